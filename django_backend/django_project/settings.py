@@ -177,8 +177,17 @@ CELERY_ACCEPT_CONTENT = ["json"]
 CELERY_TASK_SERIALIZER = "json"
 CELERY_RESULT_SERIALIZER = "json"
 CELERY_TIMEZONE = "Asia/Shanghai"
-# 限制并发数为1，确保同一时间只有一个下载任务在执行
-CELERY_WORKER_CONCURRENCY = 1
+# 下载任务使用 download 队列，其它任务（异步添加、批量操作、批量刷新、翻译、定时检查等）使用默认队列 celery，
+# 两个队列分别由各自的 Worker 消费，短任务不会排在长时间运行的下载任务后面（启动方式见 README）
+CELERY_TASK_DEFAULT_QUEUE = "celery"
+CELERY_TASK_ROUTES = {
+    "nassav.tasks.download_video_task": {"queue": "download"},
+    "nassav.tasks.mock_download_video_task": {"queue": "download"},
+}
+# 默认队列 Worker 的并发数（Celery.concurrency，默认 4）；
+# 下载队列 Worker 启动时用 --concurrency 指定为下载槽位数，同时运行的下载任务数由下载槽位控制
+CELERY_CONFIG = CONFIG.get("Celery", {}) or {}
+CELERY_WORKER_CONCURRENCY = max(int(CELERY_CONFIG.get("concurrency", 4)), 1)
 CELERY_WORKER_PREFETCH_MULTIPLIER = 1
 # 禁用 Worker 的任务成功/失败日志
 CELERY_WORKER_SEND_TASK_EVENTS = False
@@ -241,14 +250,74 @@ PROXY_URL = PROXY_CONFIG.get("url", None)
 
 # Source configurations
 SOURCE_CONFIG = CONFIG.get("Source", {})
+# 从任意源获取资源时并发探测所有源（权重最高的成功结果优先），false 时按权重依次尝试
+SOURCE_PROBE_CONCURRENT = bool(SOURCE_CONFIG.get("probe_concurrent", True))
+
+# 源健康统计与熔断（按成功率/延迟动态排序，连续失败后暂停使用该源）
+SOURCE_HEALTH_CONFIG = CONFIG.get("SourceHealth", {}) or {}
+SOURCE_HEALTH_ENABLED = bool(SOURCE_HEALTH_CONFIG.get("enabled", True))
+
+# HTTP 会话池配置（源/刮削器/封面/头像请求按 域名+代理 复用连接）
+HTTP_POOL_CONFIG = CONFIG.get("HttpPool", {}) or {}
+
+# HTTP 录制/回放（离线基准测试，见 nassav/http_replay.py）
+HTTP_REPLAY_CONFIG = CONFIG.get("HttpReplay", {}) or {}
+
+# 按域名的请求限流（令牌桶，Redis 共享）
+RATE_LIMIT_CONFIG = CONFIG.get("RateLimit", {}) or {}
+RATE_LIMIT_ENABLED = bool(RATE_LIMIT_CONFIG.get("enabled", True))
+
+# 源页面 HTML 快照（zstd 压缩，按内容哈希去重）
+HTML_SNAPSHOT_CONFIG = CONFIG.get("HtmlSnapshot", {}) or {}
+HTML_SNAPSHOT_DIR = Path(HTML_SNAPSHOT_CONFIG.get("dir") or (RESOURCE_DIR / "html"))
+
+# 未命中缓存：源/刮削器对某个 AVID 失败后，在有效期内跳过重复请求（秒，0 表示不缓存该类结果）
+NEGATIVE_CACHE_CONFIG = CONFIG.get("NegativeCache", {}) or {}
+NEGATIVE_CACHE_ENABLED = bool(NEGATIVE_CACHE_CONFIG.get("enabled", True))
+NEGATIVE_CACHE_TTL = {
+    "miss": int(NEGATIVE_CACHE_CONFIG.get("miss_ttl", 86400)),
+    "forbidden": int(NEGATIVE_CACHE_CONFIG.get("forbidden_ttl", 1800)),
+    "error": int(NEGATIVE_CACHE_CONFIG.get("error_ttl", 300)),
+}
+
+# 源 Cookie 生命周期：Redis 中记录每个 Cookie 的过期时间并推送给所有进程，过期前后台刷新
+COOKIE_CONFIG = CONFIG.get("Cookies", {}) or {}
+COOKIE_SYNC_ENABLED = bool(COOKIE_CONFIG.get("enabled", True))
+
+# 演员头像：Redis 记录已下载的头像 URL（已有时不再请求），按 ETag 定期重新验证，同一 URL 只下载一次
+AVATAR_CONFIG = CONFIG.get("Avatars", {}) or {}
+AVATAR_INDEX_ENABLED = bool(AVATAR_CONFIG.get("enabled", True))
+
+# 批量刷新元数据任务（分块处理，块内并发请求、批量写入数据库）
+BULK_REFRESH_CONFIG = CONFIG.get("BulkRefresh", {}) or {}
+
+# 添加/刷新资源的保存流程（刮削、封面、头像等互不依赖的阶段并发执行）
+RESOURCE_PIPELINE_CONFIG = CONFIG.get("ResourcePipeline", {}) or {}
+
+# 批量资源操作（/api/resources/batch）：每种操作的并发数、请求中直接执行的最大数量
+RESOURCES_BATCH_CONFIG = CONFIG.get("ResourcesBatch", {}) or {}
 
 # Scraper configurations (e.g., JavBus, Busdmm, Dmmsee)
 SCRAPER_CONFIG = CONFIG.get("Scraper", {})
+# 并发请求所有刮削镜像：latency_budget 秒内有完整结果时直接返回，否则按优先级逐字段合并已返回的结果
+SCRAPER_CONCURRENT = bool(SCRAPER_CONFIG.get("concurrent", True))
+SCRAPER_LATENCY_BUDGET = float(SCRAPER_CONFIG.get("latency_budget", 3))
 
 # Translator configurations (e.g., Ollama)
 TRANSLATOR_CONFIG = CONFIG.get("Translator", {})
 ACTIVE_TRANSLATOR = CONFIG.get("Translator", {}).get("active", None)
 
+# Downloader configurations (N_m3u8DL-RE / AsyncHLS)
+DOWNLOADER_CONFIG = CONFIG.get("Downloader", {}) or {}
+ACTIVE_DOWNLOADER = DOWNLOADER_CONFIG.get("active", "N_m3u8DL-RE")
+# 下载槽位：同时运行的下载任务数、租约有效期（秒）、槽位已满时任务暂存间隔（秒）
+DOWNLOAD_SLOTS = max(int(DOWNLOADER_CONFIG.get("slots", 1)), 1)
+DOWNLOAD_SLOT_LEASE_TTL = int(DOWNLOADER_CONFIG.get("slot_lease_ttl", 60))
+DOWNLOAD_SLOT_PARK_DELAY = int(DOWNLOADER_CONFIG.get("slot_park_delay", 15))
+# 下载调度：收藏资源的优先级加成、每等待一小时增加的优先级（防止低优先级任务饿死）
+DOWNLOAD_FAVORITE_BOOST = float(DOWNLOADER_CONFIG.get("favorite_boost", 5))
+DOWNLOAD_AGING_PER_HOUR = float(DOWNLOADER_CONFIG.get("aging_per_hour", 1))
+
 
 # Celery Beat schedule: daily consistency checks
 CELERY_BEAT_SCHEDULE = {
@@ -284,4 +353,20 @@ CELERY_BEAT_SCHEDULE = {
             "celery_beat/resources_consistency_report.json",
         ),
     },
+    "dispatch-download-queue": {
+        "task": "nassav.tasks.dispatch_download_queue_task",
+        "schedule": 30.0,  # 每 30 秒兜底派发等待中的下载任务
+    },
+    "reconcile-task-registry": {
+        "task": "nassav.tasks.reconcile_task_registry_task",
+        "schedule": 60.0,  # 每分钟对账任务登记，清理崩溃遗留的任务锁
+    },
+    "probe-tripped-sources": {
+        "task": "nassav.tasks.probe_tripped_sources_task",
+        "schedule": 60.0,  # 每分钟试探冷却期已过的熔断源
+    },
+    "refresh-expiring-cookies": {
+        "task": "nassav.tasks.refresh_expiring_cookies_task",
+        "schedule": 300.0,  # 每 5 分钟刷新即将过期的源 Cookie
+    },
 }
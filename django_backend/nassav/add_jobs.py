@@ -0,0 +1,261 @@
+"""
+异步添加资源任务
+
+POST /api/resource 使用异步模式（mode=async）时，请求只校验参数、检查资源是否已存在，
+之后创建任务并提交 Celery 任务，立即返回 202 和 job_id，不在 Web Worker 中等待查找源、刮削、封面、头像：
+
+- 任务状态保存在 Redis（nassav:add_resource:{job_id}），可通过 GET /api/resource/jobs/{job_id} 查询
+- 同一 AVID 同时只有一个任务：重复提交返回正在进行的任务
+- 各阶段（source 查找源、scrape 刮削、cover 封面、database 保存、avatar:{演员} 头像……）
+  开始/结束时通过 WebSocket 推送 resource_add 消息
+- 任务结束后记录与同步模式相同的响应（code、message、data），失败时 code 为对应的 HTTP 状态码
+"""
+import json
+import time
+import uuid
+from typing import Optional, Tuple
+
+from loguru import logger
+
+KEY_PREFIX = "nassav:add_resource"
+
+STATUS_QUEUED = "queued"
+STATUS_RUNNING = "running"
+STATUS_COMPLETED = "completed"
+STATUS_FAILED = "failed"
+
+FINISHED_STATUSES = (STATUS_COMPLETED, STATUS_FAILED)
+
+
+def brief_resource(resource_data: Optional[dict]) -> Optional[dict]:
+    """添加资源接口返回的资源字段"""
+    if resource_data is None:
+        return None
+    return {
+        "avid": resource_data.get("avid"),
+        "original_title": resource_data.get("original_title"),
+        "source_title": resource_data.get("source_title"),
+        "translated_title": resource_data.get("translated_title"),
+        "source": resource_data.get("source"),
+    }
+
+
+def summarize(result: dict) -> dict:
+    """ResourceService.add_resource 的结果 -> 添加资源接口的 data"""
+    return {
+        "resource": brief_resource(result["resource"]),
+        "cover_downloaded": result["cover_saved"],
+        "metadata_saved": result["metadata_saved"],
+        "scraped": result["scraped"],
+        "timings": result["timings"],
+    }
+
+
+def _decode(value):
+    return value.decode() if isinstance(value, bytes) else value
+
+
+class AddResourceJobs:
+    """异步添加资源任务的状态（Redis）"""
+
+    def __init__(self, client=None):
+        """
+        Args:
+            client: Redis 客户端，默认使用进程共享的客户端
+        """
+        self._client = client
+
+    @property
+    def client(self):
+        if self._client is None:
+            from nassav.tasks import get_redis_client
+
+            return get_redis_client()
+        return self._client
+
+    @property
+    def ttl(self) -> int:
+        from nassav.resource_service import _pipeline_config
+
+        return int(_pipeline_config()["job_ttl"])
+
+    @staticmethod
+    def _key(job_id: str, part: str = "") -> str:
+        return f"{KEY_PREFIX}:{job_id}" + (f":{part}" if part else "")
+
+    @staticmethod
+    def _avid_key(avid: str) -> str:
+        return f"{KEY_PREFIX}:avid:{avid.upper()}"
+
+    def create(self, avid: str, source: str = "any") -> Tuple[dict, bool]:
+        """
+        创建任务；同一 AVID 已有未结束的任务时返回该任务
+
+        Args:
+            avid: 视频编号
+            source: 指定源或 "any"
+
+        Returns:
+            (任务信息, 是否新建)
+        """
+        avid = avid.upper()
+        ttl = self.ttl
+        job_id = uuid.uuid4().hex[:12]
+        if not self.client.set(self._avid_key(avid), job_id, nx=True, ex=ttl):
+            existing = _decode(self.client.get(self._avid_key(avid)))
+            job = self.get(existing) if existing else None
+            if job is not None and job["status"] not in FINISHED_STATUSES:
+                return job, False
+            # 任务记录已过期或已结束但 AVID 索引未清理
+            self.client.set(self._avid_key(avid), job_id, ex=ttl)
+
+        now = round(time.time(), 3)
+        pipe = self.client.pipeline()
+        pipe.hset(
+            self._key(job_id),
+            mapping={
+                "avid": avid,
+                "source": source,
+                "status": STATUS_QUEUED,
+                "created_at": now,
+                "updated_at": now,
+            },
+        )
+        pipe.expire(self._key(job_id), ttl)
+        pipe.execute()
+        logger.info(f"[添加资源] 创建任务 {job_id}: {avid}, source={source}")
+        return self.get(job_id), True
+
+    def get(self, job_id: str) -> Optional[dict]:
+        """
+        Returns:
+            {"job_id", "avid", "source", "status", "stages": {阶段名: {"status", "elapsed"}},
+             "code", "message", "data", "created_at", "updated_at"}；不存在时为 None
+        """
+        pipe = self.client.pipeline(transaction=False)
+        pipe.hgetall(self._key(job_id))
+        pipe.hgetall(self._key(job_id, "stages"))
+        raw, stages = pipe.execute()
+        if not raw:
+            return None
+        data = {_decode(k): _decode(v) for k, v in raw.items()}
+        return {
+            "job_id": job_id,
+            "avid": data["avid"],
+            "source": data["source"],
+            "status": data["status"],
+            "stages": {_decode(k): json.loads(v) for k, v in stages.items()},
+            "code": int(data["code"]) if data.get("code") else None,
+            "message": data.get("message"),
+            "data": json.loads(data["data"]) if data.get("data") else None,
+            "created_at": float(data["created_at"]),
+            "updated_at": float(data["updated_at"]),
+        }
+
+    def stage(
+        self, job_id: str, avid: str, name: str, status: str, elapsed: Optional[float]
+    ):
+        """记录阶段状态并通过 WebSocket 推送（保存流程各线程中调用）"""
+        elapsed = None if elapsed is None else round(elapsed, 3)
+        try:
+            pipe = self.client.pipeline()
+            pipe.hset(
+                self._key(job_id, "stages"),
+                name,
+                json.dumps({"status": status, "elapsed": elapsed}),
+            )
+            pipe.expire(self._key(job_id, "stages"), self.ttl)
+            pipe.execute()
+        except Exception as e:
+            logger.debug(f"[添加资源] 记录阶段状态失败 {job_id}/{name}: {e}")
+        self.notify(
+            {
+                "job_id": job_id,
+                "avid": avid,
+                "status": STATUS_RUNNING,
+                "stage": name,
+                "stage_status": status,
+                "elapsed": elapsed,
+            }
+        )
+
+    def _update(self, job_id: str, **fields):
+        self.client.hset(
+            self._key(job_id),
+            mapping={**fields, "updated_at": round(time.time(), 3)},
+        )
+
+    def finish(
+        self, job_id: str, code: int, message: str, data: Optional[dict] = None
+    ) -> Optional[dict]:
+        """记录任务结果（code 为同步模式的 HTTP 状态码），释放 AVID"""
+        job = self.get(job_id)
+        if job is None:
+            return None
+        status = STATUS_COMPLETED if code < 400 else STATUS_FAILED
+        self._update(
+            job_id,
+            status=status,
+            code=code,
+            message=message,
+            data=json.dumps(data, ensure_ascii=False),
+        )
+        if _decode(self.client.get(self._avid_key(job["avid"]))) == job_id:
+            self.client.delete(self._avid_key(job["avid"]))
+        job = self.get(job_id)
+        self.notify(job)
+        return job
+
+    @staticmethod
+    def notify(data: Optional[dict]):
+        """通过 WebSocket 推送 resource_add 消息（任务状态变化或阶段事件）"""
+        if not data:
+            return
+        from nassav.tasks import notify_task_update
+
+        notify_task_update("resource_add", data)
+
+    def run(self, job_id: str) -> Optional[dict]:
+        """
+        执行任务（Celery Worker 中调用）
+
+        Returns:
+            结束后的任务信息；任务不存在或已开始执行时原样返回
+        """
+        from nassav.resource_service import (
+            ResourceAlreadyExistsError,
+            ResourceServiceException,
+            resource_service,
+        )
+
+        job = self.get(job_id)
+        if job is None or job["status"] != STATUS_QUEUED:
+            return job
+        self._update(job_id, status=STATUS_RUNNING)
+        self.notify(self.get(job_id))
+        avid = job["avid"]
+
+        try:
+            result = resource_service.add_resource(
+                avid,
+                job["source"],
+                on_stage=lambda name, status, elapsed: self.stage(
+                    job_id, avid, name, status, elapsed
+                ),
+            )
+        except ResourceAlreadyExistsError as e:
+            return self.finish(
+                job_id, e.status_code, str(e), brief_resource(e.resource_data)
+            )
+        except ResourceServiceException as e:
+            return self.finish(job_id, e.status_code, str(e))
+        except Exception as e:
+            logger.error(f"[添加资源] 任务 {job_id} 失败: {avid}, 错误: {e}", exc_info=True)
+            return self.finish(job_id, 500, f"服务器内部错误: {str(e)}")
+
+        if not result["cover_saved"]:
+            logger.warning(f"封面下载失败: {avid}")
+        return self.finish(job_id, 201, "success", summarize(result))
+
+
+add_resource_jobs = AddResourceJobs()
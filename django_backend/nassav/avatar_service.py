@@ -0,0 +1,356 @@
+"""
+演员头像服务
+
+添加/刷新资源、补全脚本、一致性检查都通过这里下载演员头像：
+
+- 头像文件按 URL 的文件名保存在 AVATAR_DIR（与 Actor.avatar_filename 一致），URL 变化即下载新文件
+- Redis 哈希记录已下载的 URL（文件名、ETag、Last-Modified、下载时间），文件已存在时不再请求；
+  超过 revalidate_after 秒的头像带 If-None-Match / If-Modified-Since 重新验证，304 时不重新下载
+- 同一 URL 同时只下载一次：进程内等待正在进行的下载，跨进程通过 Redis 锁（SET NX）等待
+- 请求经过 HTTP 会话池，按域名限流（RateLimit）；批量补全使用有界线程池
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from loguru import logger
+
+KEY = "nassav:avatars"
+LOCK_PREFIX = "nassav:avatars:lock"
+
+DEFAULT_CONFIG = {
+    # 已下载的头像超过多少秒后按 ETag/Last-Modified 重新验证（0 表示不重新验证）
+    "revalidate_after": 30 * 86400,
+    # 批量补全时同时下载的头像数
+    "workers": 4,
+    # 同一 URL 的跨进程下载锁有效期（秒）
+    "lock_ttl": 60,
+    # 请求超时（秒）与网络错误重试次数
+    "timeout": 15,
+    "retries": 3,
+}
+
+# ensure() 的结果
+STATUS_PRESENT = "present"  # 已有，未发出请求
+STATUS_DOWNLOADED = "downloaded"
+STATUS_NOT_MODIFIED = "not_modified"  # 重新验证返回 304
+STATUS_FAILED = "failed"
+STATUS_SKIPPED = "skipped"  # 没有 URL 或占位符 URL
+
+OK_STATUSES = (STATUS_PRESENT, STATUS_DOWNLOADED, STATUS_NOT_MODIFIED)
+
+
+def avatar_filename(url: str) -> str:
+    """头像 URL -> 保存的文件名（URL 的文件名，没有扩展名时按 URL 哈希命名）"""
+    filename = urlsplit(url).path.rstrip("/").split("/")[-1]
+    if not filename or "." not in filename:
+        filename = f"{hashlib.sha1(url.encode()).hexdigest()[:16]}.jpg"
+    return filename
+
+
+def is_placeholder(url: Optional[str]) -> bool:
+    from nassav.constants import ACTOR_AVATAR_PLACEHOLDER_URLS
+
+    return url in ACTOR_AVATAR_PLACEHOLDER_URLS
+
+
+class _Flight:
+    """进程内同一 URL 正在进行的下载"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.status = STATUS_FAILED
+
+
+class AvatarService:
+    """下载、去重并按需重新验证演员头像"""
+
+    def __init__(self, client=None):
+        """
+        Args:
+            client: Redis 客户端，默认使用进程共享的客户端
+        """
+        self._client = client
+        self._flights: Dict[str, _Flight] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def client(self):
+        if self._client is None:
+            from nassav.tasks import get_redis_client
+
+            return get_redis_client()
+        return self._client
+
+    @property
+    def enabled(self) -> bool:
+        """是否使用 Redis 索引与跨进程锁（关闭时只按文件是否存在判断）"""
+        return bool(getattr(settings, "AVATAR_INDEX_ENABLED", True))
+
+    @property
+    def config(self) -> dict:
+        return {**DEFAULT_CONFIG, **(getattr(settings, "AVATAR_CONFIG", {}) or {})}
+
+    def path_for(self, url: str) -> Path:
+        return Path(settings.AVATAR_DIR) / avatar_filename(url)
+
+    # ---------------------------------------------------------------- 索引
+
+    def _entries(self, urls: List[str]) -> List[Optional[dict]]:
+        if not self.enabled or not urls:
+            return [None] * len(urls)
+        try:
+            values = self.client.hmget(KEY, urls)
+        except Exception as e:
+            logger.debug(f"读取头像索引失败: {e}")
+            return [None] * len(urls)
+        return [json.loads(v) if v else None for v in values]
+
+    def _save_entry(self, url: str, entry: dict):
+        if not self.enabled:
+            return
+        try:
+            self.client.hset(KEY, url, json.dumps(entry))
+        except Exception as e:
+            logger.debug(f"写入头像索引失败: {e}")
+
+    def _is_fresh(self, entry: Optional[dict], path: Path) -> bool:
+        """文件存在且（没有索引，或索引记录未超过 revalidate_after）"""
+        if not path.exists():
+            return False
+        revalidate_after = int(self.config["revalidate_after"])
+        if entry is None or not revalidate_after:
+            return True
+        return time.time() - entry.get("fetched_at", 0) < revalidate_after
+
+    def missing(self, urls: Iterable[str]) -> List[str]:
+        """
+        需要请求的头像 URL（未下载或需要重新验证；一次 HMGET 读取索引）
+
+        Args:
+            urls: 头像 URL（忽略空值、占位符和重复）
+        """
+        urls = list(dict.fromkeys(u for u in urls if u and not is_placeholder(u)))
+        entries = self._entries(urls)
+        return [
+            url
+            for url, entry in zip(urls, entries)
+            if not self._is_fresh(entry, self.path_for(url))
+        ]
+
+    # ---------------------------------------------------------------- 下载
+
+    def ensure(self, url: Optional[str], force: bool = False) -> str:
+        """
+        确保头像已下载（已有时不请求；同一 URL 的并发调用只下载一次）
+
+        Args:
+            url: 头像 URL
+            force: 文件已存在时也重新请求（带条件请求头）
+
+        Returns:
+            STATUS_* 之一
+        """
+        if not url or is_placeholder(url):
+            return STATUS_SKIPPED
+
+        with self._lock:
+            flight = self._flights.get(url)
+            owner = flight is None
+            if owner:
+                flight = self._flights[url] = _Flight()
+        if not owner:
+            flight.done.wait(self.config["lock_ttl"])
+            return STATUS_PRESENT if flight.status in OK_STATUSES else flight.status
+
+        try:
+            flight.status = self._ensure(url, force)
+            return flight.status
+        finally:
+            with self._lock:
+                self._flights.pop(url, None)
+            flight.done.set()
+
+    def _ensure(self, url: str, force: bool) -> str:
+        path = self.path_for(url)
+        entry = self._entries([url])[0]
+        if not force and self._is_fresh(entry, path):
+            if entry is None and self.enabled:
+                # 索引之前已有的文件：补记索引，之后按 revalidate_after 重新验证
+                self._save_entry(
+                    url, {"filename": path.name, "fetched_at": path.stat().st_mtime}
+                )
+            return STATUS_PRESENT
+
+        lock_key = f"{LOCK_PREFIX}:{hashlib.sha1(url.encode()).hexdigest()}"
+        acquired = self._acquire(lock_key)
+        # 其他进程正在下载同一 URL：等待其完成
+        if not acquired and self._wait_release(lock_key) and path.exists():
+            return STATUS_PRESENT
+        try:
+            return self._fetch(url, path, entry if path.exists() else None)
+        finally:
+            if acquired:
+                self._release(lock_key)
+
+    def _acquire(self, lock_key: str) -> bool:
+        if not self.enabled:
+            return True
+        try:
+            return bool(
+                self.client.set(
+                    lock_key, os.getpid(), nx=True, ex=self.config["lock_ttl"]
+                )
+            )
+        except Exception:
+            return True
+
+    def _wait_release(self, lock_key: str) -> bool:
+        deadline = time.monotonic() + self.config["lock_ttl"]
+        while time.monotonic() < deadline:
+            try:
+                if not self.client.exists(lock_key):
+                    return True
+            except Exception:
+                return False
+            time.sleep(0.1)
+        return False
+
+    def _release(self, lock_key: str):
+        if not self.enabled:
+            return
+        try:
+            self.client.delete(lock_key)
+        except Exception:
+            pass
+
+    def _fetch(self, url: str, path: Path, entry: Optional[dict]) -> str:
+        """请求头像；entry 不为空时带条件请求头（文件已存在，重新验证）"""
+        from nassav.constants import HEADERS
+        from nassav.http_pool import get_http_pool
+
+        parts = urlsplit(url)
+        headers = {**HEADERS, "Referer": f"{parts.scheme}://{parts.netloc}/"}
+        if entry:
+            if entry.get("etag"):
+                headers["If-None-Match"] = entry["etag"]
+            if entry.get("last_modified"):
+                headers["If-Modified-Since"] = entry["last_modified"]
+        proxy = settings.PROXY_URL if settings.PROXY_ENABLED else None
+
+        retries = max(int(self.config["retries"]), 1)
+        for attempt in range(retries):
+            try:
+                response = get_http_pool().get(
+                    url, proxy=proxy, headers=headers, timeout=self.config["timeout"]
+                )
+            except Exception as e:
+                logger.warning(f"头像下载失败 (尝试 {attempt + 1}/{retries}): {e}")
+                continue
+
+            if response.status_code == 304 and entry:
+                self._save_entry(url, {**entry, "fetched_at": time.time()})
+                return STATUS_NOT_MODIFIED
+            if response.status_code == 200 and response.content:
+                path.parent.mkdir(parents=True, exist_ok=True)
+                tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+                tmp.write_bytes(response.content)
+                os.replace(tmp, path)
+                self._save_entry(
+                    url,
+                    {
+                        "filename": path.name,
+                        "etag": response.headers.get("ETag"),
+                        "last_modified": response.headers.get("Last-Modified"),
+                        "fetched_at": time.time(),
+                    },
+                )
+                logger.info(f"头像下载成功: {path.name}")
+                return STATUS_DOWNLOADED
+            logger.warning(f"头像下载失败 (HTTP {response.status_code}): {url}")
+            if response.status_code < 500:
+                break
+        return STATUS_FAILED
+
+    def backfill(
+        self,
+        urls: Iterable[str],
+        workers: Optional[int] = None,
+        force: bool = False,
+        on_result=None,
+    ) -> Dict[str, str]:
+        """
+        批量下载头像（有界线程池，已有的头像不请求）
+
+        Args:
+            urls: 头像 URL
+            workers: 同时下载数，默认配置 workers
+            force: 已有的头像也重新请求（带条件请求头）
+            on_result: 每个 URL 完成后的回调 on_result(url, 状态)
+
+        Returns:
+            {URL: STATUS_*}
+        """
+        urls = list(dict.fromkeys(u for u in urls if u))
+        results = {url: STATUS_SKIPPED for url in urls if is_placeholder(url)}
+        candidates = [url for url in urls if url not in results]
+        todo = candidates if force else self.missing(candidates)
+        pending = set(todo)
+        results.update(
+            {url: STATUS_PRESENT for url in candidates if url not in pending}
+        )
+
+        def run(url):
+            status = self.ensure(url, force=force)
+            if on_result:
+                on_result(url, status)
+            return status
+
+        workers = max(1, min(int(workers or self.config["workers"]), len(todo) or 1))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="avatar") as ex:
+            for url, status in zip(todo, ex.map(run, todo)):
+                results[url] = status
+        return results
+
+    # ---------------------------------------------------------------- 数据库
+
+    def update_actors(self, actor_avatars: Dict[str, str]) -> int:
+        """
+        批量更新演员的 avatar_url / avatar_filename（只写有变化的演员）
+
+        Args:
+            actor_avatars: {演员名: 头像 URL}
+
+        Returns:
+            更新的演员数
+        """
+        from django.utils import timezone
+        from nassav.models import Actor
+
+        actor_avatars = {k: v for k, v in (actor_avatars or {}).items() if k and v}
+        if not actor_avatars:
+            return 0
+        changed = []
+        for actor in Actor.objects.filter(name__in=list(actor_avatars)):
+            url = actor_avatars[actor.name]
+            filename = None if is_placeholder(url) else avatar_filename(url)
+            if actor.avatar_url != url or actor.avatar_filename != filename:
+                actor.avatar_url, actor.avatar_filename = url, filename
+                actor.updated_at = timezone.now()
+                changed.append(actor)
+        if changed:
+            Actor.objects.bulk_update(
+                changed, ["avatar_url", "avatar_filename", "updated_at"]
+            )
+        return len(changed)
+
+
+# 模块级单例
+avatar_service = AvatarService()
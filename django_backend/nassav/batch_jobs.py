@@ -0,0 +1,656 @@
+"""
+批量资源操作任务
+
+POST /api/resources/batch 的 add/refresh/delete-video/delete 操作由这里执行：
+
+- 每种操作一个有界线程池（并发数见配置 ResourcesBatch.concurrency），不同操作之间互不占用名额；
+  每个操作的结果与逐个执行时相同
+- 少量操作（不超过 sync_limit）默认在请求中执行，返回与之前相同的 {"results": [...]}
+- 更多操作（或 mode=async/stream）创建任务，提交 Celery 执行：状态与结果保存在 Redis（nassav:batch:{job_id}），
+  可查询、取消（未开始的操作不再执行）；每完成一项通过 WebSocket 推送 resources_batch 消息，
+  也可以通过 NDJSON 流（GET /api/resources/batch/{job_id}/stream）按完成顺序读取结果
+  （ASGI 下使用异步生成器 astream，WSGI 下使用同步生成器 stream）
+"""
+import asyncio
+import json
+import shutil
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+from typing import AsyncIterator, Callable, Dict, Iterator, List, Optional, Tuple
+
+from django.conf import settings
+from loguru import logger
+
+KEY_PREFIX = "nassav:batch"
+
+STATUS_QUEUED = "queued"
+STATUS_RUNNING = "running"
+STATUS_COMPLETED = "completed"
+STATUS_CANCELLED = "cancelled"
+STATUS_FAILED = "failed"
+
+FINISHED_STATUSES = (STATUS_COMPLETED, STATUS_CANCELLED, STATUS_FAILED)
+
+DEFAULT_CONFIG = {
+    # 每种操作同时执行的数量（delete 包括 delete-all）
+    "concurrency": {"add": 2, "refresh": 4, "delete-video": 4, "delete": 4},
+    # 不超过该数量的批量操作默认在请求中执行并直接返回结果
+    "sync_limit": 10,
+    # 任务记录保存时间（秒）
+    "ttl": 86400,
+    # NDJSON 流读取新结果的间隔与心跳间隔（秒）
+    "poll_interval": 0.5,
+    "heartbeat": 15,
+}
+
+
+class BatchError(ValueError):
+    """批量操作参数错误"""
+
+
+def _config() -> dict:
+    config = {
+        **DEFAULT_CONFIG,
+        **(getattr(settings, "RESOURCES_BATCH_CONFIG", {}) or {}),
+    }
+    config["concurrency"] = {
+        **DEFAULT_CONFIG["concurrency"],
+        **(config.get("concurrency") or {}),
+    }
+    return config
+
+
+def default_mode(count: int) -> str:
+    """未指定 mode 时：不超过 sync_limit 项在请求中执行（sync），否则创建任务（async）"""
+    return "sync" if count <= int(_config()["sync_limit"]) else "async"
+
+
+def _decode(value):
+    return value.decode() if isinstance(value, bytes) else value
+
+
+def validate_actions(actions) -> List[dict]:
+    """
+    Raises:
+        BatchError: actions 不是对象数组
+    """
+    if not isinstance(actions, list) or not all(isinstance(a, dict) for a in actions):
+        raise BatchError("actions 必须是对象数组")
+    return actions
+
+
+# ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━ 单项操作
+
+
+def _failure(action: str, avid: Optional[str], code: int, message: str) -> dict:
+    return {
+        "action": action,
+        "avid": avid,
+        "code": code,
+        "message": message,
+        "resource": None,
+    }
+
+
+def _add(avid: str, act: dict) -> dict:
+    """添加资源：已存在时返回现有数据（200 already exists）"""
+    from nassav.api_utils import serialize_resource_obj
+    from nassav.models import AVResource
+    from nassav.resource_service import (
+        ResourceAlreadyExistsError,
+        ResourceServiceException,
+        resource_service,
+    )
+
+    existing_resource = AVResource.objects.filter(avid=avid).first()
+    if existing_resource:
+        return {
+            "action": "add",
+            "avid": avid,
+            "code": 200,
+            "message": "already exists",
+            "resource": serialize_resource_obj(existing_resource),
+        }
+
+    source = (act.get("source") or "any").lower()
+    try:
+        result = resource_service.add_resource(avid, source)
+    except ResourceAlreadyExistsError as e:
+        # 其他请求同时添加了该资源
+        return {
+            "action": "add",
+            "avid": avid,
+            "code": 200,
+            "message": "already exists",
+            "resource": e.resource_data,
+        }
+    except ResourceServiceException as e:
+        return _failure("add", avid, e.status_code, str(e))
+    except Exception as e:
+        logger.error(f"批量添加资源失败: {avid}, 错误: {e}", exc_info=True)
+        return _failure("add", avid, 500, f"服务器内部错误: {str(e)}")
+    return {
+        "action": "add",
+        "avid": avid,
+        "code": 201,
+        "message": "created",
+        "resource": result["resource"],
+    }
+
+
+def _delete_video(avid: str, act: dict) -> dict:
+    """只删除视频文件，保留元数据"""
+    from nassav.models import AVResource
+
+    mp4_path = Path(settings.VIDEO_DIR) / f"{avid}.mp4"
+    if not mp4_path.exists():
+        return _failure("delete-video", avid, 404, "视频不存在")
+
+    try:
+        file_size = mp4_path.stat().st_size
+        mp4_path.unlink()
+        # 更新数据库记录，标记视频不存在
+        AVResource.objects.filter(avid=avid).update(
+            file_exists=False, file_size=None, video_saved_at=None
+        )
+        logger.info(f"已删除视频: {avid}")
+    except Exception as e:
+        logger.error(f"删除视频失败: {e}")
+        return _failure("delete-video", avid, 500, f"删除失败: {str(e)}")
+    return {
+        "action": "delete-video",
+        "avid": avid,
+        "code": 200,
+        "message": "视频已删除",
+        "deleted_file": f"{avid}.mp4",
+        "file_size": file_size,
+    }
+
+
+def _delete_all(avid: str, act: dict) -> dict:
+    """删除全部数据（视频+元数据+封面+备份）"""
+    from nassav.api_utils import serialize_resource_obj
+    from nassav.models import AVResource
+
+    action = (act.get("action") or "").lower()
+    cover_root = Path(settings.COVER_DIR)
+    video_root = Path(settings.VIDEO_DIR)
+    backup_root = Path(
+        getattr(
+            settings,
+            "RESOURCE_BACKUP_DIR",
+            Path(settings.BASE_DIR) / "resource_backup",
+        )
+    )
+
+    cover_candidates = [
+        cover_root / f"{avid}{ext}"
+        for ext in (".jpg", ".jpeg", ".png", ".webp")
+        if (cover_root / f"{avid}{ext}").exists()
+    ]
+    mp4_path = video_root / f"{avid}.mp4"
+    backup_dir = backup_root / avid
+
+    if not cover_candidates and not mp4_path.exists() and not backup_dir.exists():
+        return _failure(action, avid, 404, "资源不存在")
+
+    deleted_files = []
+    for p in cover_candidates:
+        deleted_files.append(p.name)
+        try:
+            p.unlink()
+            logger.info(f"已删除封面: {p.name}")
+        except Exception:
+            pass
+
+    if mp4_path.exists():
+        deleted_files.append(mp4_path.name)
+        logger.info(f"已删除视频: {mp4_path.name}")
+        try:
+            mp4_path.unlink()
+        except Exception:
+            pass
+
+    if backup_dir.exists():
+        try:
+            for f in backup_dir.iterdir():
+                deleted_files.append(f.name)
+            shutil.rmtree(backup_dir)
+        except Exception:
+            pass
+
+    # serialize and delete DB record
+    resource_data = None
+    try:
+        resource_obj = AVResource.objects.filter(avid=avid).first()
+        if resource_obj:
+            resource_data = serialize_resource_obj(resource_obj)
+        AVResource.objects.filter(avid=avid).delete()
+    except Exception:
+        pass
+
+    return {
+        "action": action,
+        "avid": avid,
+        "code": 200,
+        "message": "已删除全部数据",
+        "resource": resource_data,
+        "deleted_files": deleted_files,
+    }
+
+
+def _refresh(avid: str, act: dict) -> dict:
+    """刷新元数据和/或 m3u8，可选重新翻译"""
+    from nassav.api_utils import serialize_resource_obj
+    from nassav.models import AVResource
+
+    resource = AVResource.objects.filter(avid=avid).first()
+    if not resource:
+        return _failure("refresh", avid, 404, "资源不存在")
+    if not resource.source:
+        return _failure("refresh", avid, 400, "没有 source 信息")
+
+    # 解析细粒度参数
+    refresh_m3u8 = act.get("refresh_m3u8", True)
+    refresh_metadata = act.get("refresh_metadata", True)
+    retranslate = act.get("retranslate", False)
+
+    refresh_info = {}
+
+    # 刷新元数据和/或 m3u8
+    if refresh_metadata or refresh_m3u8:
+        from nassav.resource_service import ResourceNotFoundError, resource_service
+
+        try:
+            refresh_result = resource_service.refresh_resource(
+                avid,
+                scrape=refresh_metadata,
+                download_cover=refresh_metadata,
+            )
+        except ResourceNotFoundError as e:
+            return _failure("refresh", avid, 404, str(e))
+        except Exception as e:
+            logger.error(f"批量刷新资源失败: {avid}, 错误: {e}", exc_info=True)
+            return _failure("refresh", avid, 500, f"刷新失败: {str(e)}")
+
+        refresh_info["metadata_refreshed"] = refresh_metadata
+        refresh_info["m3u8_refreshed"] = refresh_m3u8
+        refresh_info["cover_saved"] = refresh_result["cover_saved"]
+        refresh_info["metadata_saved"] = refresh_result["metadata_saved"]
+        refresh_info["scraped"] = refresh_result.get("scraped", False)
+
+    # 重新翻译（在元数据刷新之后）
+    if retranslate:
+        try:
+            from nassav.tasks import translate_title_task
+
+            resource.refresh_from_db()
+            resource.translation_status = "pending"
+            resource.translated_title = None
+            resource.save(update_fields=["translation_status", "translated_title"])
+            translate_title_task.delay(avid)
+            refresh_info["translation_queued"] = True
+        except Exception as e:
+            logger.error(f"提交翻译任务失败: {e}")
+            refresh_info["translation_error"] = str(e)
+
+    resource.refresh_from_db()
+    return {
+        "action": "refresh",
+        "avid": avid,
+        "code": 200,
+        "message": "refreshed",
+        "resource": serialize_resource_obj(resource),
+        **refresh_info,
+    }
+
+
+# action -> (并发分组, 执行函数)
+ACTIONS: Dict[str, tuple] = {
+    "add": ("add", _add),
+    "refresh": ("refresh", _refresh),
+    "delete-video": ("delete-video", _delete_video),
+    "delete": ("delete", _delete_all),
+    "delete-all": ("delete", _delete_all),
+}
+
+
+def run_action(act: dict) -> dict:
+    """
+    执行一项操作（不抛出异常）
+
+    Returns:
+        {"action", "avid", "code", "message", "resource", ...}
+    """
+    action = (act.get("action") or "").lower()
+    avid = (act.get("avid") or "").upper()
+    if not avid:
+        return _failure(action, None, 400, "avid 缺失")
+    if action not in ACTIONS:
+        return _failure(action, avid, 400, "未知 action")
+    try:
+        return ACTIONS[action][1](avid, act)
+    except Exception as e:
+        logger.exception(f"批量操作失败: {e}")
+        return _failure(action, avid, 500, str(e))
+
+
+def run_actions(
+    actions: List[dict],
+    on_result: Optional[Callable[[int, dict], None]] = None,
+    should_stop: Optional[Callable[[], bool]] = None,
+) -> Dict[int, dict]:
+    """
+    按操作类型分组并发执行（每组一个有界线程池）
+
+    Args:
+        actions: 操作列表
+        on_result: 每项完成后在调用线程中回调 on_result(序号, 结果)（按完成顺序）
+        should_stop: 每项开始前调用，返回 True 时不再开始新的操作
+
+    Returns:
+        {序号: 结果}（被取消而未执行的操作不在其中）
+    """
+    from django.db import connection
+
+    concurrency = _config()["concurrency"]
+
+    def run(act):
+        if should_stop and should_stop():
+            return None
+        try:
+            return run_action(act)
+        finally:
+            # 线程池中的数据库连接用完即关闭
+            connection.close()
+
+    pools: Dict[str, ThreadPoolExecutor] = {}
+    futures = {}
+    results: Dict[int, dict] = {}
+    try:
+        for index, act in enumerate(actions):
+            action = (act.get("action") or "").lower()
+            group = ACTIONS.get(action, ("other",))[0]
+            if group not in pools:
+                pools[group] = ThreadPoolExecutor(
+                    max_workers=max(1, int(concurrency.get(group, 1))),
+                    thread_name_prefix=f"batch-{group}",
+                )
+            futures[pools[group].submit(run, act)] = index
+        for future in as_completed(futures):
+            index = futures[future]
+            result = future.result()
+            if result is None:
+                continue
+            results[index] = result
+            if on_result:
+                on_result(index, result)
+    finally:
+        for pool in pools.values():
+            pool.shutdown(wait=True)
+    return results
+
+
+# ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━ 任务状态
+
+
+class BatchJobs:
+    """批量操作任务的状态与结果（Redis）"""
+
+    def __init__(self, client=None):
+        """
+        Args:
+            client: Redis 客户端，默认使用进程共享的客户端
+        """
+        self._client = client
+
+    @property
+    def client(self):
+        if self._client is None:
+            from nassav.tasks import get_redis_client
+
+            return get_redis_client()
+        return self._client
+
+    @staticmethod
+    def _key(job_id: str, part: str = "") -> str:
+        return f"{KEY_PREFIX}:{job_id}" + (f":{part}" if part else "")
+
+    def create(self, actions: List[dict]) -> dict:
+        """
+        创建任务
+
+        Raises:
+            BatchError: actions 无效
+        """
+        actions = validate_actions(actions)
+        job_id = uuid.uuid4().hex[:12]
+        now = round(time.time(), 3)
+        ttl = int(_config()["ttl"])
+
+        pipe = self.client.pipeline()
+        pipe.hset(
+            self._key(job_id),
+            mapping={
+                "status": STATUS_QUEUED if actions else STATUS_COMPLETED,
+                "total": len(actions),
+                "succeeded": 0,
+                "failed": 0,
+                "created_at": now,
+                "updated_at": now,
+            },
+        )
+        if actions:
+            pipe.rpush(
+                self._key(job_id, "actions"),
+                *[json.dumps(a, ensure_ascii=False) for a in actions],
+            )
+        for part in ("", "actions"):
+            pipe.expire(self._key(job_id, part), ttl)
+        pipe.execute()
+        logger.info(f"[批量操作] 创建任务 {job_id}: {len(actions)} 项")
+        return self.get(job_id)
+
+    def get(self, job_id: str) -> Optional[dict]:
+        """
+        Returns:
+            {"job_id", "status", "total", "processed", "succeeded", "failed", "error",
+             "created_at", "updated_at"}；不存在时为 None
+        """
+        raw = self.client.hgetall(self._key(job_id))
+        if not raw:
+            return None
+        data = {_decode(k): _decode(v) for k, v in raw.items()}
+        counts = {
+            key: int(data.get(key, 0)) for key in ("total", "succeeded", "failed")
+        }
+        return {
+            "job_id": job_id,
+            "status": data["status"],
+            **counts,
+            "processed": counts["succeeded"] + counts["failed"],
+            "error": data.get("error"),
+            "created_at": float(data["created_at"]),
+            "updated_at": float(data["updated_at"]),
+        }
+
+    def results(self, job_id: str, offset: int = 0) -> List[dict]:
+        """按完成顺序的结果（每项带 index，为操作在请求中的序号）"""
+        items = self.client.lrange(self._key(job_id, "results"), max(offset, 0), -1)
+        return [json.loads(item) for item in items]
+
+    def actions(self, job_id: str) -> List[dict]:
+        return [
+            json.loads(a)
+            for a in self.client.lrange(self._key(job_id, "actions"), 0, -1)
+        ]
+
+    def _set_status(self, job_id: str, status: str, error: Optional[str] = None):
+        mapping = {"status": status, "updated_at": round(time.time(), 3)}
+        if error:
+            mapping["error"] = error
+        self.client.hset(self._key(job_id), mapping=mapping)
+
+    def status(self, job_id: str) -> Optional[str]:
+        return _decode(self.client.hget(self._key(job_id), "status"))
+
+    def cancel(self, job_id: str) -> Optional[dict]:
+        """取消任务：正在执行的操作完成后停止，未开始的操作不再执行"""
+        job = self.get(job_id)
+        if job is None:
+            return None
+        if job["status"] not in FINISHED_STATUSES:
+            self._set_status(job_id, STATUS_CANCELLED)
+            job = self.get(job_id)
+            self.notify(job)
+        return job
+
+    def record(self, job_id: str, index: int, result: dict) -> dict:
+        """记录一项结果并推送"""
+        ttl = int(_config()["ttl"])
+        item = {"index": index, **result}
+        pipe = self.client.pipeline()
+        pipe.rpush(self._key(job_id, "results"), json.dumps(item, ensure_ascii=False))
+        pipe.hincrby(
+            self._key(job_id), "succeeded" if result["code"] < 400 else "failed", 1
+        )
+        pipe.hset(self._key(job_id), "updated_at", round(time.time(), 3))
+        for part in ("", "actions", "results"):
+            pipe.expire(self._key(job_id, part), ttl)
+        pipe.execute()
+        job = self.get(job_id)
+        self.notify({**job, "result": item})
+        return job
+
+    @staticmethod
+    def notify(data: Optional[dict]):
+        """通过 WebSocket 推送 resources_batch 消息（状态变化，或带 result 的单项结果）"""
+        if not data:
+            return
+        from nassav.tasks import notify_task_update
+
+        notify_task_update("resources_batch", data)
+
+    def run(self, job_id: str) -> Optional[dict]:
+        """
+        执行任务（Celery Worker 中调用）
+
+        Returns:
+            结束后的任务信息；任务不存在或不在排队中时原样返回
+        """
+        job = self.get(job_id)
+        if job is None or job["status"] != STATUS_QUEUED:
+            return job
+        self._set_status(job_id, STATUS_RUNNING)
+        self.notify(self.get(job_id))
+
+        # 每项开始前检查是否已取消（最多每 0.5 秒读取一次状态）
+        state = {"checked": 0.0, "stop": False}
+        lock = threading.Lock()
+
+        def should_stop():
+            with lock:
+                now = time.monotonic()
+                if not state["stop"] and now - state["checked"] >= 0.5:
+                    state["checked"] = now
+                    state["stop"] = self.status(job_id) == STATUS_CANCELLED
+                return state["stop"]
+
+        try:
+            run_actions(
+                self.actions(job_id),
+                on_result=lambda index, result: self.record(job_id, index, result),
+                should_stop=should_stop,
+            )
+        except Exception as e:
+            logger.error(f"[批量操作] 任务 {job_id} 失败: {e}")
+            self._set_status(job_id, STATUS_FAILED, str(e))
+            job = self.get(job_id)
+            self.notify(job)
+            return job
+
+        if self.status(job_id) == STATUS_RUNNING:
+            self._set_status(job_id, STATUS_COMPLETED)
+        job = self.get(job_id)
+        logger.info(
+            f"[批量操作] 任务 {job_id} {job['status']}: 成功 {job['succeeded']}，失败 {job['failed']}"
+        )
+        self.notify(job)
+        return job
+
+    def _poll(self, job_id: str, offset: int) -> Tuple[List[str], int, bool]:
+        """
+        读取 offset 之后的结果
+
+        Returns:
+            (NDJSON 行, 新的 offset, 任务是否已结束（此时最后一行为结束行）)
+        """
+        job = self.get(job_id)
+        items = self.results(job_id, offset)
+        lines = [
+            json.dumps({"event": "item", **item}, ensure_ascii=False) + "\n"
+            for item in items
+        ]
+        offset += len(items)
+        # 读取任务状态后又有结果写入时，下一轮再输出结束行
+        if job is None or (
+            job["status"] in FINISHED_STATUSES and job["processed"] <= offset
+        ):
+            lines.append(
+                json.dumps({"event": "end", **(job or {})}, ensure_ascii=False) + "\n"
+            )
+            return lines, offset, True
+        return lines, offset, False
+
+    def stream(self, job_id: str, offset: int = 0) -> Iterator[str]:
+        """
+        NDJSON 流（WSGI）：按完成顺序逐行输出结果（{"event": "item", "index", ...}），
+        长时间没有新结果时输出心跳（{"event": "heartbeat"}），任务结束后输出 {"event": "end", 任务信息}
+
+        Args:
+            offset: 跳过前 offset 个结果（断线重连时使用）
+        """
+        config = _config()
+        last_output = time.monotonic()
+        while True:
+            lines, offset, finished = self._poll(job_id, offset)
+            yield from lines
+            if finished:
+                return
+            if lines:
+                last_output = time.monotonic()
+            elif time.monotonic() - last_output >= float(config["heartbeat"]):
+                last_output = time.monotonic()
+                yield json.dumps({"event": "heartbeat"}) + "\n"
+            time.sleep(float(config["poll_interval"]))
+
+    async def astream(self, job_id: str, offset: int = 0) -> AsyncIterator[str]:
+        """
+        与 stream 相同的 NDJSON 流（ASGI）
+
+        ASGI 下 StreamingHttpResponse 会先在线程中读完同步迭代器再发送，结果和心跳都要等任务结束才到达客户端；
+        这里用异步生成器逐行输出，Redis 读取在线程池中执行，不阻塞事件循环。
+        """
+        from asgiref.sync import sync_to_async
+
+        config = _config()
+        poll = sync_to_async(self._poll, thread_sensitive=False)
+        last_output = time.monotonic()
+        while True:
+            lines, offset, finished = await poll(job_id, offset)
+            for line in lines:
+                yield line
+            if finished:
+                return
+            if lines:
+                last_output = time.monotonic()
+            elif time.monotonic() - last_output >= float(config["heartbeat"]):
+                last_output = time.monotonic()
+                yield json.dumps({"event": "heartbeat"}) + "\n"
+            await asyncio.sleep(float(config["poll_interval"]))
+
+
+batch_jobs = BatchJobs()
@@ -0,0 +1,618 @@
+"""
+批量刷新元数据任务
+
+把需要刷新的资源（按缺失字段、元数据更新时间、来源筛选）按 chunk_size 分块，
+由 Celery 任务逐块处理（每块处理完后提交下一块的任务，不长时间占用 Worker）：
+
+- 块内最多 concurrency 个资源同时请求刮削器/源（每个资源对同一域名同时只有一个请求，
+  因此每个域名的并发请求数不超过 concurrency；请求频率仍由 RateLimit 控制）
+- 网络请求在线程中执行，数据库写入在块结束后一次事务内批量完成（bulk_update + 批量写入演员/类别关联）
+- 进度（已完成的块）保存在 Redis，任务中断或取消后可从检查点继续；每块完成后通过 WebSocket 广播进度
+"""
+import json
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from loguru import logger
+
+KEY_PREFIX = "nassav:bulk_refresh"
+JOBS_KEY = f"{KEY_PREFIX}:jobs"
+
+STATUS_RUNNING = "running"
+STATUS_COMPLETED = "completed"
+STATUS_CANCELLED = "cancelled"
+STATUS_FAILED = "failed"
+
+# 可用于筛选的缺失字段
+MISSING_FIELDS = ("title", "release_date", "duration", "actors", "genres")
+
+DEFAULT_OPTIONS = {
+    # 刮削元数据
+    "metadata": True,
+    # 从资源原来的源刷新 m3u8 链接
+    "m3u8": False,
+    # 封面文件不存在时下载刮削到的封面
+    "cover": False,
+    # 用刮削结果覆盖已有字段（默认只补全空字段）
+    "force": False,
+}
+
+DEFAULT_CONFIG = {
+    "chunk_size": 50,
+    "concurrency": 4,
+    # 任务记录保存时间（秒）
+    "ttl": 7 * 86400,
+}
+
+# 刮削结果中写入 metadata 的字段
+_SCRAPED_FIELDS = (
+    "title",
+    "release_date",
+    "duration",
+    "director",
+    "studio",
+    "label",
+    "series",
+    "genres",
+    "actors",
+    "actor_avatars",
+)
+
+
+class BulkRefreshError(ValueError):
+    """批量刷新参数错误"""
+
+
+def _config() -> dict:
+    return {**DEFAULT_CONFIG, **(getattr(settings, "BULK_REFRESH_CONFIG", {}) or {})}
+
+
+def select_avids(
+    missing: Iterable[str] = (),
+    older_than_days: Optional[int] = None,
+    sources: Iterable[str] = (),
+    avids: Iterable[str] = (),
+    limit: Optional[int] = None,
+) -> List[str]:
+    """
+    按条件选出需要刷新的 AVID（条件之间为“且”，missing 中的字段之间为“或”）
+
+    Args:
+        missing: 缺失任一字段（MISSING_FIELDS）的资源
+        older_than_days: 元数据超过 N 天未更新的资源
+        sources: 来源为其中之一的资源（不区分大小写）
+        avids: 只在这些 AVID 中选择
+        limit: 最多选择的数量
+
+    Raises:
+        BulkRefreshError: 参数无效
+    """
+    from nassav.models import AVResource
+
+    query = Q()
+    missing = list(missing or [])
+    unknown = set(missing) - set(MISSING_FIELDS)
+    if unknown:
+        raise BulkRefreshError(
+            f"missing 只能包含 {', '.join(MISSING_FIELDS)}，未知字段: {', '.join(sorted(unknown))}"
+        )
+    if missing:
+        conditions = {
+            "title": Q(original_title=""),
+            "release_date": Q(release_date=""),
+            "duration": Q(duration__isnull=True) | Q(duration=0),
+            "actors": Q(actors__isnull=True),
+            "genres": Q(genres__isnull=True),
+        }
+        any_missing = Q()
+        for field in missing:
+            any_missing |= conditions[field]
+        query &= any_missing
+    if older_than_days is not None:
+        try:
+            days = int(older_than_days)
+        except (TypeError, ValueError):
+            raise BulkRefreshError("older_than_days 必须是整数")
+        if days < 0:
+            raise BulkRefreshError("older_than_days 不能小于 0")
+        query &= Q(metadata_updated_at__lt=timezone.now() - timedelta(days=days))
+    sources = [s for s in (sources or []) if s]
+    if sources:
+        by_source = Q()
+        for source in sources:
+            by_source |= Q(source__iexact=source)
+        query &= by_source
+    avids = [a.upper() for a in (avids or []) if a]
+    if avids:
+        query &= Q(avid__in=avids)
+
+    selected = (
+        AVResource.objects.filter(query)
+        .order_by("id")
+        .values_list("avid", flat=True)
+        .distinct()
+    )
+    if limit:
+        selected = selected[: int(limit)]
+    return list(selected)
+
+
+# ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━ 单块处理
+
+
+def _fetch(resource, options: dict) -> dict:
+    """在线程中请求刮削器/源（不访问数据库）"""
+    from nassav.scraper.ScraperManager import scraper_manager
+    from nassav.source.SourceManager import source_manager
+
+    avid = resource.avid
+    fetched = {"scraped": None, "info": None, "cover_saved": False}
+    if options["metadata"]:
+        fetched["scraped"] = scraper_manager.scrape(avid)
+    if options["m3u8"] and resource.source:
+        fetched["info"] = source_manager.get_info_from_source(avid, resource.source)[0]
+
+    scraped = fetched["scraped"]
+    cover_path = Path(settings.COVER_DIR) / f"{avid}.jpg"
+    if (
+        options["cover"]
+        and scraped
+        and scraped.get("cover_url")
+        and not cover_path.exists()
+    ):
+        from nassav.scraper.ScraperManager import FIELD_SOURCES_KEY
+
+        cover_path.parent.mkdir(parents=True, exist_ok=True)
+        fetched["cover_saved"] = scraper_manager.download_cover(
+            scraped["cover_url"],
+            str(cover_path),
+            scraper_name=(scraped.get(FIELD_SOURCES_KEY) or {}).get("cover_url"),
+        )
+    return fetched
+
+
+def _is_empty(value) -> bool:
+    return value is None or value == "" or value == [] or value == {} or value == 0
+
+
+def _apply(resource, fetched: dict, force: bool, actors: dict, genres: dict) -> set:
+    """
+    把请求结果合并到资源对象上（不保存）
+
+    Args:
+        actors/genres: 收集需要替换的关联 {resource.id: [名称]}
+
+    Returns:
+        修改过的模型字段
+    """
+    from nassav.resource_service import resource_service
+
+    changed = set()
+
+    def assign(field, value):
+        if getattr(resource, field) != value:
+            setattr(resource, field, value)
+            changed.add(field)
+
+    info = fetched["info"]
+    if info is not None:
+        if info.m3u8:
+            assign("m3u8", info.m3u8)
+        if info.source_title and (force or not resource.source_title):
+            from nassav.source.SourceManager import normalize_source_title
+
+            assign(
+                "source_title", normalize_source_title(resource.avid, info.source_title)
+            )
+
+    scraped = fetched["scraped"]
+    if not scraped:
+        return changed
+
+    metadata = dict(resource.metadata or {})
+    for key in _SCRAPED_FIELDS:
+        value = scraped.get(key)
+        if not _is_empty(value) and (force or _is_empty(metadata.get(key))):
+            metadata[key] = value
+    if metadata != (resource.metadata or {}):
+        assign("metadata", metadata)
+
+    title = scraped.get("title")
+    if (
+        title
+        and title != resource.original_title
+        and (force or not resource.original_title)
+    ):
+        if resource.original_title and resource.translated_title:
+            # 标题变化，需要重新翻译
+            assign("translation_status", "pending")
+            assign("translated_title", None)
+        assign("original_title", title)
+    if scraped.get("release_date") and (force or not resource.release_date):
+        assign("release_date", scraped["release_date"])
+    duration = resource_service._parse_duration(scraped.get("duration"))
+    if duration and (force or not resource.duration):
+        assign("duration", duration)
+
+    # prefetch_related 的结果，不产生查询
+    for names, current, target in (
+        (scraped.get("actors"), resource.actors.all(), actors),
+        (scraped.get("genres"), resource.genres.all(), genres),
+    ):
+        names = list(dict.fromkeys(n for n in names or [] if n))
+        if names and (force or not current) and set(names) != {o.name for o in current}:
+            target[resource.id] = names
+            changed.add("relations")
+    return changed
+
+
+def refresh_chunk(avids: List[str], options: Optional[dict] = None) -> dict:
+    """
+    刷新一组资源：并发请求，之后在一个事务内批量写入
+
+    Args:
+        avids: AVID 列表
+        options: 见 DEFAULT_OPTIONS
+
+    Returns:
+        {"updated", "unchanged", "failed", "errors": {avid: 错误信息}}
+    """
+    from nassav.models import Actor, AVResource, Genre
+    from nassav.relations import associate
+
+    options = {**DEFAULT_OPTIONS, **(options or {})}
+    resources = list(
+        AVResource.objects.filter(avid__in=avids).prefetch_related("actors", "genres")
+    )
+    result = {"updated": 0, "unchanged": 0, "failed": 0, "errors": {}}
+    missing = set(avids) - {r.avid for r in resources}
+    for avid in missing:
+        result["errors"][avid] = "资源不存在"
+    result["failed"] += len(missing)
+    if not resources:
+        return result
+
+    workers = max(1, min(int(_config()["concurrency"]), len(resources)))
+    with ThreadPoolExecutor(
+        max_workers=workers, thread_name_prefix="bulk-refresh"
+    ) as executor:
+        futures = [executor.submit(_fetch, r, options) for r in resources]
+
+    updates, fields = [], set()
+    actors: Dict[int, List[str]] = {}
+    genres: Dict[int, List[str]] = {}
+    for resource, future in zip(resources, futures):
+        try:
+            fetched = future.result()
+        except Exception as e:
+            logger.error(f"[批量刷新] {resource.avid} 请求失败: {e}")
+            result["errors"][resource.avid] = str(e)
+            result["failed"] += 1
+            continue
+        if not fetched["scraped"] and fetched["info"] is None:
+            result["errors"][resource.avid] = "未获取到元数据"
+            result["failed"] += 1
+            continue
+        changed = _apply(resource, fetched, options["force"], actors, genres)
+        if changed or fetched["cover_saved"]:
+            updates.append(resource)
+            fields |= changed - {"relations"}
+            result["updated"] += 1
+        else:
+            result["unchanged"] += 1
+
+    if updates:
+        now = timezone.now()
+        for resource in updates:
+            resource.metadata_updated_at = now
+        with transaction.atomic():
+            AVResource.objects.bulk_update(
+                updates, sorted(fields | {"metadata_updated_at"})
+            )
+            associate(Actor, AVResource.actors, actors, replace=True)
+            associate(Genre, AVResource.genres, genres, replace=True)
+    return result
+
+
+# ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━ 任务状态
+
+
+class BulkRefreshJobs:
+    """批量刷新任务的状态与检查点（Redis）"""
+
+    def __init__(self, client=None):
+        """
+        Args:
+            client: Redis 客户端，默认使用进程共享的客户端
+        """
+        self._client = client
+
+    @property
+    def client(self):
+        if self._client is None:
+            from nassav.tasks import get_redis_client
+
+            return get_redis_client()
+        return self._client
+
+    @staticmethod
+    def _key(job_id: str, part: str = "") -> str:
+        return f"{KEY_PREFIX}:{job_id}" + (f":{part}" if part else "")
+
+    def create(self, filters: Optional[dict] = None, options: Optional[dict] = None):
+        """
+        按条件选出资源并创建任务（AVID 列表在创建时固定下来）
+
+        Args:
+            filters: select_avids 的参数
+            options: 见 DEFAULT_OPTIONS
+
+        Returns:
+            任务信息（见 get）
+
+        Raises:
+            BulkRefreshError: 参数无效
+        """
+        filters = dict(filters or {})
+        unknown = set(filters) - {
+            "missing",
+            "older_than_days",
+            "sources",
+            "avids",
+            "limit",
+        }
+        if unknown:
+            raise BulkRefreshError(f"未知的筛选条件: {', '.join(sorted(unknown))}")
+        options = dict(options or {})
+        unknown = set(options) - set(DEFAULT_OPTIONS)
+        if unknown:
+            raise BulkRefreshError(f"未知的选项: {', '.join(sorted(unknown))}")
+        options = {
+            key: bool(options.get(key, default))
+            for key, default in DEFAULT_OPTIONS.items()
+        }
+        if not options["metadata"] and not options["m3u8"]:
+            raise BulkRefreshError("metadata 与 m3u8 至少选择一项")
+
+        avids = select_avids(**filters)
+        config = _config()
+        chunk_size = max(1, int(config["chunk_size"]))
+        chunks = (len(avids) + chunk_size - 1) // chunk_size
+        job_id = uuid.uuid4().hex[:12]
+        now = round(time.time(), 3)
+        ttl = int(config["ttl"])
+
+        pipe = self.client.pipeline()
+        pipe.hset(
+            self._key(job_id),
+            mapping={
+                "status": STATUS_RUNNING if chunks else STATUS_COMPLETED,
+                "filters": json.dumps(filters, ensure_ascii=False),
+                "options": json.dumps(options),
+                "total": len(avids),
+                "chunk_size": chunk_size,
+                "chunks": chunks,
+                "updated": 0,
+                "unchanged": 0,
+                "failed": 0,
+                "created_at": now,
+                "updated_at": now,
+            },
+        )
+        if avids:
+            pipe.rpush(self._key(job_id, "avids"), *avids)
+            pipe.rpush(self._key(job_id, "pending"), *range(chunks))
+        for part in ("", "avids", "pending"):
+            pipe.expire(self._key(job_id, part), ttl)
+        pipe.zadd(JOBS_KEY, {job_id: now})
+        pipe.execute()
+        logger.info(f"[批量刷新] 创建任务 {job_id}: {len(avids)} 个资源，{chunks} 块")
+        return self.get(job_id)
+
+    def get(self, job_id: str) -> Optional[dict]:
+        """
+        Returns:
+            {"job_id", "status", "filters", "options", "total", "processed", "chunks", "chunks_done",
+             "updated", "unchanged", "failed", "errors", "created_at", "updated_at"}；不存在时为 None
+        """
+        pipe = self.client.pipeline(transaction=False)
+        pipe.hgetall(self._key(job_id))
+        pipe.scard(self._key(job_id, "done"))
+        pipe.hgetall(self._key(job_id, "errors"))
+        raw, chunks_done, errors = pipe.execute()
+        if not raw:
+            return None
+        data = {
+            (k.decode() if isinstance(k, bytes) else k): (
+                v.decode() if isinstance(v, bytes) else v
+            )
+            for k, v in raw.items()
+        }
+        counts = {
+            key: int(data.get(key, 0))
+            for key in (
+                "total",
+                "chunks",
+                "chunk_size",
+                "updated",
+                "unchanged",
+                "failed",
+            )
+        }
+        return {
+            "job_id": job_id,
+            "status": data["status"],
+            "filters": json.loads(data.get("filters") or "{}"),
+            "options": json.loads(data.get("options") or "{}"),
+            **counts,
+            "processed": counts["updated"] + counts["unchanged"] + counts["failed"],
+            "chunks_done": int(chunks_done),
+            "errors": {
+                (k.decode() if isinstance(k, bytes) else k): (
+                    v.decode() if isinstance(v, bytes) else v
+                )
+                for k, v in errors.items()
+            },
+            "error": data.get("error"),
+            "created_at": float(data["created_at"]),
+            "updated_at": float(data["updated_at"]),
+        }
+
+    def list(self, limit: int = 20) -> List[dict]:
+        """最近创建的任务（不含错误明细）"""
+        job_ids = self.client.zrevrange(JOBS_KEY, 0, max(int(limit), 1) - 1)
+        jobs = []
+        stale = []
+        for job_id in job_ids:
+            job_id = job_id.decode() if isinstance(job_id, bytes) else job_id
+            job = self.get(job_id)
+            if job is None:
+                stale.append(job_id)
+                continue
+            job.pop("errors")
+            jobs.append(job)
+        if stale:
+            self.client.zrem(JOBS_KEY, *stale)
+        return jobs
+
+    def _set_status(self, job_id: str, status: str, error: Optional[str] = None):
+        mapping = {"status": status, "updated_at": round(time.time(), 3)}
+        if error:
+            mapping["error"] = error
+        self.client.hset(self._key(job_id), mapping=mapping)
+
+    def cancel(self, job_id: str) -> Optional[dict]:
+        """取消任务：正在处理的块完成后停止，已完成的块保留（可 resume）"""
+        job = self.get(job_id)
+        if job is None:
+            return None
+        if job["status"] == STATUS_RUNNING:
+            self._set_status(job_id, STATUS_CANCELLED)
+            job = self.get(job_id)
+            self.notify(job)
+        return job
+
+    def resume(self, job_id: str) -> Optional[dict]:
+        """
+        从检查点继续：未完成的块（包括中断时正在处理的块）重新排队
+
+        Returns:
+            任务信息；任务不存在时为 None，已完成时原样返回
+        """
+        job = self.get(job_id)
+        if job is None or job["status"] == STATUS_COMPLETED:
+            return job
+        done = {int(i) for i in self.client.smembers(self._key(job_id, "done"))}
+        remaining = [i for i in range(job["chunks"]) if i not in done]
+        pipe = self.client.pipeline()
+        pipe.delete(self._key(job_id, "pending"))
+        if remaining:
+            pipe.rpush(self._key(job_id, "pending"), *remaining)
+        pipe.hdel(self._key(job_id), "error")
+        pipe.hset(
+            self._key(job_id),
+            mapping={
+                "status": STATUS_RUNNING if remaining else STATUS_COMPLETED,
+                "updated_at": round(time.time(), 3),
+            },
+        )
+        pipe.execute()
+        logger.info(f"[批量刷新] 任务 {job_id} 从检查点继续: 剩余 {len(remaining)} 块")
+        return self.get(job_id)
+
+    def claim(self, job_id: str) -> Optional[int]:
+        """领取下一个待处理的块，任务不在运行中或没有剩余块时返回 None"""
+        status = self.client.hget(self._key(job_id), "status")
+        status = status.decode() if isinstance(status, bytes) else status
+        if status != STATUS_RUNNING:
+            return None
+        index = self.client.lpop(self._key(job_id, "pending"))
+        return None if index is None else int(index)
+
+    def chunk_avids(self, job_id: str, index: int) -> List[str]:
+        chunk_size = int(self.client.hget(self._key(job_id), "chunk_size"))
+        avids = self.client.lrange(
+            self._key(job_id, "avids"),
+            index * chunk_size,
+            (index + 1) * chunk_size - 1,
+        )
+        return [a.decode() if isinstance(a, bytes) else a for a in avids]
+
+    def complete_chunk(self, job_id: str, index: int, result: dict) -> dict:
+        """记录一块的结果（检查点），所有块完成时任务完成"""
+        ttl = int(_config()["ttl"])
+        pipe = self.client.pipeline()
+        pipe.sadd(self._key(job_id, "done"), index)
+        for key in ("updated", "unchanged", "failed"):
+            pipe.hincrby(self._key(job_id), key, result[key])
+        if result["errors"]:
+            pipe.hset(self._key(job_id, "errors"), mapping=result["errors"])
+        pipe.hset(self._key(job_id), "updated_at", round(time.time(), 3))
+        for part in ("", "avids", "pending", "done", "errors"):
+            pipe.expire(self._key(job_id, part), ttl)
+        pipe.execute()
+
+        job = self.get(job_id)
+        if job["chunks_done"] >= job["chunks"] and job["status"] == STATUS_RUNNING:
+            self._set_status(job_id, STATUS_COMPLETED)
+            job = self.get(job_id)
+            logger.info(
+                f"[批量刷新] 任务 {job_id} 完成: 更新 {job['updated']}，"
+                f"未变化 {job['unchanged']}，失败 {job['failed']}"
+            )
+        return job
+
+    def fail(self, job_id: str, error: str):
+        """任务异常中止（可 resume）"""
+        self._set_status(job_id, STATUS_FAILED, error)
+        self.notify(self.get(job_id))
+
+    def has_pending(self, job_id: str) -> bool:
+        return bool(self.client.llen(self._key(job_id, "pending")))
+
+    @staticmethod
+    def notify(job: Optional[dict]):
+        """通过 WebSocket 广播任务进度（bulk_refresh 消息，不含错误明细）"""
+        if not job:
+            return
+        from nassav.tasks import notify_task_update
+
+        notify_task_update(
+            "bulk_refresh", {k: v for k, v in job.items() if k != "errors"}
+        )
+
+    def run_next_chunk(self, job_id: str) -> Optional[dict]:
+        """
+        领取并处理下一块
+
+        Returns:
+            处理后的任务信息；没有可处理的块时为 None
+        """
+        index = self.claim(job_id)
+        if index is None:
+            return None
+        job = self.get(job_id)
+        avids = self.chunk_avids(job_id, index)
+        logger.info(
+            f"[批量刷新] 任务 {job_id} 处理第 {index + 1}/{job['chunks']} 块（{len(avids)} 个资源）"
+        )
+        try:
+            result = refresh_chunk(avids, job["options"])
+        except Exception:
+            # 放回队首，resume 时重新处理
+            self.client.lpush(self._key(job_id, "pending"), index)
+            raise
+        job = self.complete_chunk(job_id, index, result)
+        self.notify(job)
+        return job
+
+
+bulk_refresh_jobs = BulkRefreshJobs()
@@ -24,12 +24,7 @@ class TaskConsumer(AsyncWebsocketConsumer):
         await self.accept()
 
         # Send initial queue status
-        from .tasks import get_task_queue_status
-
-        queue_status = get_task_queue_status()
-        await self.send(
-            text_data=json.dumps({"type": "queue_status", "data": queue_status})
-        )
+        await self.send_queue_status()
 
     async def disconnect(self, close_code):
         """Handle WebSocket disconnection"""
@@ -44,17 +39,26 @@ class TaskConsumer(AsyncWebsocketConsumer):
         try:
             data = json.loads(text_data)
             if data.get("action") == "get_queue_status":
-                from .tasks import get_task_queue_status
-
-                queue_status = get_task_queue_status()
-                await self.send(
-                    text_data=json.dumps({"type": "queue_status", "data": queue_status})
-                )
+                await self.send_queue_status()
         except json.JSONDecodeError:
             await self.send(
                 text_data=json.dumps({"type": "error", "message": "Invalid JSON"})
             )
 
+    async def send_queue_status(self):
+        """
+        Send the current queue snapshot
+
+        Uses the shared async snapshot (short TTL cache) so the event loop is
+        never blocked on Redis and reconnect storms compute it only once.
+        """
+        from .queue_snapshot import get_queue_snapshot
+
+        queue_status = await get_queue_snapshot()
+        await self.send(
+            text_data=json.dumps({"type": "queue_status", "data": queue_status})
+        )
+
     async def task_update(self, event):
         """
         Handle task update messages from channel layer
@@ -70,7 +74,7 @@ def send_task_update(update_type: str, data: dict):
     Send task update to all connected WebSocket clients
 
     Args:
-        update_type: Type of update ('task_started', 'task_completed', 'task_failed', 'queue_status')
+        update_type: Type of update ('task_started', 'task_completed', 'task_failed', 'queue_status', 'queue_event')
         data: Task data to send
     """
     channel_layer = get_channel_layer()
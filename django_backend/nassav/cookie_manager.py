@@ -0,0 +1,331 @@
+"""
+下载源 Cookie 生命周期管理
+
+- 每个源的 Cookie 连同每个 Cookie 的过期时间保存在 Redis 哈希中（一次 HGETALL 读取所有源），
+  数据库 SourceCookie 作为持久化副本；Redis 为空或不可用时回退到数据库
+- Cookie 更新后通过 Redis 发布/订阅推送给所有 Web/Worker 进程，各进程由后台线程应用到内存中的源，
+  不需要重新读数据库
+- 自动获取的 Cookie 记录最早的过期时间（会话 Cookie 按 session_ttl 计），由 Celery Beat
+  在过期前 refresh_before 秒后台刷新，过期后的第一次请求不再承担获取 Cookie 的延迟；
+  手动设置的 Cookie 没有过期信息，不自动刷新
+"""
+import json
+import os
+import threading
+import time
+from datetime import datetime
+from datetime import timezone as dt_timezone
+from typing import Callable, Dict, Iterable, List, Optional
+
+from django.conf import settings
+from loguru import logger
+
+KEY = "nassav:cookies"
+CHANNEL = "nassav:cookies:updates"
+REFRESH_LOCK_PREFIX = "nassav:cookies:refresh"
+
+DEFAULT_CONFIG = {
+    # 过期前多少秒开始后台刷新
+    "refresh_before": 1800,
+    # 没有过期时间的会话 Cookie 按获取后多少秒过期处理
+    "session_ttl": 43200,
+    # 同一个源的刷新锁有效期（秒），避免多个进程同时刷新
+    "refresh_lock_ttl": 300,
+}
+
+
+def jar_expiries(jar: Iterable) -> Dict[str, Optional[float]]:
+    """
+    从 CookieJar 提取每个 Cookie 的过期时间
+
+    Returns:
+        {cookie 名称: 过期时间戳}，会话 Cookie 为 None
+    """
+    return {c.name: float(c.expires) if c.expires is not None else None for c in jar}
+
+
+class CookieManager:
+    """保存、同步并按过期时间刷新下载源 Cookie"""
+
+    def __init__(self, client=None):
+        """
+        Args:
+            client: Redis 客户端，默认使用进程共享的客户端
+        """
+        self._client = client
+        self._listener: Optional[threading.Thread] = None
+        self._listener_pid: Optional[int] = None
+        self._callbacks: List[Callable[[str, str], None]] = []
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+
+    @property
+    def client(self):
+        if self._client is None:
+            from nassav.tasks import get_redis_client
+
+            return get_redis_client()
+        return self._client
+
+    @property
+    def enabled(self) -> bool:
+        return bool(getattr(settings, "COOKIE_SYNC_ENABLED", True))
+
+    @property
+    def config(self) -> dict:
+        return {**DEFAULT_CONFIG, **(getattr(settings, "COOKIE_CONFIG", {}) or {})}
+
+    # ---------------------------------------------------------------- 保存
+
+    def build_entry(
+        self,
+        source: str,
+        cookie: str,
+        expiries: Optional[Dict[str, Optional[float]]] = None,
+        now: Optional[float] = None,
+    ) -> dict:
+        """
+        构造保存的记录
+
+        Args:
+            source: 源名称
+            cookie: "k=v; ..." 形式的 Cookie 字符串
+            expiries: 每个 Cookie 的过期时间（jar_expiries 的返回值），None 表示手动设置
+            now: 当前时间戳
+
+        Returns:
+            {"source", "cookie", "expires", "expires_at", "auto", "updated_at"}，
+            expires_at 为最早的过期时间，手动设置或 Cookie 为空时为 None
+        """
+        now = time.time() if now is None else now
+        expires_at = None
+        if expiries and cookie:
+            session_expiry = now + float(self.config["session_ttl"])
+            expires_at = min(
+                session_expiry if e is None else e for e in expiries.values()
+            )
+        return {
+            "source": source.lower(),
+            "cookie": cookie or "",
+            "expires": dict(expiries or {}),
+            "expires_at": round(expires_at, 3) if expires_at is not None else None,
+            "auto": expiries is not None,
+            "updated_at": round(now, 3),
+        }
+
+    def store(
+        self,
+        source: str,
+        cookie: str,
+        expiries: Optional[Dict[str, Optional[float]]] = None,
+    ) -> dict:
+        """
+        保存 Cookie：写入数据库，再写入 Redis 并通知所有进程
+
+        Args:
+            source: 源名称（不区分大小写）
+            cookie: Cookie 字符串，空字符串表示清除
+            expiries: 见 build_entry
+
+        Returns:
+            保存的记录
+
+        Raises:
+            数据库写入失败时抛出原异常（Redis 失败只记录日志）
+        """
+        from nassav.models import SourceCookie
+
+        entry = self.build_entry(source, cookie, expiries)
+        expires_at = entry["expires_at"]
+        SourceCookie.objects.update_or_create(
+            source_name=entry["source"],
+            defaults={
+                "cookie": entry["cookie"],
+                "expires_at": (
+                    datetime.fromtimestamp(expires_at, tz=dt_timezone.utc)
+                    if expires_at is not None
+                    else None
+                ),
+            },
+        )
+        if self.enabled:
+            try:
+                payload = json.dumps(entry)
+                pipe = self.client.pipeline(transaction=False)
+                pipe.hset(KEY, entry["source"], payload)
+                pipe.publish(CHANNEL, payload)
+                pipe.execute()
+            except Exception as e:
+                logger.warning(f"同步 {entry['source']} 的 Cookie 到 Redis 失败: {e}")
+        return entry
+
+    # ---------------------------------------------------------------- 读取
+
+    def load_all(self) -> Dict[str, dict]:
+        """
+        读取所有源的 Cookie 记录
+
+        优先读 Redis（一次往返）；Redis 未启用、不可用或为空时读数据库，并在 Redis 可用时回填。
+
+        Returns:
+            {源名称（小写）: 记录}
+        """
+        if self.enabled:
+            try:
+                raw = self.client.hgetall(KEY)
+                if raw:
+                    return {
+                        (k.decode() if isinstance(k, bytes) else k): json.loads(v)
+                        for k, v in raw.items()
+                    }
+            except Exception as e:
+                logger.warning(f"从 Redis 读取 Cookie 失败，改为读取数据库: {e}")
+                return self._load_from_db()
+        entries = self._load_from_db()
+        if self.enabled and entries:
+            try:
+                self.client.hset(
+                    KEY, mapping={k: json.dumps(v) for k, v in entries.items()}
+                )
+            except Exception as e:
+                logger.warning(f"回填 Cookie 到 Redis 失败: {e}")
+        return entries
+
+    def _load_from_db(self) -> Dict[str, dict]:
+        from nassav.models import SourceCookie
+
+        entries = {}
+        try:
+            for obj in SourceCookie.objects.all():
+                entry = self.build_entry(obj.source_name, obj.cookie)
+                if obj.expires_at is not None:
+                    entry.update(expires_at=obj.expires_at.timestamp(), auto=True)
+                entry["updated_at"] = obj.updated_at.timestamp()
+                entries[entry["source"]] = entry
+        except Exception as e:
+            logger.warning(f"从数据库加载 Cookie 失败: {e}")
+        return entries
+
+    def get(self, source: str) -> Optional[dict]:
+        """读取单个源的 Cookie 记录，没有时返回 None"""
+        return self.load_all().get(source.lower())
+
+    def due(
+        self, within: Optional[float] = None, now: Optional[float] = None
+    ) -> List[str]:
+        """
+        即将过期（within 秒内）的自动获取 Cookie 的源名称（小写），按过期时间排序
+
+        Args:
+            within: 默认使用配置 refresh_before
+        """
+        within = float(self.config["refresh_before"]) if within is None else within
+        now = time.time() if now is None else now
+        entries = [
+            e
+            for e in self.load_all().values()
+            if e.get("auto") and e.get("cookie") and e.get("expires_at") is not None
+        ]
+        entries.sort(key=lambda e: e["expires_at"])
+        return [e["source"] for e in entries if e["expires_at"] - within <= now]
+
+    def acquire_refresh(self, source: str) -> bool:
+        """获取某个源的刷新锁（多个进程同时刷新时只有一个成功）；未启用或 Redis 不可用时总是成功"""
+        if not self.enabled:
+            return True
+        try:
+            return bool(
+                self.client.set(
+                    f"{REFRESH_LOCK_PREFIX}:{source.lower()}",
+                    os.getpid(),
+                    nx=True,
+                    ex=int(self.config["refresh_lock_ttl"]),
+                )
+            )
+        except Exception as e:
+            logger.warning(f"获取 {source} 的 Cookie 刷新锁失败: {e}")
+            return True
+
+    def release_refresh(self, source: str):
+        if not self.enabled:
+            return
+        try:
+            self.client.delete(f"{REFRESH_LOCK_PREFIX}:{source.lower()}")
+        except Exception as e:
+            logger.warning(f"释放 {source} 的 Cookie 刷新锁失败: {e}")
+
+    # ---------------------------------------------------------------- 订阅
+
+    def listen(self, callback: Callable[[str, str], None]):
+        """
+        订阅 Cookie 更新（每个进程一个后台线程，fork 后的子进程自动重新启动）
+
+        线程启动（包括断线重连）时先按当前记录回调一次，补上订阅前错过的更新。
+
+        Args:
+            callback: callback(源名称（小写）, cookie)，同一个回调只注册一次
+        """
+        if not self.enabled:
+            return
+        with self._lock:
+            if callback not in self._callbacks:
+                self._callbacks.append(callback)
+            pid = os.getpid()
+            if (
+                self._listener is not None
+                and self._listener_pid == pid
+                and self._listener.is_alive()
+            ):
+                return
+            self._stop.clear()
+            self._listener_pid = pid
+            self._listener = threading.Thread(
+                target=self._listen_loop, name="cookie-listener", daemon=True
+            )
+            self._listener.start()
+
+    def stop(self, timeout: float = 5.0):
+        """停止订阅线程并清空回调"""
+        with self._lock:
+            listener, self._listener = self._listener, None
+            self._callbacks = []
+            self._stop.set()
+        if listener is not None and listener.is_alive():
+            listener.join(timeout)
+
+    def _dispatch(self, source: str, cookie: str):
+        for callback in list(self._callbacks):
+            try:
+                callback(source, cookie)
+            except Exception as e:
+                logger.warning(f"应用 {source} 的 Cookie 更新失败: {e}")
+
+    def _listen_loop(self):
+        backoff = 1.0
+        while not self._stop.is_set():
+            pubsub = None
+            try:
+                pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(CHANNEL)
+                for source, entry in self.load_all().items():
+                    self._dispatch(source, entry.get("cookie", ""))
+                backoff = 1.0
+                while not self._stop.is_set():
+                    message = pubsub.get_message(timeout=1.0)
+                    if not message or message.get("type") != "message":
+                        continue
+                    entry = json.loads(message["data"])
+                    self._dispatch(entry["source"], entry.get("cookie", ""))
+            except Exception as e:
+                logger.warning(f"Cookie 更新订阅中断，{backoff:.0f} 秒后重连: {e}")
+                self._stop.wait(backoff)
+                backoff = min(backoff * 2, 60.0)
+            finally:
+                if pubsub is not None:
+                    try:
+                        pubsub.close()
+                    except Exception:
+                        pass
+
+
+cookie_manager = CookieManager()
@@ -0,0 +1,241 @@
+"""
+下载调度器：位于 download_video_task 之前的优先级队列
+
+等待中的下载任务不直接进入 Celery，而是写入 Redis 有序集合，由调度器在有空闲下载槽位时
+按优先级派发。排序依据：显式优先级 > 收藏加成 > 提交时间，并随等待时长老化（不会饿死）。
+
+有效优先级随时间线性增长：
+    effective(t) = priority + favorite_boost * is_favorite + (t - submitted_at) / 3600 * aging_per_hour
+所有任务的 t 项相同，因此只需存储与时间无关的分数：
+    score = priority + favorite_boost * is_favorite - submitted_at / 3600 * aging_per_hour
+分数越高越先派发。
+"""
+import json
+import math
+import time
+from typing import Any, Dict, List, Optional
+
+SCHEDULE_KEY = "nassav:download_schedule"
+SCHEDULE_META_KEY = "nassav:download_schedule:meta"
+
+# 老化速率为 0 时仍按提交时间先后打破平局（对整数优先级无影响）
+_TIE_BREAK_PER_HOUR = 1e-6
+
+
+class DownloadScheduler:
+    """下载优先级队列"""
+
+    def __init__(
+        self, redis_client, favorite_boost: float = 5, aging_per_hour: float = 1
+    ):
+        """
+        Args:
+            redis_client: Redis 客户端
+            favorite_boost: 收藏资源的优先级加成
+            aging_per_hour: 每等待一小时增加的优先级
+        """
+        self.redis = redis_client
+        self.favorite_boost = float(favorite_boost)
+        self.aging_per_hour = max(float(aging_per_hour), _TIE_BREAK_PER_HOUR)
+
+    def compute_score(
+        self, priority: float, is_favorite: bool, submitted_at: float
+    ) -> float:
+        """计算与时间无关的排序分数（越高越优先）"""
+        return (
+            float(priority)
+            + (self.favorite_boost if is_favorite else 0.0)
+            - submitted_at / 3600 * self.aging_per_hour
+        )
+
+    def enqueue(
+        self,
+        avid: str,
+        task_id: str,
+        priority: int = 0,
+        is_favorite: bool = False,
+        submitted_at: Optional[float] = None,
+        pipe=None,
+    ):
+        """
+        加入等待队列（已存在时覆盖）
+
+        Args:
+            avid: 视频ID
+            task_id: 派发时使用的 Celery 任务ID
+            priority: 显式优先级（越大越优先）
+            is_favorite: 是否收藏
+            submitted_at: 提交时间戳，默认当前时间
+            pipe: 可选的 Redis pipeline，传入时只排队命令，由调用方统一 execute
+        """
+        avid = avid.upper()
+        submitted_at = submitted_at if submitted_at is not None else time.time()
+        meta = {
+            "avid": avid,
+            "task_id": task_id,
+            "priority": priority,
+            "is_favorite": bool(is_favorite),
+            "submitted_at": submitted_at,
+        }
+        own_pipe = pipe is None
+        if own_pipe:
+            pipe = self.redis.pipeline()
+        pipe.hset(SCHEDULE_META_KEY, avid, json.dumps(meta))
+        pipe.zadd(
+            SCHEDULE_KEY,
+            {avid: self.compute_score(priority, is_favorite, submitted_at)},
+        )
+        if own_pipe:
+            pipe.execute()
+
+    def is_queued(self, avid: str) -> bool:
+        """是否仍在等待队列中（尚未派发）"""
+        return self.redis.zscore(SCHEDULE_KEY, avid.upper()) is not None
+
+    def position(self, avid: str) -> Optional[int]:
+        """返回排队位置（从 1 开始），不在等待队列中时返回 None"""
+        rank = self.redis.zrevrank(SCHEDULE_KEY, avid.upper())
+        return rank + 1 if rank is not None else None
+
+    def get_meta(self, avid: str) -> Optional[Dict[str, Any]]:
+        raw = self.redis.hget(SCHEDULE_META_KEY, avid.upper())
+        return json.loads(raw) if raw else None
+
+    def set_priority(self, avid: str, priority: int) -> bool:
+        """
+        修改显式优先级
+
+        Returns:
+            bool: 任务不在等待队列中时返回 False
+        """
+        avid = avid.upper()
+        meta = self.get_meta(avid)
+        if meta is None or not self.is_queued(avid):
+            return False
+        meta["priority"] = priority
+        pipe = self.redis.pipeline()
+        pipe.hset(SCHEDULE_META_KEY, avid, json.dumps(meta))
+        pipe.zadd(
+            SCHEDULE_KEY,
+            {
+                avid: self.compute_score(
+                    priority, meta["is_favorite"], meta["submitted_at"]
+                )
+            },
+            xx=True,
+        )
+        pipe.execute()
+        return True
+
+    def bump(self, avid: str) -> bool:
+        """
+        把任务提到队首（提高显式优先级直至分数超过当前最高分）
+
+        Returns:
+            bool: 任务不在等待队列中时返回 False
+        """
+        avid = avid.upper()
+        meta = self.get_meta(avid)
+        if meta is None or not self.is_queued(avid):
+            return False
+
+        top = self.redis.zrevrange(SCHEDULE_KEY, 0, 0, withscores=True)
+        if not top or _decode(top[0][0]) == avid:
+            return True
+
+        base = self.compute_score(0, meta["is_favorite"], meta["submitted_at"])
+        return self.set_priority(avid, math.floor(top[0][1] - base) + 1)
+
+    def reorder(self, avids: List[str]) -> List[str]:
+        """
+        按给定顺序把任务排到队首（列表第一个为新的队首）
+
+        Returns:
+            list: 实际调整的 AVID（不在等待队列中的会被忽略）
+        """
+        moved = []
+        for avid in reversed([a.upper() for a in avids]):
+            if self.bump(avid):
+                moved.append(avid)
+        return list(reversed(moved))
+
+    def remove(self, avid: str):
+        """从等待队列移除"""
+        avid = avid.upper()
+        pipe = self.redis.pipeline()
+        pipe.zrem(SCHEDULE_KEY, avid)
+        pipe.hdel(SCHEDULE_META_KEY, avid)
+        pipe.execute()
+
+    def pop_next(self, count: int = 1) -> List[Dict[str, Any]]:
+        """
+        取出优先级最高的若干任务（原子弹出，多个调度器并发调用不会重复取到同一任务）
+
+        Returns:
+            list: 任务元数据列表，按优先级从高到低
+        """
+        if count <= 0:
+            return []
+        popped = self.redis.zpopmax(SCHEDULE_KEY, count)
+        if not popped:
+            return []
+
+        avids = [_decode(member) for member, _ in popped]
+        pipe = self.redis.pipeline()
+        pipe.hmget(SCHEDULE_META_KEY, avids)
+        pipe.hdel(SCHEDULE_META_KEY, *avids)
+        raw_metas, _ = pipe.execute()
+
+        result = []
+        for avid, raw in zip(avids, raw_metas):
+            result.append(json.loads(raw) if raw else {"avid": avid, "task_id": None})
+        return result
+
+    def ordered(self) -> List[Dict[str, Any]]:
+        """
+        返回等待队列的完整派发顺序
+
+        Returns:
+            list: 任务元数据（附带 position 从 1 开始、effective_priority 当前有效优先级）
+        """
+        pipe = self.redis.pipeline(transaction=False)
+        self.queue_ordered_commands(pipe)
+        entries, raw_metas = pipe.execute()
+        return self.build_ordered(entries, raw_metas)
+
+    @staticmethod
+    def queue_ordered_commands(pipe):
+        """向 pipeline 追加读取派发顺序所需的命令（同步/异步 pipeline 均可）"""
+        pipe.zrevrange(SCHEDULE_KEY, 0, -1, withscores=True)
+        pipe.hgetall(SCHEDULE_META_KEY)
+
+    def build_ordered(self, entries, raw_metas) -> List[Dict[str, Any]]:
+        """
+        由 queue_ordered_commands 的执行结果组装派发顺序
+
+        Args:
+            entries: ZREVRANGE WITHSCORES 结果
+            raw_metas: 元数据哈希 HGETALL 结果
+        """
+        if not entries:
+            return []
+
+        raw_metas = {_decode(k): v for k, v in raw_metas.items()}
+        now_term = time.time() / 3600 * self.aging_per_hour
+
+        result = []
+        for position, (member, score) in enumerate(entries, start=1):
+            avid = _decode(member)
+            raw = raw_metas.get(avid)
+            meta = json.loads(raw) if raw else {"avid": avid}
+            meta["position"] = position
+            meta["effective_priority"] = round(score + now_term, 3)
+            result.append(meta)
+        return result
+
+    def __len__(self) -> int:
+        return self.redis.zcard(SCHEDULE_KEY)
+
+
+def _decode(value) -> str:
+    return value.decode() if isinstance(value, bytes) else value
@@ -0,0 +1,139 @@
+"""
+下载槽位：基于 Redis 的计数信号量
+
+每个槽位是一份带过期时间的租约（ZSET 成员为持有者，分数为租约到期时间），
+持有期间由后台心跳线程续期。Worker 崩溃后租约最多在 lease_ttl 秒后自动失效，
+不会像固定 TTL 的全局锁那样阻塞队列一个小时。
+"""
+import threading
+from typing import List, Optional
+
+from loguru import logger
+
+SLOTS_KEY = "nassav:download_slots"
+
+# KEYS[1]: 槽位 ZSET；ARGV: holder, limit, ttl
+# 清理过期租约 -> 已持有则续期（重入） -> 有空位则占用
+_ACQUIRE_SCRIPT = """
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', now)
+if redis.call('ZSCORE', KEYS[1], ARGV[1]) then
+    redis.call('ZADD', KEYS[1], now + tonumber(ARGV[3]), ARGV[1])
+    return 1
+end
+if redis.call('ZCARD', KEYS[1]) < tonumber(ARGV[2]) then
+    redis.call('ZADD', KEYS[1], now + tonumber(ARGV[3]), ARGV[1])
+    return 1
+end
+return 0
+"""
+
+# KEYS[1]: 槽位 ZSET；ARGV: holder, ttl
+# 仅当租约仍存在时续期，返回 0 表示租约已丢失
+_RENEW_SCRIPT = """
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local expiry = redis.call('ZSCORE', KEYS[1], ARGV[1])
+if not expiry or tonumber(expiry) <= now then
+    return 0
+end
+redis.call('ZADD', KEYS[1], now + tonumber(ARGV[2]), ARGV[1])
+return 1
+"""
+
+# KEYS[1]: 槽位 ZSET；返回仍有效的持有者列表
+_HOLDERS_SCRIPT = """
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', now)
+return redis.call('ZRANGE', KEYS[1], 0, -1)
+"""
+
+
+class DownloadSlots:
+    """下载槽位信号量"""
+
+    def __init__(self, redis_client, limit: int = 1, lease_ttl: int = 60):
+        """
+        Args:
+            redis_client: Redis 客户端
+            limit: 槽位数量（同时运行的下载任务数）
+            lease_ttl: 租约有效期（秒），心跳间隔为其 1/3
+        """
+        self.redis = redis_client
+        self.limit = max(int(limit), 1)
+        self.lease_ttl = max(int(lease_ttl), 3)
+        self._acquire = redis_client.register_script(_ACQUIRE_SCRIPT)
+        self._renew = redis_client.register_script(_RENEW_SCRIPT)
+        self._holders = redis_client.register_script(_HOLDERS_SCRIPT)
+
+    def try_acquire(self, holder: str) -> bool:
+        """
+        尝试占用一个槽位（非阻塞，同一持有者重复占用视为续期）
+
+        Args:
+            holder: 持有者标识（如 AVID）
+
+        Returns:
+            bool: 成功占用返回 True
+        """
+        return bool(
+            self._acquire(keys=[SLOTS_KEY], args=[holder, self.limit, self.lease_ttl])
+        )
+
+    def renew(self, holder: str) -> bool:
+        """
+        续期租约
+
+        Returns:
+            bool: 租约仍有效返回 True，已过期被回收返回 False
+        """
+        return bool(self._renew(keys=[SLOTS_KEY], args=[holder, self.lease_ttl]))
+
+    def release(self, holder: str):
+        """释放槽位"""
+        self.redis.zrem(SLOTS_KEY, holder)
+
+    def holders(self) -> List[str]:
+        """返回当前持有槽位的标识列表（已清理过期租约）"""
+        return [
+            h.decode() if isinstance(h, bytes) else h
+            for h in self._holders(keys=[SLOTS_KEY])
+        ]
+
+    def start_heartbeat(self, holder: str) -> "SlotHeartbeat":
+        """启动后台心跳线程，返回可 stop() 的句柄"""
+        heartbeat = SlotHeartbeat(self, holder)
+        heartbeat.start()
+        return heartbeat
+
+
+class SlotHeartbeat(threading.Thread):
+    """槽位租约心跳线程"""
+
+    def __init__(self, slots: DownloadSlots, holder: str):
+        super().__init__(name=f"slot-heartbeat-{holder}", daemon=True)
+        self.slots = slots
+        self.holder = holder
+        self.lost = False
+        self._stop_event = threading.Event()
+
+    def run(self):
+        interval = self.slots.lease_ttl / 3
+        while not self._stop_event.wait(interval):
+            try:
+                if self.slots.renew(self.holder):
+                    continue
+                # 租约已被回收（如 Redis 长时间不可达），尝试重新占用
+                logger.warning(f"下载槽位租约已丢失，尝试重新占用: {self.holder}")
+                if not self.slots.try_acquire(self.holder):
+                    self.lost = True
+                    logger.error(f"重新占用下载槽位失败，槽位可能已被其他任务占用: {self.holder}")
+            except Exception as e:
+                logger.error(f"下载槽位心跳失败 {self.holder}: {e}")
+
+    def stop(self, timeout: Optional[float] = 5.0):
+        self._stop_event.set()
+        if self.is_alive():
+            self.join(timeout)
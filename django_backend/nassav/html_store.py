@@ -0,0 +1,321 @@
+"""
+源页面 HTML 快照存储
+
+添加/刷新资源时保存源站返回的原始 HTML，用于解析器修复后离线重新解析（不请求源站）。
+
+目录结构（settings.HTML_SNAPSHOT_DIR）：
+    objects/{sha256[:2]}/{sha256}.zst   zstd 压缩的页面，按内容哈希去重
+    refs/{AVID}.json                    某个 AVID 的快照列表（按抓取时间升序）
+    refs/.lock                          索引读-改-写的跨进程文件锁（fcntl.flock）
+    dicts/{dict_id}.dict                训练得到的 zstd 字典；dicts/current 记录当前使用的字典
+
+页面压缩时记录字典 ID（zstd 帧头），更换字典后旧快照仍按各自的字典解压。
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional
+
+import zstandard
+from loguru import logger
+
+try:
+    import fcntl
+except ImportError:  # Windows 下没有 fcntl，只使用进程内的线程锁
+    fcntl = None
+
+DEFAULT_LEVEL = 10
+DEFAULT_KEEP = 5
+# zstd 推荐的字典大小（112KB）
+DEFAULT_DICT_SIZE = 112 * 1024
+
+
+def _atomic_write(path: Path, data: bytes):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    tmp.write_bytes(data)
+    os.replace(tmp, path)
+
+
+class HtmlSnapshotStore:
+    """
+    按 AVID + 抓取时间索引、按内容哈希去重的 zstd 压缩 HTML 存储
+
+    同一 AVID 重复抓取到相同页面时只新增一条索引，不重复保存内容；
+    每个 AVID 只保留最近 keep 个快照，多出的索引在写入时删除，对应内容由 gc() 清理。
+    """
+
+    def __init__(self, root, level: int = DEFAULT_LEVEL, keep: int = DEFAULT_KEEP):
+        """
+        Args:
+            root: 存储根目录
+            level: zstd 压缩级别
+            keep: 每个 AVID 保留的快照数（<=0 表示不限）
+        """
+        self.root = Path(root)
+        self.level = level
+        self.keep = keep
+        self._lock = threading.Lock()
+        self._dicts: Dict[int, zstandard.ZstdCompressionDict] = {}
+
+    # ---------------------------------------------------------------- 路径
+
+    def _object_path(self, sha256: str) -> Path:
+        return self.root / "objects" / sha256[:2] / f"{sha256}.zst"
+
+    def _refs_path(self, avid: str) -> Path:
+        return self.root / "refs" / f"{avid.upper()}.json"
+
+    @property
+    def _dict_dir(self) -> Path:
+        return self.root / "dicts"
+
+    # ---------------------------------------------------------------- 字典
+
+    def _load_dict(self, dict_id: int) -> Optional[zstandard.ZstdCompressionDict]:
+        if dict_id not in self._dicts:
+            path = self._dict_dir / f"{dict_id}.dict"
+            if not path.exists():
+                return None
+            self._dicts[dict_id] = zstandard.ZstdCompressionDict(path.read_bytes())
+        return self._dicts[dict_id]
+
+    def current_dict_id(self) -> int:
+        """当前用于压缩的字典 ID，0 表示不使用字典"""
+        path = self._dict_dir / "current"
+        try:
+            return int(path.read_text().strip() or 0)
+        except (FileNotFoundError, ValueError):
+            return 0
+
+    def _compressor(self) -> zstandard.ZstdCompressor:
+        dict_id = self.current_dict_id()
+        dict_data = self._load_dict(dict_id) if dict_id else None
+        return zstandard.ZstdCompressor(level=self.level, dict_data=dict_data)
+
+    def train_dictionary(
+        self, dict_size: int = DEFAULT_DICT_SIZE, max_samples: int = 2000
+    ) -> int:
+        """
+        用已保存的快照（每个 AVID 取最新一个）训练 zstd 字典，并设为之后写入使用的字典
+
+        已保存的快照不重新压缩。
+
+        Args:
+            dict_size: 字典大小（字节）
+            max_samples: 最多使用的样本数
+
+        Returns:
+            新字典的 ID
+
+        Raises:
+            zstandard.ZstdError: 样本不足等原因导致训练失败
+        """
+        samples = []
+        for avid in self.avids():
+            snapshot = self.latest(avid)
+            if snapshot:
+                samples.append(self.read(snapshot["sha256"]).encode("utf-8"))
+            if len(samples) >= max_samples:
+                break
+        if not samples:
+            raise zstandard.ZstdError("没有可用于训练字典的快照")
+
+        trained = zstandard.train_dictionary(dict_size, samples, level=self.level)
+        dict_id = trained.dict_id()
+        _atomic_write(self._dict_dir / f"{dict_id}.dict", trained.as_bytes())
+        _atomic_write(self._dict_dir / "current", str(dict_id).encode())
+        self._dicts[dict_id] = trained
+        logger.info(f"HTML 快照字典训练完成: id={dict_id}，样本数 {len(samples)}")
+        return dict_id
+
+    # ---------------------------------------------------------------- 内容
+
+    def _write_object(self, data: bytes) -> str:
+        sha256 = hashlib.sha256(data).hexdigest()
+        path = self._object_path(sha256)
+        if not path.exists():
+            _atomic_write(path, self._compressor().compress(data))
+        return sha256
+
+    def read(self, sha256: str) -> str:
+        """
+        按内容哈希读取页面
+
+        Raises:
+            FileNotFoundError: 内容或其压缩字典不存在
+        """
+        data = self._object_path(sha256).read_bytes()
+        dict_id = zstandard.get_frame_parameters(data).dict_id
+        dict_data = None
+        if dict_id:
+            dict_data = self._load_dict(dict_id)
+            if dict_data is None:
+                raise FileNotFoundError(f"缺少 zstd 字典: {dict_id}")
+        raw = zstandard.ZstdDecompressor(dict_data=dict_data).decompress(data)
+        return raw.decode("utf-8")
+
+    # ---------------------------------------------------------------- 索引
+
+    @contextmanager
+    def _refs_lock(self):
+        """
+        索引读-改-写锁
+
+        Web 与多个 Celery Worker 进程共用同一目录，线程锁之外再对 refs/.lock 加 fcntl.flock，
+        避免不同进程同时追加同一 AVID 的快照时后写入的覆盖先写入的。
+        """
+        with self._lock:
+            if fcntl is None:
+                yield
+                return
+            path = self.root / "refs" / ".lock"
+            path.parent.mkdir(parents=True, exist_ok=True)
+            with open(path, "a") as f:
+                fcntl.flock(f, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+
+    def snapshots(self, avid: str) -> List[dict]:
+        """
+        某个 AVID 的快照列表（按抓取时间升序）
+
+        Returns:
+            [{"sha256", "source", "fetched_at", "size"}]
+        """
+        try:
+            return json.loads(self._refs_path(avid).read_text(encoding="utf-8"))
+        except FileNotFoundError:
+            return []
+
+    def latest(self, avid: str, source: Optional[str] = None) -> Optional[dict]:
+        """最新快照（可按源过滤），不存在时返回 None"""
+        for snapshot in reversed(self.snapshots(avid)):
+            if source is None or snapshot.get("source", "").lower() == source.lower():
+                return snapshot
+        return None
+
+    def avids(self) -> Iterator[str]:
+        """所有有快照的 AVID"""
+        refs_dir = self.root / "refs"
+        if not refs_dir.exists():
+            return
+        for path in sorted(refs_dir.glob("*.json")):
+            yield path.stem
+
+    def put(
+        self,
+        avid: str,
+        html: str,
+        source: str = "",
+        fetched_at: Optional[float] = None,
+    ) -> dict:
+        """
+        保存一次抓取到的页面
+
+        Args:
+            avid: 视频编号
+            html: 页面内容
+            source: 来源名称
+            fetched_at: 抓取时间戳，默认当前时间
+
+        Returns:
+            新增的快照条目
+        """
+        data = html.encode("utf-8")
+        snapshot = {
+            "sha256": self._write_object(data),
+            "source": source,
+            "fetched_at": int(fetched_at if fetched_at is not None else time.time()),
+            "size": len(data),
+        }
+        with self._refs_lock():
+            snapshots = self.snapshots(avid)
+            snapshots.append(snapshot)
+            snapshots.sort(key=lambda s: s["fetched_at"])
+            if self.keep > 0:
+                snapshots = snapshots[-self.keep :]
+            _atomic_write(
+                self._refs_path(avid),
+                json.dumps(snapshots, ensure_ascii=False).encode("utf-8"),
+            )
+        return snapshot
+
+    def get(self, avid: str, source: Optional[str] = None) -> Optional[str]:
+        """读取最新快照的页面内容，不存在时返回 None"""
+        snapshot = self.latest(avid, source)
+        if snapshot is None:
+            return None
+        try:
+            return self.read(snapshot["sha256"])
+        except Exception as e:
+            logger.error(f"读取 HTML 快照失败: {avid}, {e}")
+            return None
+
+    def delete(self, avid: str) -> bool:
+        """删除某个 AVID 的快照索引（内容由 gc() 清理）"""
+        with self._refs_lock():
+            try:
+                self._refs_path(avid).unlink()
+                return True
+            except FileNotFoundError:
+                return False
+
+    def gc(self) -> int:
+        """
+        删除没有任何索引引用的内容
+
+        Returns:
+            删除的内容数
+        """
+        referenced = set()
+        for avid in self.avids():
+            referenced.update(s["sha256"] for s in self.snapshots(avid))
+        removed = 0
+        for path in (self.root / "objects").glob("*/*.zst"):
+            if path.stem not in referenced:
+                path.unlink()
+                removed += 1
+        return removed
+
+    def stats(self) -> dict:
+        """快照数、去重后内容数、原始/压缩后大小"""
+        snapshots = 0
+        raw_size = 0
+        for avid in self.avids():
+            for s in self.snapshots(avid):
+                snapshots += 1
+                raw_size += s.get("size", 0)
+        objects = list((self.root / "objects").glob("*/*.zst"))
+        return {
+            "avids": sum(1 for _ in self.avids()),
+            "snapshots": snapshots,
+            "objects": len(objects),
+            "raw_size": raw_size,
+            "stored_size": sum(p.stat().st_size for p in objects),
+            "dict_id": self.current_dict_id(),
+        }
+
+
+_store: Optional[HtmlSnapshotStore] = None
+
+
+def get_html_store() -> HtmlSnapshotStore:
+    """获取共享的 HTML 快照存储（参数来自配置 HtmlSnapshot，目录变化时重新创建）"""
+    global _store
+    from django.conf import settings
+
+    if _store is None or _store.root != Path(settings.HTML_SNAPSHOT_DIR):
+        config = getattr(settings, "HTML_SNAPSHOT_CONFIG", {}) or {}
+        _store = HtmlSnapshotStore(
+            settings.HTML_SNAPSHOT_DIR,
+            level=int(config.get("level", DEFAULT_LEVEL)),
+            keep=int(config.get("keep", DEFAULT_KEEP)),
+        )
+    return _store
@@ -0,0 +1,336 @@
+"""
+进程级 HTTP 会话池
+
+源、刮削器、封面/头像下载共用。按 (域名, 代理) 复用 curl_cffi Session，保持长连接和 TLS 会话，
+避免每个请求重新握手、重新初始化浏览器指纹。
+
+并发探测源使用的 AsyncSession 同样按 (域名, 代理) 复用：AsyncSession 绑定事件循环，
+会话池维护一个常驻事件循环线程，异步请求通过 run_async 在其中执行，多次调用之间保持连接。
+
+被淘汰的会话会被关闭（释放 curl 句柄和连接）；仍有请求在使用的会话等最后一个使用者释放后再关闭。
+"""
+import asyncio
+import os
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Coroutine, Dict, Iterator, Optional, Set, Tuple, TypeVar
+from urllib.parse import urlsplit
+
+from curl_cffi import CurlOpt
+from curl_cffi.requests import AsyncSession, Response, Session
+from nassav.constants import IMPERSONATE
+
+# 最多保留的会话数（按最近使用淘汰）
+DEFAULT_MAX_SESSIONS = 32
+# 每个会话（每个线程一个 curl 句柄）缓存的最大连接数
+DEFAULT_MAX_CONNECTIONS = 8
+# 空闲连接最长保留时间（秒），超过后下次请求重新建连
+DEFAULT_IDLE_TIMEOUT = 60
+
+
+T = TypeVar("T")
+
+
+def _domain_of(url: str) -> str:
+    return urlsplit(url).netloc.lower()
+
+
+class HttpSessionPool:
+    """
+    按 (域名, 代理) 缓存的 curl_cffi 会话池（线程安全）
+
+    - 会话使用线程本地 curl 句柄，多个线程可同时使用同一会话
+    - 会话不保存响应中的 Set-Cookie（discard_cookies），Cookie 只按域名显式注入，
+      避免不同源之间互相污染
+    - AsyncSession 只能在 run_async 执行的协程中使用（常驻事件循环线程）
+    - 按最近使用淘汰的会话会被关闭；发送请求期间持有使用登记（request()、async_lease()），
+      登记未释放的会话推迟到释放时关闭
+    - fork 后（Celery prefork 子进程）自动丢弃继承的会话与事件循环，不与父进程共享连接
+    """
+
+    def __init__(
+        self,
+        max_sessions: int = DEFAULT_MAX_SESSIONS,
+        max_connections: int = DEFAULT_MAX_CONNECTIONS,
+        idle_timeout: int = DEFAULT_IDLE_TIMEOUT,
+    ):
+        """
+        Args:
+            max_sessions: 最多保留的会话数
+            max_connections: 每个会话缓存的最大连接数
+            idle_timeout: 空闲连接最长保留时间（秒）
+        """
+        self.max_sessions = max_sessions
+        self.max_connections = max_connections
+        self.idle_timeout = idle_timeout
+        self.sessions_created = 0
+        self._sessions: "OrderedDict[Tuple[str, Optional[str]], Session]" = (
+            OrderedDict()
+        )
+        self._async_sessions: "OrderedDict[Tuple[str, Optional[str]], AsyncSession]" = (
+            OrderedDict()
+        )
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        # 会话 -> 正在使用的请求数；已淘汰但仍在使用、等待关闭的会话
+        self._users: Dict[Any, int] = {}
+        self._retired: Set[Any] = set()
+        self._cookies: Dict[str, str] = {}
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
+
+    def _new_session(self, factory):
+        """创建 Session 或 AsyncSession（factory）"""
+        self.sessions_created += 1
+        return factory(
+            impersonate=IMPERSONATE,
+            discard_cookies=True,
+            curl_options={
+                CurlOpt.MAXCONNECTS: self.max_connections,
+                CurlOpt.MAXAGE_CONN: self.idle_timeout,
+            },
+        )
+
+    def _check_fork(self):
+        """fork 后丢弃继承的会话与事件循环（调用方持有 _lock）"""
+        if self._pid != os.getpid():
+            # 继承的连接与父进程共享，不能关闭，直接丢弃
+            self._sessions.clear()
+            self._async_sessions.clear()
+            self._users.clear()
+            self._retired.clear()
+            self._loop = None
+            self._pid = os.getpid()
+
+    def _acquire(self, sessions: OrderedDict, url: str, proxy, factory):
+        """取出（不存在时创建）会话并登记一次使用，用完后必须调用 _release"""
+        key = (_domain_of(url), proxy or None)
+        with self._lock:
+            self._check_fork()
+            session = sessions.get(key)
+            if session is None:
+                session = self._new_session(factory)
+                sessions[key] = session
+                # 淘汰最久未使用的会话
+                while len(sessions) > self.max_sessions:
+                    self._retire(sessions.popitem(last=False)[1])
+            else:
+                sessions.move_to_end(key)
+            self._users[session] = self._users.get(session, 0) + 1
+            return session
+
+    def _release(self, session):
+        """释放一次使用登记；已淘汰的会话在最后一个使用者释放后关闭"""
+        with self._lock:
+            count = self._users.pop(session, 0) - 1
+            if count > 0:
+                self._users[session] = count
+                return
+            if session not in self._retired:
+                return
+            self._retired.discard(session)
+        self._close(session)
+
+    def _retire(self, session):
+        """淘汰会话：空闲时立即关闭，仍在使用时推迟到释放时关闭（调用方持有 _lock）"""
+        if self._users.get(session):
+            self._retired.add(session)
+        else:
+            self._close(session)
+
+    def _close(self, session):
+        if isinstance(session, AsyncSession):
+            # AsyncSession 只能在所属事件循环中关闭；淘汰发生在事件循环线程中，不等待结果
+            if self._loop is not None and not self._loop.is_closed():
+                asyncio.run_coroutine_threadsafe(session.close(), self._loop)
+        else:
+            session.close()
+
+    @contextmanager
+    def _lease(self, sessions: OrderedDict, url: str, proxy, factory) -> Iterator:
+        session = self._acquire(sessions, url, proxy, factory)
+        try:
+            yield session
+        finally:
+            self._release(session)
+
+    def session(self, url: str, proxy: Optional[str] = None) -> Session:
+        """
+        获取 url 所在域名（及代理）对应的会话，不存在时创建
+
+        返回时不持有使用登记，会话被淘汰后即关闭；发送请求请使用 request()。
+        """
+        with self._lease(self._sessions, url, proxy, Session) as session:
+            return session
+
+    def async_session(self, url: str, proxy: Optional[str] = None) -> AsyncSession:
+        """
+        获取 url 所在域名（及代理）对应的 AsyncSession，不存在时创建
+
+        只能在 run_async 执行的协程中调用（会话绑定会话池的事件循环）。
+        返回时不持有使用登记，发送请求请使用 async_lease()。
+        """
+        with self._lease(self._async_sessions, url, proxy, AsyncSession) as session:
+            return session
+
+    def async_lease(self, url: str, proxy: Optional[str] = None):
+        """
+        获取 AsyncSession 并在 with 块内持有使用登记（期间被淘汰时推迟到退出 with 块后关闭）
+
+        只能在 run_async 执行的协程中调用。
+
+        用法：
+            with get_http_pool().async_lease(url, proxy) as session:
+                response = await session.get(url)
+        """
+        return self._lease(self._async_sessions, url, proxy, AsyncSession)
+
+    def _event_loop(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            self._check_fork()
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                threading.Thread(
+                    target=loop.run_forever, name="http-pool-loop", daemon=True
+                ).start()
+                self._loop = loop
+            return self._loop
+
+    def run_async(self, coro: Coroutine[Any, Any, T]) -> T:
+        """
+        在会话池的常驻事件循环中执行协程并等待结果（供同步代码调用）
+
+        Raises:
+            RuntimeError: 在会话池的事件循环线程中调用（会死锁）
+        """
+        loop = self._event_loop()
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is loop:
+            coro.close()
+            raise RuntimeError("不能在会话池的事件循环中调用 run_async")
+        return asyncio.run_coroutine_threadsafe(coro, loop).result()
+
+    def set_cookie(self, domain: str, cookie: Optional[str]):
+        """设置（cookie 为空时清除）某个域名的 Cookie，之后发往该域名的请求自动携带"""
+        with self._lock:
+            if cookie:
+                self._cookies[domain.lower()] = cookie
+            else:
+                self._cookies.pop(domain.lower(), None)
+
+    def cookie_headers(self, url: str) -> dict:
+        """返回 url 所在域名需要注入的 Cookie 请求头（无 Cookie 时为空字典）"""
+        cookie = self._cookies.get(_domain_of(url))
+        return {"Cookie": cookie} if cookie else {}
+
+    def request(
+        self,
+        method: str,
+        url: str,
+        proxy: Optional[str] = None,
+        headers: Optional[dict] = None,
+        throttle: bool = True,
+        **kwargs,
+    ) -> Response:
+        """
+        通过会话池发送请求
+
+        Args:
+            method: HTTP 方法
+            url: 请求地址
+            proxy: 代理地址（与域名一起决定使用的会话）
+            headers: 请求头；未包含 Cookie 时注入该域名已设置的 Cookie
+            throttle: 是否按域名限流（见 nassav.rate_limit），并上报状态码用于自适应退避
+            **kwargs: 透传给 curl_cffi Session.request（timeout、allow_redirects 等）
+        """
+        from nassav.http_replay import get_http_replay
+
+        replay = get_http_replay()
+        headers = dict(headers or {})
+        if "Cookie" not in headers:
+            headers.update(self.cookie_headers(url))
+        if proxy and not replay.replaying:
+            kwargs.setdefault("proxies", {"http": proxy, "https": proxy})
+        # 回放时发往回放服务器；会话、Cookie、限流仍按原始地址
+        target = replay.rewrite(url)
+        if not throttle:
+            with self._lease(self._sessions, url, proxy, Session) as session:
+                response = session.request(method, target, headers=headers, **kwargs)
+        else:
+            from nassav.rate_limit import get_rate_limiter
+
+            limiter = get_rate_limiter()
+            limiter.wait(url)
+            with self._lease(self._sessions, url, proxy, Session) as session:
+                response = session.request(method, target, headers=headers, **kwargs)
+            limiter.feedback_response(url, response)
+        # 边接收边写入文件的请求没有 content，由 download() 在写完后录制
+        if replay.recording and "content_callback" not in kwargs:
+            replay.record(
+                method, url, response, body=kwargs.get("json") or kwargs.get("data")
+            )
+        return response
+
+    def get(self, url: str, **kwargs) -> Response:
+        return self.request("GET", url, **kwargs)
+
+    def download(self, url: str, save_path: str, **kwargs) -> Response:
+        """
+        下载到文件（边接收边写入，复用会话连接）
+
+        先写入 {save_path}.part，状态码正常后再替换为目标文件；失败时删除临时文件并抛出异常。
+
+        Raises:
+            curl_cffi.requests.exceptions.RequestException: 请求失败或状态码 >= 400
+        """
+        os.makedirs(os.path.dirname(save_path) or ".", exist_ok=True)
+        part_path = f"{save_path}.part"
+        try:
+            with open(part_path, "wb") as f:
+                response = self.get(url, content_callback=f.write, **kwargs)
+            response.raise_for_status()
+            os.replace(part_path, save_path)
+            from nassav.http_replay import get_http_replay
+
+            replay = get_http_replay()
+            if replay.recording:
+                with open(save_path, "rb") as f:
+                    replay.record("GET", url, response, content=f.read())
+            return response
+        finally:
+            if os.path.exists(part_path):
+                os.remove(part_path)
+
+    def clear(self):
+        """关闭并丢弃所有会话（仍在使用的会话在释放后关闭；Cookie 保留）"""
+        with self._lock:
+            self._check_fork()
+            for sessions in (self._sessions, self._async_sessions):
+                while sessions:
+                    self._retire(sessions.popitem(last=False)[1])
+
+
+_pool: Optional[HttpSessionPool] = None
+_pool_lock = threading.Lock()
+
+
+def get_http_pool() -> HttpSessionPool:
+    """获取进程级共享的 HTTP 会话池（参数来自配置 HttpPool）"""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                from django.conf import settings
+
+                config = getattr(settings, "HTTP_POOL_CONFIG", {}) or {}
+                _pool = HttpSessionPool(
+                    max_sessions=int(config.get("max_sessions", DEFAULT_MAX_SESSIONS)),
+                    max_connections=int(
+                        config.get("max_connections", DEFAULT_MAX_CONNECTIONS)
+                    ),
+                    idle_timeout=int(config.get("idle_timeout", DEFAULT_IDLE_TIMEOUT)),
+                )
+    return _pool
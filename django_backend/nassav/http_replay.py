@@ -0,0 +1,329 @@
+"""
+HTTP 录制/回放
+
+- record：请求照常发往真实站点，同时把响应（状态码、部分响应头、内容）写入录像目录（cassette）
+- replay：请求地址改写到本地替身服务器（nassav.testing.CassetteServer），由它按录像返回响应，
+  不访问外网即可复现 添加 → 刮削 → 封面 → 头像 → 翻译 → 下载 的完整流程（基准测试、回归测试）
+
+接入点：HTTP 会话池（源/刮削器/封面/头像）、源的并发探测与自动获取 Cookie、Ollama 翻译器、
+AsyncHLS 下载器；N_m3u8DL-RE 是外部程序，只改写播放列表地址（回放可用，录制需使用 AsyncHLS）。
+
+代码中流转的始终是原始地址（拼接相对地址、限流、Cookie 都按原始域名），只在发出请求前改写，
+录像也按原始地址记录。
+
+录像目录结构：
+    index.jsonl              每行一条 {"key", "status", "headers", "body"}，同一 key 以最后一条为准
+    bodies/ab/abcdef...      响应内容（按 sha256 命名，相同内容只保存一份）
+    meta.json                录制时的附加信息（如基准测试使用的 AVID 列表）
+"""
+import hashlib
+import json
+import os
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple, Union
+from urllib.parse import urlsplit
+
+from loguru import logger
+
+MODE_OFF = "off"
+MODE_RECORD = "record"
+MODE_REPLAY = "replay"
+
+# 录制时保留的响应头（小写），其余（长度、编码、日期等）由回放服务器重新生成
+RECORDED_HEADERS = (
+    "content-type",
+    "etag",
+    "last-modified",
+    "location",
+    "retry-after",
+    "set-cookie",
+)
+
+
+def _body_digest(body: Union[bytes, str, dict, list, None]) -> Optional[str]:
+    """请求体摘要；JSON 请求体按排序后的键计算，与序列化方式无关"""
+    if body is None or body == b"" or body == "":
+        return None
+    if isinstance(body, (bytes, str)):
+        try:
+            body = json.loads(body)
+        except ValueError:
+            raw = body.encode() if isinstance(body, str) else body
+            return hashlib.sha256(raw).hexdigest()[:16]
+    raw = json.dumps(body, sort_keys=True, ensure_ascii=False).encode()
+    return hashlib.sha256(raw).hexdigest()[:16]
+
+
+def header_pairs(headers) -> List[Tuple[str, str]]:
+    """响应头 -> [(名称, 值)]，只保留 RECORDED_HEADERS（同名多值的 Set-Cookie 逐条保留）"""
+    if headers is None:
+        return []
+    if hasattr(headers, "multi_items"):
+        items = headers.multi_items()
+    else:
+        items = headers.items()
+    return [(k, v) for k, v in items if k.lower() in RECORDED_HEADERS]
+
+
+class Cassette:
+    """
+    录像：请求键 -> 响应（线程安全，追加写入，可在录制中途中断）
+
+    用法：
+        cassette = Cassette("bench/cassette")
+        cassette.record(Cassette.key("GET", url), 200, headers, content)
+        status, headers, content = cassette.lookup(Cassette.key("GET", url))
+    """
+
+    def __init__(self, path: Union[str, Path]):
+        self.path = Path(path)
+        self._entries: Dict[str, dict] = {}
+        self._lock = threading.Lock()
+        index = self.path / "index.jsonl"
+        if index.exists():
+            with open(index, encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        entry = json.loads(line)
+                        self._entries[entry["key"]] = entry
+
+    @staticmethod
+    def key(
+        method: str,
+        url: str,
+        body: Union[bytes, str, dict, list, None] = None,
+        byte_range: Optional[str] = None,
+    ) -> str:
+        """
+        请求键
+
+        Args:
+            method: HTTP 方法
+            url: 原始请求地址（含查询参数）
+            body: 请求体（POST），JSON 按键排序后计算摘要
+            byte_range: Range 请求头的值（如 "bytes=0-1023"）
+        """
+        parts = [method.upper(), url]
+        if byte_range:
+            parts.append(f"range={byte_range}")
+        digest = _body_digest(body)
+        if digest:
+            parts.append(f"body={digest}")
+        return " ".join(parts)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._entries
+
+    def keys(self) -> List[str]:
+        return list(self._entries)
+
+    def _body_path(self, digest: str) -> Path:
+        return self.path / "bodies" / digest[:2] / digest
+
+    def record(
+        self,
+        key: str,
+        status: int,
+        headers: List[Tuple[str, str]],
+        content: bytes,
+    ):
+        """
+        记录一条响应
+
+        Args:
+            key: 见 key()
+            status: 状态码
+            headers: 见 header_pairs()
+            content: 响应内容（已解压）
+        """
+        content = content or b""
+        digest = hashlib.sha256(content).hexdigest()
+        entry = {
+            "key": key,
+            "status": int(status),
+            "headers": [list(h) for h in headers],
+            "body": digest,
+        }
+        body_path = self._body_path(digest)
+        with self._lock:
+            if not body_path.exists():
+                body_path.parent.mkdir(parents=True, exist_ok=True)
+                tmp_path = body_path.with_name(f"{digest}.{os.getpid()}.tmp")
+                tmp_path.write_bytes(content)
+                os.replace(tmp_path, body_path)
+            with open(self.path / "index.jsonl", "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            self._entries[key] = entry
+
+    def lookup(self, key: str) -> Optional[Tuple[int, List[Tuple[str, str]], bytes]]:
+        """查找响应，返回 (状态码, 响应头, 内容)，没有录制时返回 None"""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        content = self._body_path(entry["body"]).read_bytes()
+        return entry["status"], [tuple(h) for h in entry["headers"]], content
+
+    @property
+    def meta(self) -> dict:
+        path = self.path / "meta.json"
+        return json.loads(path.read_text(encoding="utf-8")) if path.exists() else {}
+
+    def save_meta(self, meta: dict):
+        self.path.mkdir(parents=True, exist_ok=True)
+        (self.path / "meta.json").write_text(
+            json.dumps(meta, ensure_ascii=False, indent=2), encoding="utf-8"
+        )
+
+
+def replay_path(url: str) -> str:
+    """原始地址 -> 回放服务器上的路径：https://a.com/x?y -> /https/a.com/x?y"""
+    parts = urlsplit(url)
+    path = f"/{parts.scheme}/{parts.netloc}{parts.path or '/'}"
+    return f"{path}?{parts.query}" if parts.query else path
+
+
+def original_url(path: str) -> Optional[str]:
+    """replay_path 的逆变换，格式不符时返回 None"""
+    scheme, _, rest = path.lstrip("/").partition("/")
+    if scheme not in ("http", "https") or not rest:
+        return None
+    return f"{scheme}://{rest}"
+
+
+class HttpReplay:
+    """进程内的录制/回放开关（默认关闭，对请求没有任何影响）"""
+
+    def __init__(self):
+        self.mode = MODE_OFF
+        self.cassette: Optional[Cassette] = None
+        self.server_url: Optional[str] = None
+
+    @property
+    def recording(self) -> bool:
+        return self.mode == MODE_RECORD
+
+    @property
+    def replaying(self) -> bool:
+        return self.mode == MODE_REPLAY
+
+    def start_recording(self, cassette: Union[Cassette, str, Path]):
+        if not isinstance(cassette, Cassette):
+            cassette = Cassette(cassette)
+        cassette.path.mkdir(parents=True, exist_ok=True)
+        self.mode, self.cassette, self.server_url = MODE_RECORD, cassette, None
+        logger.info(f"HTTP 录制已开启: {cassette.path}")
+
+    def start_replay(self, server_url: str):
+        """回放：之后的请求改写到 server_url（CassetteServer.base_url）"""
+        self.mode, self.cassette, self.server_url = (
+            MODE_REPLAY,
+            None,
+            server_url.rstrip("/"),
+        )
+        logger.info(f"HTTP 回放已开启: {self.server_url}")
+
+    def stop(self):
+        self.mode, self.cassette, self.server_url = MODE_OFF, None, None
+
+    def rewrite(self, url: str) -> str:
+        """回放时把原始地址改写为回放服务器地址，其余情况原样返回"""
+        if not self.replaying or url.startswith(self.server_url):
+            return url
+        return f"{self.server_url}{replay_path(url)}"
+
+    def proxies(self, proxies: Optional[dict]) -> Optional[dict]:
+        """回放时不经过代理（回放服务器在本机）"""
+        return None if self.replaying else proxies
+
+    def record(
+        self,
+        method: str,
+        url: str,
+        response=None,
+        *,
+        status: Optional[int] = None,
+        headers=None,
+        content: Optional[bytes] = None,
+        body=None,
+        byte_range: Optional[str] = None,
+    ):
+        """
+        录制一次请求（未开启录制时不做任何事）
+
+        Args:
+            method: HTTP 方法
+            url: 原始请求地址
+            response: 响应对象（curl_cffi / requests），提供未单独传入的状态码、响应头和内容
+            body: 请求体（见 Cassette.key）
+            byte_range: Range 请求头的值
+        """
+        if not self.recording:
+            return
+        try:
+            if response is not None:
+                status = response.status_code if status is None else status
+                headers = response.headers if headers is None else headers
+                content = response.content if content is None else content
+            self.cassette.record(
+                Cassette.key(method, url, body, byte_range),
+                status,
+                header_pairs(headers),
+                content,
+            )
+        except Exception as e:
+            logger.warning(f"录制请求失败 {method} {url}: {e}")
+
+
+_replay: Optional[HttpReplay] = None
+_replay_lock = threading.Lock()
+
+
+def get_http_replay() -> HttpReplay:
+    """
+    获取进程级的录制/回放开关
+
+    首次获取时按配置 HttpReplay 初始化（mode: off/record/replay，cassette: 录像目录，
+    server: 回放服务器地址），便于让 Web/Worker 进程整体运行在录制或回放模式下。
+    """
+    global _replay
+    if _replay is None:
+        with _replay_lock:
+            if _replay is None:
+                from django.conf import settings
+
+                replay = HttpReplay()
+                config = getattr(settings, "HTTP_REPLAY_CONFIG", {}) or {}
+                mode = config.get("mode") or MODE_OFF
+                if mode == MODE_RECORD and config.get("cassette"):
+                    replay.start_recording(config["cassette"])
+                elif mode == MODE_REPLAY and config.get("server"):
+                    replay.start_replay(config["server"])
+                _replay = replay
+    return _replay
+
+
+@contextmanager
+def recording(cassette: Union[Cassette, str, Path]) -> Iterator[Cassette]:
+    """在 with 块内录制所有请求"""
+    replay = get_http_replay()
+    replay.start_recording(cassette)
+    try:
+        yield replay.cassette
+    finally:
+        replay.stop()
+
+
+@contextmanager
+def replaying(server_url: str) -> Iterator[HttpReplay]:
+    """在 with 块内把所有请求改写到回放服务器"""
+    replay = get_http_replay()
+    replay.start_replay(server_url)
+    try:
+        yield replay
+    finally:
+        replay.stop()
@@ -0,0 +1,526 @@
+"""
+原生 asyncio HLS 分片下载器实现
+自行解析 M3U8 播放列表，基于 curl_cffi AsyncSession 并发下载分片并按序写入输出文件
+"""
+import asyncio
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urljoin
+
+from curl_cffi.requests import AsyncSession
+from loguru import logger
+from nassav.constants import IMPERSONATE
+from nassav.http_replay import get_http_replay
+from nassav.utils import Throttler
+
+from .DownloadCheckpoint import DownloadCheckpoint
+from .DownloadProgress import DownloadProgress
+from .M3u8DownloaderBase import DownloadAborted, M3u8DownloaderBase
+
+_ATTR_PATTERN = re.compile(r'([A-Z0-9-]+)=("[^"]*"|[^,]*)')
+
+
+class HlsDownloadError(Exception):
+    """HLS 下载失败（播放列表无效、分片重试耗尽等）"""
+
+
+@dataclass
+class HlsSegment:
+    """媒体播放列表中的单个分片"""
+
+    index: int
+    url: str
+    duration: float = 0.0
+    # (length, offset)，对应 EXT-X-BYTERANGE
+    byte_range: Optional[Tuple[int, int]] = None
+
+
+@dataclass
+class HlsMediaPlaylist:
+    """解析后的媒体播放列表"""
+
+    segments: List[HlsSegment] = field(default_factory=list)
+    # 加密方式（EXT-X-KEY METHOD），None 表示未加密
+    encryption: Optional[str] = None
+
+    @property
+    def total_duration(self) -> float:
+        return sum(seg.duration for seg in self.segments)
+
+
+def _parse_attributes(text: str) -> Dict[str, str]:
+    """解析 M3U8 标签属性列表，如 BANDWIDTH=123,RESOLUTION=1280x720"""
+    return {key: value.strip('"') for key, value in _ATTR_PATTERN.findall(text)}
+
+
+def _parse_byte_range(value: str, default_offset: int) -> Tuple[int, int]:
+    """解析 EXT-X-BYTERANGE 的 <length>[@<offset>]"""
+    if "@" in value:
+        length, offset = value.split("@", 1)
+        return int(length), int(offset)
+    return int(value), default_offset
+
+
+def parse_master_playlist(text: str, base_url: str) -> List[Tuple[int, str]]:
+    """
+    解析主播放列表中的变体流
+
+    Args:
+        text: 播放列表内容
+        base_url: 播放列表地址（用于解析相对路径）
+
+    Returns:
+        [(bandwidth, url), ...]，若不是主播放列表则返回空列表
+    """
+    variants = []
+    bandwidth = None
+    for raw_line in text.splitlines():
+        line = raw_line.strip()
+        if not line:
+            continue
+        if line.startswith("#EXT-X-STREAM-INF:"):
+            attrs = _parse_attributes(line.split(":", 1)[1])
+            try:
+                bandwidth = int(attrs.get("BANDWIDTH", "0"))
+            except ValueError:
+                bandwidth = 0
+        elif not line.startswith("#") and bandwidth is not None:
+            variants.append((bandwidth, urljoin(base_url, line)))
+            bandwidth = None
+    return variants
+
+
+def parse_media_playlist(text: str, base_url: str) -> HlsMediaPlaylist:
+    """
+    解析媒体播放列表
+
+    支持 EXTINF、EXT-X-BYTERANGE、EXT-X-MAP（初始化分片）和 EXT-X-KEY（仅记录加密方式）。
+
+    Args:
+        text: 播放列表内容
+        base_url: 播放列表地址（用于解析相对路径）
+
+    Returns:
+        HlsMediaPlaylist
+    """
+    playlist = HlsMediaPlaylist()
+    duration = 0.0
+    byte_range = None
+    last_range_end: Dict[str, int] = {}
+
+    for raw_line in text.splitlines():
+        line = raw_line.strip()
+        if not line:
+            continue
+
+        if line.startswith("#EXTINF:"):
+            value = line.split(":", 1)[1].split(",", 1)[0]
+            try:
+                duration = float(value)
+            except ValueError:
+                duration = 0.0
+        elif line.startswith("#EXT-X-BYTERANGE:"):
+            byte_range = line.split(":", 1)[1]
+        elif line.startswith("#EXT-X-KEY:"):
+            method = _parse_attributes(line.split(":", 1)[1]).get("METHOD", "NONE")
+            playlist.encryption = None if method == "NONE" else method
+        elif line.startswith("#EXT-X-MAP:"):
+            attrs = _parse_attributes(line.split(":", 1)[1])
+            if "URI" in attrs:
+                map_range = None
+                if "BYTERANGE" in attrs:
+                    map_range = _parse_byte_range(attrs["BYTERANGE"], 0)
+                playlist.segments.append(
+                    HlsSegment(
+                        index=len(playlist.segments),
+                        url=urljoin(base_url, attrs["URI"]),
+                        byte_range=map_range,
+                    )
+                )
+        elif not line.startswith("#"):
+            url = urljoin(base_url, line)
+            seg_range = None
+            if byte_range is not None:
+                seg_range = _parse_byte_range(byte_range, last_range_end.get(url, 0))
+                last_range_end[url] = seg_range[1] + seg_range[0]
+            playlist.segments.append(
+                HlsSegment(
+                    index=len(playlist.segments),
+                    url=url,
+                    duration=duration,
+                    byte_range=seg_range,
+                )
+            )
+            duration = 0.0
+            byte_range = None
+
+    return playlist
+
+
+def format_speed(bytes_per_second: float) -> str:
+    """格式化下载速度，如 5.21MB/s"""
+    for unit in ("B", "KB", "MB"):
+        if bytes_per_second < 1024:
+            return f"{bytes_per_second:.2f}{unit}/s"
+        bytes_per_second /= 1024
+    return f"{bytes_per_second:.2f}GB/s"
+
+
+def format_eta(seconds: float) -> str:
+    """格式化剩余时间为 HH:MM:SS"""
+    seconds = max(int(seconds), 0)
+    return f"{seconds // 3600:02d}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}"
+
+
+class _ProgressTracker:
+    """按分片/字节精确统计下载进度（续传时从断点处的分片数和字节数开始计数）
+
+    进度回调在单独的线程中按顺序执行：回调可能是同步阻塞调用（写 Redis、
+    async_to_sync 推送 WebSocket），不能在下载器的事件循环线程中运行。
+    回调抛出的 DownloadAborted 记录在 aborted 中，由下载协程检查后中止下载。
+    """
+
+    def __init__(
+        self,
+        total_segments: int,
+        progress_callback: Optional[callable],
+        initial_segments: int = 0,
+        initial_bytes: int = 0,
+    ):
+        self.total_segments = total_segments
+        self.done_segments = initial_segments
+        self.downloaded_bytes = initial_bytes
+        self._initial_segments = initial_segments
+        self._initial_bytes = initial_bytes
+        self.start_time = time.monotonic()
+        self.progress_callback = progress_callback
+        self.aborted: Optional[DownloadAborted] = None
+        self._executor = (
+            ThreadPoolExecutor(max_workers=1, thread_name_prefix="hls-progress")
+            if progress_callback
+            else None
+        )
+
+    def on_segment_done(self, size: int):
+        self.done_segments += 1
+        self.downloaded_bytes += size
+        if not self.progress_callback:
+            return
+
+        # 速度和剩余时间只按本次会话下载的数据计算
+        elapsed = max(time.monotonic() - self.start_time, 1e-6)
+        session_segments = self.done_segments - self._initial_segments
+        session_bytes = self.downloaded_bytes - self._initial_bytes
+        speed_bps = session_bytes / elapsed
+        remaining = self.total_segments - self.done_segments
+        progress = DownloadProgress(
+            percent=round(self.done_segments * 100 / self.total_segments, 2),
+            speed=format_speed(speed_bps),
+            eta=format_eta(elapsed / session_segments * remaining),
+            done_segments=self.done_segments,
+            total_segments=self.total_segments,
+            downloaded_bytes=self.downloaded_bytes,
+            speed_bps=round(speed_bps, 1),
+        )
+        self._executor.submit(self._notify, progress)
+
+    def _notify(self, progress: DownloadProgress):
+        if self.aborted:
+            return
+        try:
+            self.progress_callback(progress)
+        except DownloadAborted as e:
+            self.aborted = e
+        except Exception as e:
+            logger.error(f"进度回调失败: {e}")
+
+    def close(self):
+        """等待已提交的进度回调执行完毕"""
+        if self._executor:
+            self._executor.shutdown(wait=True)
+
+
+class AsyncHLS(M3u8DownloaderBase):
+    """原生 asyncio HLS 下载器（无需外部二进制）"""
+
+    def __init__(self, proxy: Optional[str] = None):
+        super().__init__(proxy)
+        self.proxies = {"http": proxy, "https": proxy} if proxy else None
+        # 单个请求超时时间（秒）
+        self.timeout = 30
+        # 乱序分片最多缓存 thread_count * window_factor 个，限制内存占用
+        self.window_factor = 2
+        # 断点清单最短保存间隔（秒）
+        self.checkpoint_interval = 2.0
+
+    def get_downloader_name(self) -> str:
+        return "AsyncHLS"
+
+    def download(
+        self,
+        url: str,
+        output_dir: Path,
+        output_name: str,
+        referer: str,
+        user_agent: str,
+        thread_count: int = 32,
+        retry_count: int = 5,
+        progress_callback: Optional[callable] = None,
+    ) -> bool:
+        """并发下载 HLS 分片并按序合并为单个 .ts 文件
+
+        下载过程中维护断点清单，失败时保留 {output_name}.ts.part 和清单，
+        下次下载同一 output_name 时从最后完成的分片继续（播放列表变化时自动重新下载）。
+
+        Args:
+            progress_callback: 进度回调函数，参数为 DownloadProgress，
+                每完成一个分片回调一次，percent 按已完成分片数精确计算；
+                抛出 DownloadAborted 时停止下载、保留断点并向上抛出
+        """
+        output_dir.mkdir(parents=True, exist_ok=True)
+        checkpoint = DownloadCheckpoint(output_dir, output_name)
+        part_path = checkpoint.part_path
+
+        try:
+            asyncio.run(
+                self._download_async(
+                    url,
+                    checkpoint,
+                    output_name,
+                    headers={"Referer": referer, "User-Agent": user_agent},
+                    thread_count=max(thread_count, 1),
+                    retry_count=max(retry_count, 0),
+                    progress_callback=progress_callback,
+                )
+            )
+        except DownloadAborted as e:
+            logger.warning(f"[{output_name}] 下载已中止: {e}")
+            self._keep_or_clear_checkpoint(checkpoint, output_name)
+            raise
+        except HlsDownloadError as e:
+            logger.error(f"[{output_name}] HLS 下载失败: {e}")
+            self._keep_or_clear_checkpoint(checkpoint, output_name)
+            return False
+        except Exception as e:
+            logger.error(f"下载失败: {e}")
+            self._keep_or_clear_checkpoint(checkpoint, output_name)
+            return False
+
+        output_file = output_dir / f"{output_name}.ts"
+        part_path.replace(output_file)
+        checkpoint.clear()
+        size_mb = output_file.stat().st_size / (1024 * 1024)
+        logger.info(f"[{output_name}] 下载完成: {size_mb:.1f} MB")
+        return True
+
+    def _keep_or_clear_checkpoint(
+        self, checkpoint: DownloadCheckpoint, output_name: str
+    ):
+        """失败后若已有完成的分片则保留断点，否则清理临时文件"""
+        if checkpoint.fingerprint is None:
+            # 尚未解析到播放列表（如网络错误），不动已有的断点文件
+            return
+        if checkpoint.completed_segments > 0:
+            logger.info(
+                f"[{output_name}] 已保留断点: {checkpoint.completed_segments}/"
+                f"{checkpoint.segment_count} 分片，{checkpoint.byte_offset} 字节"
+            )
+        else:
+            checkpoint.clear(remove_part=True)
+
+    async def _download_async(
+        self,
+        url: str,
+        checkpoint: DownloadCheckpoint,
+        output_name: str,
+        headers: Dict[str, str],
+        thread_count: int,
+        retry_count: int,
+        progress_callback: Optional[callable],
+    ):
+        async with AsyncSession(
+            impersonate=IMPERSONATE,
+            headers=headers,
+            proxies=get_http_replay().proxies(self.proxies),
+            timeout=self.timeout,
+            max_clients=thread_count,
+        ) as session:
+            playlist = await self._resolve_media_playlist(session, url, retry_count)
+            if playlist.encryption:
+                raise HlsDownloadError(f"不支持的加密方式: {playlist.encryption}")
+            if not playlist.segments:
+                raise HlsDownloadError("播放列表中没有分片")
+
+            total = len(playlist.segments)
+            logger.info(
+                f"[{output_name}] 共 {total} 个分片，"
+                f"时长 {playlist.total_duration / 60:.1f} 分钟，并发 {thread_count}"
+            )
+
+            start_index = checkpoint.begin(
+                DownloadCheckpoint.compute_fingerprint(playlist.segments), total, url
+            )
+            if start_index:
+                logger.info(
+                    f"[{output_name}] 从断点续传: 已完成 {start_index}/{total} 分片，"
+                    f"{checkpoint.byte_offset} 字节"
+                )
+
+            tracker = _ProgressTracker(
+                total,
+                progress_callback,
+                initial_segments=start_index,
+                initial_bytes=checkpoint.byte_offset,
+            )
+            try:
+                with open(
+                    checkpoint.part_path, "ab" if start_index else "wb"
+                ) as output:
+                    try:
+                        await self._fetch_all(
+                            session,
+                            playlist.segments[start_index:],
+                            output,
+                            thread_count,
+                            retry_count,
+                            tracker,
+                            checkpoint,
+                        )
+                    finally:
+                        # 无论成功失败都落盘断点，供下次续传
+                        output.flush()
+                        checkpoint.save()
+            finally:
+                # 分片已全部结束，等待剩余的进度回调（不再阻塞其他协程）
+                tracker.close()
+
+            logger.info(
+                f"[{output_name}] 分片下载完成: {tracker.done_segments}/{total}，"
+                f"{tracker.downloaded_bytes} 字节"
+            )
+
+    async def _resolve_media_playlist(
+        self, session: AsyncSession, url: str, retry_count: int
+    ) -> HlsMediaPlaylist:
+        """获取播放列表；若为主播放列表则选择带宽最高的变体流"""
+        text = (await self._fetch(session, url, None, retry_count)).decode(
+            "utf-8", errors="ignore"
+        )
+        if not text.lstrip().startswith("#EXTM3U"):
+            raise HlsDownloadError(f"无效的 M3U8 内容: {url}")
+
+        variants = parse_master_playlist(text, url)
+        if variants:
+            bandwidth, url = max(variants, key=lambda v: v[0])
+            logger.debug(f"选择变体流: {url} (BANDWIDTH={bandwidth})")
+            text = (await self._fetch(session, url, None, retry_count)).decode(
+                "utf-8", errors="ignore"
+            )
+
+        return parse_media_playlist(text, url)
+
+    async def _fetch_all(
+        self,
+        session: AsyncSession,
+        segments: List[HlsSegment],
+        output,
+        thread_count: int,
+        retry_count: int,
+        tracker: _ProgressTracker,
+        checkpoint: DownloadCheckpoint,
+    ):
+        """并发下载分片，按序号顺序写入 output 并记录断点"""
+        if not segments:
+            return
+
+        window = thread_count * self.window_factor
+        pending = asyncio.Queue()
+        for segment in segments:
+            pending.put_nowait(segment)
+
+        buffer: Dict[int, bytes] = {}
+        state = {"next_index": segments[0].index}
+        condition = asyncio.Condition()
+        save_throttler = Throttler(min_interval=self.checkpoint_interval)
+
+        async def worker():
+            while True:
+                try:
+                    segment = pending.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+
+                # 限制乱序缓冲区大小：领先写入位置过多时等待
+                async with condition:
+                    await condition.wait_for(
+                        lambda: segment.index < state["next_index"] + window
+                    )
+
+                data = await self._fetch(
+                    session, segment.url, segment.byte_range, retry_count
+                )
+                tracker.on_segment_done(len(data))
+                if tracker.aborted:
+                    raise tracker.aborted
+
+                async with condition:
+                    buffer[segment.index] = data
+                    while state["next_index"] in buffer:
+                        output.write(buffer.pop(state["next_index"]))
+                        checkpoint.record(state["next_index"], output.tell())
+                        state["next_index"] += 1
+                    if save_throttler.should_execute():
+                        output.flush()
+                        checkpoint.save()
+                    condition.notify_all()
+
+        workers = [
+            asyncio.create_task(worker())
+            for _ in range(min(thread_count, len(segments)))
+        ]
+        try:
+            await asyncio.gather(*workers)
+        except BaseException:
+            for task in workers:
+                task.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+            raise
+
+    async def _fetch(
+        self,
+        session: AsyncSession,
+        url: str,
+        byte_range: Optional[Tuple[int, int]],
+        retry_count: int,
+    ) -> bytes:
+        """带重试的 GET 请求，返回响应内容"""
+        headers = None
+        if byte_range:
+            length, offset = byte_range
+            headers = {"Range": f"bytes={offset}-{offset + length - 1}"}
+
+        replay = get_http_replay()
+        last_error = None
+        for attempt in range(retry_count + 1):
+            try:
+                response = await session.get(replay.rewrite(url), headers=headers)
+                if response.status_code in (200, 206):
+                    replay.record(
+                        "GET",
+                        url,
+                        response,
+                        byte_range=headers["Range"] if headers else None,
+                    )
+                    return response.content
+                last_error = f"HTTP {response.status_code}"
+            except Exception as e:
+                last_error = str(e)
+
+            if attempt < retry_count:
+                await asyncio.sleep(min(0.5 * 2**attempt, 10))
+
+        raise HlsDownloadError(f"请求失败 {url}: {last_error}")
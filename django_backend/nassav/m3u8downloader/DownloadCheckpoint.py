@@ -0,0 +1,160 @@
+"""
+分片下载断点清单
+记录每个 AVID 已按序写入的分片及其字节偏移，使任务重试、Worker 重启或手动重新提交时从断点继续
+"""
+import hashlib
+import json
+import time
+from pathlib import Path
+from typing import List, Optional
+from urllib.parse import urlsplit
+
+from loguru import logger
+
+
+class DownloadCheckpoint:
+    """
+    断点清单（{output_name}.checkpoint.json，与 {output_name}.ts.part 同目录）
+
+    清单内容：
+        version: 清单格式版本
+        fingerprint: 播放列表指纹（分片路径/字节范围/时长的哈希，忽略 CDN 主机名和查询参数中的临时签名）
+        playlist_url: 播放列表地址（仅供排查）
+        segment_count: 分片总数
+        offsets: 已完成分片的结束字节偏移（按序号连续，第 i 项对应第 i 个分片）
+        updated_at: 最后更新时间戳
+    """
+
+    VERSION = 1
+
+    def __init__(self, output_dir: Path, output_name: str):
+        self.path = output_dir / f"{output_name}.checkpoint.json"
+        self.part_path = output_dir / f"{output_name}.ts.part"
+        self.fingerprint: Optional[str] = None
+        self.playlist_url: Optional[str] = None
+        self.segment_count = 0
+        self.offsets: List[int] = []
+
+    @staticmethod
+    def compute_fingerprint(segments) -> str:
+        """
+        计算播放列表指纹
+
+        Args:
+            segments: HlsSegment 列表
+
+        Returns:
+            sha256 十六进制字符串
+        """
+        digest = hashlib.sha256()
+        for seg in segments:
+            path = urlsplit(seg.url).path
+            digest.update(f"{path}|{seg.byte_range}|{seg.duration:.3f}\n".encode())
+        return digest.hexdigest()
+
+    @property
+    def completed_segments(self) -> int:
+        return len(self.offsets)
+
+    @property
+    def byte_offset(self) -> int:
+        return self.offsets[-1] if self.offsets else 0
+
+    def load(self) -> Optional[dict]:
+        """读取清单文件，不存在或损坏时返回 None"""
+        if not self.path.exists():
+            return None
+        try:
+            data = json.loads(self.path.read_text(encoding="utf-8"))
+            if data.get("version") != self.VERSION:
+                return None
+            return data
+        except Exception as e:
+            logger.warning(f"读取断点清单失败 {self.path}: {e}")
+            return None
+
+    def begin(self, fingerprint: str, segment_count: int, playlist_url: str) -> int:
+        """
+        开始（或恢复）一次下载
+
+        若清单与当前播放列表一致且临时文件完整，则截断临时文件到最后完成分片的位置并返回续传起点；
+        否则清除旧的临时文件和清单，从头开始。
+
+        Args:
+            fingerprint: 当前播放列表指纹
+            segment_count: 当前分片总数
+            playlist_url: 当前播放列表地址
+
+        Returns:
+            续传起始分片序号（0 表示从头下载）
+        """
+        self.fingerprint = fingerprint
+        self.playlist_url = playlist_url
+        self.segment_count = segment_count
+        self.offsets = []
+
+        data = self.load()
+        if data is None:
+            self._reset_files()
+            return 0
+
+        if (
+            data.get("fingerprint") != fingerprint
+            or data.get("segment_count") != segment_count
+        ):
+            logger.info(f"播放列表已变化，丢弃断点并重新下载: {self.path.name}")
+            self._reset_files()
+            return 0
+
+        offsets = [int(o) for o in data.get("offsets") or []]
+        part_size = self.part_path.stat().st_size if self.part_path.exists() else -1
+        if not offsets or part_size < offsets[-1]:
+            # 临时文件缺失或比清单记录的短，无法续传
+            self._reset_files()
+            return 0
+
+        # 丢弃最后一次保存清单之后写入的不完整数据
+        with open(self.part_path, "r+b") as f:
+            f.truncate(offsets[-1])
+        self.offsets = offsets
+        return len(offsets)
+
+    def record(self, segment_index: int, end_offset: int):
+        """
+        记录一个按序写入完成的分片
+
+        Args:
+            segment_index: 分片序号（必须等于当前已完成数量）
+            end_offset: 写入后临时文件的结束偏移
+        """
+        if segment_index != len(self.offsets):
+            raise ValueError(f"分片必须按序记录: 期望 {len(self.offsets)}，实际 {segment_index}")
+        self.offsets.append(end_offset)
+
+    def save(self):
+        """原子写入清单文件（调用前需保证临时文件已 flush 到 byte_offset）"""
+        data = {
+            "version": self.VERSION,
+            "fingerprint": self.fingerprint,
+            "playlist_url": self.playlist_url,
+            "segment_count": self.segment_count,
+            "offsets": self.offsets,
+            "updated_at": time.time(),
+        }
+        tmp_path = self.path.with_suffix(".json.tmp")
+        tmp_path.write_text(json.dumps(data), encoding="utf-8")
+        tmp_path.replace(self.path)
+
+    def clear(self, remove_part: bool = False):
+        """
+        删除清单文件
+
+        Args:
+            remove_part: 是否同时删除临时文件
+        """
+        self.path.unlink(missing_ok=True)
+        if remove_part:
+            self.part_path.unlink(missing_ok=True)
+
+    def _reset_files(self):
+        self.clear(remove_part=True)
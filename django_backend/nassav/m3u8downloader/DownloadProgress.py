@@ -0,0 +1,166 @@
+"""
+下载进度：结构化进度对象、N_m3u8DL-RE 输出解析与 Redis 写入合并
+"""
+import re
+import time
+from dataclasses import dataclass
+from typing import Callable, Optional
+
+# N_m3u8DL-RE 进度行（重定向输出时每次刷新输出一行），例如：
+#   Vid 1920x1080 | 4000 Kbps ━━━━━━━━━━ 245/1042 23.51% 486.21MB/~2.03GB 8.12MBps 00:03:12
+# 大小/速度未知时输出 "-"，剩余时间未知时输出 "--:--:--"
+_PROGRESS_RE = re.compile(
+    r"(?P<done>\d+)/(?P<total>\d+)\s+(?P<percent>\d+(?:\.\d+)?)%"
+    r"(?:\s+(?P<downloaded>[\d.]+[KMGT]?B|-)/~?(?P<size>[\d.]+[KMGT]?B|-))?"
+    r"(?:\s+(?P<speed>[\d.]+[KMGT]?B(?:ps|/s)|-))?"
+    r"(?:\s+(?P<eta>\d{2}:\d{2}:\d{2}))?"
+)
+# 兼容其他格式（如 "已下载: 45.2% | 速度: 5.2MB/s"）
+_PERCENT_RE = re.compile(r"(\d+(?:\.\d+)?)%")
+_SPEED_RE = re.compile(r"([\d.]+)\s*([KMGT]?B)(?:ps|/s)", re.IGNORECASE)
+# 日志行（"22:40:23.118 INFO : ..."）不含进度
+_LOG_LINE_RE = re.compile(r"^\d{2}:\d{2}:\d{2}\.\d+ [A-Z]+\s*:")
+_ANSI_RE = re.compile(r"\x1b\[[0-9;?]*[A-Za-z]")
+_SIZE_RE = re.compile(r"([\d.]+)\s*([KMGT]?B)", re.IGNORECASE)
+
+_UNITS = {"B": 1, "KB": 1024, "MB": 1024**2, "GB": 1024**3, "TB": 1024**4}
+
+
+@dataclass
+class DownloadProgress:
+    """一次进度更新（未知字段为 None）"""
+
+    percent: float
+    speed: str = ""
+    eta: str = ""
+    done_segments: Optional[int] = None
+    total_segments: Optional[int] = None
+    downloaded_bytes: Optional[int] = None
+    total_bytes: Optional[int] = None
+    speed_bps: Optional[float] = None
+
+    def to_dict(self) -> dict:
+        """转为字典（省略未知字段），用于写入 Redis 和推送 WebSocket"""
+        return {k: v for k, v in vars(self).items() if v is not None}
+
+
+def parse_size(text: Optional[str]) -> Optional[int]:
+    """
+    解析大小字符串（如 486.21MB），按 1024 进制
+
+    Returns:
+        字节数，无法解析（如 "-"）时返回 None
+    """
+    if not text:
+        return None
+    match = _SIZE_RE.match(text.strip())
+    if not match:
+        return None
+    return int(float(match.group(1)) * _UNITS[match.group(2).upper()])
+
+
+def _parse_speed(text: Optional[str]):
+    """返回 (展示用速度字符串, 字节/秒)；统一为 5.21MB/s 形式"""
+    if not text or text == "-":
+        return "", None
+    match = _SPEED_RE.match(text)
+    if not match:
+        return text, None
+    value, unit = match.group(1), match.group(2).upper()
+    return f"{value}{unit}/s", float(value) * _UNITS[unit]
+
+
+def parse_progress_line(line: str) -> Optional[DownloadProgress]:
+    """
+    解析一行下载器输出
+
+    Args:
+        line: 下载器标准输出中的一行
+
+    Returns:
+        DownloadProgress，非进度行返回 None
+    """
+    # 绝大多数非进度行不含 "%"，无需正则
+    if "%" not in line:
+        return None
+    if "\x1b" in line:
+        line = _ANSI_RE.sub("", line)
+
+    match = _PROGRESS_RE.search(line)
+    if match:
+        speed, speed_bps = _parse_speed(match.group("speed"))
+        return DownloadProgress(
+            percent=float(match.group("percent")),
+            speed=speed,
+            eta=match.group("eta") or "",
+            done_segments=int(match.group("done")),
+            total_segments=int(match.group("total")),
+            downloaded_bytes=parse_size(match.group("downloaded")),
+            total_bytes=parse_size(match.group("size")),
+            speed_bps=speed_bps,
+        )
+
+    if _LOG_LINE_RE.match(line):
+        return None
+    match = _PERCENT_RE.search(line)
+    if not match:
+        return None
+    speed_match = _SPEED_RE.search(line)
+    speed, speed_bps = _parse_speed(speed_match.group(0) if speed_match else None)
+    return DownloadProgress(
+        percent=float(match.group(1)), speed=speed, speed_bps=speed_bps
+    )
+
+
+class ProgressCoalescer:
+    """
+    合并高频进度更新：距上次写入超过 min_interval 秒、百分比变化达到 min_step 或到达 100% 时
+    才调用 sink，其余更新直接丢弃（写入的总是当时最新的进度）
+    """
+
+    def __init__(
+        self,
+        sink: Callable[[DownloadProgress], None],
+        min_interval: float = 0.5,
+        min_step: float = 1.0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        """
+        Args:
+            sink: 实际写入函数
+            min_interval: 最短写入间隔（秒）
+            min_step: 触发写入的最小百分比变化
+            clock: 时钟函数（测试/基准中可替换为模拟时钟）
+        """
+        self.sink = sink
+        self.min_interval = min_interval
+        self.min_step = min_step
+        self.clock = clock
+        self.writes = 0
+        self._last: Optional[DownloadProgress] = None
+        self._last_time = 0.0
+
+    def update(self, progress: DownloadProgress) -> bool:
+        """
+        提交一次进度
+
+        Returns:
+            bool: 本次是否写入
+        """
+        now = self.clock()
+        last = self._last
+        if last is not None:
+            if progress == last:
+                return False
+            if (
+                progress.percent < 100
+                and abs(progress.percent - last.percent) < self.min_step
+                and now - self._last_time < self.min_interval
+            ):
+                return False
+
+        self._last = progress
+        self._last_time = now
+        self.writes += 1
+        self.sink(progress)
+        return True
@@ -6,6 +6,10 @@ from pathlib import Path
 from typing import Optional
 
 
+class DownloadAborted(Exception):
+    """进度回调抛出该异常时中止下载（保留断点供续传），异常传播给 download() 的调用方"""
+
+
 class M3u8DownloaderBase(ABC):
     """M3U8 下载器基类"""
 
@@ -46,7 +50,8 @@ class M3u8DownloaderBase(ABC):
             user_agent: User-Agent 头
             thread_count: 下载线程数
             retry_count: 重试次数
-            progress_callback: 进度回调函数，参数为 (percent: float, speed: str, eta: str)
+            progress_callback: 进度回调函数，参数为 DownloadProgress；
+                抛出 DownloadAborted 时中止下载并向上抛出
 
         Returns:
             是否下载成功
@@ -10,8 +10,10 @@ from typing import Optional
 
 from django.conf import settings
 from loguru import logger
+from nassav.http_replay import get_http_replay
 
-from .M3u8DownloaderBase import M3u8DownloaderBase
+from .DownloadProgress import parse_progress_line
+from .M3u8DownloaderBase import DownloadAborted, M3u8DownloaderBase
 
 
 class N_m3u8DL_RE(M3u8DownloaderBase):
@@ -44,16 +46,19 @@ class N_m3u8DL_RE(M3u8DownloaderBase):
         """使用 N_m3u8DL-RE 下载 M3U8 视频
 
         Args:
-            progress_callback: 进度回调函数，参数为 (percent: float, speed: str, eta: str)
+            progress_callback: 进度回调函数，参数为 DownloadProgress（分片数、字节数、速度、剩余时间），
+                连续相同的进度行只回调一次；抛出 DownloadAborted 时终止下载进程并向上抛出
         """
         output_dir.mkdir(parents=True, exist_ok=True)
         tmp_path = output_dir / "temp"
 
+        # 回放时改写到回放服务器（播放列表中的相对地址随之解析到回放服务器；外部程序的请求无法录制）
+        replay = get_http_replay()
         try:
             # 构建命令
             cmd = [
                 self.tool_path,
-                url,
+                replay.rewrite(url),
                 "--tmp-dir",
                 str(tmp_path),
                 "--save-dir",
@@ -75,7 +80,7 @@ class N_m3u8DL_RE(M3u8DownloaderBase):
 
             # 设置环境变量（代理）
             env = os.environ.copy()
-            if self.proxy:
+            if self.proxy and not replay.replaying:
                 env["http_proxy"] = self.proxy
                 env["https_proxy"] = self.proxy
                 env["HTTP_PROXY"] = self.proxy
@@ -91,27 +96,23 @@ class N_m3u8DL_RE(M3u8DownloaderBase):
                 bufsize=1,
             )
 
-            # 实时读取输出并解析进度
-            import re
-
+            # 实时读取输出并解析进度（控制台刷新会重复输出相同的进度行）
+            last_progress = None
             for line in process.stdout:
-                # 解析进度信息（示例格式: "已下载: 45.2% | 速度: 5.2MB/s"）
-                line = line.strip()
-                if progress_callback:
-                    # 尝试匹配百分比
-                    percent_match = re.search(r"(\d+\.?\d*)%", line)
-                    # 尝试匹配速度
-                    speed_match = re.search(
-                        r"([\d.]+\s*[KMG]?B/s)", line, re.IGNORECASE
-                    )
-
-                    if percent_match:
-                        percent = float(percent_match.group(1))
-                        speed = speed_match.group(1) if speed_match else "N/A"
-                        try:
-                            progress_callback(percent, speed, "")
-                        except Exception as e:
-                            logger.error(f"进度回调失败: {e}")
+                if not progress_callback:
+                    continue
+                progress = parse_progress_line(line)
+                if progress is None or progress == last_progress:
+                    continue
+                last_progress = progress
+                try:
+                    progress_callback(progress)
+                except DownloadAborted:
+                    process.terminate()
+                    process.wait()
+                    raise
+                except Exception as e:
+                    logger.error(f"进度回调失败: {e}")
 
             # 等待进程完成
             returncode = process.wait()
@@ -131,6 +132,9 @@ class N_m3u8DL_RE(M3u8DownloaderBase):
                 logger.error(f"[{output_name}] 未找到输出文件")
                 return False
 
+        except DownloadAborted as e:
+            logger.warning(f"[{output_name}] 下载已中止: {e}")
+            raise
         except FileNotFoundError:
             logger.error(f"N_m3u8DL-RE 工具不存在: {self.tool_path}")
             return False
@@ -1,10 +1,49 @@
 """
 M3U8 下载器模块
 """
-from .M3u8DownloaderBase import M3u8DownloaderBase
+from typing import Optional
+
+from .AsyncHLS import AsyncHLS
+from .DownloadCheckpoint import DownloadCheckpoint
+from .DownloadProgress import DownloadProgress, ProgressCoalescer, parse_progress_line
+from .M3u8DownloaderBase import DownloadAborted, M3u8DownloaderBase
 from .N_m3u8DL_RE import N_m3u8DL_RE
 
+# 可用下载器（键为配置中 Downloader.active 的取值，不区分大小写）
+DOWNLOADER_CLASSES = {
+    "n_m3u8dl-re": N_m3u8DL_RE,
+    "asynchls": AsyncHLS,
+}
+
+
+def create_m3u8_downloader(
+    name: Optional[str], proxy: Optional[str] = None
+) -> M3u8DownloaderBase:
+    """
+    根据名称创建下载器实例
+
+    Args:
+        name: 下载器名称（如 N_m3u8DL-RE、AsyncHLS），为空时使用 N_m3u8DL-RE
+        proxy: 代理地址
+
+    Returns:
+        下载器实例
+    """
+    downloader_class = DOWNLOADER_CLASSES.get((name or "N_m3u8DL-RE").lower())
+    if downloader_class is None:
+        raise ValueError(f"未知的下载器: {name}，可选: {list(DOWNLOADER_CLASSES.keys())}")
+    return downloader_class(proxy=proxy)
+
+
 __all__ = [
     "M3u8DownloaderBase",
+    "DownloadAborted",
     "N_m3u8DL_RE",
+    "AsyncHLS",
+    "DownloadCheckpoint",
+    "DownloadProgress",
+    "ProgressCoalescer",
+    "parse_progress_line",
+    "DOWNLOADER_CLASSES",
+    "create_m3u8_downloader",
 ]
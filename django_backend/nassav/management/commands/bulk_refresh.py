@@ -0,0 +1,110 @@
+"""管理命令：bulk_refresh
+
+用法示例：
+  python manage.py bulk_refresh --missing actors --missing genres
+  python manage.py bulk_refresh --older-than-days 180 --source Jable --async
+  python manage.py bulk_refresh --m3u8 --no-metadata --source MissAV
+  python manage.py bulk_refresh --resume 3f2a9c1b7d4e
+  python manage.py bulk_refresh --status 3f2a9c1b7d4e
+
+功能：创建批量刷新元数据任务（见 nassav.bulk_refresh），默认在当前进程中逐块执行并输出进度，
+  --async 时提交给 Celery 执行。中断（Ctrl+C）或失败后用 --resume 从检查点继续。
+"""
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = "批量刷新资源元数据（分块、块内并发、批量写入，可从检查点继续）"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--missing",
+            action="append",
+            default=None,
+            help="只刷新缺失该字段的资源（title/release_date/duration/actors/genres，可重复）",
+        )
+        parser.add_argument(
+            "--older-than-days", type=int, default=None, help="只刷新元数据超过 N 天未更新的资源"
+        )
+        parser.add_argument(
+            "--source", action="append", default=None, help="只刷新来自该源的资源（可重复）"
+        )
+        parser.add_argument(
+            "--avid", action="append", default=None, help="只刷新指定 AVID（可重复）"
+        )
+        parser.add_argument("--limit", type=int, default=None, help="最多刷新 N 个资源")
+        parser.add_argument(
+            "--no-metadata", action="store_true", help="不刮削元数据（配合 --m3u8 使用）"
+        )
+        parser.add_argument("--m3u8", action="store_true", help="从资源原来的源刷新 m3u8 链接")
+        parser.add_argument("--cover", action="store_true", help="封面文件不存在时下载封面")
+        parser.add_argument("--force", action="store_true", help="用刮削结果覆盖已有字段")
+        parser.add_argument(
+            "--async", dest="async_mode", action="store_true", help="提交给 Celery 执行"
+        )
+        parser.add_argument("--resume", type=str, default=None, help="从检查点继续指定任务")
+        parser.add_argument("--status", type=str, default=None, help="查看指定任务的进度")
+
+    def handle(self, *args, **options):
+        from nassav.bulk_refresh import (
+            STATUS_RUNNING,
+            BulkRefreshError,
+            bulk_refresh_jobs,
+        )
+        from nassav.tasks import start_bulk_refresh
+
+        if options["status"]:
+            job = bulk_refresh_jobs.get(options["status"])
+            if job is None:
+                raise CommandError(f"任务 {options['status']} 不存在")
+            self._report(job)
+            for avid, error in job["errors"].items():
+                self.stdout.write(f"  {avid}: {error}")
+            return
+
+        if options["resume"]:
+            job = bulk_refresh_jobs.resume(options["resume"])
+            if job is None:
+                raise CommandError(f"任务 {options['resume']} 不存在")
+        else:
+            filters = {
+                "missing": options["missing"] or [],
+                "older_than_days": options["older_than_days"],
+                "sources": options["source"] or [],
+                "avids": options["avid"] or [],
+                "limit": options["limit"],
+            }
+            try:
+                job = bulk_refresh_jobs.create(
+                    filters,
+                    {
+                        "metadata": not options["no_metadata"],
+                        "m3u8": options["m3u8"],
+                        "cover": options["cover"],
+                        "force": options["force"],
+                    },
+                )
+            except BulkRefreshError as e:
+                raise CommandError(str(e))
+        self._report(job)
+        if job["status"] != STATUS_RUNNING:
+            return
+
+        if options["async_mode"]:
+            start_bulk_refresh(job["job_id"])
+            self.stdout.write(f"已提交 Celery 任务，查看进度: --status {job['job_id']}")
+            return
+        try:
+            start_bulk_refresh(job["job_id"], async_mode=False)
+        except KeyboardInterrupt:
+            bulk_refresh_jobs.cancel(job["job_id"])
+            self.stdout.write(f"已中断，继续执行: --resume {job['job_id']}")
+            return
+        self._report(bulk_refresh_jobs.get(job["job_id"]))
+
+    def _report(self, job):
+        self.stdout.write(
+            f"任务 {job['job_id']} [{job['status']}]: {job['processed']}/{job['total']}"
+            f"（块 {job['chunks_done']}/{job['chunks']}），更新 {job['updated']}，"
+            f"未变化 {job['unchanged']}，失败 {job['failed']}"
+        )
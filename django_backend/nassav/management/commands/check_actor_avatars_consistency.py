@@ -17,6 +17,12 @@ class Command(BaseCommand):
             action="store_true",
             help="实际下载缺失的头像（默认只检查不下载）",
         )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=None,
+            help="同时下载的头像数（默认使用配置 Avatars.workers）",
+        )
         parser.add_argument(
             "--report",
             type=str,
@@ -26,10 +32,13 @@ class Command(BaseCommand):
 
     def handle(self, *args, **options):
         from django.conf import settings
-        from loguru import logger
-        from nassav.constants import ACTOR_AVATAR_PLACEHOLDER_URLS
+        from nassav.avatar_service import (
+            OK_STATUSES,
+            avatar_filename,
+            avatar_service,
+            is_placeholder,
+        )
         from nassav.models import Actor
-        from nassav.scraper.ScraperManager import ScraperManager
 
         apply_changes = options.get("apply", False)
         report_path = options.get(
@@ -40,17 +49,6 @@ class Command(BaseCommand):
         self.stdout.write(f"开始演员头像一致性检查 (apply_changes={apply_changes})")
         self.stdout.write("=" * 60)
 
-        # 初始化 Scraper Manager（用于下载头像）
-        proxy = settings.PROXY_URL if settings.PROXY_ENABLED else None
-        scraper_manager = ScraperManager(proxy=proxy)
-
-        # 获取第一个可用的 scraper
-        scrapers = scraper_manager.get_scrapers()
-        if not scrapers:
-            self.stderr.write(self.style.ERROR("没有可用的刮削器，无法下载头像"))
-            return
-        _, scraper = scrapers[0]
-
         try:
             actors = Actor.objects.all()
             total = actors.count()
@@ -69,8 +67,10 @@ class Command(BaseCommand):
                 "issues": [],
             }
 
-            for idx, actor in enumerate(actors, 1):
-                if idx % 100 == 0:
+            # 先检查（不访问网络），需要下载的头像之后并发下载
+            pending = []  # [(actor, issue)]
+            for idx, actor in enumerate(actors.iterator(), 1):
+                if idx % 1000 == 0:
                     self.stdout.write(f"进度: {idx}/{total} ({idx * 100 // total}%)")
 
                 # 检查是否有头像URL
@@ -79,42 +79,24 @@ class Command(BaseCommand):
                     continue
 
                 # 检查是否是占位符URL
-                if actor.avatar_url in ACTOR_AVATAR_PLACEHOLDER_URLS:
+                if is_placeholder(actor.avatar_url):
                     stats["placeholder"] += 1
                     continue
 
                 # 检查 avatar_filename 是否为空
                 if not actor.avatar_filename:
                     stats["filename_empty"] += 1
+                    avatar_path = avatar_service.path_for(actor.avatar_url)
                     issue = {
                         "actor": actor.name,
                         "actor_id": actor.id,
                         "issue": "filename_empty",
                         "avatar_url": actor.avatar_url,
                     }
-
-                    # 生成文件名
-                    filename = actor.avatar_url.split("/")[-1]
-                    if not filename or "." not in filename:
-                        filename = f"{actor.id}.jpg"
-
-                    avatar_path = Path(settings.AVATAR_DIR) / filename
-
-                    if apply_changes:
-                        if scraper.download_avatar(actor.avatar_url, str(avatar_path)):
-                            actor.avatar_filename = filename
-                            actor.save()
-                            stats["download_success"] += 1
-                            issue["action"] = "downloaded"
-                            issue["filename"] = filename
-                        else:
-                            stats["download_failed"] += 1
-                            issue["action"] = "download_failed"
-                    else:
+                    if not apply_changes:
                         issue["action"] = "skipped"
                         issue["would_download_to"] = str(avatar_path)
-
-                    stats["issues"].append(issue)
+                    pending.append((actor, issue))
                     continue
 
                 # 检查文件是否存在
@@ -129,21 +111,38 @@ class Command(BaseCommand):
                         "filename": actor.avatar_filename,
                         "expected_path": str(avatar_path),
                     }
-
-                    if apply_changes:
-                        if scraper.download_avatar(actor.avatar_url, str(avatar_path)):
-                            stats["download_success"] += 1
-                            issue["action"] = "redownloaded"
-                        else:
-                            stats["download_failed"] += 1
-                            issue["action"] = "redownload_failed"
-                    else:
+                    if not apply_changes:
                         issue["action"] = "skipped"
-
-                    stats["issues"].append(issue)
+                    pending.append((actor, issue))
                 else:
                     stats["ok"] += 1
 
+            if apply_changes and pending:
+                self.stdout.write(
+                    f"下载 {len(pending)} 个头像（并发 {options['workers'] or avatar_service.config['workers']}）..."
+                )
+                results = avatar_service.backfill(
+                    [actor.avatar_url for actor, _ in pending],
+                    workers=options["workers"],
+                )
+                changed = []
+                for actor, issue in pending:
+                    filename = avatar_filename(actor.avatar_url)
+                    ok = results.get(actor.avatar_url) in OK_STATUSES
+                    stats["download_success" if ok else "download_failed"] += 1
+                    if issue["issue"] == "filename_empty":
+                        issue["action"] = "downloaded" if ok else "download_failed"
+                    else:
+                        issue["action"] = "redownloaded" if ok else "redownload_failed"
+                    if ok and actor.avatar_filename != filename:
+                        actor.avatar_filename = filename
+                        issue["filename"] = filename
+                        changed.append(actor)
+                if changed:
+                    Actor.objects.bulk_update(changed, ["avatar_filename"])
+
+            stats["issues"] = [issue for _, issue in pending]
+
             # 打印统计信息
             self.stdout.write("=" * 60)
             self.stdout.write(self.style.SUCCESS("演员头像一致性检查完成"))
@@ -0,0 +1,179 @@
+"""管理命令：html_snapshots
+
+用法示例：
+  python manage.py html_snapshots stats
+  python manage.py html_snapshots import --delete-legacy
+  python manage.py html_snapshots train
+  python manage.py html_snapshots reparse --avid ABC-123
+  python manage.py html_snapshots reparse --source Jable --apply
+  python manage.py html_snapshots gc
+
+功能：管理源页面 HTML 快照存储（settings.HTML_SNAPSHOT_DIR）。
+  stats    统计快照数量与压缩率
+  import   导入旧版未压缩 HTML（COVER_DIR/{avid}.html、RESOURCE_BACKUP_DIR/{avid}/{avid}.html）
+  train    用已有快照训练 zstd 字典，之后写入的快照使用该字典压缩
+  reparse  用快照重新运行源的 parse_html，对比/更新数据库中的 m3u8 与 source_title（不请求源站页面）
+  gc       删除没有被任何快照引用的内容
+"""
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+
+def _size(n: float) -> str:
+    for unit in ("B", "KB", "MB"):
+        if n < 1024:
+            return f"{n:.1f}{unit}"
+        n /= 1024
+    return f"{n:.1f}GB"
+
+
+class Command(BaseCommand):
+    help = "管理源页面 HTML 快照（统计/导入旧文件/训练字典/离线重新解析/清理）"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "action", choices=["stats", "import", "train", "reparse", "gc"]
+        )
+        parser.add_argument(
+            "--avid", action="append", default=None, help="仅处理指定 AVID（可重复）"
+        )
+        parser.add_argument(
+            "--source", type=str, default=None, help="reparse: 仅使用该源的快照"
+        )
+        parser.add_argument("--limit", type=int, default=None, help="仅处理前 N 个 AVID")
+        parser.add_argument("--apply", action="store_true", help="reparse: 将解析结果写回数据库")
+        parser.add_argument(
+            "--delete-legacy", action="store_true", help="import: 导入后删除旧 HTML 文件"
+        )
+        parser.add_argument(
+            "--dict-size", type=int, default=None, help="train: 字典大小（字节）"
+        )
+        parser.add_argument(
+            "--max-samples", type=int, default=2000, help="train: 最多使用的样本数"
+        )
+
+    def handle(self, *args, **options):
+        from nassav.html_store import get_html_store
+
+        self.store = get_html_store()
+        getattr(self, f"_{options['action']}")(options)
+
+    def _avids(self, options):
+        avids = [a.upper() for a in options["avid"] or []] or list(self.store.avids())
+        limit = options.get("limit")
+        return avids[:limit] if limit else avids
+
+    def _stats(self, options):
+        stats = self.store.stats()
+        ratio = stats["stored_size"] / stats["raw_size"] if stats["raw_size"] else 0
+        self.stdout.write(f"目录: {self.store.root}")
+        self.stdout.write(
+            f"AVID: {stats['avids']}，快照: {stats['snapshots']}，去重后内容: {stats['objects']}"
+        )
+        self.stdout.write(
+            f"原始大小: {_size(stats['raw_size'])}，存储大小: {_size(stats['stored_size'])}"
+            f"（{ratio:.1%}），当前字典: {stats['dict_id'] or '无'}"
+        )
+
+    def _import(self, options):
+        from nassav.models import AVResource
+
+        backup_root = Path(
+            getattr(
+                settings,
+                "RESOURCE_BACKUP_DIR",
+                Path(settings.BASE_DIR) / "resource_backup",
+            )
+        )
+        candidates = list(Path(settings.COVER_DIR).glob("*.html"))
+        if backup_root.exists():
+            candidates += list(backup_root.glob("*/*.html"))
+        if options["avid"]:
+            wanted = {a.upper() for a in options["avid"]}
+            candidates = [p for p in candidates if p.stem.upper() in wanted]
+        if options.get("limit"):
+            candidates = candidates[: options["limit"]]
+
+        sources = dict(
+            AVResource.objects.filter(
+                avid__in=[p.stem.upper() for p in candidates]
+            ).values_list("avid", "source")
+        )
+        imported = 0
+        for path in candidates:
+            avid = path.stem.upper()
+            try:
+                html = path.read_text(encoding="utf-8")
+            except Exception as e:
+                self.stderr.write(f"读取失败 {path}: {e}")
+                continue
+            self.store.put(
+                avid,
+                html,
+                source=sources.get(avid) or "",
+                fetched_at=path.stat().st_mtime,
+            )
+            imported += 1
+            if options["delete_legacy"]:
+                path.unlink()
+        self.stdout.write(self.style.SUCCESS(f"导入 {imported} 个 HTML 文件"))
+        self._stats(options)
+
+    def _train(self, options):
+        import zstandard
+
+        kwargs = {"max_samples": options["max_samples"]}
+        if options["dict_size"]:
+            kwargs["dict_size"] = options["dict_size"]
+        try:
+            dict_id = self.store.train_dictionary(**kwargs)
+        except zstandard.ZstdError as e:
+            raise CommandError(f"训练字典失败: {e}")
+        self.stdout.write(self.style.SUCCESS(f"字典已生成并启用: {dict_id}"))
+
+    def _reparse(self, options):
+        from nassav.models import AVResource
+        from nassav.source.SourceManager import normalize_source_title, source_manager
+
+        changed = failed = unchanged = 0
+        for avid in self._avids(options):
+            info, source = source_manager.reparse_snapshot(avid, options["source"])
+            if info is None:
+                failed += 1
+                self.stderr.write(f"{avid}: 无可用快照或解析失败")
+                continue
+            updates = {
+                "m3u8": info.m3u8,
+                "source_title": normalize_source_title(avid, info.source_title),
+                "source": source.get_source_name(),
+            }
+            resource = AVResource.objects.filter(avid=avid).first()
+            if resource is None:
+                failed += 1
+                self.stderr.write(f"{avid}: 数据库中无记录")
+                continue
+            diff = {
+                k: (getattr(resource, k), v)
+                for k, v in updates.items()
+                if v and getattr(resource, k) != v
+            }
+            if not diff:
+                unchanged += 1
+                continue
+            changed += 1
+            for field, (old, new) in diff.items():
+                self.stdout.write(f"{avid}.{field}: {old!r} -> {new!r}")
+            if options["apply"]:
+                AVResource.objects.filter(avid=avid).update(
+                    **{k: new for k, (_, new) in diff.items()}
+                )
+        verb = "已更新" if options["apply"] else "需更新（使用 --apply 写入）"
+        self.stdout.write(
+            self.style.SUCCESS(f"{verb}: {changed}，无变化: {unchanged}，失败: {failed}")
+        )
+
+    def _gc(self, options):
+        removed = self.store.gc()
+        self.stdout.write(self.style.SUCCESS(f"已删除 {removed} 个未引用的内容"))
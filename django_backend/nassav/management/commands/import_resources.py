@@ -17,7 +17,8 @@ from typing import List
 from django.conf import settings
 from django.core.management.base import BaseCommand
 from django.db import transaction
-from nassav.models import Actor, AVResource, Genre
+from nassav.models import AVResource
+from nassav.relations import set_resource_relations
 
 
 def _parse_int_duration(dur) -> int | None:
@@ -236,18 +237,14 @@ class Command(BaseCommand):
                             avid=avid, defaults=defaults
                         )
 
-                    # actors
+                    # actors / genres（批量替换）
                     if data is not None:
-                        resource.actors.clear()
-                        for a in actors_list:
-                            actor_obj, _ = Actor.objects.get_or_create(name=a)
-                            resource.actors.add(actor_obj)
-
-                        # genres
-                        resource.genres.clear()
-                        for g in genres_list:
-                            genre_obj, _ = Genre.objects.get_or_create(name=g)
-                            resource.genres.add(genre_obj)
+                        set_resource_relations(
+                            resource,
+                            actors=actors_list,
+                            genres=genres_list,
+                            replace=True,
+                        )
 
                     # ensure timestamps
                     if file_exists:
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-17 05:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("nassav", "0011_rename_and_add_metadata_timestamps"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="sourcecookie",
+            name="expires_at",
+            field=models.DateTimeField(blank=True, null=True, verbose_name="过期时间"),
+        ),
+    ]
@@ -14,6 +14,8 @@ class SourceCookie(models.Model):
         max_length=50, unique=True, primary_key=True, verbose_name="源名称"
     )
     cookie = models.TextField(verbose_name="Cookie")
+    # 自动获取的 Cookie 中最早的过期时间，手动设置时为空（见 nassav.cookie_manager）
+    expires_at = models.DateTimeField(null=True, blank=True, verbose_name="过期时间")
     updated_at = models.DateTimeField(auto_now=True, verbose_name="更新时间")
 
     class Meta:
@@ -0,0 +1,217 @@
+"""
+来源未命中缓存
+
+记录 (源/刮削器, AVID) 的失败结果（不存在 / 拒绝访问 / 其他错误），有效期内 SourceManager 与
+刮削器直接跳过，不再重复请求同一个 404 页面。批量添加的 AVID 列表中有大量某些源没有的番号时，
+可以省去这些请求及其等待时间。
+
+条目存放在 Redis（带过期时间），Redis 不可用时不跳过任何请求。
+"""
+import json
+import time
+from typing import Dict, Iterable, List, Optional
+
+from django.conf import settings
+from loguru import logger
+
+KEY_PREFIX = "nassav:negative"
+
+KIND_SOURCE = "source"
+KIND_SCRAPER = "scraper"
+KINDS = (KIND_SOURCE, KIND_SCRAPER)
+
+OUTCOME_MISS = "miss"
+OUTCOME_FORBIDDEN = "forbidden"
+OUTCOME_ERROR = "error"
+OUTCOMES = (OUTCOME_MISS, OUTCOME_FORBIDDEN, OUTCOME_ERROR)
+
+
+def classify(code) -> str:
+    """
+    按错误码归类失败结果
+
+    Args:
+        code: 状态码（int）或错误信息字符串；None 表示请求成功但页面无法解析
+
+    Returns:
+        miss（404）、forbidden（403）或 error（其他）
+    """
+    try:
+        code = int(code)
+    except (TypeError, ValueError):
+        return OUTCOME_ERROR
+    if code == 404:
+        return OUTCOME_MISS
+    if code == 403:
+        return OUTCOME_FORBIDDEN
+    return OUTCOME_ERROR
+
+
+class NegativeCache:
+    """
+    (类型, 名称, AVID) -> 失败结果 的 TTL 缓存
+
+    键: nassav:negative:{kind}:{name 小写}:{AVID 大写}
+    值: {"kind", "name", "avid", "outcome", "code", "at"}，过期时间按 outcome 取配置
+    """
+
+    def __init__(self, client=None):
+        """
+        Args:
+            client: Redis 客户端，默认使用进程共享的客户端
+        """
+        self._client = client
+
+    @property
+    def client(self):
+        if self._client is None:
+            from nassav.tasks import get_redis_client
+
+            return get_redis_client()
+        return self._client
+
+    @property
+    def enabled(self) -> bool:
+        return bool(getattr(settings, "NEGATIVE_CACHE_ENABLED", True))
+
+    @staticmethod
+    def key(kind: str, name: str, avid: str) -> str:
+        return f"{KEY_PREFIX}:{kind}:{name.lower()}:{avid.upper()}"
+
+    def lookup(self, kind: str, names: Iterable[str], avid: str) -> Dict[str, dict]:
+        """
+        一次 MGET 查询多个源/刮削器对某个 AVID 的失败记录
+
+        Returns:
+            {name: 条目}，只包含仍在有效期内的记录
+        """
+        names = list(names)
+        if not self.enabled or not names:
+            return {}
+        try:
+            raws = self.client.mget([self.key(kind, n, avid) for n in names])
+        except Exception as e:
+            logger.warning(f"读取未命中缓存失败: {e}")
+            return {}
+        return {n: json.loads(raw) for n, raw in zip(names, raws) if raw}
+
+    def get(self, kind: str, name: str, avid: str) -> Optional[dict]:
+        return self.lookup(kind, [name], avid).get(name)
+
+    def record(self, kind: str, name: str, avid: str, code=None) -> Optional[dict]:
+        """
+        记录一次失败
+
+        Args:
+            code: 状态码或错误信息（见 classify）
+
+        Returns:
+            写入的条目；未启用或对应结果的有效期为 0 时返回 None
+        """
+        if not self.enabled:
+            return None
+        outcome = classify(code)
+        ttl = int(settings.NEGATIVE_CACHE_TTL.get(outcome, 0))
+        if ttl <= 0:
+            return None
+        entry = {
+            "kind": kind,
+            "name": name,
+            "avid": avid.upper(),
+            "outcome": outcome,
+            "code": code,
+            "at": int(time.time()),
+        }
+        try:
+            self.client.set(
+                self.key(kind, name, avid),
+                json.dumps(entry, ensure_ascii=False),
+                ex=ttl,
+            )
+        except Exception as e:
+            logger.warning(f"写入未命中缓存失败: {e}")
+            return None
+        return entry
+
+    def forget(self, kind: str, name: str, avid: str):
+        """请求成功后清除该源/刮削器对此 AVID 的失败记录"""
+        if not self.enabled:
+            return
+        try:
+            self.client.delete(self.key(kind, name, avid))
+        except Exception as e:
+            logger.warning(f"清除未命中缓存失败: {e}")
+
+    def _scan_keys(
+        self, kind: Optional[str], name: Optional[str], avid: Optional[str]
+    ) -> List[bytes]:
+        pattern = ":".join(
+            [
+                KEY_PREFIX,
+                kind or "*",
+                name.lower() if name else "*",
+                avid.upper() if avid else "*",
+            ]
+        )
+        return list(self.client.scan_iter(match=pattern, count=500))
+
+    def entries(
+        self,
+        kind: Optional[str] = None,
+        name: Optional[str] = None,
+        avid: Optional[str] = None,
+        outcome: Optional[str] = None,
+    ) -> List[dict]:
+        """
+        列出失败记录（含剩余有效期 ttl），按记录时间倒序
+
+        Args:
+            kind/name/avid/outcome: 过滤条件，None 表示不过滤
+        """
+        keys = self._scan_keys(kind, name, avid)
+        if not keys:
+            return []
+        pipe = self.client.pipeline(transaction=False)
+        for key in keys:
+            pipe.get(key)
+            pipe.ttl(key)
+        values = pipe.execute()
+
+        result = []
+        for raw, ttl in zip(values[::2], values[1::2]):
+            if not raw:
+                continue
+            entry = json.loads(raw)
+            if outcome and entry.get("outcome") != outcome:
+                continue
+            entry["ttl"] = ttl
+            result.append(entry)
+        result.sort(key=lambda e: e.get("at", 0), reverse=True)
+        return result
+
+    def purge(
+        self,
+        kind: Optional[str] = None,
+        name: Optional[str] = None,
+        avid: Optional[str] = None,
+        outcome: Optional[str] = None,
+    ) -> int:
+        """
+        删除匹配的失败记录
+
+        Returns:
+            删除的条目数
+        """
+        if outcome:
+            keys = [
+                self.key(e["kind"], e["name"], e["avid"])
+                for e in self.entries(kind, name, avid, outcome)
+            ]
+        else:
+            keys = self._scan_keys(kind, name, avid)
+        if not keys:
+            return 0
+        return int(self.client.delete(*keys))
+
+
+negative_cache = NegativeCache()
@@ -0,0 +1,122 @@
+"""
+任务队列快照（异步）
+
+TaskConsumer 运行在 ASGI 事件循环中，直接调用同步的 get_full_task_queue 会以阻塞式 Redis I/O
+卡住同一 Worker 上的所有 WebSocket。这里使用 redis.asyncio 客户端计算相同结构的快照
+（一次 pipeline 读取序号/队列/调度顺序，再一次 MGET 读取进度），并在进程内按短 TTL 缓存、
+合并并发请求：大量标签页同时（重）连时只计算一次。
+
+缓存的快照最多比实时状态旧 SNAPSHOT_TTL 秒；客户端按快照中的 seq 应用之后的增量事件，
+发现缺口时重新请求快照，缓存过期后即可追上。
+"""
+import asyncio
+import time
+from typing import Any, Dict, Optional
+
+import redis.asyncio
+from django.conf import settings
+from loguru import logger
+
+# 快照缓存有效期（秒）
+SNAPSHOT_TTL = 1.0
+
+
+class QueueSnapshotProvider:
+    """带 TTL 缓存和并发合并的异步队列快照"""
+
+    def __init__(self, ttl: float = SNAPSHOT_TTL):
+        """
+        Args:
+            ttl: 快照缓存有效期（秒）
+        """
+        self.ttl = ttl
+        self.computations = 0
+        self._snapshot: Optional[Dict[str, Any]] = None
+        self._expires_at = 0.0
+        self._inflight: Optional[asyncio.Task] = None
+        self._client = None
+        self._loop = None
+
+    def _get_client(self):
+        """返回绑定当前事件循环的异步 Redis 客户端（事件循环变化时重建）"""
+        loop = asyncio.get_running_loop()
+        if self._client is None or self._loop is not loop:
+            self._client = redis.asyncio.from_url(settings.CELERY_BROKER_URL)
+            self._loop = loop
+        return self._client
+
+    async def get(self) -> Dict[str, Any]:
+        """
+        获取队列快照（调用方只读，不要修改返回的字典）
+
+        Returns:
+            dict: 与 get_full_task_queue 结构相同的快照
+        """
+        if self._snapshot is not None and time.monotonic() < self._expires_at:
+            return self._snapshot
+
+        loop = asyncio.get_running_loop()
+        if self._inflight is None or self._inflight.get_loop() is not loop:
+            self._inflight = loop.create_task(self._refresh())
+        # shield：某个连接断开被取消时不影响其他等待同一次计算的连接
+        return await asyncio.shield(self._inflight)
+
+    def invalidate(self):
+        """丢弃缓存的快照"""
+        self._snapshot = None
+        self._expires_at = 0.0
+
+    async def _refresh(self) -> Dict[str, Any]:
+        try:
+            snapshot = await self._compute()
+        except Exception as e:
+            logger.error(f"获取完整任务队列失败: {e}")
+            from .tasks import _empty_task_queue
+
+            return _empty_task_queue(None)
+        finally:
+            self._inflight = None
+
+        self._snapshot = snapshot
+        self._expires_at = time.monotonic() + self.ttl
+        return snapshot
+
+    async def _compute(self) -> Dict[str, Any]:
+        from .tasks import (
+            QUEUE_KEY,
+            QUEUE_SEQ_KEY,
+            build_task_queue,
+            get_download_scheduler,
+            parse_queue_entries,
+            task_progress_keys,
+        )
+
+        self.computations += 1
+        client = self._get_client()
+        scheduler = get_download_scheduler(client)
+
+        # 先读序号再读队列：快照至少包含 seq 及之前的所有事件
+        async with client.pipeline(transaction=False) as pipe:
+            pipe.get(QUEUE_SEQ_KEY)
+            pipe.hgetall(QUEUE_KEY)
+            scheduler.queue_ordered_commands(pipe)
+            seq, all_tasks_data, entries, raw_metas = await pipe.execute()
+
+        all_tasks = parse_queue_entries(all_tasks_data)
+        progress_list = (
+            await client.mget(task_progress_keys(all_tasks)) if all_tasks else []
+        )
+        return build_task_queue(
+            int(seq or 0),
+            all_tasks,
+            progress_list,
+            scheduler.build_ordered(entries, raw_metas),
+        )
+
+
+_provider = QueueSnapshotProvider()
+
+
+async def get_queue_snapshot() -> Dict[str, Any]:
+    """获取进程内共享的任务队列快照"""
+    return await _provider.get()
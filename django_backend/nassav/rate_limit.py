@@ -0,0 +1,322 @@
+"""
+按域名的令牌桶限流（多进程共享）
+
+源、刮削器、封面/头像下载、翻译等所有对外请求在发起前向所在域名预约一个令牌：
+空闲的域名可以立即连续发起 burst 个请求，之后按 rate（每秒请求数）匀速放行；
+收到 429 / 403 / 5xx 时该域名的放行速率减半（最多降到 1/max_backoff），
+之后每次成功逐步恢复；响应带 Retry-After 时在此之前不再放行。
+
+状态保存在 Redis（Celery worker、Web 进程共享同一份额度），Redis 不可用时退回进程内限流。
+实现为 GCRA（按「理论到达时间」记账的令牌桶），每个域名只需保存两个数值。
+"""
+import asyncio
+import threading
+import time
+from typing import Dict, Optional, Tuple
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from loguru import logger
+
+KEY_PREFIX = "nassav:ratelimit"
+
+DEFAULT_RATE = 2.0
+DEFAULT_BURST = 4
+DEFAULT_MAX_BACKOFF = 16.0
+# 每次成功后退避倍数乘以该值，直到恢复为 1
+RECOVERY_FACTOR = 0.8
+# Redis 出错后改用进程内限流的时长（秒）
+REDIS_RETRY_INTERVAL = 30.0
+
+# (tat, backoff) -> 预约：返回 [等待秒数, 当前退避倍数]
+_ACQUIRE_LUA = """
+local now = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local burst = tonumber(ARGV[3])
+local state = redis.call('HMGET', KEYS[1], 'tat', 'backoff')
+local backoff = tonumber(state[2]) or 1
+local interval = backoff / rate
+local tau = (burst - 1) * interval
+local tat = math.max(tonumber(state[1]) or now, now)
+local start = math.max(now, tat - tau)
+tat = tat + interval
+redis.call('HSET', KEYS[1], 'tat', tostring(tat), 'backoff', tostring(backoff))
+redis.call('EXPIRE', KEYS[1], math.ceil(tat - now + tau) + 60)
+return {tostring(start - now), tostring(backoff)}
+"""
+
+# 调整退避倍数；retry_after > 0 时推迟下一次放行
+_FEEDBACK_LUA = """
+local now = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local burst = tonumber(ARGV[3])
+local factor = tonumber(ARGV[4])
+local max_backoff = tonumber(ARGV[5])
+local retry_after = tonumber(ARGV[6])
+local state = redis.call('HMGET', KEYS[1], 'tat', 'backoff')
+local backoff = math.min(max_backoff, math.max(1, (tonumber(state[2]) or 1) * factor))
+local tat = math.max(tonumber(state[1]) or now, now)
+local tau = (burst - 1) * backoff / rate
+if retry_after > 0 then
+  tat = math.max(tat, now + retry_after + tau)
+end
+redis.call('HSET', KEYS[1], 'tat', tostring(tat), 'backoff', tostring(backoff))
+redis.call('EXPIRE', KEYS[1], math.ceil(tat - now + tau) + 60)
+return tostring(backoff)
+"""
+
+
+def domain_of(url: str) -> str:
+    """url 或域名 -> 小写的 host[:port]"""
+    if "://" not in url:
+        return url.lower()
+    return urlsplit(url).netloc.lower()
+
+
+def is_backoff_status(code) -> bool:
+    """需要降低请求速率的响应：429、403 和 5xx"""
+    return isinstance(code, int) and (code in (403, 429) or code >= 500)
+
+
+def _parse_retry_after(value) -> float:
+    try:
+        return max(0.0, float(value))
+    except (TypeError, ValueError):
+        return 0.0
+
+
+class RateLimiter:
+    """
+    按域名的令牌桶限流器（线程安全）
+
+    reserve() 预约令牌并返回需要等待的秒数，wait() / async_wait() 预约并等待；
+    请求完成后调用 feedback() 上报状态码，用于自适应退避。
+    """
+
+    def __init__(
+        self,
+        rate: float = DEFAULT_RATE,
+        burst: int = DEFAULT_BURST,
+        max_backoff: float = DEFAULT_MAX_BACKOFF,
+        domains: Optional[Dict[str, dict]] = None,
+        client=None,
+        use_redis: bool = True,
+    ):
+        """
+        Args:
+            rate: 默认每秒放行的请求数（<=0 表示不限流）
+            burst: 默认允许的突发请求数
+            max_backoff: 最大退避倍数
+            domains: 按域名覆盖 {域名: {"rate", "burst"}}，也匹配其子域名
+            client: Redis 客户端，默认使用进程共享的客户端
+            use_redis: False 时只在进程内限流
+        """
+        self.rate = float(rate)
+        self.burst = max(1, int(burst))
+        self.max_backoff = max(1.0, float(max_backoff))
+        self.domains: Dict[str, Tuple[float, int]] = {}
+        for domain, limit in (domains or {}).items():
+            limit = limit or {}
+            self.configure(domain, limit.get("rate"), limit.get("burst"))
+        self._client = client
+        self.use_redis = use_redis
+        self._redis_retry_at = 0.0
+        self._scripts = None
+        self._backoff_seen: Dict[str, float] = {}
+        self._local: Dict[str, list] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return bool(getattr(settings, "RATE_LIMIT_ENABLED", True))
+
+    def configure(
+        self, domain: str, rate: Optional[float] = None, burst: Optional[int] = None
+    ):
+        """设置某个域名（及其子域名）的速率和突发数，未指定的项使用默认值"""
+        self.domains[domain_of(domain)] = (
+            float(self.rate if rate is None else rate),
+            max(1, int(self.burst if burst is None else burst)),
+        )
+
+    def limits(self, domain: str) -> Tuple[float, int]:
+        """域名对应的 (rate, burst)：依次匹配 a.b.c、b.c、c"""
+        host = domain.split(":", 1)[0]
+        for candidate in (domain, host):
+            if candidate in self.domains:
+                return self.domains[candidate]
+        parts = host.split(".")
+        for i in range(1, len(parts)):
+            suffix = ".".join(parts[i:])
+            if suffix in self.domains:
+                return self.domains[suffix]
+        return self.rate, self.burst
+
+    # ---------------------------------------------------------------- 后端
+
+    def _redis(self):
+        """可用时返回 (client, scripts)，否则返回 None（改用进程内限流）"""
+        if not self.use_redis or time.monotonic() < self._redis_retry_at:
+            return None
+        try:
+            client = self._client
+            if client is None:
+                from nassav.tasks import get_redis_client
+
+                client = get_redis_client()
+            if self._scripts is None or self._scripts[0] is not client:
+                self._scripts = (
+                    client,
+                    client.register_script(_ACQUIRE_LUA),
+                    client.register_script(_FEEDBACK_LUA),
+                )
+            return self._scripts
+        except Exception as e:
+            self._redis_unavailable(e)
+            return None
+
+    def _redis_unavailable(self, error):
+        logger.warning(f"限流 Redis 不可用，{REDIS_RETRY_INTERVAL:.0f} 秒内使用进程内限流: {error}")
+        self._redis_retry_at = time.monotonic() + REDIS_RETRY_INTERVAL
+
+    def _local_acquire(
+        self, domain: str, rate: float, burst: int
+    ) -> Tuple[float, float]:
+        now = time.time()
+        with self._lock:
+            tat, backoff = self._local.get(domain, (now, 1.0))
+            interval = backoff / rate
+            tat = max(tat, now)
+            start = max(now, tat - (burst - 1) * interval)
+            self._local[domain] = [tat + interval, backoff]
+            return start - now, backoff
+
+    def _local_feedback(
+        self, domain: str, rate: float, burst: int, factor: float, retry_after: float
+    ) -> float:
+        now = time.time()
+        with self._lock:
+            tat, backoff = self._local.get(domain, (now, 1.0))
+            backoff = min(self.max_backoff, max(1.0, backoff * factor))
+            tat = max(tat, now)
+            if retry_after > 0:
+                tat = max(tat, now + retry_after + (burst - 1) * backoff / rate)
+            self._local[domain] = [tat, backoff]
+            return backoff
+
+    # ---------------------------------------------------------------- 接口
+
+    def reserve(self, url: str) -> float:
+        """
+        为一次请求预约令牌
+
+        Args:
+            url: 请求地址或域名
+
+        Returns:
+            发起请求前需要等待的秒数
+        """
+        if not self.enabled:
+            return 0.0
+        domain = domain_of(url)
+        rate, burst = self.limits(domain)
+        if rate <= 0:
+            return 0.0
+        redis = self._redis()
+        if redis is not None:
+            try:
+                wait, backoff = redis[1](
+                    keys=[f"{KEY_PREFIX}:{domain}"], args=[time.time(), rate, burst]
+                )
+                wait, backoff = float(wait), float(backoff)
+                self._backoff_seen[domain] = backoff
+                return wait
+            except Exception as e:
+                self._redis_unavailable(e)
+        wait, backoff = self._local_acquire(domain, rate, burst)
+        self._backoff_seen[domain] = backoff
+        return wait
+
+    def wait(self, url: str) -> float:
+        """预约令牌并阻塞等待，返回等待的秒数"""
+        delay = self.reserve(url)
+        if delay > 0:
+            time.sleep(delay)
+        return delay
+
+    async def async_wait(self, url: str) -> float:
+        """wait() 的协程版本"""
+        delay = self.reserve(url)
+        if delay > 0:
+            await asyncio.sleep(delay)
+        return delay
+
+    def feedback(self, url: str, code=None, retry_after=None):
+        """
+        上报请求结果
+
+        Args:
+            url: 请求地址或域名
+            code: 响应状态码；429/403/5xx 时退避，其余视为成功（异常信息等非整数不处理）
+            retry_after: 响应头 Retry-After（秒），有值时在此之前不再放行
+        """
+        if not self.enabled or (code is not None and not isinstance(code, int)):
+            return
+        domain = domain_of(url)
+        rate, burst = self.limits(domain)
+        if rate <= 0:
+            return
+        backoff_status = is_backoff_status(code)
+        retry_after = _parse_retry_after(retry_after) if backoff_status else 0.0
+        # 成功且未处于退避状态时无需写入
+        if not backoff_status and self._backoff_seen.get(domain, 1.0) <= 1.0:
+            return
+        factor = 2.0 if backoff_status else RECOVERY_FACTOR
+        if backoff_status:
+            logger.warning(f"{domain} 返回 {code}，降低请求速率")
+
+        redis = self._redis()
+        if redis is not None:
+            try:
+                backoff = redis[2](
+                    keys=[f"{KEY_PREFIX}:{domain}"],
+                    args=[
+                        time.time(),
+                        rate,
+                        burst,
+                        factor,
+                        self.max_backoff,
+                        retry_after,
+                    ],
+                )
+                self._backoff_seen[domain] = float(backoff)
+                return
+            except Exception as e:
+                self._redis_unavailable(e)
+        self._backoff_seen[domain] = self._local_feedback(
+            domain, rate, burst, factor, retry_after
+        )
+
+    def feedback_response(self, url: str, response):
+        """按响应对象上报（读取状态码和 Retry-After）"""
+        self.feedback(url, response.status_code, response.headers.get("Retry-After"))
+
+
+_limiter: Optional[RateLimiter] = None
+_limiter_lock = threading.Lock()
+
+
+def get_rate_limiter() -> RateLimiter:
+    """获取进程级共享的限流器（参数来自配置 RateLimit）"""
+    global _limiter
+    if _limiter is None:
+        with _limiter_lock:
+            if _limiter is None:
+                config = getattr(settings, "RATE_LIMIT_CONFIG", {}) or {}
+                _limiter = RateLimiter(
+                    rate=float(config.get("rate", DEFAULT_RATE)),
+                    burst=int(config.get("burst", DEFAULT_BURST)),
+                    max_backoff=float(config.get("max_backoff", DEFAULT_MAX_BACKOFF)),
+                    domains=config.get("domains") or {},
+                )
+    return _limiter
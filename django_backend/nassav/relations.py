@@ -0,0 +1,103 @@
+"""
+演员/类别关联的批量写入
+
+逐个 get_or_create + add 时，每个名称都要 2~4 条查询（SQLite 上还各带一个隐式事务）。
+这里按名称一次查出已有的演员/类别，缺少的用 bulk_create(ignore_conflicts=True) 一次创建，
+关联表每种关联只插入一次，与资源数量、名称数量无关：
+
+    查询已有名称 1 条 + （有缺少的名称时）创建 1 条、查回 id 1 条
+    + （replace 时）删除旧关联 1 条 + 插入关联 1 条
+
+并发创建同名演员/类别时由唯一约束去重（ignore_conflicts），之后统一按名称查回 id。
+"""
+from typing import Dict, Iterable, List, Optional
+
+from django.db import transaction
+
+
+def clean_names(values: Optional[Iterable]) -> List[str]:
+    """
+    规范化名称列表：支持字符串或 {"name": ...}，去掉首尾空白、空值和重复（保持顺序）
+    """
+    names = []
+    for value in values or []:
+        name = value.get("name") if isinstance(value, dict) else value
+        name = str(name).strip() if name else ""
+        if name and name not in names:
+            names.append(name)
+    return names
+
+
+def resolve_names(model, names: Iterable[str]) -> Dict[str, int]:
+    """
+    按名称获取演员/类别的 id，缺少的批量创建
+
+    Args:
+        model: Actor 或 Genre
+        names: 名称
+
+    Returns:
+        {名称: id}
+    """
+    names = set(names)
+    if not names:
+        return {}
+    ids = dict(model.objects.filter(name__in=names).values_list("name", "id"))
+    missing = names - set(ids)
+    if missing:
+        model.objects.bulk_create(
+            [model(name=name) for name in missing], ignore_conflicts=True
+        )
+        ids.update(model.objects.filter(name__in=missing).values_list("name", "id"))
+    return ids
+
+
+def associate(model, relation, assignments: Dict[int, Iterable], replace=False):
+    """
+    批量写入多个资源的演员/类别关联（缺少的演员/类别一并创建）
+
+    Args:
+        model: Actor 或 Genre
+        relation: AVResource.actors 或 AVResource.genres
+        assignments: {资源 id: 名称列表（见 clean_names）}
+        replace: True 时先删除这些资源原有的关联（替换），否则只追加
+    """
+    assignments = {rid: clean_names(names) for rid, names in assignments.items()}
+    if not assignments:
+        return
+    through = relation.through
+    target_field = f"{model._meta.model_name}_id"
+    with transaction.atomic():
+        ids = resolve_names(model, {n for names in assignments.values() for n in names})
+        if replace:
+            through.objects.filter(avresource_id__in=list(assignments)).delete()
+        rows = [
+            through(**{"avresource_id": resource_id, target_field: ids[name]})
+            for resource_id, names in assignments.items()
+            for name in names
+        ]
+        if rows:
+            through.objects.bulk_create(rows, ignore_conflicts=True)
+
+
+def set_resource_relations(
+    resource,
+    actors: Optional[Iterable] = None,
+    genres: Optional[Iterable] = None,
+    replace=False,
+):
+    """
+    写入单个资源的演员/类别关联
+
+    Args:
+        resource: AVResource
+        actors: 演员名称列表（或刮削结果中的 {"name": ...}），None 表示不处理
+        genres: 类别名称列表，None 表示不处理
+        replace: True 时替换原有关联，否则只追加
+    """
+    from nassav.models import Actor, AVResource, Genre
+
+    if actors is not None:
+        associate(Actor, AVResource.actors, {resource.pk: actors}, replace=replace)
+    if genres is not None:
+        associate(Genre, AVResource.genres, {resource.pk: genres}, replace=replace)
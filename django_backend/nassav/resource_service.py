@@ -10,17 +10,23 @@ ResourceService - 资源服务层
 """
 import json
 import os
+import time
 from pathlib import Path
-from typing import Optional, Tuple
+from typing import Callable, Optional, Tuple
 
 from django.conf import settings
 from django.utils import timezone
 from loguru import logger
-from nassav.models import Actor, AVResource, Genre
+from nassav.avatar_service import OK_STATUSES as AVATAR_OK_STATUSES
+from nassav.avatar_service import avatar_service
+from nassav.html_store import get_html_store
+from nassav.models import AVResource
+from nassav.relations import set_resource_relations
 from nassav.scraper import AVDownloadInfo
-from nassav.scraper.ScraperManager import ScraperManager
+from nassav.scraper.ScraperManager import FIELD_SOURCES_KEY, ScraperManager
 from nassav.source.SourceBase import SourceBase
 from nassav.source.SourceManager import SourceManager
+from nassav.stage_graph import STATUS_DONE, STATUS_FAILED, STATUS_RUNNING, StageGraph
 from nassav.translator.TranslatorManager import TranslatorManager
 
 # ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
@@ -31,12 +37,15 @@ from nassav.translator.TranslatorManager import TranslatorManager
 class ResourceServiceException(Exception):
     """ResourceService 基础异常"""
 
-    pass
+    # 对应的 HTTP 状态码（异步添加任务记录结果时使用）
+    status_code = 500
 
 
 class ResourceAlreadyExistsError(ResourceServiceException):
     """资源已存在异常 (409 Conflict)"""
 
+    status_code = 409
+
     def __init__(self, avid: str, resource_data: dict):
         self.avid = avid
         self.resource_data = resource_data
@@ -46,6 +55,8 @@ class ResourceAlreadyExistsError(ResourceServiceException):
 class ResourceNotFoundError(ResourceServiceException):
     """资源未找到异常 (404 Not Found)"""
 
+    status_code = 404
+
     def __init__(self, avid: str, errors: dict):
         self.avid = avid
         self.errors = errors
@@ -57,6 +68,8 @@ class ResourceNotFoundError(ResourceServiceException):
 class ResourceAccessDeniedError(ResourceServiceException):
     """资源访问被拒绝异常 (403 Forbidden)"""
 
+    status_code = 403
+
     def __init__(self, avid: str, errors: dict):
         self.avid = avid
         self.errors = errors
@@ -68,6 +81,8 @@ class ResourceAccessDeniedError(ResourceServiceException):
 class ResourceFetchError(ResourceServiceException):
     """资源获取失败异常 (502 Bad Gateway)"""
 
+    status_code = 502
+
     def __init__(self, avid: str, errors: dict):
         self.avid = avid
         self.errors = errors
@@ -76,6 +91,33 @@ class ResourceFetchError(ResourceServiceException):
         )
 
 
+DEFAULT_PIPELINE_CONFIG = {
+    # 保存资源时同时执行的阶段数（刮削、封面、头像等网络请求）
+    "max_workers": 4,
+    # 与刮削同时预取源网站封面（Javbus 封面下载失败时直接使用，成功时丢弃）
+    "prefetch_source_cover": True,
+    # POST /api/resource 的默认模式：sync 在请求中完成添加；async 提交 Celery 任务并返回 202（见 nassav/add_jobs.py）
+    "add_mode": "sync",
+    # 异步添加任务记录保存时间（秒）
+    "job_ttl": 86400,
+}
+
+
+def _pipeline_config() -> dict:
+    return {
+        **DEFAULT_PIPELINE_CONFIG,
+        **(getattr(settings, "RESOURCE_PIPELINE_CONFIG", {}) or {}),
+    }
+
+
+def _status_code(error) -> Optional[int]:
+    """源返回的错误 -> HTTP 状态码，非状态码时为 None"""
+    try:
+        return int(error)
+    except (TypeError, ValueError):
+        return None
+
+
 # ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
 # ResourceService 核心类
 # ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
@@ -121,6 +163,7 @@ class ResourceService:
         scrape: bool = True,
         download_cover: bool = True,
         submit_translate: bool = True,
+        on_stage: Optional[Callable[[str, str, Optional[float]], None]] = None,
     ) -> dict:
         """
         添加新资源（完整流程）
@@ -131,6 +174,8 @@ class ResourceService:
             scrape: 是否刮削 Javbus 元数据
             download_cover: 是否下载封面
             submit_translate: 是否提交翻译任务
+            on_stage: 阶段状态回调 on_stage(阶段名, 状态, 耗时)，阶段包括查找源（source）
+                与保存流程的各阶段，状态见 StageGraph
 
         Returns:
             {
@@ -163,7 +208,19 @@ class ResourceService:
         # ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
         # Step 2: 从源获取资源信息
         # ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
-        info, source_inst, html, errors = self._get_source_info(avid, source)
+        def emit(status, elapsed=None):
+            if on_stage:
+                on_stage("source", status, elapsed)
+
+        emit(STATUS_RUNNING)
+        start = time.perf_counter()
+        try:
+            info, source_inst, html, errors = self._get_source_info(avid, source)
+        except Exception:
+            emit(STATUS_FAILED, time.perf_counter() - start)
+            raise
+        source_elapsed = time.perf_counter() - start
+        emit(STATUS_DONE, source_elapsed)
 
         # ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
         # Step 3: 保存所有资源
@@ -176,7 +233,14 @@ class ResourceService:
             scrape=scrape,
             download_cover=download_cover,
             submit_translate=submit_translate,
+            on_stage=on_stage,
         )
+        timings = result["timings"]
+        result["timings"] = {
+            "source": round(source_elapsed, 3),
+            **timings,
+            "total": round(timings["total"] + source_elapsed, 3),
+        }
 
         logger.info(f"[ResourceService] 资源 {avid} 添加成功")
         return result
@@ -339,8 +403,10 @@ class ResourceService:
 
         # 错误处理
         if not info:
-            has_403 = any(int(v) == 403 for v in errors.values() if v)
-            all_404 = all(int(v) == 404 for v in errors.values() if v)
+            # 错误可能是状态码，也可能是异常信息或 CIRCUIT_OPEN_ERROR 等字符串
+            codes = [_status_code(v) for v in errors.values() if v]
+            has_403 = 403 in codes
+            all_404 = all(code == 404 for code in codes)
 
             if has_403:
                 raise ResourceAccessDeniedError(avid, errors)
@@ -361,74 +427,126 @@ class ResourceService:
         scrape: bool = True,
         download_cover: bool = True,
         submit_translate: bool = True,
+        on_stage: Optional[Callable[[str, str, Optional[float]], None]] = None,
     ) -> dict:
         """
         保存所有资源（从 SourceManager.save_all_resources 迁移）
 
+        各步骤按依赖关系组成阶段图（见 nassav/stage_graph.py），互不依赖的网络请求同时进行。
+        on_stage 为阶段状态回调（见 StageGraph 的 on_event）。
+
         Returns:
             {
                 "resource": AVResource对象,
                 "cover_saved": bool,
                 "metadata_saved": bool,
                 "scraped": bool,
+                "timings": {阶段名: 耗时（秒）, "total": 总耗时},
                 "translate_task_id": str (可选)
             }
         """
         logger.info(f"[ResourceService] 开始保存资源: {avid}")
+        config = _pipeline_config()
+        graph = StageGraph(
+            max_workers=config["max_workers"], name=f"add-{avid}", on_event=on_stage
+        )
 
-        # ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
-        # Step 1: 保存HTML原始页面
-        # ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
-        html_path = Path(settings.COVER_DIR) / f"{avid}.html"
-        html_path.parent.mkdir(parents=True, exist_ok=True)
-        html_path.write_text(html, encoding="utf-8")
+        def scraped():
+            return graph.results.get("scrape")
 
         # ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
-        # Step 2: 刮削Javbus元数据（可选）
+        # 阶段依赖：
+        #   html ─────────────────────────────────────────
+        #   scrape ──┬─ cover（Javbus 封面，失败时用 source_cover）
+        #   source_cover ┘
+        #            ├─ database ── translate
+        #            └─ avatars ── avatar:{演员}（每个演员一个阶段）
+        # 源页面 HTML、Javbus 刮削、源网站封面互不依赖，同时进行；头像与数据库写入互不依赖
         # ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
-        scraped_data = None
+        meta_deps = ("scrape",) if scrape else ()
+        graph.add("html", lambda: self._save_html(avid, html, source_inst))
         if scrape:
-            scraped_data = self._scrape_metadata(avid)
+            graph.add("scrape", lambda: self._scrape_metadata(avid))
 
-        # ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
-        # Step 3: 下载封面图片（可选）
-        # ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
-        cover_saved = False
+        prefetch = download_cover and config["prefetch_source_cover"]
+        if prefetch:
+            graph.add(
+                "source_cover",
+                lambda: self._prefetch_source_cover(avid, source_inst, html),
+            )
         if download_cover:
-            cover_saved = self._download_cover(avid, scraped_data, source_inst, html)
+            graph.add(
+                "cover",
+                lambda: self._download_cover(
+                    avid,
+                    scraped(),
+                    source_inst,
+                    html,
+                    fallback_path=graph.results.get("source_cover"),
+                ),
+                deps=meta_deps + (("source_cover",) if prefetch else ()),
+            )
 
-        # ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
-        # Step 4: 保存到数据库
-        # ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
-        resource = self._save_to_database(avid, info, source_inst, scraped_data)
+        graph.add(
+            "database",
+            lambda: self._save_to_database(avid, info, source_inst, scraped()),
+            deps=meta_deps,
+            inline=True,
+        )
+        if scrape:
+            graph.add(
+                "avatars",
+                lambda: self._add_avatar_stages(graph, scraped()),
+                deps=("scrape",),
+            )
+        if submit_translate and scrape:
+            graph.add(
+                "translate",
+                lambda: self._submit_translate_task(avid) if scraped() else None,
+                deps=("database",),
+                inline=True,
+            )
 
-        # ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
-        # Step 5: 下载演员头像（可选）
-        # ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
-        if scrape and scraped_data:
-            self._download_avatars(scraped_data)
+        try:
+            graph.run()
+        finally:
+            # 预取的源封面未被使用（Javbus 封面下载成功）时删除
+            prefetched = graph.results.get("source_cover")
+            if prefetched and prefetched.exists():
+                prefetched.unlink()
 
-        # ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
-        # Step 6: 提交翻译任务（可选）
-        # ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
-        translate_task_id = None
-        if submit_translate and scraped_data:
-            translate_task_id = self._submit_translate_task(avid)
+        resource = graph.results["database"]
+        scraped_data = scraped()
+        translate_task_id = graph.results.get("translate")
 
         # 构造返回结果
         result = {
             "resource": self._serialize_resource(resource, include_relations=True),
-            "cover_saved": cover_saved,
+            "cover_saved": bool(graph.results.get("cover")),
             "metadata_saved": True,
             "scraped": scraped_data is not None,
+            "timings": {
+                **{name: round(t, 3) for name, t in graph.timings.items()},
+                "total": round(graph.elapsed, 3),
+            },
         }
 
         if translate_task_id:
             result["translate_task_id"] = translate_task_id
 
-        logger.info(f"[ResourceService] 资源 {avid} 保存完成")
+        logger.info(
+            f"[ResourceService] 资源 {avid} 保存完成，耗时 "
+            + ", ".join(f"{k}={v:.2f}s" for k, v in result["timings"].items())
+        )
         return result
 
+    def _save_html(self, avid: str, html: str, source_inst: SourceBase):
+        """保存源页面 HTML 快照（失败只记录日志）"""
+        try:
+            get_html_store().put(avid, html, source=source_inst.get_source_name())
+        except Exception as e:
+            logger.error(f"[ResourceService] 保存 HTML 快照失败: {avid}, {e}")
+
     def _scrape_metadata(self, avid: str) -> Optional[dict]:
         """
         刮削Javbus元数据
@@ -459,6 +577,7 @@ class ResourceService:
         scraped_data: Optional[dict],
         source_inst: SourceBase,
         html: str,
+        fallback_path: Optional[Path] = None,
     ) -> bool:
         """
         下载封面图片（双源备份策略）
@@ -467,6 +586,10 @@ class ResourceService:
         1. Javbus封面 (scraped_data.cover_url)
         2. 源网站封面 (source_inst.get_cover_url())
 
+        Args:
+            fallback_path: 已预取的源网站封面（见 _prefetch_source_cover），
+                有值时策略 2 直接使用该文件，不再请求源网站
+
         Returns:
             是否下载成功
         """
@@ -478,11 +601,23 @@ class ResourceService:
         # 策略1: 尝试Javbus封面
         if scraped_data and scraped_data.get("cover_url"):
             cover_url = scraped_data["cover_url"]
-            if self.scraper_manager.download_cover(cover_url, str(cover_path)):
+            # 使用提供该封面的镜像下载（Referer 与封面域名一致）
+            scraper_name = (scraped_data.get(FIELD_SOURCES_KEY) or {}).get("cover_url")
+            if self.scraper_manager.download_cover(
+                cover_url, str(cover_path), scraper_name=scraper_name
+            ):
                 logger.info(f"[ResourceService] 从Javbus下载封面成功: {avid}")
                 return True
 
         # 策略2: 尝试源网站封面
+        if fallback_path is not None:
+            if fallback_path.exists():
+                os.replace(fallback_path, cover_path)
+                logger.info(f"[ResourceService] 使用预取的源网站封面: {avid}")
+                return True
+            logger.warning(f"[ResourceService] 封面下载失败: {avid}")
+            return False
+
         cover_url = source_inst.get_cover_url(html)
         if cover_url:
             source_name = source_inst.get_source_name()
@@ -493,6 +628,24 @@ class ResourceService:
         logger.warning(f"[ResourceService] 封面下载失败: {avid}")
         return False
 
+    def _prefetch_source_cover(
+        self, avid: str, source_inst: SourceBase, html: str
+    ) -> Optional[Path]:
+        """
+        与刮削同时预取源网站封面（Javbus 封面下载失败时的备选）
+
+        Returns:
+            临时文件路径（下载失败或没有封面地址时为 None）
+        """
+        cover_url = source_inst.get_cover_url(html)
+        if not cover_url:
+            return None
+        tmp_path = Path(settings.COVER_DIR) / f"{avid}.source.jpg.tmp"
+        tmp_path.parent.mkdir(parents=True, exist_ok=True)
+        if source_inst.download_file(cover_url, str(tmp_path)):
+            return tmp_path
+        return None
+
     def _save_to_database(
         self,
         avid: str,
@@ -562,72 +715,63 @@ class ResourceService:
         if scraped_data:
             self._associate_actors(resource, scraped_data.get("actors", []))
             self._associate_genres(resource, scraped_data.get("genres", []))
+            # 演员头像 URL / 文件名（文件由头像阶段下载）
+            avatar_service.update_actors(self._actor_avatars(scraped_data))
 
         return resource
 
     def _associate_actors(self, resource: AVResource, actors: list):
-        """关联演员"""
-        if not actors:
-            return
-
-        for actor_data in actors:
-            actor_name = (
-                actor_data.get("name") if isinstance(actor_data, dict) else actor_data
-            )
-            if actor_name:
-                actor, _ = Actor.objects.get_or_create(name=actor_name)
-                resource.actors.add(actor)
+        """关联演员（批量写入，见 nassav.relations）"""
+        if actors:
+            set_resource_relations(resource, actors=actors)
 
     def _associate_genres(self, resource: AVResource, genres: list):
-        """关联类别"""
-        if not genres:
-            return
-
-        for genre_name in genres:
-            if genre_name:
-                genre, _ = Genre.objects.get_or_create(name=genre_name)
-                resource.genres.add(genre)
+        """关联类别（批量写入，见 nassav.relations）"""
+        if genres:
+            set_resource_relations(resource, genres=genres)
 
-    def _download_avatars(self, scraped_data: dict):
+    def _add_avatar_stages(self, graph: StageGraph, scraped_data: Optional[dict]):
         """
-        下载演员头像
+        为每个需要下载的头像添加一个下载阶段（头像之间、头像与数据库写入同时进行）
+
+        已下载的头像（见 nassav/avatar_service.py）不添加阶段、不发出请求。
 
         Args:
-            scraped_data: 刮削数据（包含actors列表）
+            graph: 当前的阶段图
+            scraped_data: 刮削数据（包含 actor_avatars: {演员名: 头像URL}）
         """
-        actors = scraped_data.get("actors", [])
-        if not actors:
+        avatars = self._actor_avatars(scraped_data)
+        missing = avatar_service.missing(avatars.values())
+        if not missing:
             return
 
-        logger.info(f"[ResourceService] 开始下载演员头像: {len(actors)} 个")
-
-        for actor_data in actors:
-            if not isinstance(actor_data, dict):
-                continue
-
-            actor_name = actor_data.get("name")
-            avatar_url = actor_data.get("avatar_url")
+        logger.info(f"[ResourceService] 开始下载演员头像: {len(missing)} 个（共 {len(avatars)} 个）")
+        names = {url: name for name, url in avatars.items()}
+        for url in missing:
+            graph.add(
+                f"avatar:{names[url]}",
+                lambda u=url: self._download_avatar(u),
+                deps=("avatars",),
+            )
 
-            if not actor_name or not avatar_url:
-                continue
+    @staticmethod
+    def _actor_avatars(scraped_data: Optional[dict]) -> dict:
+        """刮削数据 -> {演员名: 头像URL}"""
+        scraped_data = scraped_data or {}
+        avatars = dict(scraped_data.get("actor_avatars") or {})
+        for actor_data in scraped_data.get("actors") or []:
+            if isinstance(actor_data, dict) and actor_data.get("avatar_url"):
+                avatars.setdefault(actor_data.get("name"), actor_data["avatar_url"])
+        return {name: url for name, url in avatars.items() if name and url}
 
-            # 下载头像
-            avatar_path = Path(settings.AVATAR_DIR) / f"{actor_name}.jpg"
-            avatar_path.parent.mkdir(parents=True, exist_ok=True)
+    def _download_avatar(self, avatar_url: str) -> bool:
+        """
+        下载单个演员头像（同一 URL 的并发下载只进行一次）
 
-            try:
-                # 获取第一个可用的scraper来下载头像
-                scrapers = self.scraper_manager.get_scrapers()
-                if scrapers:
-                    _, scraper_instance = scrapers[0]
-                    if scraper_instance.download_avatar(avatar_url, str(avatar_path)):
-                        logger.info(f"演员头像下载成功: {actor_name}")
-                    else:
-                        logger.warning(f"演员头像下载失败: {actor_name}")
-                else:
-                    logger.warning("没有可用的刮削器来下载头像")
-            except Exception as e:
-                logger.error(f"演员头像下载异常: {actor_name}, {e}")
+        Returns:
+            是否已有或下载成功
+        """
+        return avatar_service.ensure(avatar_url) in AVATAR_OK_STATUSES
 
     def _submit_translate_task(self, avid: str) -> Optional[str]:
         """
@@ -661,10 +805,14 @@ class ResourceService:
 
         files_to_delete = [
             Path(settings.COVER_DIR) / f"{avid}.jpg",  # 封面
-            Path(settings.COVER_DIR) / f"{avid}.html",  # HTML
+            Path(settings.COVER_DIR) / f"{avid}.html",  # 旧版未压缩 HTML
             Path(settings.VIDEO_DIR) / f"{avid}.mp4",  # 视频
+            Path(settings.VIDEO_DIR) / f"{avid}.ts.part",  # 未完成的下载
+            Path(settings.VIDEO_DIR) / f"{avid}.checkpoint.json",  # 断点清单
         ]
 
+        get_html_store().delete(avid)
+
         for file_path in files_to_delete:
             if file_path.exists():
                 try:
@@ -2,15 +2,55 @@
 JavBus 风格刮削器 - 适用于 JavBus 及其镜像站（Busdmm, Dmmsee 等）
 """
 import re
-from typing import Optional
+from typing import Any, Optional, Tuple
 
-from curl_cffi import requests
 from django.conf import settings
 from loguru import logger
-from nassav.constants import IMPERSONATE
+from nassav.extractor import Extractor
+from nassav.http_pool import get_http_pool
 
 from .ScraperBase import ScraperBase
 
+# 详情页所有字段的提取规则，扫描一次页面
+JAVBUS_PAGE = Extractor(
+    {
+        "description": r'<meta\s+name="description"\s+content="([^"]+)"',
+        "page_title": r"<title>([^<]+)</title>",
+        "release_date": r'<span class="header">發行日期:</span>\s*(\d{4}-\d{2}-\d{2})',
+        "duration": r'<span class="header">長度:</span>\s*(\d+)分鐘',
+        "links": r'<span class="header">(製作商|發行商|系列|導演):</span>\s*<a[^>]*>([^<]+)</a>',
+        "genres": r'<span class="genre"><label><input[^>]*><a[^>]*>([^<]+)</a></label></span>',
+        "cover": r'<a[^>]*class="bigImage"[^>]*href="([^"]+)"',
+        "actors": (
+            r'<a class="avatar-box"[^>]*>\s*<div[^>]*>\s*'
+            r'<img[^>]*src="([^"]+)"[^>]*title="([^"]+)"[^>]*>'
+        ),
+    },
+    multi=("links", "genres", "actors"),
+)
+
+_DESC_DATE = re.compile(r"【發行日期】(\d{4}-\d{2}-\d{2})")
+_DESC_DURATION = re.compile(r"【長度】(\d+)分鐘")
+_TITLE_SUFFIX = re.compile(r"\s*[-|]\s*JavBus.*$", re.IGNORECASE)
+_INFO_HEADERS = {"製作商": "studio", "發行商": "label", "系列": "series", "導演": "director"}
+
+# 不作为类别保存的技术性标签
+TECHNICAL_GENRES = frozenset(
+    [
+        "フルハイビジョン(FHD)",
+        "MGSだけのおまけ映像付き",
+        "高畫質",
+        "單體作品",
+        "DMM獨家",
+        "4K",
+        "薄馬賽克",
+        "數位馬賽克",
+        "企畫",
+        "纪录片",
+        "高",
+    ]
+)
+
 
 class Javbus(ScraperBase):
     """JavBus 刮削器"""
@@ -23,15 +63,16 @@ class Javbus(ScraperBase):
     def get_scraper_name(self) -> str:
         return "Javbus"
 
-    def get_html(self, avid: str) -> Optional[str]:
+    def get_html(self, avid: str) -> Tuple[Optional[str], Any]:
         avid = avid.upper()
         url = f"https://{self.domain}/{avid}"
         return self.fetch_html(url)
 
     def parse_html(self, html: str, avid: str) -> Optional[dict]:
-        """解析 JavBus 风格的 HTML 获取元数据"""
+        """解析 JavBus 风格的 HTML 获取元数据（扫描一次页面，见 JAVBUS_PAGE）"""
+        avid = avid.upper()
         scrape_data = {
-            "avid": avid.upper(),
+            "avid": avid,
             "title": "",
             "release_date": "",
             "duration": "",
@@ -43,144 +84,61 @@ class Javbus(ScraperBase):
         }
 
         try:
+            fields = JAVBUS_PAGE.extract(html)
+
             # 从 meta description 提取基本信息
             # 格式: 【發行日期】2025-12-19，【長度】160分鐘，(ABF-296)「標題...」
-            meta_match = re.search(
-                r'<meta\s+name="description"\s+content="([^"]+)"', html
-            )
-            if meta_match:
-                desc = meta_match.group(1)
-
-                # 提取发行日期
-                date_match = re.search(r"【發行日期】(\d{4}-\d{2}-\d{2})", desc)
+            desc = fields["description"]
+            if desc:
+                date_match = _DESC_DATE.search(desc)
                 if date_match:
                     scrape_data["release_date"] = date_match.group(1)
-
-                # 提取时长
-                duration_match = re.search(r"【長度】(\d+)分鐘", desc)
+                duration_match = _DESC_DURATION.search(desc)
                 if duration_match:
                     scrape_data["duration"] = duration_match.group(1) + "分钟"
+                # 标题 - (AVID)后面的内容
+                marker = desc.find(f"({avid})")
+                if marker >= 0:
+                    scrape_data["title"] = desc[marker + len(avid) + 2 :].strip()
 
-                # 提取标题 - (AVID)后面的内容
-                title_match = re.search(rf"\({avid}\)(.+?)$", desc)
-                if title_match:
-                    scrape_data["title"] = title_match.group(1).strip()
-
-            # 从页面内容提取发行日期（如果 meta 中没有）
-            if not scrape_data["release_date"]:
-                release_match = re.search(
-                    r'<span class="header">發行日期:</span>\s*(\d{4}-\d{2}-\d{2})', html
-                )
-                if release_match:
-                    scrape_data["release_date"] = release_match.group(1)
-
-            # 从页面内容提取时长（如果 meta 中没有）
-            if not scrape_data["duration"]:
-                duration_match = re.search(
-                    r'<span class="header">長度:</span>\s*(\d+)分鐘', html
-                )
-                if duration_match:
-                    scrape_data["duration"] = duration_match.group(1) + "分钟"
+            # meta 中没有时从页面详情区提取发行日期、时长
+            if not scrape_data["release_date"] and fields["release_date"]:
+                scrape_data["release_date"] = fields["release_date"]
+            if not scrape_data["duration"] and fields["duration"]:
+                scrape_data["duration"] = fields["duration"] + "分钟"
 
             # 从页面标题提取标题（作为备选，仅当 meta 中未获取到时）
-            if not scrape_data["title"]:
-                title_tag_match = re.search(r"<title>([^<]+)</title>", html)
-                if title_tag_match:
-                    title = title_tag_match.group(1)
-                    # 移除网站名称后缀
-                    title = re.sub(
-                        r"\s*[-|]\s*JavBus.*$", "", title, flags=re.IGNORECASE
-                    )
-                    # 移除 AVID 前缀（包括可能的空格）
-                    title = re.sub(rf"^{avid}\s*", "", title, flags=re.IGNORECASE)
-                    scrape_data["title"] = title.strip()
-
-            # 提取製作商（studio）
-            studio_match = re.search(
-                r'<span class="header">製作商:</span>\s*<a[^>]*>([^<]+)</a>', html
-            )
-            if studio_match:
-                scrape_data["studio"] = studio_match.group(1).strip()
-
-            # 提取發行商（label）
-            label_match = re.search(
-                r'<span class="header">發行商:</span>\s*<a[^>]*>([^<]+)</a>', html
-            )
-            if label_match:
-                scrape_data["label"] = label_match.group(1).strip()
-
-            # 提取系列（series）
-            series_match = re.search(
-                r'<span class="header">系列:</span>\s*<a[^>]*>([^<]+)</a>', html
-            )
-            if series_match:
-                scrape_data["series"] = series_match.group(1).strip()
-
-            # 提取類別（categories）
-            genres_matches = re.findall(
-                r'<span class="genre"><label><input[^>]*><a[^>]*>([^<]+)</a></label></span>',
-                html,
-            )
-            if genres_matches:
-                # 过滤掉技术性标签
-                technical_tags = [
-                    "フルハイビジョン(FHD)",
-                    "MGSだけのおまけ映像付き",
-                    "高畫質",
-                    "單體作品",
-                    "DMM獨家",
-                    "4K",
-                    "薄馬賽克",
-                    "數位馬賽克",
-                    "企畫",
-                    "纪录片",
-                    "高",
-                ]
-                filtered_genres = [
-                    cat for cat in genres_matches if cat not in technical_tags
-                ]
-                scrape_data["genres"] = filtered_genres
-
-            # 提取導演（director）
-            director_match = re.search(
-                r'<span class="header">導演:</span>\s*<a[^>]*>([^<]+)</a>', html
-            )
-            if director_match:
-                scrape_data["director"] = director_match.group(1).strip()
-
-            # 提取封面URL
-            cover_match = re.search(r'<a[^>]*class="bigImage"[^>]*href="([^"]+)"', html)
-            if cover_match:
-                cover_url = cover_match.group(1)
-                # 将相对路径转为完整URL
-                if cover_url.startswith("/"):
-                    scrape_data["cover_url"] = f"https://{self.domain}{cover_url}"
-                else:
-                    scrape_data["cover_url"] = cover_url
-
-            # 提取演員（actors）及头像URL
+            if not scrape_data["title"] and fields["page_title"]:
+                # 移除网站名称后缀和 AVID 前缀
+                title = _TITLE_SUFFIX.sub("", fields["page_title"])
+                if title.upper().startswith(avid):
+                    title = title[len(avid) :]
+                scrape_data["title"] = title.strip()
+
+            # 製作商、發行商、系列、導演（同一项取第一个）
+            for header, value in fields["links"]:
+                key = _INFO_HEADERS[header]
+                if not scrape_data.get(key):
+                    scrape_data[key] = value.strip()
+
+            # 類別，过滤掉技术性标签
+            scrape_data["genres"] = [
+                genre for genre in fields["genres"] if genre not in TECHNICAL_GENRES
+            ]
+
+            if fields["cover"]:
+                scrape_data["cover_url"] = self._absolute_url(fields["cover"])
+
+            # 演員及头像URL
             # 从 img 标签的 title 属性提取演员名（完整名称）
             # 因为 span 标签中的名字可能被截断（如"めぐり（藤"）
             # 而 img title 中保存的是完整名字（如"めぐり（藤浦めぐ）"）
-            # 同时提取src属性获取头像URL
-            actor_pattern = re.compile(
-                r'<a class="avatar-box"[^>]*>\s*<div[^>]*>\s*'
-                r'<img[^>]*src="([^"]+)"[^>]*title="([^"]+)"[^>]*>',
-                re.DOTALL,
-            )
-            actor_matches = actor_pattern.findall(html)
-            if actor_matches:
-                scrape_data["actors"] = [name for _, name in actor_matches]
+            if fields["actors"]:
+                scrape_data["actors"] = [name for _, name in fields["actors"]]
                 # 保存头像URL映射: {演员名: 完整URL}
-                actor_avatars = {}
-                for src, name in actor_matches:
-                    # 将相对路径转为完整URL
-                    if src.startswith("/"):
-                        avatar_url = f"https://{self.domain}{src}"
-                    else:
-                        avatar_url = src
-                    actor_avatars[name] = avatar_url
-                scrape_data["actor_avatars"] = actor_avatars
+                scrape_data["actor_avatars"] = {
+                    name: self._absolute_url(src) for src, name in fields["actors"]
+                }
 
             return scrape_data
 
@@ -188,6 +146,10 @@ class Javbus(ScraperBase):
             logger.error(f"解析 JavBus HTML 失败: {e}")
             return None
 
+    def _absolute_url(self, url: str) -> str:
+        """将相对路径转为完整URL"""
+        return f"https://{self.domain}{url}" if url.startswith("/") else url
+
     def download_avatar(self, url: str, dest_path: str, max_retries: int = 3) -> bool:
         """下载演员头像图片（JavBus 实现）
 
@@ -212,12 +174,8 @@ class Javbus(ScraperBase):
 
         for attempt in range(max_retries):
             try:
-                response = requests.get(
-                    url,
-                    headers=headers,
-                    proxies=self.proxies,
-                    timeout=self.timeout,
-                    impersonate=IMPERSONATE,
+                response = get_http_pool().get(
+                    url, proxy=self.proxy, headers=headers, timeout=self.timeout
                 )
                 if response.status_code == 200:
                     dest.write_bytes(response.content)
@@ -226,10 +184,6 @@ class Javbus(ScraperBase):
                     logger.warning(f"头像下载失败 (HTTP {response.status_code}): {url}")
             except Exception as e:
                 logger.warning(f"头像下载失败 (尝试 {attempt + 1}/{max_retries}): {e}")
-                if attempt < max_retries - 1:
-                    import time
-
-                    time.sleep(1)  # 重试前等待1秒
 
         return False
 
@@ -1,11 +1,12 @@
 """
 Scraper 基类 - 定义刮削器的通用接口和方法
 """
-from typing import Optional
+from typing import Any, Optional, Tuple
 
-from curl_cffi import requests
 from loguru import logger
-from nassav.constants import HEADERS, IMPERSONATE
+from nassav.constants import HEADERS
+from nassav.http_pool import get_http_pool
+from nassav.negative_cache import KIND_SCRAPER, negative_cache
 
 
 class ScraperBase:
@@ -25,30 +26,32 @@ class ScraperBase:
         """获取刮削器名称，子类必须实现"""
         raise NotImplementedError
 
-    def get_html(self, avid: str) -> Optional[str]:
-        """根据 avid 获取 HTML，子类必须实现"""
+    def get_html(self, avid: str) -> Tuple[Optional[str], Any]:
+        """根据 avid 获取 HTML，返回 (html, error)，子类必须实现"""
         raise NotImplementedError
 
     def parse_html(self, html: str, avid: str) -> Optional[dict]:
         """解析 HTML 获取元数据，子类必须实现"""
         raise NotImplementedError
 
-    def fetch_html(self, url: str) -> Optional[str]:
-        """获取 HTML 页面"""
+    def fetch_html(self, url: str) -> Tuple[Optional[str], Any]:
+        """
+        获取 HTML 页面（不修改实例状态，刮削器单例可被并发调用）
+
+        Returns:
+            (html, error)：成功时 error 为 None，失败时为状态码或错误信息字符串
+        """
         try:
-            response = requests.get(
-                url,
-                proxies=self.proxies,
-                headers=HEADERS,
-                timeout=self.timeout,
-                impersonate=IMPERSONATE,
+            response = get_http_pool().get(
+                url, proxy=self.proxy, headers=HEADERS, timeout=self.timeout
             )
             response.raise_for_status()
-
-            return response.text
+            return response.text, None
         except Exception as e:
+            response = getattr(e, "response", None)
+            code = getattr(response, "status_code", None)
             logger.error(f"Scraper 请求失败: {str(e)}")
-            return None
+            return None, code if code is not None else str(e)
 
     def download_cover(self, url: str, save_path: str) -> bool:
         """下载封面图片（带Referer头）
@@ -67,26 +70,13 @@ class ScraperBase:
             headers = HEADERS.copy()
             headers["Referer"] = f"https://{self.domain}/"
 
-            response = requests.get(
+            get_http_pool().download(
                 url,
+                save_path,
+                proxy=self.proxy,
                 headers=headers,
-                proxies=self.proxies,
                 timeout=self.timeout,
-                impersonate=IMPERSONATE,
-                stream=True,
             )
-            response.raise_for_status()
-
-            # 确保目录存在
-            os.makedirs(os.path.dirname(save_path), exist_ok=True)
-
-            # 写入文件 (curl_cffi 不支持 chunk_size 参数)
-            with open(save_path, "wb") as f:
-                for chunk in response.iter_content():
-                    if chunk:
-                        f.write(chunk)
-
-            file_size = os.path.getsize(save_path)
             logger.info(f"封面下载成功: {os.path.basename(save_path)}")
 
             return True
@@ -108,17 +98,30 @@ class ScraperBase:
         """
         raise NotImplementedError("子类必须实现 download_avatar 方法")
 
-    def scrape(self, avid: str) -> Optional[dict]:
+    def scrape(self, avid: str, use_negative_cache: bool = True) -> Optional[dict]:
         """
         刮削元数据
         返回包含元数据的字典或 None
+
+        Args:
+            use_negative_cache: 是否跳过近期未命中的 AVID（失败结果总会写入未命中缓存）
         """
         avid = avid.upper()
-        logger.info(f"尝试从 {self.get_scraper_name()} ({self.domain}) 刮削 {avid} 的元数据")
-        html = self.get_html(avid)
+        name = self.get_scraper_name()
+        if use_negative_cache:
+            entry = negative_cache.get(KIND_SCRAPER, name, avid)
+            if entry:
+                logger.info(f"{name} 近期未命中 {avid}（{entry['outcome']}），跳过")
+                return None
+
+        logger.info(f"尝试从 {name} ({self.domain}) 刮削 {avid} 的元数据")
+        html, error = self.get_html(avid)
         if html:
             metadata = self.parse_html(html, avid)
             if metadata:
-                logger.info(f"成功从 {self.get_scraper_name()} 获取 {avid} 的元数据")
+                logger.info(f"成功从 {name} 获取 {avid} 的元数据")
+                negative_cache.forget(KIND_SCRAPER, name, avid)
                 return metadata
+        # 页面可访问但解析失败时按其他错误记录（有效期较短）
+        negative_cache.record(KIND_SCRAPER, name, avid, None if html else error)
         return None
@@ -1,14 +1,63 @@
 """
 Scraper 管理器 - 管理所有刮削器的注册和调用
 """
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
 
 from django.conf import settings
 from loguru import logger
+from nassav.negative_cache import KIND_SCRAPER, negative_cache
 
 from .Javbus import Busdmm, Dmmsee, Javbus
 from .ScraperBase import ScraperBase
 
+# 这些字段都非空时视为完整结果，并发刮削时可以直接返回
+COMPLETE_FIELDS = ("title", "release_date", "duration", "genres", "actors", "cover_url")
+# 随 actors 一起取自同一镜像的字段（头像地址与镜像域名对应）
+_FOLLOW_FIELDS = {"actor_avatars": "actors"}
+# 刮削结果中记录字段来源的键：{字段名: 刮削器名称}
+FIELD_SOURCES_KEY = "field_sources"
+
+
+def is_complete(metadata: Optional[dict]) -> bool:
+    """刮削结果是否包含所有 COMPLETE_FIELDS"""
+    return bool(metadata) and all(metadata.get(field) for field in COMPLETE_FIELDS)
+
+
+def merge_metadata(results: List[Tuple[str, dict]]) -> Optional[dict]:
+    """
+    按刮削器优先级逐字段合并刮削结果
+
+    Args:
+        results: [(刮削器名称, 元数据)]，按优先级排列
+
+    Returns:
+        合并后的元数据（每个字段取第一个非空值），FIELD_SOURCES_KEY 记录每个字段的来源；
+        results 为空时返回 None
+    """
+    if not results:
+        return None
+    merged: dict = {}
+    sources: Dict[str, str] = {}
+    for name, metadata in results:
+        for field, value in metadata.items():
+            if field == FIELD_SOURCES_KEY or field in _FOLLOW_FIELDS:
+                continue
+            if value and not merged.get(field):
+                merged[field] = value
+                sources[field] = name
+            elif field not in merged:
+                merged[field] = value
+    for field, owner in _FOLLOW_FIELDS.items():
+        for name, metadata in results:
+            if name == sources.get(owner) and metadata.get(field):
+                merged[field] = metadata[field]
+                sources[field] = name
+    merged[FIELD_SOURCES_KEY] = sources
+    return merged
+
 
 class ScraperManager:
     """刮削器管理器"""
@@ -41,37 +90,127 @@ class ScraperManager:
 
     def scrape(self, avid: str) -> Optional[dict]:
         """
-        遍历所有刮削器获取元数据
-        返回第一个成功获取的元数据
+        从所有刮削器获取元数据；近期未命中该 AVID 的刮削器直接跳过
+
+        默认并发请求所有镜像（Scraper.concurrent），见 _scrape_concurrent；
+        否则按注册顺序依次尝试，返回第一个成功获取的元数据。
+        结果中 FIELD_SOURCES_KEY 记录每个字段来自哪个刮削器（download_cover 据此选择刮削器）。
         """
         avid = avid.upper()
-        for name, scraper in self.get_scrapers():
-            metadata = scraper.scrape(avid)
+        scrapers = self.get_scrapers()
+        cached = negative_cache.lookup(KIND_SCRAPER, [n for n, _ in scrapers], avid)
+        if cached:
+            logger.info(f"跳过近期未命中 {avid} 的刮削器: {', '.join(cached)}")
+        scrapers = [(name, scraper) for name, scraper in scrapers if name not in cached]
+
+        if len(scrapers) > 1 and settings.SCRAPER_CONCURRENT:
+            metadata = self._scrape_concurrent(avid, scrapers)
+        else:
+            metadata = self._scrape_sequential(avid, scrapers)
+        if not metadata:
+            logger.warning(f"无法从任何刮削源获取 {avid} 的元数据")
+        return metadata
+
+    @staticmethod
+    def _scrape_sequential(
+        avid: str, scrapers: List[Tuple[str, ScraperBase]]
+    ) -> Optional[dict]:
+        """按顺序依次尝试，返回第一个成功获取的元数据"""
+        for name, scraper in scrapers:
+            metadata = scraper.scrape(avid, use_negative_cache=False)
             if metadata:
-                # 保存成功的scraper引用，供download_cover使用
-                self._last_successful_scraper = scraper
-                return metadata
-        logger.warning(f"无法从任何刮削源获取 {avid} 的元数据")
+                return merge_metadata([(name, metadata)])
         return None
 
-    def download_cover(self, url: str, save_path: str) -> bool:
-        """下载封面图片（委托给最近成功的scraper）
+    @staticmethod
+    def _scrape_concurrent(
+        avid: str, scrapers: List[Tuple[str, ScraperBase]]
+    ) -> Optional[dict]:
+        """
+        并发请求所有镜像
+
+        latency_budget 秒内任一镜像返回完整结果（is_complete）时立即返回该结果；
+        否则在预算用完（或所有镜像都已返回）时按优先级合并已获取的结果，
+        预算用完仍没有任何结果时等待第一个成功的镜像。未完成的请求在后台继续执行（照常写入未命中缓存）。
+        """
+        budget = float(settings.SCRAPER_LATENCY_BUDGET)
+        deadline = time.monotonic() + budget
+        executor = ThreadPoolExecutor(
+            max_workers=len(scrapers), thread_name_prefix="scraper"
+        )
+        futures = {
+            executor.submit(scraper.scrape, avid, use_negative_cache=False): name
+            for name, scraper in scrapers
+        }
+        results: Dict[str, dict] = {}
+        pending = set(futures)
+        try:
+            while pending:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 and results:
+                    break
+                # 预算用完仍没有结果时一直等到下一个镜像返回
+                done, pending = wait(
+                    pending,
+                    timeout=remaining if remaining > 0 else None,
+                    return_when=FIRST_COMPLETED,
+                )
+                for future in done:
+                    name = futures[future]
+                    try:
+                        metadata = future.result()
+                    except Exception as e:
+                        logger.error(f"刮削器 {name} 异常: {e}")
+                        continue
+                    if not metadata:
+                        continue
+                    if is_complete(metadata):
+                        logger.info(f"并发刮削命中完整结果 {name}: {avid}")
+                        return merge_metadata([(name, metadata)])
+                    results[name] = metadata
+        finally:
+            executor.shutdown(wait=False)
+
+        merged = merge_metadata(
+            [(name, results[name]) for name, _ in scrapers if name in results]
+        )
+        if merged:
+            logger.info(
+                f"并发刮削合并 {len(results)} 个镜像的结果: {avid}"
+                f"（{', '.join(sorted(set(merged[FIELD_SOURCES_KEY].values())))}）"
+            )
+        return merged
+
+    def get_scraper_for_url(
+        self, url: str, scraper_name: Optional[str] = None
+    ) -> Optional[ScraperBase]:
+        """
+        选择请求某个地址的刮削器：指定名称的刮削器 > 域名与地址相同的刮削器 > 第一个注册的刮削器
+        """
+        if scraper_name and scraper_name in self.scrapers:
+            return self.scrapers[scraper_name]
+        host = urlsplit(url).netloc.lower()
+        for scraper in self.scrapers.values():
+            if scraper.domain and scraper.domain.lower() == host:
+                return scraper
+        return next(iter(self.scrapers.values()), None)
+
+    def download_cover(
+        self, url: str, save_path: str, scraper_name: Optional[str] = None
+    ) -> bool:
+        """下载封面图片（委托给提供封面地址的scraper，确保使用正确的domain和Referer）
 
         Args:
             url: 封面图片URL
             save_path: 保存路径
+            scraper_name: 提供该封面的刮削器（刮削结果中 FIELD_SOURCES_KEY 的 cover_url），
+                为空时按地址的域名选择
 
         Returns:
             bool: 下载成功返回True，否则返回False
         """
-        # 使用最近成功刮削的scraper来下载封面（确保使用正确的domain和Referer）
-        if hasattr(self, "_last_successful_scraper"):
-            return self._last_successful_scraper.download_cover(url, save_path)
-
-        # 如果没有成功的scraper记录，尝试使用第一个注册的scraper
-        scrapers = self.get_scrapers()
-        if scrapers:
-            _, scraper = scrapers[0]
+        scraper = self.get_scraper_for_url(url, scraper_name)
+        if scraper:
             return scraper.download_cover(url, save_path)
 
         logger.warning("没有可用的刮削器来下载封面")
@@ -84,7 +223,7 @@ class ScraperManager:
         avid = avid.upper()
         scraper = self.scrapers.get(scraper_name)
         if scraper:
-            return scraper.scrape(avid)
+            return scraper.scrape(avid, use_negative_cache=False)
         logger.warning(f"刮削器 {scraper_name} 未注册")
         return None
 
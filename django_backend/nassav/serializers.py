@@ -30,6 +30,8 @@ class NewResourceSerializer(serializers.Serializer):
 
     avid = serializers.CharField(max_length=50)
     source = serializers.CharField(max_length=50, default="any", required=False)
+    # sync: 请求中完成添加；async: 提交后台任务，返回 202 和 job_id（默认见配置 ResourcePipeline.add_mode）
+    mode = serializers.ChoiceField(choices=["sync", "async"], required=False)
 
 
 class DownloadRequestSerializer(serializers.Serializer):
@@ -51,6 +53,7 @@ class SourceCookieListSerializer(serializers.Serializer):
     source = serializers.CharField(source="source_name")
     cookie = serializers.CharField()
     mtime = serializers.DateTimeField(source="updated_at")
+    expires_at = serializers.DateTimeField(allow_null=True)
 
 
 class UserSettingSerializer(serializers.Serializer):
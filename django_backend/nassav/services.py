@@ -22,7 +22,7 @@ logger.add(
 
 # 导入常量（为了向后兼容，重新导出HEADERS）
 from nassav.constants import HEADERS
-from nassav.m3u8downloader import M3u8DownloaderBase, N_m3u8DL_RE
+from nassav.m3u8downloader import M3u8DownloaderBase, create_m3u8_downloader
 from nassav.source.SourceManager import SourceManager, source_manager
 
 
@@ -146,8 +146,8 @@ class VideoDownloadService:
             output_name=avid_upper,
             referer=f"https://{domain}/",
             user_agent=HEADERS["User-Agent"],
-            thread_count=32,
-            retry_count=5,
+            thread_count=settings.DOWNLOADER_CONFIG.get("thread_count", 32),
+            retry_count=settings.DOWNLOADER_CONFIG.get("retry_count", 5),
             progress_callback=progress_callback,
         )
 
@@ -161,8 +161,9 @@ class VideoDownloadService:
 # 全局服务实例（使用依赖注入）
 video_download_service = VideoDownloadService(
     resource_manager=source_manager,
-    m3u8_downloader=N_m3u8DL_RE(
-        proxy=settings.PROXY_URL if settings.PROXY_ENABLED else None
+    m3u8_downloader=create_m3u8_downloader(
+        settings.ACTIVE_DOWNLOADER,
+        proxy=settings.PROXY_URL if settings.PROXY_ENABLED else None,
     ),
 )
 
@@ -1,11 +1,27 @@
 import re
-from typing import Optional
+from typing import List, Optional, Tuple
 
 from django.conf import settings
 from loguru import logger
+from nassav.extractor import Extractor
 from nassav.scraper.AVDownloadInfo import AVDownloadInfo
 from nassav.source.SourceBase import SourceBase
 
+# 播放页所有字段的提取规则，扫描一次页面
+JABLE_PAGE = Extractor(
+    {
+        "m3u8": r'var hlsUrl = ["\']([^"\']+)["\']',
+        # 格式: <title>AVID 标题内容 - Jable.TV | ...</title>
+        "page_title": r"<title>(.+?)\s*-\s*Jable\.TV",
+        "h4_title": r'<h4 class="title">([^<]+)</h4>',
+        "medium_title": r'<span class="font-medium">([^<]+)</span>',
+        "avid": r'<span class="inactive-color">([A-Z]+-\d+)</span>',
+        "og_image": r'<meta property="og:image" content="([^"]+)"',
+    }
+)
+
+_AVID_TITLE = re.compile(r"^([A-Z]+-\d+)\s+(.+)$")
+
 
 class Jable(SourceBase):
     """Jable下载器"""
@@ -18,11 +34,13 @@ class Jable(SourceBase):
     def get_source_name(self) -> str:
         return "Jable"
 
-    def get_html(self, avid: str) -> Optional[str]:
-        url = f"https://{self.domain}/videos/{avid.lower()}/"
-        return self.fetch_html(
-            url, referer=f"https://{self.domain}/search/{avid.lower()}"
-        )
+    def get_candidate_urls(self, avid: str) -> List[Tuple[str, str]]:
+        return [
+            (
+                f"https://{self.domain}/videos/{avid.lower()}/",
+                f"https://{self.domain}/search/{avid.lower()}",
+            )
+        ]
 
     def parse_html(self, html: str) -> Optional[AVDownloadInfo]:
         """解析 HTML 获取核心下载信息（m3u8、avid、source_title）
@@ -33,45 +51,35 @@ class Jable(SourceBase):
         info.source = self.get_source_name()
 
         try:
+            fields = JABLE_PAGE.extract(html)
+
             # 1. 提取 m3u8（必需）
-            match = re.search(r'var hlsUrl = ["\']([^"\']+)["\']', html)
-            if match:
-                info.m3u8 = match.group(1)
+            if fields["m3u8"]:
+                info.m3u8 = fields["m3u8"]
             else:
                 return None
 
             # 2. 提取 source_title（备用标题）- 优先从 <title> 标签提取
-            # 格式: <title>AVID 标题内容 - Jable.TV | ...</title>
-            title_match = re.search(r"<title>(.+?)\s*-\s*Jable\.TV", html)
-            if title_match:
-                full_title = title_match.group(1).strip()
+            if fields["page_title"]:
+                full_title = fields["page_title"].strip()
                 info.source_title = full_title
 
                 # 3. 从标题中提取 AVID
-                avid_match = re.match(r"^([A-Z]+-\d+)\s+(.+)$", full_title)
+                avid_match = _AVID_TITLE.match(full_title)
                 if avid_match:
                     info.avid = avid_match.group(1)
                     info.source_title = avid_match.group(2).strip()
 
             # 如果标题提取失败，尝试其他模式
             if not info.source_title:
-                title_patterns = [
-                    r'<h4 class="title">([^<]+)</h4>',
-                    r'<span class="font-medium">([^<]+)</span>',
-                ]
-                for pattern in title_patterns:
-                    title_match = re.search(pattern, html)
-                    if title_match:
-                        info.source_title = title_match.group(1).strip()
+                for key in ("h4_title", "medium_title"):
+                    if fields[key]:
+                        info.source_title = fields[key].strip()
                         break
 
-            # 如果 AVID 还未提取，单独查找
-            if not info.avid:
-                avid_match = re.search(
-                    r'<span class="inactive-color">([A-Z]+-\d+)</span>', html
-                )
-                if avid_match:
-                    info.avid = avid_match.group(1)
+            # 如果 AVID 还未提取，使用页面上单独显示的番号
+            if not info.avid and fields["avid"]:
+                info.avid = fields["avid"]
 
             return info
         except Exception as e:
@@ -80,10 +88,7 @@ class Jable(SourceBase):
 
     def get_cover_url(self, html: str) -> Optional[str]:
         try:
-            match = re.search(r'<meta property="og:image" content="([^"]+)"', html)
-            if match:
-                return match.group(1)
-            return None
+            return JABLE_PAGE.extract(html)["og_image"]
         except Exception as e:
             logger.error(f"封面URL提取失败: {e}")
             return None
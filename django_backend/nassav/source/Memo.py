@@ -1,11 +1,22 @@
 import re
-from typing import Optional
+from typing import List, Optional, Tuple
 
 from django.conf import settings
 from loguru import logger
+from nassav.extractor import Extractor
 from nassav.scraper.AVDownloadInfo import AVDownloadInfo
 from nassav.source.SourceBase import SourceBase
 
+# 播放页所有字段的提取规则，扫描一次页面
+MEMO_PAGE = Extractor(
+    {
+        "og_title": r'<meta property="og:title" content="([^"]+)"',
+        "og_image": r'<meta property="og:image" content="([^"]+)"',
+    }
+)
+
+_AVID = re.compile(r"([A-Z]+-\d+)", re.IGNORECASE)
+
 
 class Memo(SourceBase):
     """MemoJav下载器"""
@@ -18,33 +29,27 @@ class Memo(SourceBase):
     def get_source_name(self) -> str:
         return "Memo"
 
-    def get_html(self, avid: str) -> Optional[str]:
+    def get_candidate_urls(self, avid: str) -> List[Tuple[str, str]]:
         avid_upper = avid.upper()
-        urls = [
-            f"https://{self.domain}/video/{avid_upper}",
-            f"https://{self.domain}/cn/{avid_upper}",
-            f"https://{self.domain}/{avid_upper}",
+        return [
+            (f"https://{self.domain}/video/{avid_upper}", ""),
+            (f"https://{self.domain}/cn/{avid_upper}", ""),
+            (f"https://{self.domain}/{avid_upper}", ""),
         ]
-        for url in urls:
-            content = self.fetch_html(url)
-            if content:
-                return content
-        return None
 
     def parse_html(self, html: str) -> Optional[AVDownloadInfo]:
         info = AVDownloadInfo()
         info.source = self.get_source_name()
 
         try:
+            fields = MEMO_PAGE.extract(html)
+
             # 提取标题
-            title_match = re.search(
-                r'<meta property="og:title" content="([^"]+)"', html
-            )
-            if title_match:
-                info.title = title_match.group(1).strip()
+            if fields["og_title"]:
+                info.title = fields["og_title"].strip()
 
             # 提取avid
-            avid_match = re.search(r"([A-Z]+-\d+)", info.title, re.IGNORECASE)
+            avid_match = _AVID.search(info.title)
             if avid_match:
                 info.avid = avid_match.group(1).upper()
 
@@ -60,10 +65,7 @@ class Memo(SourceBase):
 
     def get_cover_url(self, html: str) -> Optional[str]:
         try:
-            match = re.search(r'<meta property="og:image" content="([^"]+)"', html)
-            if match:
-                return match.group(1)
-            return None
+            return MEMO_PAGE.extract(html)["og_image"]
         except Exception as e:
             logger.error(f"封面URL提取失败: {e}")
             return None
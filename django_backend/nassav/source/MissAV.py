@@ -1,13 +1,28 @@
 import re
-from typing import Optional, Tuple
+from typing import List, Optional, Tuple
 
-from curl_cffi import requests
 from django.conf import settings
 from loguru import logger
-from nassav.constants import HEADERS, IMPERSONATE
+from nassav.extractor import Extractor
+from nassav.http_pool import get_http_pool
 from nassav.scraper.AVDownloadInfo import AVDownloadInfo
 from nassav.source.SourceBase import SourceBase
 
+# 播放页所有字段的提取规则，扫描一次页面
+MISSAV_PAGE = Extractor(
+    {
+        # 播放地址在压缩脚本的词表中：m3u8|uuid 各段倒序|com|surrit|https|video
+        "uuid": r"m3u8\|([a-f0-9|]+)\|com\|surrit\|https\|video",
+        "og_title": r'<meta property="og:title" content="(.*?)"',
+        "og_image": r'<meta property="og:image" content="([^"]+)"',
+    }
+)
+
+_AVID_PREFIX = re.compile(r"^([A-Z]+(?:-[A-Z]+)*-\d+)")
+_STREAM_INF = re.compile(
+    r"#EXT-X-STREAM-INF:BANDWIDTH=(\d+),.*?RESOLUTION=(\d+x\d+).*?\n(.*)"
+)
+
 
 class MissAV(SourceBase):
     """MissAV下载器"""
@@ -20,24 +35,14 @@ class MissAV(SourceBase):
     def get_source_name(self) -> str:
         return "MissAV"
 
-    def get_html(self, avid: str) -> Optional[str]:
-        """根据avid获取HTML"""
-        import time
-
+    def get_candidate_urls(self, avid: str) -> List[Tuple[str, str]]:
         avid_lower = avid.lower()
-        urls = [
-            f"https://{self.domain}/cn/{avid_lower}-chinese-subtitle",
-            f"https://{self.domain}/{avid_lower}-chinese-subtitle",
-            f"https://{self.domain}/cn/{avid_lower}",
+        referer = f"https://{self.domain}/search/{avid_lower}"
+        return [
+            (f"https://{self.domain}/cn/{avid_lower}-chinese-subtitle", referer),
+            (f"https://{self.domain}/{avid_lower}-chinese-subtitle", referer),
+            (f"https://{self.domain}/cn/{avid_lower}", referer),
         ]
-        for url in urls:
-            content = self.fetch_html(
-                url, referer=f"https://{self.domain}/search/{avid_lower}"
-            )
-            time.sleep(1)
-            if content:
-                return content
-        return None
 
     def parse_html(self, html: str) -> Optional[AVDownloadInfo]:
         """解析 HTML 获取核心下载信息（m3u8、avid、title）
@@ -47,8 +52,10 @@ class MissAV(SourceBase):
         info = AVDownloadInfo()
         info.source = self.get_source_name()
 
+        fields = MISSAV_PAGE.extract(html)
+
         # 1. 提取 m3u8（必需）
-        uuid = self._extract_uuid(html)
+        uuid = self._extract_uuid(fields)
         if uuid:
             playlist_url = f"https://surrit.com/{uuid}/playlist.m3u8"
             result = self._get_highest_quality_m3u8(playlist_url)
@@ -63,29 +70,27 @@ class MissAV(SourceBase):
             return None
 
         # 2. 提取标题和 AVID
-        if not self._extract_metadata(html, info):
+        if not self._extract_metadata(fields, info):
             return None
 
         return info
 
-    def _extract_uuid(self, html: str) -> Optional[str]:
+    def _extract_uuid(self, fields: dict) -> Optional[str]:
         try:
-            match = re.search(r"m3u8\|([a-f0-9|]+)\|com\|surrit\|https\|video", html)
-            if match:
-                return "-".join(match.group(1).split("|")[::-1])
+            if fields["uuid"]:
+                return "-".join(fields["uuid"].split("|")[::-1])
             return None
         except Exception as e:
             logger.error(f"UUID提取异常: {str(e)}")
             return None
 
-    def _extract_metadata(self, html: str, metadata: AVDownloadInfo) -> bool:
+    def _extract_metadata(self, fields: dict, metadata: AVDownloadInfo) -> bool:
         """提取核心元数据：AVID 和 source_title（备用标题）"""
         try:
-            og_title = re.search(r'<meta property="og:title" content="(.*?)"', html)
-            if og_title:
-                title_content = og_title.group(1)
+            title_content = fields["og_title"]
+            if title_content is not None:
                 # 尝试从标题中分离 AVID
-                code_match = re.search(r"^([A-Z]+(?:-[A-Z]+)*-\d+)", title_content)
+                code_match = _AVID_PREFIX.search(title_content)
                 if code_match:
                     metadata.avid = code_match.group(1)
                     metadata.source_title = title_content.replace(
@@ -100,16 +105,12 @@ class MissAV(SourceBase):
 
     def _get_highest_quality_m3u8(self, playlist_url: str) -> Optional[Tuple[str, str]]:
         try:
-            response = requests.get(playlist_url, timeout=10, impersonate=IMPERSONATE)
+            response = get_http_pool().get(playlist_url, timeout=10)
             response.raise_for_status()
             playlist_content = response.text
 
             streams = []
-            pattern = re.compile(
-                r"#EXT-X-STREAM-INF:BANDWIDTH=(\d+),.*?RESOLUTION=(\d+x\d+).*?\n(.*)"
-            )
-
-            for match in pattern.finditer(playlist_content):
+            for match in _STREAM_INF.finditer(playlist_content):
                 bandwidth = int(match.group(1))
                 resolution = match.group(2)
                 url = match.group(3).strip()
@@ -136,10 +137,7 @@ class MissAV(SourceBase):
         """从HTML中提取封面URL"""
         try:
             # MissAV的封面通常在og:image标签中
-            match = re.search(r'<meta property="og:image" content="([^"]+)"', html)
-            if match:
-                return match.group(1)
-            return None
+            return MISSAV_PAGE.extract(html)["og_image"]
         except Exception as e:
             logger.error(f"封面URL提取失败: {e}")
             return None
@@ -1,13 +1,50 @@
-import os
-from typing import Optional
+import asyncio
+from typing import Any, Awaitable, List, Optional, Tuple
 
 from curl_cffi import requests
 from curl_cffi.requests.exceptions import HTTPError
 from loguru import logger
 from nassav.constants import HEADERS, IMPERSONATE
+from nassav.http_pool import get_http_pool
+from nassav.http_replay import get_http_replay
+from nassav.rate_limit import get_rate_limiter
 from nassav.scraper.AVDownloadInfo import AVDownloadInfo
 
 
+async def first_success(awaitables: List[Awaitable]) -> Tuple[Optional[int], Any]:
+    """
+    并发执行并按排名取第一个成功结果
+
+    所有任务同时开始；第 i 个任务成功（返回非 None）且排在它前面的任务都已失败时立即返回，
+    并取消其余仍在运行的任务。任务抛出异常视为失败。
+
+    Args:
+        awaitables: 按优先级从高到低排列的协程
+
+    Returns:
+        (排名, 结果)，全部失败时返回 (None, None)
+    """
+    tasks = [asyncio.ensure_future(a) for a in awaitables]
+    try:
+        for rank, task in enumerate(tasks):
+            try:
+                result = await task
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"并发探测任务异常: {e}")
+                continue
+            if result is not None:
+                return rank, result
+        return None, None
+    finally:
+        pending = [t for t in tasks if not t.done()]
+        for task in pending:
+            task.cancel()
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
+
+
 class SourceBase:
     """下载源基类
 
@@ -23,15 +60,26 @@ class SourceBase:
     def __init__(self, proxy: Optional[str] = None, timeout: int = 15):
         self.proxy = proxy
         self.proxies = {"http": proxy, "https": proxy} if proxy else None
+        self.domain = ""
         self.cookie = None
         self.cookie_retry_times = 5
         self.timeout = timeout
-        self.domain = ""
-        # 最近一次 fetch_html 请求的响应状态码（成功时为 None）
-        self.last_error_code = None
+
+    @property
+    def cookie(self) -> Optional[str]:
+        return self._cookie
+
+    @cookie.setter
+    def cookie(self, value: Optional[str]):
+        # 同步到 HTTP 会话池，发往本源域名的所有请求（页面、文件下载）自动携带
+        self._cookie = value
+        if self.domain:
+            get_http_pool().set_cookie(self.domain, value)
 
     def set_domain(self, domain: str):
         self.domain = domain
+        if self.cookie:
+            get_http_pool().set_cookie(domain, self.cookie)
 
     def set_cookie(self, cookie: str):
         self.cookie = cookie
@@ -47,67 +95,67 @@ class SourceBase:
 
     def set_cookie_auto(self, force_refresh: bool = False) -> bool:
         """
-        自动获取cookie并存储到数据库
+        自动获取cookie，连同每个cookie的过期时间交给 cookie_manager 保存并同步到所有进程
 
         Args:
-            force_refresh: 是否强制刷新cookie，即使数据库中已存在
+            force_refresh: 是否强制刷新cookie，即使已保存过
 
         Returns:
             bool: 是否成功获取并设置cookie
         """
-        try:
-            from time import sleep
-
-            from nassav.models import SourceCookie
+        from nassav.cookie_manager import cookie_manager, jar_expiries
 
-            source_name = self.get_source_name()
-
-            # 如果不强制刷新，先尝试从数据库加载
+        source_name = self.get_source_name()
+        try:
+            # 如果不强制刷新，先尝试使用已保存的 cookie
             if not force_refresh:
-                try:
-                    cookie_obj = SourceCookie.objects.get(source_name=source_name)
-                    self.cookie = cookie_obj.cookie
-                    logger.info(f"{source_name}: 从数据库加载cookie")
+                entry = cookie_manager.get(source_name)
+                if entry and entry.get("cookie"):
+                    self.cookie = entry["cookie"]
+                    logger.info(f"{source_name}: 使用已保存的cookie")
                     return True
-                except SourceCookie.DoesNotExist:
-                    logger.info(f"{source_name}: 数据库中无cookie，开始自动获取")
+                logger.info(f"{source_name}: 没有已保存的cookie，开始自动获取")
 
             home_url = self._get_home_url()
             headers = HEADERS.copy()
-            for i in range(self.cookie_retry_times):
-                session = requests.Session()
-                logger.info(f"{source_name}: 正在访问 {home_url} 获取cookie... 重试次数：{i + 1}")
-                response = session.get(
-                    home_url,
-                    proxies=self.proxies,
-                    headers=headers,
-                    timeout=self.timeout,
-                    impersonate=IMPERSONATE,
-                )
-                try:
-                    response.raise_for_status()
-                except HTTPError as err:
-                    logger.info(f"{source_name}: 获取失败，进行重试...")
-                    sleep(0.5)
-                    continue
-
-                # 获取cookie字符串
-                cookies = session.cookies.get_dict()
-                if not cookies:
-                    logger.info(f"{source_name}: 获取失败，进行重试...")
-                    sleep(0.5)
-                else:
-                    cookie_str = "; ".join([f"{k}={v}" for k, v in cookies.items()])
-                    logger.info(f"{source_name}: 成功获取cookie: {list(cookies.keys())}")
-
-                    SourceCookie.objects.update_or_create(
-                        source_name=source_name, defaults={"cookie": cookie_str}
+            limiter = get_rate_limiter()
+            replay = get_http_replay()
+            # 所有重试共用一个会话（复用连接），每次重试前清空上次残留的 cookie
+            with requests.Session() as session:
+                for i in range(self.cookie_retry_times):
+                    session.cookies.clear()
+                    logger.info(
+                        f"{source_name}: 正在访问 {home_url} 获取cookie... 重试次数：{i + 1}"
+                    )
+                    # 重试间隔由限流器决定（失败状态码会降低该域名的请求速率）
+                    limiter.wait(home_url)
+                    response = session.get(
+                        replay.rewrite(home_url),
+                        proxies=replay.proxies(self.proxies),
+                        headers=headers,
+                        timeout=self.timeout,
+                        impersonate=IMPERSONATE,
                     )
-                    logger.info(f"{source_name}: Cookie已保存到数据库")
+                    limiter.feedback_response(home_url, response)
+                    replay.record("GET", home_url, response)
+                    try:
+                        response.raise_for_status()
+                    except HTTPError:
+                        logger.info(f"{source_name}: 获取失败，进行重试...")
+                        continue
+
+                    jar = list(session.cookies.jar)
+                    if not jar:
+                        logger.info(f"{source_name}: 获取失败，进行重试...")
+                        continue
+                    cookie_str = "; ".join(f"{c.name}={c.value}" for c in jar)
+                    logger.info(f"{source_name}: 成功获取cookie: {[c.name for c in jar]}")
                     self.cookie = cookie_str
+                    cookie_manager.store(source_name, cookie_str, jar_expiries(jar))
+                    logger.info(f"{source_name}: Cookie已保存")
                     return True
         except Exception as e:
-            logger.warning(f"{self.get_source_name()}: 自动获取cookie失败: {str(e)}")
+            logger.warning(f"{source_name}: 自动获取cookie失败: {str(e)}")
             return False
         logger.warning(f"{source_name}：达到最大重试次数，cookie获取失败。")
         return False
@@ -123,7 +171,13 @@ class SourceBase:
             from nassav.models import SourceCookie
 
             source_name = self.get_source_name()
-            cookie_obj = SourceCookie.objects.get(source_name=source_name)
+            cookie_obj = (
+                SourceCookie.objects.filter(source_name__iexact=source_name)
+                .order_by("-updated_at")
+                .first()
+            )
+            if cookie_obj is None:
+                raise SourceCookie.DoesNotExist(source_name)
             self.cookie = cookie_obj.cookie
             logger.info(f"{source_name}: 从数据库加载cookie成功")
             return True
@@ -131,35 +185,115 @@ class SourceBase:
             logger.warning(f"{self.get_source_name()}: 从数据库加载cookie失败: {str(e)}")
             return False
 
-    def get_html(self, avid: str) -> Optional[str]:
+    def get_candidate_urls(self, avid: str) -> List[Tuple[str, str]]:
+        """
+        返回资源页候选地址（按优先级从高到低）
+
+        Returns:
+            [(url, referer), ...]
+        """
         raise NotImplementedError
 
+    def get_html(self, avid: str) -> Tuple[Optional[str], Any]:
+        """
+        按优先级依次请求候选地址，返回第一个成功的 HTML
+
+        Returns:
+            (html, error)：失败时 error 为最后一个候选地址的错误码
+        """
+        error = None
+        for url, referer in self.get_candidate_urls(avid):
+            content, error = self.fetch_html(url, referer=referer)
+            if content:
+                return content, None
+        return None, error
+
+    async def aget_html(self, avid: str) -> Tuple[Optional[str], Any]:
+        """
+        并发请求所有候选地址（受请求间隔限制错开发起），优先级最高的成功结果胜出，其余请求取消
+
+        需在会话池的事件循环中执行（get_http_pool().run_async）。
+
+        Returns:
+            (html, error)：失败时 error 为最后一个候选地址的错误码（与 get_html 一致）
+        """
+        candidates = self.get_candidate_urls(avid)
+        errors: List[Any] = [None] * len(candidates)
+
+        async def fetch(index: int, url: str, referer: str):
+            html, errors[index] = await self.afetch_html(url, referer)
+            return html or None
+
+        _, html = await first_success(
+            [fetch(i, url, referer) for i, (url, referer) in enumerate(candidates)]
+        )
+        if html:
+            return html, None
+        return None, errors[-1] if errors else None
+
     def parse_html(self, html: str) -> Optional[AVDownloadInfo]:
         raise NotImplementedError
 
     def get_cover_url(self, html: str) -> str:
         raise NotImplementedError
 
-    def fetch_html(self, url: str, referer: str = "") -> Optional[str]:
+    def _request_headers(self, referer: str = "") -> dict:
+        headers = HEADERS.copy()
+        if referer:
+            headers["Referer"] = referer
+        return headers
+
+    async def afetch_html(
+        self, url: str, referer: str = ""
+    ) -> Tuple[Optional[str], Any]:
+        """
+        异步请求页面（可并发调用；使用会话池中按域名复用的 AsyncSession）
+
+        Returns:
+            (html, error)：成功时 error 为 None，失败时为状态码或错误信息字符串
+        """
+        limiter = get_rate_limiter()
+        replay = get_http_replay()
+        await limiter.async_wait(url)
         try:
-            headers = HEADERS.copy()
-            if referer:
-                headers["Referer"] = referer
-            if self.cookie:
-                headers["Cookie"] = self.cookie
+            with get_http_pool().async_lease(url, self.proxy) as session:
+                response = await session.get(
+                    replay.rewrite(url),
+                    proxies=replay.proxies(self.proxies),
+                    headers={
+                        **self._request_headers(referer),
+                        **get_http_pool().cookie_headers(url),
+                    },
+                    timeout=self.timeout,
+                    impersonate=IMPERSONATE,
+                )
+        except Exception as e:
+            logger.error(f"请求失败: {url} {e}")
+            return None, str(e)
+        limiter.feedback_response(url, response)
+        replay.record("GET", url, response)
+        if response.status_code >= 400:
+            logger.error(f"请求失败: {url} (status={response.status_code})")
+            return None, response.status_code
+        return response.text, None
+
+    def fetch_html(self, url: str, referer: str = "") -> Tuple[Optional[str], Any]:
+        """
+        请求页面（不修改实例状态，源单例可被并发调用）
 
-            response = requests.get(
+        Returns:
+            (html, error)：成功时 error 为 None，失败时为状态码（尽量为 int）或错误信息字符串
+        """
+        response = None
+        try:
+            response = get_http_pool().get(
                 url,
-                proxies=self.proxies,
-                headers=headers,
+                proxy=self.proxy,
+                headers=self._request_headers(referer),
                 timeout=self.timeout,
-                impersonate=IMPERSONATE,
             )
             response.raise_for_status()
-
-            # 成功时清除上次的错误码
-            self.last_error_code = None
-            return response.text
+            return response.text, None
         except Exception as e:
             # 尝试从异常或 response 对象获取状态码
             code = None
@@ -170,45 +304,25 @@ class SourceBase:
             except Exception:
                 code = None
 
-            try:
-                # 如果 response 在本地作用域可用，优先使用
-                if "response" in locals() and response is not None:
-                    code = getattr(response, "status_code", code)
-            except Exception:
-                pass
+            # 如果 response 在本地作用域可用，优先使用
+            if response is not None:
+                code = getattr(response, "status_code", code)
 
-            # 记录并暴露错误码（尽量为 int，否则保留错误信息字符串）
-            self.last_error_code = code if code is not None else str(e)
-            logger.error(f"请求失败: {str(e)} (status={self.last_error_code})")
-            return None
+            error = code if code is not None else str(e)
+            logger.error(f"请求失败: {str(e)} (status={error})")
+            return None, error
 
     def download_file(self, url: str, save_path: str, referer: str = "") -> bool:
         """下载文件到指定路径"""
         try:
-            headers = HEADERS.copy()
-            if referer:
-                headers["Referer"] = referer
-            if self.cookie:
-                headers["Cookie"] = self.cookie
-
-            response = requests.get(
+            get_http_pool().download(
                 url,
-                stream=True,
-                impersonate=IMPERSONATE,
-                proxies=self.proxies,
-                headers=headers,
+                save_path,
+                proxy=self.proxy,
+                headers=self._request_headers(referer),
                 timeout=self.timeout,
                 allow_redirects=True,
             )
-            response.raise_for_status()
-
-            os.makedirs(os.path.dirname(save_path), exist_ok=True)
-            with open(save_path, "wb") as f:
-                # curl_cffi 不支持 chunk_size 参数,直接使用 iter_content()
-                for chunk in response.iter_content():
-                    if chunk:
-                        f.write(chunk)
-
             return True
         except Exception as e:
             logger.error(f"下载失败: {e}")
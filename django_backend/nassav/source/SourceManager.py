@@ -1,12 +1,25 @@
+import asyncio
 import json
+import time
 from pathlib import Path
 from typing import Dict, List, Optional, Tuple
 
 from asgiref.sync import sync_to_async
 from django.conf import settings
 from loguru import logger
+from nassav.cookie_manager import cookie_manager
+from nassav.html_store import get_html_store
+from nassav.http_pool import get_http_pool
+from nassav.negative_cache import KIND_SOURCE, OUTCOME_FORBIDDEN, negative_cache
 from nassav.scraper import AVDownloadInfo
 from nassav.source import Jable, Memo, MissAV, SourceBase
+from nassav.source.SourceBase import first_success
+from nassav.source_health import (
+    CIRCUIT_OPEN_ERROR,
+    ERROR_PARSE,
+    STATE_HALF_OPEN,
+    source_health,
+)
 
 
 def normalize_source_title(avid: str, source_title: str) -> str:
@@ -54,71 +67,106 @@ class SourceManager:
         # Cookie 将在首次使用时懒加载
 
     def _ensure_cookies_loaded(self):
-        """确保cookie已加载（懒加载）"""
+        """确保cookie已加载（懒加载），并订阅其他进程的 Cookie 更新"""
         if not self._cookies_loaded:
-            self.load_cookies_from_db()
+            self.load_cookies()
             self._cookies_loaded = True
+        # 每个进程一个订阅线程（已启动时直接返回，fork 后的子进程重新启动）
+        cookie_manager.listen(self._apply_cookie)
 
-    def load_cookies_from_db(self):
-        """从数据库加载所有源的 cookie"""
+    def _find_source(self, source_name: str) -> Optional[Tuple[str, SourceBase]]:
+        """按名称查找源（不区分大小写），返回 (实际名称, 源)"""
+        for name, source in self.sources.items():
+            if name.lower() == source_name.lower():
+                return name, source
+        return None
+
+    def _apply_cookie(self, source_name: str, cookie: str):
+        """把 Cookie 应用到内存中的源（订阅回调）"""
+        found = self._find_source(source_name)
+        if found and found[1].cookie != (cookie or None):
+            found[1].set_cookie(cookie or None)
+            logger.info(f"已更新 {found[0]} 的 Cookie")
+
+    def load_cookies(self):
+        """加载所有源的 cookie（优先读 Redis，回退到数据库）"""
+        for source_name, entry in cookie_manager.load_all().items():
+            if entry.get("cookie"):
+                self._apply_cookie(source_name, entry["cookie"])
+
+    def _purge_forbidden(self, name: str):
+        # 之前因 Cookie 失效被拒绝（403）的记录不再有效
         try:
-            from nassav.models import SourceCookie
-
-            cookies = SourceCookie.objects.all()
-            for cookie_obj in cookies:
-                source_name = cookie_obj.source_name.lower()
-                # 查找对应的源（不区分大小写）
-                for name, source in self.sources.items():
-                    if name.lower() == source_name:
-                        source.set_cookie(cookie_obj.cookie)
-                        logger.info(f"从数据库加载 {name} 的 Cookie")
-                        break
+            negative_cache.purge(KIND_SOURCE, name, outcome=OUTCOME_FORBIDDEN)
         except Exception as e:
-            logger.warning(f"从数据库加载 Cookie 失败: {e}")
+            logger.warning(f"清除 {name} 的 403 未命中记录失败: {e}")
 
     def set_source_cookie(self, source_name: str, cookie: str) -> bool:
         """
-        设置指定源的 cookie，同时更新内存和数据库
+        设置指定源的 cookie，同时更新内存、数据库和其他进程
         返回是否设置成功
         """
-        # 查找对应的源（不区分大小写）
-        target_source = None
-        actual_name = None
-        for name, source in self.sources.items():
-            if name.lower() == source_name.lower():
-                target_source = source
-                actual_name = name
-                break
-
-        if not target_source:
+        found = self._find_source(source_name)
+        if not found:
             logger.warning(f"未找到源 {source_name}")
             return False
+        actual_name, target_source = found
 
         # 更新内存中的 cookie
         target_source.set_cookie(cookie)
         logger.info(f"已设置 {actual_name} 的 Cookie")
+        self._purge_forbidden(actual_name)
 
-        # 更新数据库
+        # 更新数据库并通知其他进程
         try:
-            from nassav.models import SourceCookie
-
-            SourceCookie.objects.update_or_create(
-                source_name=actual_name.lower(), defaults={"cookie": cookie}
-            )
+            cookie_manager.store(actual_name, cookie)
             return True
         except Exception as e:
             logger.error(f"保存 Cookie 到数据库失败: {e}")
             return False
 
-    def get_sorted_sources(self) -> List[Tuple[str, SourceBase]]:
-        """获取按权重排序的下载器列表"""
+    def refresh_expiring_cookies(self) -> Dict[str, bool]:
+        """
+        后台刷新即将过期的自动获取的 Cookie（见 nassav.cookie_manager）
+
+        Returns:
+            {源名称: 是否刷新成功}，其他进程正在刷新的源不包含在内
+        """
+        results = {}
+        for source_name in cookie_manager.due():
+            found = self._find_source(source_name)
+            if not found or not cookie_manager.acquire_refresh(source_name):
+                continue
+            name, source = found
+            try:
+                logger.info(f"{name} 的 Cookie 即将过期，后台刷新")
+                results[name] = source.set_cookie_auto(force_refresh=True)
+                if results[name]:
+                    self._purge_forbidden(name)
+            finally:
+                cookie_manager.release_refresh(source_name)
+        return results
+
+    def get_source_ranking(self) -> List[dict]:
+        """
+        按健康统计动态排序的源及其统计明细（见 nassav.source_health）
+
+        Returns:
+            [{"name", "weight", "score", "rank", "demoted", "metrics"}]
+        """
         source_config = settings.SOURCE_CONFIG
-        sorted_items = []
-        for name, downloader in self.sources.items():
-            weight = source_config.get(name.lower(), {}).get("weight", 0)
-            sorted_items.append((name, downloader, weight))
-        sorted_items.sort(key=lambda x: x[2], reverse=True)
-        return [(name, dl) for name, dl, _ in sorted_items]
+        weights = {
+            name: source_config.get(name.lower(), {}).get("weight", 0)
+            for name in self.sources
+        }
+        return source_health.rank(weights)
+
+    def get_sorted_sources(self) -> List[Tuple[str, SourceBase]]:
+        """获取按动态分数排序的下载器列表（配置权重 × 成功率 × 延迟系数，熔断中的源排在最后）"""
+        return [
+            (entry["name"], self.sources[entry["name"]])
+            for entry in self.get_source_ranking()
+        ]
 
     def get_info_from_any_source(
         self, avid: str
@@ -126,43 +174,128 @@ class SourceManager:
         Optional[AVDownloadInfo], Optional[SourceBase], Optional[str], Dict[str, object]
     ]:
         """
-        遍历所有源获取信息
+        从所有源获取信息，排序最靠前（见 get_sorted_sources）的成功结果优先
+
+        默认并发探测（Source.probe_concurrent），在事件循环中调用时退回按顺序依次尝试。
+        未命中缓存中仍在有效期内的源直接跳过，其错误码照常出现在 errors 中；
+        熔断中的源同样跳过，错误为 CIRCUIT_OPEN_ERROR。
         返回: (info, source, html, errors)
         errors: dict mapping source_name -> error_code (or error string)
         """
-        import time
-
         self._ensure_cookies_loaded()
 
+        ranking = self.get_source_ranking()
+        sources = [(entry["name"], self.sources[entry["name"]]) for entry in ranking]
+        cached = negative_cache.lookup(KIND_SOURCE, [name for name, _ in sources], avid)
+        if cached:
+            logger.info(f"跳过近期未命中 {avid} 的源: {', '.join(cached)}")
+            sources = [(name, source) for name, source in sources if name not in cached]
+        metrics = {entry["name"]: entry["metrics"] for entry in ranking}
+        tripped = [
+            name for name, _ in sources if not source_health.allow(name, metrics[name])
+        ]
+        if tripped:
+            logger.info(f"跳过熔断中的源: {', '.join(tripped)}")
+            sources = [
+                (name, source) for name, source in sources if name not in tripped
+            ]
+
+        if not sources:
+            result = (None, None, None, {})
+        elif settings.SOURCE_PROBE_CONCURRENT and not self._in_event_loop():
+            result = get_http_pool().run_async(self._probe_all_sources(avid, sources))
+        else:
+            result = self._get_info_sequential(avid, sources)
+
+        info, source, html, errors = result
+        for name, err in errors.items():
+            negative_cache.record(KIND_SOURCE, name, avid, err)
+        errors.update({name: entry["code"] for name, entry in cached.items()})
+        errors.update({name: CIRCUIT_OPEN_ERROR for name in tripped})
+        return info, source, html, errors
+
+    @staticmethod
+    def _in_event_loop() -> bool:
+        try:
+            asyncio.get_running_loop()
+            return True
+        except RuntimeError:
+            return False
+
+    def _get_info_sequential(
+        self, avid: str, sources: List[Tuple[str, SourceBase]]
+    ) -> Tuple[
+        Optional[AVDownloadInfo], Optional[SourceBase], Optional[str], Dict[str, object]
+    ]:
+        """按权重依次尝试各个源"""
         errors: Dict[str, object] = {}
 
-        for name, source in self.get_sorted_sources():
+        for name, source in sources:
             logger.info(f"尝试从 {name} 获取 {avid}")
-            # 重置源上的上次错误码
-            try:
-                source.last_error_code = None
-            except Exception:
-                pass
+            start = time.monotonic()
+            html, err = source.get_html(avid)
 
-            html = source.get_html(avid)
-            time.sleep(0.5)
-
-            # 如果 fetch_html 记录了错误码且未获取到 html，则把错误码记录下来
-            try:
-                err = getattr(source, "last_error_code", None)
-                if not html and err is not None:
-                    errors[name] = err
-            except Exception:
-                pass
+            # 未获取到 html 时记录错误码
+            if not html and err is not None:
+                errors[name] = err
 
-            if html:
-                info = source.parse_html(html)
-                if info:
-                    info.avid = avid.upper()
-                    return info, source, html, errors
+            info = source.parse_html(html) if html else None
+            self._record_health(name, start, html, info, err)
+            if info:
+                info.avid = avid.upper()
+                return info, source, html, errors
 
         return None, None, None, errors
 
+    @staticmethod
+    def _record_health(name: str, start: float, html, info, err):
+        """记录一次源请求结果（耗时从 start 起算）：未获取到页面时为错误码，页面无法解析时为 ERROR_PARSE"""
+        if html:
+            err = None if info else ERROR_PARSE
+        source_health.record(name, time.monotonic() - start, err)
+
+    async def _probe_all_sources(
+        self, avid: str, sources: List[Tuple[str, SourceBase]]
+    ) -> Tuple[
+        Optional[AVDownloadInfo], Optional[SourceBase], Optional[str], Dict[str, object]
+    ]:
+        """
+        并发探测所有源（及每个源的所有候选地址）
+
+        权重最高的成功解析胜出：它之前的源都已失败时立即返回并取消其余请求；
+        已完成的失败源照常记录错误码。
+        """
+        errors: Dict[str, object] = {}
+
+        async def probe(name: str, source: SourceBase):
+            logger.info(f"尝试从 {name} 获取 {avid}")
+            start = time.monotonic()
+            html, err = await source.aget_html(avid)
+            if not html:
+                if err is not None:
+                    errors[name] = err
+                await asyncio.to_thread(
+                    self._record_health, name, start, html, None, err
+                )
+                return None
+            # parse_html 可能包含同步请求（如 MissAV 读取播放列表），放到线程中执行
+            info = await asyncio.to_thread(source.parse_html, html)
+            await asyncio.to_thread(self._record_health, name, start, html, info, err)
+            if not info:
+                return None
+            info.avid = avid.upper()
+            return info, source, html
+
+        rank, result = await first_success(
+            [probe(name, source) for name, source in sources]
+        )
+
+        if result is None:
+            return None, None, None, errors
+        info, source, html = result
+        logger.info(f"并发探测命中 {source.get_source_name()}（权重排名 {rank + 1}）: {avid}")
+        return info, source, html, errors
+
     def get_info_from_source(
         self, avid: str, source_str: str
     ) -> Tuple[
@@ -188,29 +321,53 @@ class SourceManager:
             return None, None, None, errors
 
         logger.info(f"从 {source_str} 刷新 {avid}")
-        try:
-            source.last_error_code = None
-        except Exception:
-            pass
 
-        html = source.get_html(avid)
-        try:
-            err = getattr(source, "last_error_code", None)
-            if not html and err is not None:
-                errors[source_str] = err
-        except Exception:
-            pass
+        # 指定源刷新不读取未命中缓存、不受熔断限制（总是实际请求），但照常更新缓存和健康统计
+        start = time.monotonic()
+        html, err = source.get_html(avid)
+        if not html and err is not None:
+            errors[source_str] = err
+            negative_cache.record(KIND_SOURCE, source.get_source_name(), avid, err)
 
+        info = None
         if html:
             logger.info(f"成功从源 {source_str} 获取 html")
             info = source.parse_html(html)
-            if info:
-                info.avid = avid.upper()
-                return info, source, html, errors
+        self._record_health(source.get_source_name(), start, html, info, err)
+        if info:
+            info.avid = avid.upper()
+            negative_cache.forget(KIND_SOURCE, source.get_source_name(), avid)
+            return info, source, html, errors
 
         logger.warning(f"从 {source_str} 获取 {avid} 失败")
         return None, None, None, errors
 
+    def probe_tripped_sources(self) -> Dict[str, Optional[str]]:
+        """
+        试探冷却期已过的熔断源（请求首页），成功则恢复，失败则重新熔断
+
+        Returns:
+            {源名称: 试探后的熔断状态}
+        """
+        results = {}
+        for entry in self.get_source_ranking():
+            name, metrics = entry["name"], entry["metrics"] or {}
+            if metrics.get("state") != STATE_HALF_OPEN:
+                continue
+            source = self.sources[name]
+            try:
+                home_url = source._get_home_url()
+            except ValueError:
+                continue
+            if not source_health.allow(name, metrics):
+                continue
+            self._ensure_cookies_loaded()
+            logger.info(f"试探熔断中的源 {name}")
+            start = time.monotonic()
+            html, err = source.fetch_html(home_url)
+            results[name] = source_health.record(name, time.monotonic() - start, err)
+        return results
+
     def get_resource_dir(self, avid: str) -> Path:
         """确保新的资源子目录存在并返回资源根目录
 
@@ -223,10 +380,20 @@ class SourceManager:
         return Path(settings.RESOURCE_DIR)
 
     def load_cached_html(self, avid: str) -> Optional[str]:
-        """从缓存加载 HTML"""
+        """从 HTML 快照存储加载最新页面，没有快照时读取旧的备份目录"""
         avid = avid.upper()
+        html = get_html_store().get(avid)
+        if html is not None:
+            return html
         # HTML 缓存如果存在于旧的 per-avid 目录（resource_backup/{avid}/{avid}.html），优先从备份目录读取
-        html_path = Path(settings.RESOURCE_BACKUP_DIR) / avid / f"{avid}.html"
+        backup_root = Path(
+            getattr(
+                settings,
+                "RESOURCE_BACKUP_DIR",
+                Path(settings.BASE_DIR) / "resource_backup",
+            )
+        )
+        html_path = backup_root / avid / f"{avid}.html"
         if html_path.exists():
             try:
                 with open(html_path, "r", encoding="utf-8") as f:
@@ -235,5 +402,37 @@ class SourceManager:
                 logger.error(f"读取缓存 HTML 失败: {e}")
         return None
 
+    def reparse_snapshot(
+        self, avid: str, source_str: Optional[str] = None
+    ) -> Tuple[Optional[AVDownloadInfo], Optional[SourceBase]]:
+        """
+        用已保存的 HTML 快照重新解析（不请求源站页面），用于解析器修复后批量更新
+
+        Args:
+            avid: 视频编号
+            source_str: 源名称；默认使用最新快照的来源
+
+        Returns:
+            (info, source)：没有快照、找不到源或解析失败时 info 为 None
+        """
+        snapshot = get_html_store().latest(avid, source_str)
+        if snapshot is None:
+            return None, None
+        name = (source_str or snapshot.get("source") or "").lower()
+        source = next((s for n, s in self.sources.items() if n.lower() == name), None)
+        if source is None:
+            logger.warning(f"未找到快照来源 {name} 对应的下载器: {avid}")
+            return None, None
+        html = get_html_store().read(snapshot["sha256"])
+        try:
+            info = source.parse_html(html)
+        except Exception as e:
+            logger.error(f"重新解析 {avid} 失败: {e}")
+            return None, source
+        if info:
+            info.avid = avid.upper()
+            info.source = source.get_source_name()
+        return info, source
+
 
 source_manager = SourceManager()
@@ -0,0 +1,350 @@
+"""
+下载源健康统计与熔断
+
+记录每个源最近 window 次请求的结果（耗时、错误类型），据此计算成功率、p50/p95 延迟，
+用于动态排序（配置权重 × 平滑成功率 × 延迟系数）和熔断：
+
+- closed：正常参与探测
+- open：连续 failure_threshold 次健康失败（403/429/5xx/超时/网络错误/页面无法解析）后打开，
+  冷却期内直接跳过该源
+- half_open：冷却期结束，只放行一次试探请求（实际请求或后台探测），成功则关闭，
+  失败则重新打开且冷却期加倍（不超过 max_cooldown）
+
+404 表示该源没有此番号，不算健康失败。统计保存在 Redis（多进程共享），Redis 不可用时按配置权重排序、不熔断。
+"""
+import json
+import math
+import time
+from typing import Dict, Iterable, List, Optional
+
+from django.conf import settings
+from loguru import logger
+
+KEY_PREFIX = "nassav:source_health"
+
+STATE_CLOSED = "closed"
+STATE_OPEN = "open"
+STATE_HALF_OPEN = "half_open"
+
+# 错误类型
+ERROR_MISS = "miss"
+ERROR_FORBIDDEN = "forbidden"
+ERROR_RATE_LIMITED = "rate_limited"
+ERROR_SERVER = "server"
+ERROR_CLIENT = "client"
+ERROR_TIMEOUT = "timeout"
+ERROR_NETWORK = "network"
+ERROR_PARSE = "parse"
+# 因熔断跳过的源在 errors 中的错误信息
+CIRCUIT_OPEN_ERROR = "circuit_open"
+# 不计入健康失败的错误类型
+NON_FAILURE_ERRORS = (ERROR_MISS, ERROR_CLIENT)
+
+DEFAULT_CONFIG = {
+    "window": 100,
+    "failure_threshold": 5,
+    "cooldown": 300,
+    "max_cooldown": 3600,
+    # 延迟系数 = latency_scale / (latency_scale + p50)，单位毫秒
+    "latency_scale": 2000,
+    # 平滑成功率时假设的先验成功次数，样本少时不至于因一两次失败大幅降级
+    "prior": 5,
+}
+
+
+def classify_error(error) -> Optional[str]:
+    """
+    请求结果 -> 错误类型
+
+    Args:
+        error: None（成功）、状态码、ERROR_PARSE 或异常信息字符串
+
+    Returns:
+        错误类型，成功时为 None
+    """
+    if error is None:
+        return None
+    if error == ERROR_PARSE:
+        return ERROR_PARSE
+    try:
+        code = int(error)
+    except (TypeError, ValueError):
+        text = str(error).lower()
+        return (
+            ERROR_TIMEOUT if "timed out" in text or "timeout" in text else ERROR_NETWORK
+        )
+    if code == 404:
+        return ERROR_MISS
+    if code == 403:
+        return ERROR_FORBIDDEN
+    if code == 429:
+        return ERROR_RATE_LIMITED
+    if code >= 500:
+        return ERROR_SERVER
+    return ERROR_CLIENT
+
+
+def _percentile(values: List[float], q: float) -> Optional[float]:
+    """最近秩法百分位数"""
+    if not values:
+        return None
+    values = sorted(values)
+    index = min(len(values), max(1, math.ceil(q * len(values)))) - 1
+    return values[index]
+
+
+class SourceHealth:
+    """按源统计请求结果、计算排序分数并维护熔断状态"""
+
+    def __init__(self, client=None):
+        """
+        Args:
+            client: Redis 客户端，默认使用进程共享的客户端
+        """
+        self._client = client
+
+    @property
+    def client(self):
+        if self._client is None:
+            from nassav.tasks import get_redis_client
+
+            return get_redis_client()
+        return self._client
+
+    @property
+    def enabled(self) -> bool:
+        return bool(getattr(settings, "SOURCE_HEALTH_ENABLED", True))
+
+    @property
+    def config(self) -> dict:
+        return {
+            **DEFAULT_CONFIG,
+            **(getattr(settings, "SOURCE_HEALTH_CONFIG", {}) or {}),
+        }
+
+    @staticmethod
+    def _samples_key(name: str) -> str:
+        return f"{KEY_PREFIX}:{name.lower()}:samples"
+
+    @staticmethod
+    def _state_key(name: str) -> str:
+        return f"{KEY_PREFIX}:{name.lower()}:state"
+
+    @staticmethod
+    def _trial_key(name: str) -> str:
+        return f"{KEY_PREFIX}:{name.lower()}:trial"
+
+    # ---------------------------------------------------------------- 记录
+
+    def record(self, name: str, latency: Optional[float], error=None) -> Optional[str]:
+        """
+        记录一次请求结果并更新熔断状态
+
+        Args:
+            name: 源名称
+            latency: 请求耗时（秒），未知时为 None
+            error: 见 classify_error
+
+        Returns:
+            记录后的熔断状态；未启用或 Redis 不可用时返回 None
+        """
+        if not self.enabled:
+            return None
+        config = self.config
+        error_class = classify_error(error)
+        failed = error_class is not None and error_class not in NON_FAILURE_ERRORS
+        now = time.time()
+        sample = [
+            round(now, 3),
+            None if latency is None else round(latency * 1000, 1),
+            error_class,
+        ]
+        try:
+            pipe = self.client.pipeline(transaction=False)
+            pipe.lpush(self._samples_key(name), json.dumps(sample))
+            pipe.ltrim(self._samples_key(name), 0, int(config["window"]) - 1)
+            pipe.hgetall(self._state_key(name))
+            state = self._decode(pipe.execute()[2])
+            updates = self._next_state(state, failed, error_class, now, config)
+            self.client.hset(self._state_key(name), mapping=updates)
+            if not failed or updates["state"] == STATE_OPEN:
+                self.client.delete(self._trial_key(name))
+        except Exception as e:
+            logger.warning(f"记录源 {name} 健康统计失败: {e}")
+            return None
+        if updates.get("opened_at"):
+            logger.warning(f"源 {name} 熔断（{error_class}），{updates['cooldown']} 秒后重新试探")
+        elif updates["state"] == STATE_CLOSED and state.get("state") == STATE_OPEN:
+            logger.info(f"源 {name} 恢复正常")
+        return updates["state"]
+
+    @staticmethod
+    def _next_state(
+        state: dict, failed: bool, error_class: Optional[str], now: float, config: dict
+    ) -> dict:
+        updates = {"state": state.get("state", STATE_CLOSED)}
+        if not failed:
+            updates.update(state=STATE_CLOSED, failures=0, cooldown=config["cooldown"])
+            return updates
+
+        failures = int(state.get("failures", 0)) + 1
+        cooldown = int(state.get("cooldown", config["cooldown"]))
+        updates.update(
+            failures=failures,
+            cooldown=cooldown,
+            last_error=error_class,
+            last_error_at=round(now, 3),
+        )
+        if state.get("state") == STATE_OPEN:
+            # 冷却期结束后的试探失败：重新打开，冷却期加倍（冷却期内结束的旧请求不影响）
+            if now >= float(state.get("opened_at", 0)) + cooldown:
+                cooldown = min(int(config["max_cooldown"]), cooldown * 2)
+                updates.update(opened_at=round(now, 3), cooldown=cooldown)
+        elif failures >= int(config["failure_threshold"]):
+            updates.update(state=STATE_OPEN, opened_at=round(now, 3))
+        return updates
+
+    @staticmethod
+    def _decode(raw: dict) -> dict:
+        return {
+            (k.decode() if isinstance(k, bytes) else k): (
+                v.decode() if isinstance(v, bytes) else v
+            )
+            for k, v in (raw or {}).items()
+        }
+
+    # ---------------------------------------------------------------- 查询
+
+    def metrics(self, names: Iterable[str]) -> Dict[str, dict]:
+        """
+        一次往返读取多个源的统计
+
+        Returns:
+            {name: {"samples", "success_rate", "p50_ms", "p95_ms", "last_error", "last_error_at",
+                    "state", "failures", "retry_at"}}；Redis 不可用时为空字典
+        """
+        names = list(names)
+        if not self.enabled or not names:
+            return {}
+        try:
+            pipe = self.client.pipeline(transaction=False)
+            for name in names:
+                pipe.lrange(self._samples_key(name), 0, -1)
+                pipe.hgetall(self._state_key(name))
+            values = pipe.execute()
+        except Exception as e:
+            logger.warning(f"读取源健康统计失败: {e}")
+            return {}
+
+        now = time.time()
+        result = {}
+        for name, raw_samples, raw_state in zip(names, values[::2], values[1::2]):
+            samples = [json.loads(s) for s in raw_samples]
+            failures = sum(
+                1 for _, _, cls in samples if cls and cls not in NON_FAILURE_ERRORS
+            )
+            latencies = [ms for _, ms, _ in samples if ms is not None]
+            state = self._decode(raw_state)
+            circuit = state.get("state", STATE_CLOSED)
+            retry_at = None
+            if circuit == STATE_OPEN:
+                retry_at = float(state.get("opened_at", 0)) + float(
+                    state.get("cooldown", 0)
+                )
+                if now >= retry_at:
+                    circuit = STATE_HALF_OPEN
+            result[name] = {
+                "samples": len(samples),
+                "success_rate": (
+                    round(1 - failures / len(samples), 4) if samples else None
+                ),
+                "p50_ms": _percentile(latencies, 0.5),
+                "p95_ms": _percentile(latencies, 0.95),
+                "last_error": state.get("last_error"),
+                "last_error_at": (
+                    float(state["last_error_at"]) if "last_error_at" in state else None
+                ),
+                "state": circuit,
+                "failures": int(state.get("failures", 0)),
+                "retry_at": retry_at,
+            }
+        return result
+
+    def score(self, weight: float, metrics: Optional[dict]) -> float:
+        """排序分数 = 配置权重 × 平滑成功率 × 延迟系数（没有统计时等于配置权重）"""
+        if not metrics or not metrics.get("samples"):
+            return float(weight)
+        config = self.config
+        n = metrics["samples"]
+        prior = float(config["prior"])
+        ok = metrics["success_rate"] * n
+        smoothed = (ok + prior) / (n + prior)
+        latency_factor = 1.0
+        if metrics.get("p50_ms"):
+            scale = float(config["latency_scale"])
+            latency_factor = scale / (scale + metrics["p50_ms"])
+        return float(weight) * smoothed * latency_factor
+
+    def rank(self, weights: Dict[str, float]) -> List[dict]:
+        """
+        按动态分数排序（熔断中的源排在最后）
+
+        Args:
+            weights: {源名称: 配置权重}
+
+        Returns:
+            [{"name", "weight", "score", "rank", "demoted", "metrics"}]，
+            demoted 表示排名低于按配置权重的排名
+        """
+        all_metrics = self.metrics(weights)
+        by_weight = sorted(weights, key=lambda n: weights[n], reverse=True)
+        entries = []
+        for name, weight in weights.items():
+            metrics = all_metrics.get(name)
+            entries.append(
+                {
+                    "name": name,
+                    "weight": weight,
+                    "score": round(self.score(weight, metrics), 2),
+                    "metrics": metrics,
+                }
+            )
+        entries.sort(
+            key=lambda e: (
+                (e["metrics"] or {}).get("state") == STATE_OPEN,
+                -e["score"],
+                -e["weight"],
+            )
+        )
+        for rank, entry in enumerate(entries):
+            entry["rank"] = rank + 1
+            entry["demoted"] = rank > by_weight.index(entry["name"])
+        return entries
+
+    def allow(self, name: str, metrics: Optional[dict]) -> bool:
+        """
+        熔断检查：closed 放行；open 拒绝；half_open 只放行一个试探请求
+
+        Args:
+            metrics: metrics() 返回的该源统计，None 表示没有统计
+        """
+        state = (metrics or {}).get("state", STATE_CLOSED)
+        if state == STATE_CLOSED:
+            return True
+        if state == STATE_OPEN:
+            return False
+        try:
+            # 试探请求结束（record）时删除；进程崩溃时按超时自动释放
+            return bool(self.client.set(self._trial_key(name), 1, nx=True, ex=120))
+        except Exception as e:
+            logger.warning(f"获取源 {name} 试探许可失败: {e}")
+            return True
+
+    def reset(self, name: Optional[str] = None) -> int:
+        """清除统计和熔断状态（name 为空时清除所有源），返回删除的键数"""
+        pattern = f"{KEY_PREFIX}:{name.lower() if name else '*'}:*"
+        keys = list(self.client.scan_iter(match=pattern, count=500))
+        return int(self.client.delete(*keys)) if keys else 0
+
+
+source_health = SourceHealth()
@@ -0,0 +1,153 @@
+"""
+阶段依赖图
+
+按依赖关系执行一组阶段：依赖全部成功的阶段立即开始，互不依赖的阶段在有界线程池中同时执行，
+记录每个阶段的耗时。访问数据库的阶段（inline=True）在调用 run() 的线程中执行，
+使用调用方的数据库连接和事务；其余阶段（网络请求、文件写入）在线程池中执行。
+
+用法：
+    graph = StageGraph(max_workers=4)
+    graph.add("scrape", lambda: scraper_manager.scrape(avid))
+    graph.add("cover", lambda: download(graph.results["scrape"]), deps=("scrape",))
+    graph.add("database", lambda: save(graph.results["scrape"]), deps=("scrape",), inline=True)
+    graph.run()
+    graph.timings  # {"scrape": 1.2, "cover": 0.4, "database": 0.05}
+"""
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, Iterable, Optional
+
+from loguru import logger
+
+STATUS_RUNNING = "running"
+STATUS_DONE = "done"
+STATUS_FAILED = "failed"
+STATUS_SKIPPED = "skipped"
+
+
+class StageGraph:
+    """按依赖关系并发执行的阶段集合（一次性使用）"""
+
+    def __init__(
+        self,
+        max_workers: int = 4,
+        name: str = "stage",
+        on_event: Optional[Callable[[str, str, Optional[float]], None]] = None,
+    ):
+        """
+        Args:
+            max_workers: 线程池大小（同时执行的非 inline 阶段数上限）
+            name: 线程名前缀
+            on_event: 阶段状态回调 on_event(阶段名, 状态, 耗时)，状态为
+                running/done/failed/skipped，running 与 skipped 时耗时为 None
+        """
+        self.max_workers = max(1, int(max_workers))
+        self.name = name
+        self.on_event = on_event
+        self.results: Dict[str, Any] = {}
+        self.errors: Dict[str, Exception] = {}
+        self.status: Dict[str, str] = {}
+        self.timings: Dict[str, float] = {}
+        self.elapsed = 0.0
+        self._stages: Dict[str, tuple] = {}
+        self._lock = threading.Lock()
+
+    def add(
+        self,
+        name: str,
+        func: Callable[[], Any],
+        deps: Iterable[str] = (),
+        inline: bool = False,
+    ):
+        """
+        添加阶段（也可以在其他阶段执行过程中添加，例如按刮削结果为每个演员添加头像阶段）
+
+        Args:
+            name: 阶段名称（唯一）
+            func: 无参数函数，返回值保存在 results[name]
+            deps: 依赖的阶段（必须已添加）；全部成功后才执行，有依赖失败或被跳过时本阶段跳过
+            inline: True 时在调用 run() 的线程中执行
+        """
+        deps = tuple(deps)
+        with self._lock:
+            if name in self._stages:
+                raise ValueError(f"阶段 {name} 已存在")
+            unknown = [d for d in deps if d not in self._stages]
+            if unknown:
+                raise ValueError(f"阶段 {name} 依赖的阶段不存在: {unknown}")
+            self._stages[name] = (func, deps, inline)
+
+    def _emit(self, name: str, status: str, elapsed: Optional[float] = None):
+        self.status[name] = status
+        if self.on_event:
+            try:
+                self.on_event(name, status, elapsed)
+            except Exception as e:
+                logger.warning(f"阶段事件回调失败 {name}: {e}")
+
+    def _execute(self, name: str, func: Callable[[], Any]):
+        """执行一个阶段，记录结果/异常和耗时（不抛出异常）"""
+        self._emit(name, STATUS_RUNNING)
+        start = time.perf_counter()
+        try:
+            self.results[name] = func()
+            status = STATUS_DONE
+        except Exception as e:
+            logger.error(f"阶段 {name} 失败: {e}")
+            self.errors[name] = e
+            status = STATUS_FAILED
+        elapsed = time.perf_counter() - start
+        self.timings[name] = elapsed
+        self._emit(name, status, elapsed)
+
+    def run(self) -> Dict[str, Any]:
+        """
+        执行所有阶段
+
+        Returns:
+            {阶段名: 返回值}
+
+        Raises:
+            有阶段抛出异常时，等其余可执行的阶段结束后，按添加顺序抛出第一个异常
+        """
+        start = time.perf_counter()
+        started = set()
+        running = {}
+        with ThreadPoolExecutor(
+            max_workers=self.max_workers, thread_name_prefix=self.name
+        ) as executor:
+            while True:
+                with self._lock:
+                    stages = list(self._stages.items())
+                inline, skipped = [], False
+                for name, (func, deps, is_inline) in stages:
+                    if name in started:
+                        continue
+                    states = [self.status.get(d) for d in deps]
+                    if any(s in (STATUS_FAILED, STATUS_SKIPPED) for s in states):
+                        started.add(name)
+                        self._emit(name, STATUS_SKIPPED)
+                        skipped = True
+                    elif all(s == STATUS_DONE for s in states):
+                        started.add(name)
+                        if is_inline:
+                            inline.append((name, func))
+                        else:
+                            running[executor.submit(self._execute, name, func)] = name
+                # 先提交线程池阶段，再在当前线程执行 inline 阶段
+                for name, func in inline:
+                    self._execute(name, func)
+                if inline or skipped:
+                    continue
+                if not running:
+                    break
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    running.pop(future)
+        self.elapsed = time.perf_counter() - start
+
+        for name in self._stages:
+            if name in self.errors:
+                raise self.errors[name]
+        return self.results
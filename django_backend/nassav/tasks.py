@@ -1,111 +1,106 @@
 """
 Celery异步任务定义
 """
+import json
+import threading
 from pathlib import Path
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Optional
 
 import redis
 from celery import shared_task
 from django.conf import settings
-from django_project.celery import app as celery_app
 from loguru import logger
 
+_redis_clients: Dict[str, redis.Redis] = {}
+_redis_clients_lock = threading.Lock()
+
+QUEUE_KEY = "nassav:task_queue"
+# 队列记录整体过期时间（秒）
+QUEUE_TTL = 86400
+# 任务登记（即任务锁）：存在即表示该 AVID 已排队或正在执行，值为任务ID
+TASK_LOCK_KEY = "nassav:task_lock:{avid}"
+# 下载任务登记的有效期（秒）；排队时间可能很长，存活性由调度队列/在途记录/槽位判断
+TASK_REGISTRY_TTL = 86400
+# 模拟下载任务登记的有效期（秒），不参与槽位调度，仅依赖过期时间回收
+MOCK_TASK_REGISTRY_TTL = 3600
+# 队列增量事件序号（INCR 单调递增，跨 Web/Worker 进程共享）
+QUEUE_SEQ_KEY = "nassav:queue_seq"
+# 已派发到 Celery 的下载任务（ZSET，分数为派发时间）
+INFLIGHT_KEY = "nassav:download_inflight"
+# 已派发但迟迟未占用槽位的任务，超过该时间（秒）不再计入在途数量
+DISPATCH_GRACE_SECONDS = 300
+# 下载进度写入 Redis 的最短间隔（秒）和最小百分比变化，两者满足其一才写入
+PROGRESS_WRITE_INTERVAL = 0.5
+PROGRESS_WRITE_STEP = 1.0
+
+# KEYS: 任务锁, 队列 hash；ARGV: avid, task_id, 队列记录 JSON, 锁过期时间, 队列过期时间
+# SET NX 登记任务锁，成功后写入 PENDING 队列记录；已登记时返回 0（重复任务）
+_REGISTER_TASK_SCRIPT = """
+if not redis.call('SET', KEYS[1], ARGV[2], 'NX', 'EX', ARGV[4]) then
+    return 0
+end
+redis.call('HSET', KEYS[2], ARGV[1], ARGV[3])
+redis.call('EXPIRE', KEYS[2], ARGV[5])
+return 1
+"""
+
+# KEYS: 任务锁, 队列 hash；ARGV: avid, task_id, task_type, 锁过期时间, 队列过期时间, 当前时间
+# 一次往返完成：写任务锁 -> 将队列记录置为 STARTED（记录缺失时补建）-> 续期队列 hash
+_START_TASK_SCRIPT = """
+redis.call('SETEX', KEYS[1], ARGV[4], ARGV[2])
+local now = tonumber(ARGV[6])
+local raw = redis.call('HGET', KEYS[2], ARGV[1])
+local task
+if raw then
+    task = cjson.decode(raw)
+else
+    task = {task_id = ARGV[2], avid = ARGV[1], task_type = ARGV[3], created_at = now}
+end
+task['state'] = 'STARTED'
+task['updated_at'] = now
+local encoded = cjson.encode(task)
+redis.call('HSET', KEYS[2], ARGV[1], encoded)
+redis.call('EXPIRE', KEYS[2], ARGV[5])
+return encoded
+"""
+
 
 def get_redis_client():
-    """获取Redis客户端"""
-    return redis.from_url(settings.CELERY_BROKER_URL)
+    """
+    获取Redis客户端
+
+    同一进程内共享一个连接池（按 URL 缓存），避免每次调用都新建连接。
+    redis-py 的连接池会在 fork 后自动重建，Celery prefork 子进程可直接复用。
+    """
+    url = settings.CELERY_BROKER_URL
+    client = _redis_clients.get(url)
+    if client is None:
+        with _redis_clients_lock:
+            client = _redis_clients.get(url)
+            if client is None:
+                client = redis.Redis(connection_pool=redis.ConnectionPool.from_url(url))
+                _redis_clients[url] = client
+    return client
 
 
 def is_task_existed(avid: str):
     """
     检查任务是否已存在于队列中
 
+    只读取 Redis 任务登记（O(1)），不再向 Worker 广播 inspect 请求。
+
     Args:
         avid: 视频ID
 
     Returns:
         bool: 如果任务已存在返回True，否则返回False
     """
-    avid = avid.upper()
-    # 支持真实下载任务和模拟下载任务
-    task_names = [
-        "nassav.tasks.download_video_task",
-        "nassav.tasks.mock_download_video_task",
-    ]
-
-    lock_key = f"nassav:task_lock:{avid}"
-
-    # 检查Redis锁（容错）
-    try:
-        redis_client = get_redis_client()
-        try:
-            if redis_client.exists(lock_key):
-                return True
-        except Exception as e:
-            logger.error(f"检查 Redis 锁失败: {e}")
-    except Exception as e:
-        logger.error(f"获取 Redis 客户端失败: {e}")
-
-    # 检查Celery队列中的任务（inspect 可能失败或返回 None）
     try:
-        insp = celery_app.control.inspect()
+        return bool(get_redis_client().exists(TASK_LOCK_KEY.format(avid=avid.upper())))
     except Exception as e:
-        logger.error(f"获取 Celery inspector 失败: {e}")
-        insp = None
-
-    if insp is None:
-        # 如果无法检查 Celery 状态，依赖 Redis 锁判断（已检查），无法进一步判断时返回 False
-        logger.info("无法获取 Celery inspector，跳过队列检查 (依赖 Redis 锁)。")
+        logger.error(f"检查任务登记失败: {e}")
         return False
 
-    # 检查正在执行的任务
-    try:
-        active_tasks = insp.active() or {}
-        for worker, tasks in active_tasks.items():
-            for task in tasks:
-                if (
-                    task.get("name") in task_names
-                    and task.get("args")
-                    and len(task["args"]) > 0
-                    and task["args"][0].upper() == avid
-                ):
-                    return True
-    except Exception as e:
-        logger.error(f"检查 active 任务失败: {e}")
-
-    # 检查队列中等待的任务
-    try:
-        scheduled_tasks = insp.scheduled() or {}
-        for worker, tasks in scheduled_tasks.items():
-            for task in tasks:
-                task_info = task.get("request", {})
-                if (
-                    task_info.get("task") in task_names
-                    and task_info.get("args")
-                    and len(task_info["args"]) > 0
-                    and task_info["args"][0].upper() == avid
-                ):
-                    return True
-    except Exception as e:
-        logger.error(f"检查 scheduled 任务失败: {e}")
-
-    # 检查保留的任务（reserved tasks）
-    try:
-        reserved_tasks = insp.reserved() or {}
-        for worker, tasks in reserved_tasks.items():
-            for task in tasks:
-                if (
-                    task.get("name") in task_names
-                    and task.get("args")
-                    and len(task["args"]) > 0
-                    and task["args"][0].upper() == avid
-                ):
-                    return True
-    except Exception as e:
-        logger.error(f"检查 reserved 任务失败: {e}")
-
-    return False
-
 
 def set_task_progress(
     avid: str,
@@ -113,6 +108,7 @@ def set_task_progress(
     speed: str = "N/A",
     eta: str = None,
     downloaded: str = None,
+    **details,
 ):
     """
     设置任务下载进度
@@ -123,6 +119,8 @@ def set_task_progress(
         speed: 下载速度字符串
         eta: 预计剩余时间（可选）
         downloaded: 已下载大小（可选）
+        **details: 其他进度字段（如 downloaded_bytes、total_bytes、done_segments、
+            total_segments、speed_bps），值为 None 的字段不写入
     """
     redis_client = get_redis_client()
     progress_key = f"nassav:task_progress:{avid.upper()}"
@@ -135,6 +133,7 @@ def set_task_progress(
         progress_data["eta"] = eta
     if downloaded is not None:
         progress_data["downloaded"] = downloaded
+    progress_data.update({k: v for k, v in details.items() if v is not None})
     # 设置过期时间为1小时
     redis_client.setex(progress_key, 3600, __import__("json").dumps(progress_data))
 
@@ -169,111 +168,12 @@ def remove_task_progress(avid: str):
     redis_client.delete(progress_key)
 
 
-def get_task_queue_status() -> Dict[str, Any]:
-    """
-    获取当前任务队列状态
-
-    Returns:
-        dict: 包含活跃任务、等待任务的信息，以及任务计数
-    """
-    # 支持真实下载任务和模拟下载任务
-    task_names = [
-        "nassav.tasks.download_video_task",
-        "nassav.tasks.mock_download_video_task",
-    ]
-    insp = celery_app.control.inspect()
-
-    active_tasks_list = []
-    pending_tasks_list = []
-
-    # 获取正在执行的任务
-    active_tasks = insp.active() or {}
-    for worker, tasks in active_tasks.items():
-        for task in tasks:
-            if (
-                task.get("name") in task_names
-                and task.get("args")
-                and len(task["args"]) > 0
-            ):
-                avid = task["args"][0].upper()
-                task_info = {
-                    "task_id": task.get("id"),
-                    "avid": avid,
-                    "state": "STARTED",
-                    "worker": worker,
-                    "time_start": task.get("time_start"),
-                    "task_type": "mock"
-                    if task.get("name") == "nassav.tasks.mock_download_video_task"
-                    else "download",
-                }
-                # 添加进度信息
-                progress = get_task_progress(avid)
-                if progress:
-                    task_info["progress"] = {
-                        "percent": progress["percent"],
-                        "speed": progress["speed"],
-                    }
-                active_tasks_list.append(task_info)
-
-    # 获取计划中的任务（pending）
-    scheduled_tasks = insp.scheduled() or {}
-    for worker, tasks in scheduled_tasks.items():
-        for task in tasks:
-            task_info = task.get("request", {})
-            if (
-                task_info.get("task") in task_names
-                and task_info.get("args")
-                and len(task_info["args"]) > 0
-            ):
-                pending_tasks_list.append(
-                    {
-                        "task_id": task_info.get("id"),
-                        "avid": task_info["args"][0].upper(),
-                        "task_type": "mock"
-                        if task_info.get("task")
-                        == "nassav.tasks.mock_download_video_task"
-                        else "download",
-                    }
-                )
-
-    # 获取保留的任务（也算 pending）
-    reserved_tasks = insp.reserved() or {}
-    for worker, tasks in reserved_tasks.items():
-        for task in tasks:
-            if (
-                task.get("name") in task_names
-                and task.get("args")
-                and len(task["args"]) > 0
-            ):
-                pending_tasks_list.append(
-                    {
-                        "task_id": task.get("id"),
-                        "avid": task["args"][0].upper(),
-                        "task_type": "mock"
-                        if task.get("name") == "nassav.tasks.mock_download_video_task"
-                        else "download",
-                    }
-                )
-
-    # 计算统计数据
-    active_count = len(active_tasks_list)
-    pending_count = len(pending_tasks_list)
-
-    return {
-        "active_tasks": active_tasks_list,
-        "pending_tasks": pending_tasks_list,
-        "active_count": active_count,
-        "pending_count": pending_count,
-        "total_count": active_count + pending_count,
-    }
-
-
 def notify_task_update(update_type: str, data: dict):
     """
     发送任务更新通知到WebSocket
 
     Args:
-        update_type: 更新类型 ('task_started', 'task_completed', 'task_failed', 'queue_status')
+        update_type: 更新类型 ('task_started', 'task_completed', 'task_failed', 'queue_status', 'queue_event')
         data: 任务数据
     """
     try:
@@ -284,6 +184,48 @@ def notify_task_update(update_type: str, data: dict):
         logger.error(f"发送任务更新通知失败: {str(e)}")
 
 
+def notify_queue_event(event: str, **payload):
+    """
+    发送增量队列事件（queue_event），代替每次状态变化都广播完整队列
+
+    每个事件携带单调递增的 seq；客户端发现 seq 不连续时通过 get_queue_status 请求完整快照
+    （快照中的 seq 表示已包含的最后一个事件）。
+
+    Args:
+        event: 事件类型（'added', 'started', 'progress', 'removed', 'reordered'）
+        **payload: 事件内容（task 为任务记录，reordered 事件为 order 列表）
+    """
+    try:
+        seq = get_redis_client().incr(QUEUE_SEQ_KEY)
+    except Exception as e:
+        logger.error(f"生成队列事件序号失败: {e}")
+        return
+    notify_task_update("queue_event", {"seq": seq, "event": event, **payload})
+
+
+def notify_queue_snapshot():
+    """广播完整队列快照（仅用于批量变化，如对账修复）"""
+    notify_task_update("queue_status", get_full_task_queue())
+
+
+def notify_queue_reordered():
+    """广播调度队列中等待任务的最新排队位置"""
+    try:
+        order = [
+            {
+                "avid": item["avid"],
+                "position": item["position"],
+                "priority": item.get("priority", 0),
+                "effective_priority": item["effective_priority"],
+            }
+            for item in get_download_scheduler().ordered()
+        ]
+    except Exception as e:
+        logger.error(f"获取下载调度顺序失败: {e}")
+        return
+    notify_queue_event("reordered", order=order)
+
+
 def create_task_lock(avid: str, task_id: str, expire_time: int = 3600):
     """
     创建任务锁
@@ -294,34 +236,80 @@ def create_task_lock(avid: str, task_id: str, expire_time: int = 3600):
         expire_time: 锁过期时间（秒）
     """
     redis_client = get_redis_client()
-    lock_key = f"nassav:task_lock:{avid.upper()}"
+    lock_key = TASK_LOCK_KEY.format(avid=avid.upper())
     redis_client.setex(lock_key, expire_time, task_id)
 
 
-def add_task_to_queue(avid: str, task_id: str, task_type: str = "download"):
-    """
-    添加任务到 Redis 队列记录（用于追踪完整任务列表）
-
-    Args:
-        avid: 视频ID
-        task_id: 任务ID
-        task_type: 任务类型（'download' 或 'mock'）
-    """
+def _build_queue_entry(avid: str, task_id: str, task_type: str) -> Dict[str, Any]:
+    """构造 PENDING 状态的队列记录"""
     import time
 
-    redis_client = get_redis_client()
-    queue_key = "nassav:task_queue"
-    task_data = {
+    return {
         "task_id": task_id,
         "avid": avid.upper(),
         "state": "PENDING",
         "task_type": task_type,
         "created_at": time.time(),
     }
+
+
+def register_task(
+    avid: str,
+    task_id: str,
+    task_type: str = "download",
+    ttl: int = TASK_REGISTRY_TTL,
+) -> Dict[str, Any] | None:
+    """
+    原子登记任务：SET NX 创建任务锁并写入队列记录（单次 Redis 往返）
+
+    Args:
+        avid: 视频ID
+        task_id: 任务ID
+        task_type: 任务类型（'download' 或 'mock'）
+        ttl: 任务锁有效期（秒）
+
+    Returns:
+        dict: 登记成功返回写入的队列记录；该 AVID 已登记（重复任务）返回 None
+    """
+    avid = avid.upper()
+    entry = _build_queue_entry(avid, task_id, task_type)
+    registered = get_redis_client().eval(
+        _REGISTER_TASK_SCRIPT,
+        2,
+        TASK_LOCK_KEY.format(avid=avid),
+        QUEUE_KEY,
+        avid,
+        task_id,
+        json.dumps(entry),
+        ttl,
+        QUEUE_TTL,
+    )
+    return entry if registered else None
+
+
+def add_task_to_queue(avid: str, task_id: str, task_type: str = "download", pipe=None):
+    """
+    添加任务到 Redis 队列记录（用于追踪完整任务列表）
+
+    Args:
+        avid: 视频ID
+        task_id: 任务ID
+        task_type: 任务类型（'download' 或 'mock'）
+        pipe: 可选的 Redis pipeline，传入时只排队命令，由调用方统一 execute
+    """
+    own_pipe = pipe is None
+    if own_pipe:
+        pipe = get_redis_client().pipeline(transaction=False)
     # 使用 HSET 存储，key 为 avid，value 为任务数据 JSON
-    redis_client.hset(queue_key, avid.upper(), __import__("json").dumps(task_data))
+    pipe.hset(
+        QUEUE_KEY,
+        avid.upper(),
+        json.dumps(_build_queue_entry(avid, task_id, task_type)),
+    )
     # 设置整个 hash 的过期时间（24小时）
-    redis_client.expire(queue_key, 86400)
+    pipe.expire(QUEUE_KEY, QUEUE_TTL)
+    if own_pipe:
+        pipe.execute()
 
 
 def update_task_state_in_queue(avid: str, state: str):
@@ -333,7 +321,7 @@ def update_task_state_in_queue(avid: str, state: str):
         state: 任务状态（'PENDING', 'STARTED', 'SUCCESS', 'FAILURE'）
     """
     redis_client = get_redis_client()
-    queue_key = "nassav:task_queue"
+    queue_key = QUEUE_KEY
     avid_upper = avid.upper()
 
     # 获取现有任务数据
@@ -352,69 +340,130 @@ def remove_task_from_queue(avid: str):
     Args:
         avid: 视频ID
     """
-    redis_client = get_redis_client()
-    queue_key = "nassav:task_queue"
-    redis_client.hdel(queue_key, avid.upper())
+    get_redis_client().hdel(QUEUE_KEY, avid.upper())
+
+
+def _empty_task_queue(seq: Optional[int]) -> Dict[str, Any]:
+    return {
+        "active_tasks": [],
+        "pending_tasks": [],
+        "active_count": 0,
+        "pending_count": 0,
+        "total_count": 0,
+        "seq": seq,
+    }
+
+
+def parse_queue_entries(all_tasks_data: Dict) -> List[Dict[str, Any]]:
+    """解析 Redis 队列哈希中的任务记录（跳过损坏的记录）"""
+    all_tasks = []
+    for task_json in all_tasks_data.values():
+        try:
+            all_tasks.append(json.loads(task_json))
+        except Exception as e:
+            logger.error(f"解析任务数据失败: {e}")
+            continue
+    return all_tasks
+
+
+def task_progress_keys(all_tasks: List[Dict[str, Any]]) -> List[str]:
+    """返回任务进度键列表（与 all_tasks 一一对应，供 MGET 批量读取）"""
+    return [f"nassav:task_progress:{t['avid']}" for t in all_tasks]
+
+
+def build_task_queue(
+    seq: int,
+    all_tasks: List[Dict[str, Any]],
+    progress_list: List,
+    schedule: List[Dict[str, Any]],
+) -> Dict[str, Any]:
+    """
+    由已读取的 Redis 数据组装完整任务队列（同步接口与 WebSocket 异步快照共用）
+
+    Args:
+        seq: 快照包含的最后一个队列事件序号
+        all_tasks: 解析后的队列记录
+        progress_list: 与 all_tasks 对应的进度 JSON（无进度为 None）
+        schedule: 调度器派发顺序（DownloadScheduler.ordered 的返回值）
+
+    Returns:
+        dict: 包含完整任务列表的字典
+    """
+    if not all_tasks:
+        return _empty_task_queue(seq)
+
+    for task, progress_str in zip(all_tasks, progress_list):
+        if progress_str:
+            # 包含所有可用的进度字段
+            task["progress"] = json.loads(progress_str)
+
+    # 按状态分类
+    active_tasks = [t for t in all_tasks if t.get("state") == "STARTED"]
+    pending_tasks = [t for t in all_tasks if t.get("state") == "PENDING"]
+
+    # 附加调度信息：已派发到 Celery 的任务排在前面（按创建时间），
+    # 其余按调度器派发顺序排列（position 从 1 开始）
+    schedule = {item["avid"]: item for item in schedule}
+    for task in pending_tasks:
+        item = schedule.get(task["avid"])
+        if item:
+            task["position"] = item["position"]
+            task["priority"] = item.get("priority", 0)
+            task["is_favorite"] = item.get("is_favorite", False)
+            task["effective_priority"] = item["effective_priority"]
+        else:
+            task["position"] = 0
+
+    # 按创建时间排序
+    active_tasks.sort(key=lambda x: x.get("created_at", 0))
+    pending_tasks.sort(key=lambda x: (x["position"], x.get("created_at", 0)))
+
+    return {
+        "active_tasks": active_tasks,
+        "pending_tasks": pending_tasks,
+        "active_count": len(active_tasks),
+        "pending_count": len(pending_tasks),
+        "total_count": len(all_tasks),
+        "seq": seq,
+    }
 
 
 def get_full_task_queue() -> Dict[str, Any]:
     """
     从 Redis 获取完整任务队列（包括所有 pending 和 active 任务）
 
+    同步接口，供视图和 Celery 任务使用；WebSocket 消费者使用 nassav.queue_snapshot 的异步版本。
+
     Returns:
         dict: 包含完整任务列表的字典
     """
     redis_client = get_redis_client()
-    queue_key = "nassav:task_queue"
 
     try:
-        all_tasks_data = redis_client.hgetall(queue_key)
-
-        if not all_tasks_data:
-            return {
-                "active_tasks": [],
-                "pending_tasks": [],
-                "active_count": 0,
-                "pending_count": 0,
-                "total_count": 0,
-            }
-
-        # 解析任务数据
-        all_tasks = []
-        for task_json in all_tasks_data.values():
-            try:
-                task = __import__("json").loads(task_json)
-
-                # 为每个任务添加进度信息（如果有）
-                progress = get_task_progress(task["avid"])
-                if progress:
-                    # 包含所有可用的进度字段
-                    task["progress"] = progress
+        # 先读序号再读队列：快照至少包含 seq 及之前的所有事件（之后的事件重放是幂等的）
+        pipe = redis_client.pipeline(transaction=False)
+        pipe.get(QUEUE_SEQ_KEY)
+        pipe.hgetall(QUEUE_KEY)
+        seq, all_tasks_data = pipe.execute()
+        seq = int(seq or 0)
 
-                all_tasks.append(task)
-            except Exception as e:
-                logger.error(f"解析任务数据失败: {e}")
-                continue
+        all_tasks = parse_queue_entries(all_tasks_data)
+        if not all_tasks:
+            return _empty_task_queue(seq)
 
-        # 按状态分类
-        active_tasks = [t for t in all_tasks if t.get("state") == "STARTED"]
-        pending_tasks = [t for t in all_tasks if t.get("state") == "PENDING"]
+        # 一次 MGET 批量读取所有任务的进度信息（如果有）
+        progress_list = redis_client.mget(task_progress_keys(all_tasks))
 
-        # 按创建时间排序
-        active_tasks.sort(key=lambda x: x.get("created_at", 0))
-        pending_tasks.sort(key=lambda x: x.get("created_at", 0))
+        try:
+            schedule = get_download_scheduler().ordered()
+        except Exception as e:
+            logger.error(f"获取下载调度顺序失败: {e}")
+            schedule = []
 
-        return {
-            "active_tasks": active_tasks,
-            "pending_tasks": pending_tasks,
-            "active_count": len(active_tasks),
-            "pending_count": len(pending_tasks),
-            "total_count": len(all_tasks),
-        }
+        return build_task_queue(seq, all_tasks, progress_list, schedule)
     except Exception as e:
         logger.error(f"获取完整任务队列失败: {e}")
-        # 如果 Redis 队列失败，回退到原来的 Celery inspector 方法
-        return get_task_queue_status()
+        return _empty_task_queue(None)
 
 
 def remove_task_lock(avid: str):
@@ -424,133 +473,474 @@ def remove_task_lock(avid: str):
     Args:
         avid: 视频ID
     """
+    get_redis_client().delete(TASK_LOCK_KEY.format(avid=avid.upper()))
+
+
+def mark_task_started(
+    avid: str,
+    task_id: str,
+    task_type: str = "download",
+    ttl: int = TASK_REGISTRY_TTL,
+):
+    """
+    标记任务开始执行：续期任务锁并将队列记录置为 STARTED（单次 Redis 往返）
+
+    Args:
+        avid: 视频ID
+        task_id: 任务ID
+        task_type: 队列记录缺失时补建使用的任务类型
+        ttl: 任务锁有效期（秒）
+
+    Returns:
+        dict: 更新后的队列记录
+    """
+    import json
+    import time
+
+    avid = avid.upper()
+    encoded = get_redis_client().eval(
+        _START_TASK_SCRIPT,
+        2,
+        TASK_LOCK_KEY.format(avid=avid),
+        QUEUE_KEY,
+        avid,
+        task_id,
+        task_type,
+        ttl,
+        QUEUE_TTL,
+        time.time(),
+    )
+    return json.loads(encoded)
+
+
+def mark_task_retrying(avid: str, task_id: str, countdown: float) -> Dict[str, Any]:
+    """
+    标记任务等待重试：续期任务锁和在途记录，队列记录置回 PENDING（单次 Redis 往返写入）
+
+    重试倒计时期间该 AVID 仍视为已排队：重复提交会被任务锁拦截，
+    派发器和对账任务也不会把它当作丢失的任务清理。
+
+    Args:
+        avid: 视频ID
+        task_id: 任务ID
+        countdown: 距离重新执行的秒数
+
+    Returns:
+        dict: 更新后的队列记录
+    """
+    import time
+
+    avid = avid.upper()
     redis_client = get_redis_client()
-    lock_key = f"nassav:task_lock:{avid.upper()}"
-    redis_client.delete(lock_key)
+    now = time.time()
+    raw = redis_client.hget(QUEUE_KEY, avid)
+    entry = json.loads(raw) if raw else _build_queue_entry(avid, task_id, "download")
+    entry["state"] = "PENDING"
+    entry["updated_at"] = now
+
+    pipe = redis_client.pipeline(transaction=False)
+    pipe.setex(TASK_LOCK_KEY.format(avid=avid), TASK_REGISTRY_TTL, task_id)
+    pipe.hset(QUEUE_KEY, avid, json.dumps(entry))
+    pipe.expire(QUEUE_KEY, QUEUE_TTL)
+    # 分数为预计重新执行的时间，派发器的宽限期从重新执行时开始计算
+    pipe.zadd(INFLIGHT_KEY, {avid: now + countdown})
+    pipe.execute()
+    return entry
+
+
+def clear_task_state(avid: str, remove_from_queue: bool = False):
+    """
+    任务结束后清理任务锁、进度信息和在途记录（单次 Redis 往返）
+
+    Args:
+        avid: 视频ID
+        remove_from_queue: 是否同时移除队列记录
+    """
+    avid = avid.upper()
+    pipe = get_redis_client().pipeline(transaction=False)
+    pipe.delete(TASK_LOCK_KEY.format(avid=avid), f"nassav:task_progress:{avid}")
+    pipe.zrem(INFLIGHT_KEY, avid)
+    if remove_from_queue:
+        pipe.hdel(QUEUE_KEY, avid)
+    pipe.execute()
+
 
+def get_download_slots():
+    """
+    获取下载槽位信号量（槽位数量和租约时长来自 Downloader 配置）
 
-def acquire_global_download_lock(timeout: int = 3600):
+    Returns:
+        DownloadSlots: 下载槽位信号量
     """
-    获取全局下载锁，确保同一时间只有一个下载任务在执行
+    from .download_slots import DownloadSlots
+
+    return DownloadSlots(
+        get_redis_client(),
+        limit=settings.DOWNLOAD_SLOTS,
+        lease_ttl=settings.DOWNLOAD_SLOT_LEASE_TTL,
+    )
+
+
+def park_download_task(task, avid: str, parked: int):
+    """
+    暂存下载任务：没有空闲槽位时延迟重新入队，立即释放 Worker 进程
+
+    与 self.retry 不同，暂存不计入失败重试次数。
 
     Args:
-        timeout: 锁超时时间（秒）
+        task: 当前绑定的 Celery 任务实例
+        avid: 视频ID
+        parked: 已暂存次数
+    """
+    import time
+
+    from celery.exceptions import Retry
+
+    # 暂存期间仍计入在途任务，避免被派发器和对账任务当作丢失的任务清理
+    try:
+        get_redis_client().zadd(INFLIGHT_KEY, {avid: time.time()})
+    except Exception as e:
+        logger.error(f"刷新在途记录失败 {avid}: {e}")
+
+    countdown = settings.DOWNLOAD_SLOT_PARK_DELAY
+    sig = task.signature_from_request(
+        task.request,
+        args=[avid],
+        kwargs={"parked": parked + 1},
+        countdown=countdown,
+        retries=task.request.retries,
+    )
+    sig.apply_async()
+    raise Retry(f"等待下载槽位: {avid}", when=countdown, sig=sig)
+
+
+def get_download_scheduler(redis_client=None):
+    """
+    获取下载调度器（收藏加成和老化速率来自 Downloader 配置）
+
+    Args:
+        redis_client: 可选的 Redis 客户端，默认使用共享客户端
+
+    Returns:
+        DownloadScheduler: 下载优先级队列
+    """
+    from .download_scheduler import DownloadScheduler
+
+    return DownloadScheduler(
+        redis_client if redis_client is not None else get_redis_client(),
+        favorite_boost=settings.DOWNLOAD_FAVORITE_BOOST,
+        aging_per_hour=settings.DOWNLOAD_AGING_PER_HOUR,
+    )
+
+
+def dispatch_download_queue() -> List[str]:
+    """
+    按优先级把等待中的下载任务派发到 Celery，在途任务数不超过下载槽位数
+
+    在途任务记录在 nassav:download_inflight（ZSET，分数为派发时间），任务结束时移除。
 
     Returns:
-        bool: 成功获取锁返回True，否则返回False
+        list: 本次派发的 AVID 列表
     """
+    import time
+
     redis_client = get_redis_client()
-    lock_key = "nassav:global_download_lock"
-    # 使用 set nx ex 原子操作获取锁
-    return redis_client.set(lock_key, "locked", nx=True, ex=timeout)
+    lock = redis_client.lock("nassav:download_dispatch_lock", timeout=30)
+    if not lock.acquire(blocking=True, blocking_timeout=5):
+        logger.warning("获取下载派发锁超时，跳过本次派发")
+        return []
+
+    dispatched = []
+    try:
+        slots = get_download_slots()
+        holders = set(slots.holders())
+
+        # 清理长时间未开始执行且未持有槽位的在途记录（如 Worker 崩溃丢失的消息）
+        now = time.time()
+        for member, dispatched_at in redis_client.zrange(
+            INFLIGHT_KEY, 0, -1, withscores=True
+        ):
+            avid = member.decode() if isinstance(member, bytes) else member
+            if avid not in holders and now - dispatched_at > DISPATCH_GRACE_SECONDS:
+                redis_client.zrem(INFLIGHT_KEY, avid)
+
+        free = slots.limit - redis_client.zcard(INFLIGHT_KEY)
+        for item in get_download_scheduler().pop_next(free):
+            avid = item["avid"]
+            redis_client.zadd(INFLIGHT_KEY, {avid: now})
+            download_video_task.apply_async(args=[avid], task_id=item.get("task_id"))
+            dispatched.append(avid)
+    finally:
+        try:
+            lock.release()
+        except Exception:
+            pass
+
+    if dispatched:
+        logger.info(f"已派发下载任务: {dispatched}")
+        notify_queue_reordered()
+    return dispatched
 
 
-def release_global_download_lock():
+@shared_task(name="nassav.tasks.dispatch_download_queue_task", ignore_result=True)
+def dispatch_download_queue_task():
+    """定期派发等待中的下载任务（供 Celery Beat 调度，兜底任务结束时未触发派发的情况）"""
+    try:
+        dispatch_download_queue()
+    except Exception as e:
+        logger.error(f"派发下载队列失败: {e}")
+
+
+def reconcile_task_registry() -> Dict[str, List[str]]:
     """
-    释放全局下载锁
+    对账任务登记与实际任务状态，修复漂移
+
+    存活判定：
+        下载任务：仍在调度队列、在途记录或持有下载槽位，或最近 DISPATCH_GRACE_SECONDS 秒内有更新
+        模拟任务：任务锁仍存在（依赖锁过期回收）
+
+    修复：
+        - 已失效的任务：删除任务锁、进度和队列记录（如 Worker 崩溃遗留的登记）
+        - 存活但缺少任务锁：补建任务锁，避免重复提交
+        - 存活但缺少队列记录：补建队列记录
+
+    Returns:
+        dict: removed / relocked / restored 三类 AVID 列表
     """
+    import json
+    import time
+
     redis_client = get_redis_client()
-    lock_key = "nassav:global_download_lock"
-    redis_client.delete(lock_key)
+    now = time.time()
+
+    entries = {}
+    for avid, raw in redis_client.hgetall(QUEUE_KEY).items():
+        avid = avid.decode() if isinstance(avid, bytes) else avid
+        try:
+            entries[avid] = json.loads(raw)
+        except Exception:
+            entries[avid] = {}
+
+    lock_prefix = TASK_LOCK_KEY.format(avid="")
+    locked = {}
+    for key in redis_client.scan_iter(match=f"{lock_prefix}*", count=500):
+        key = key.decode() if isinstance(key, bytes) else key
+        locked[key[len(lock_prefix) :]] = key
+
+    # 先读登记再读存活状态；持有派发锁，避免任务在出队与写入在途记录之间被误判
+    lock = redis_client.lock("nassav:download_dispatch_lock", timeout=30)
+    if not lock.acquire(blocking=True, blocking_timeout=5):
+        logger.warning("获取下载派发锁超时，跳过本次对账")
+        return {"removed": [], "relocked": [], "restored": []}
+    try:
+        queued = {item["avid"] for item in get_download_scheduler().ordered()}
+        holders = set(get_download_slots().holders())
+        inflight = {
+            m.decode() if isinstance(m, bytes) else m
+            for m in redis_client.zrange(INFLIGHT_KEY, 0, -1)
+        }
+    finally:
+        try:
+            lock.release()
+        except Exception:
+            pass
+
+    result = {"removed": [], "relocked": [], "restored": []}
+    for avid in sorted(set(entries) | set(locked)):
+        entry = entries.get(avid)
+        if (entry or {}).get("task_type") == "mock":
+            alive = avid in locked
+        else:
+            last_seen = (entry or {}).get("updated_at") or (entry or {}).get(
+                "created_at", 0
+            )
+            alive = (
+                avid in queued
+                or avid in inflight
+                or avid in holders
+                or (entry is not None and now - last_seen < DISPATCH_GRACE_SECONDS)
+            )
+
+        if not alive:
+            clear_task_state(avid, remove_from_queue=True)
+            result["removed"].append(avid)
+            continue
+
+        task_id = (entry or {}).get("task_id") or ""
+        if avid not in locked:
+            redis_client.set(
+                TASK_LOCK_KEY.format(avid=avid), task_id, nx=True, ex=TASK_REGISTRY_TTL
+            )
+            result["relocked"].append(avid)
+        if entry is None:
+            if not task_id:
+                raw_task_id = redis_client.get(locked[avid])
+                task_id = raw_task_id.decode() if raw_task_id else ""
+            add_task_to_queue(avid, task_id, task_type="download")
+            if avid in holders:
+                update_task_state_in_queue(avid, "STARTED")
+            result["restored"].append(avid)
+
+    if any(result.values()):
+        logger.warning(f"任务登记对账修复: {result}")
+    return result
+
+
+@shared_task(name="nassav.tasks.reconcile_task_registry_task", ignore_result=True)
+def reconcile_task_registry_task():
+    """定期对账任务登记（供 Celery Beat 调度）"""
+    try:
+        result = reconcile_task_registry()
+        if any(result.values()):
+            notify_queue_snapshot()
+    except Exception as e:
+        logger.error(f"任务登记对账失败: {e}")
+
+
+@shared_task(name="nassav.tasks.probe_tripped_sources_task", ignore_result=True)
+def probe_tripped_sources_task():
+    """定期试探冷却期已过的熔断源（供 Celery Beat 调度），源恢复后无需等待实际请求"""
+    from nassav.source.SourceManager import source_manager
+
+    try:
+        result = source_manager.probe_tripped_sources()
+        if result:
+            logger.info(f"熔断源试探结果: {result}")
+    except Exception as e:
+        logger.error(f"试探熔断源失败: {e}")
 
 
-def wait_for_global_download_lock(max_wait_time: int = 600, check_interval: int = 5):
+@shared_task(name="nassav.tasks.refresh_expiring_cookies_task", ignore_result=True)
+def refresh_expiring_cookies_task():
+    """定期刷新即将过期的源 Cookie（供 Celery Beat 调度），过期后的第一次请求无需等待获取 Cookie"""
+    from nassav.source.SourceManager import source_manager
+
+    try:
+        result = source_manager.refresh_expiring_cookies()
+        if result:
+            logger.info(f"Cookie 刷新结果: {result}")
+    except Exception as e:
+        logger.error(f"刷新 Cookie 失败: {e}")
+
+
+def reprioritize_download(
+    avid: str, priority: int | None = None, bump: bool = False
+) -> bool:
     """
-    等待获取全局下载锁
+    调整等待中下载任务的优先级
 
     Args:
-        max_wait_time: 最大等待时间（秒）
-        check_interval: 检查间隔（秒）
+        avid: 视频ID
+        priority: 新的显式优先级
+        bump: 是否直接提到队首（优先于 priority）
 
     Returns:
-        bool: 成功获取锁返回True，超时返回False
+        bool: 任务不在等待队列中时返回 False
     """
-    import time
+    scheduler = get_download_scheduler()
+    if bump:
+        ok = scheduler.bump(avid)
+    elif priority is not None:
+        ok = scheduler.set_priority(avid, priority)
+    else:
+        ok = scheduler.is_queued(avid)
+
+    if ok:
+        notify_queue_reordered()
+    return ok
 
-    elapsed = 0
-    while elapsed < max_wait_time:
-        if acquire_global_download_lock():
-            return True
-        time.sleep(check_interval)
-        elapsed += check_interval
-    logger.warning(f"等待全局下载锁超时: {max_wait_time}秒")
-    return False
+
+def reorder_download_queue(avids: List[str]) -> List[str]:
+    """
+    按给定顺序把等待中的下载任务排到队首
+
+    Args:
+        avids: AVID 列表，第一个为新的队首
+
+    Returns:
+        list: 实际调整的 AVID
+    """
+    moved = get_download_scheduler().reorder(avids)
+    if moved:
+        notify_queue_reordered()
+    return moved
 
 
 @shared_task(bind=True, max_retries=3, default_retry_delay=60)
-def download_video_task(self, avid: str):
+def download_video_task(self, avid: str, parked: int = 0):
     """
     异步下载视频任务
 
     Args:
         avid: 视频编号
+        parked: 因槽位已满被暂存的次数（由 park_download_task 维护）
 
     Returns:
         dict: 下载结果
     """
+    from celery.exceptions import Retry
+
     from .services import video_download_service
 
     avid = avid.upper()
     logger.info(f"开始执行下载任务: {avid}, 任务ID: {self.request.id}")
 
-    # 创建任务锁，防止重复执行
-    create_task_lock(avid, self.request.id)
-
-    # 等待并获取全局下载锁，确保同一时间只有一个下载任务在执行
-    if not wait_for_global_download_lock(max_wait_time=1800):  # 最多等待30分钟
-        logger.error(f"获取全局下载锁超时: {avid}")
-        remove_task_lock(avid)
-        remove_task_from_queue(avid)
-
-        # 发送任务失败通知
-        notify_task_update(
-            "task_failed",
-            {
-                "task_id": self.request.id,
-                "avid": avid,
-                "status": "failed",
-                "message": "获取下载锁超时，可能有其他下载任务正在执行",
-            },
-        )
-        notify_task_update("queue_status", get_full_task_queue())
+    # 占用下载槽位；槽位已满时暂存任务（延迟重新入队），不阻塞 Worker
+    slots = get_download_slots()
+    if not slots.try_acquire(avid):
+        if parked == 0:
+            logger.info(
+                f"下载槽位已满（{slots.limit}），任务暂存 "
+                f"{settings.DOWNLOAD_SLOT_PARK_DELAY} 秒后重试: {avid}"
+            )
+        # 暂存期间保留任务锁，防止重复提交
+        create_task_lock(avid, self.request.id, expire_time=TASK_REGISTRY_TTL)
+        park_download_task(self, avid, parked)
 
-        return {"status": "failed", "avid": avid, "message": "获取下载锁超时，可能有其他下载任务正在执行"}
+    # 后台心跳续期槽位租约，Worker 崩溃时租约自动过期
+    heartbeat = slots.start_heartbeat(avid)
 
-    # 更新 Redis 队列中的任务状态为 STARTED
-    update_task_state_in_queue(avid, "STARTED")
+    # 续期任务锁并更新 Redis 队列中的任务状态为 STARTED（单次往返）
+    task_entry = mark_task_started(avid, self.request.id)
 
-    # 发送任务开始通知
+    # 发送任务开始通知和队列增量事件
     notify_task_update(
         "task_started", {"task_id": self.request.id, "avid": avid, "status": "started"}
     )
+    notify_queue_event("started", task=task_entry)
 
-    # 发送更新后的队列状态（使用完整队列）
-    notify_task_update("queue_status", get_full_task_queue())
-
-    # 创建节流器，限制 WebSocket 通知频率（每秒最多1次）
+    # Redis 进度写入合并（每 0.5 秒或每 1% 最多一次），WebSocket 通知节流（每秒最多1次）
+    from nassav.m3u8downloader import DownloadAborted, ProgressCoalescer
     from nassav.utils import Throttler
 
+    redis_writer = ProgressCoalescer(
+        lambda progress: set_task_progress(avid, **progress.to_dict()),
+        min_interval=PROGRESS_WRITE_INTERVAL,
+        min_step=PROGRESS_WRITE_STEP,
+    )
     ws_throttler = Throttler(min_interval=1.0)
 
     # 定义进度回调函数
-    def progress_callback(percent: float, speed: str, eta: str):
-        """更新下载进度并通知 WebSocket（带节流）"""
-        # Redis 进度更新保持原频率（供 API 查询）
-        set_task_progress(avid, percent, speed, eta=eta)
+    def progress_callback(progress):
+        """更新下载进度（DownloadProgress）并通知 WebSocket（带节流）"""
+        # 槽位租约丢失后槽位可能已派发给其他任务，继续下载会超出并发上限
+        if heartbeat.lost:
+            raise DownloadAborted(f"下载槽位租约已丢失: {avid}")
+
+        redis_writer.update(progress)
 
         # WebSocket 通知使用节流：100% 时强制发送
-        if ws_throttler.should_execute(force=(percent >= 100)):
-            notify_task_update(
-                "progress_update",
-                {
+        if ws_throttler.should_execute(force=(progress.percent >= 100)):
+            notify_queue_event(
+                "progress",
+                task={
                     "task_id": self.request.id,
                     "avid": avid,
-                    "percent": percent,
-                    "speed": speed,
-                    "eta": eta,
+                    "progress": progress.to_dict(),
                 },
             )
 
+    retrying = False
     try:
         success = video_download_service.download_video(
             avid, progress_callback=progress_callback
@@ -570,13 +960,15 @@ def download_video_task(self, avid: str):
                     "message": "下载完成",
                 },
             )
-            notify_task_update("queue_status", get_full_task_queue())
+            notify_queue_event(
+                "removed",
+                task={"task_id": self.request.id, "avid": avid, "state": "SUCCESS"},
+            )
 
             # 更新数据库：标记文件存在并写入文件大小/时间戳
             try:
                 from pathlib import Path
 
-                from django.conf import settings
                 from django.db import transaction
                 from django.utils import timezone
                 from nassav.models import AVResource
@@ -614,7 +1006,10 @@ def download_video_task(self, avid: str):
                     "message": "下载失败",
                 },
             )
-            notify_task_update("queue_status", get_full_task_queue())
+            notify_queue_event(
+                "removed",
+                task={"task_id": self.request.id, "avid": avid, "state": "FAILURE"},
+            )
 
             # 标记数据库为未完成
             try:
@@ -628,9 +1023,42 @@ def download_video_task(self, avid: str):
 
             return {"status": "failed", "avid": avid, "message": "下载失败"}
 
+    except DownloadAborted as e:
+        # 暂存任务，重新排队占用槽位后从断点续传（保留任务登记，不计入失败重试次数）
+        logger.warning(f"{e}，暂存任务等待重新占用槽位")
+        retrying = True
+        try:
+            task_entry = mark_task_retrying(
+                avid, self.request.id, settings.DOWNLOAD_SLOT_PARK_DELAY
+            )
+            notify_queue_event("added", task={**task_entry, "position": 0})
+        except Exception as redis_error:
+            logger.error(f"标记任务暂存失败 {avid}: {redis_error}")
+        park_download_task(self, avid, parked)
     except Exception as e:
         logger.error(f"视频 {avid} 下载异常: {str(e)}")
 
+        # 重试：保留任务登记，队列记录置回等待状态
+        try:
+            raise self.retry(exc=e)
+        except Retry as retry:
+            retrying = True
+            countdown = (
+                retry.when
+                if isinstance(retry.when, (int, float))
+                else self.default_retry_delay
+            )
+            try:
+                task_entry = mark_task_retrying(avid, self.request.id, countdown)
+                notify_queue_event("added", task={**task_entry, "position": 0})
+            except Exception as redis_error:
+                logger.error(f"标记任务重试失败 {avid}: {redis_error}")
+            logger.info(f"视频 {avid} 将在 {countdown} 秒后重试")
+            raise
+        except Exception as final_error:
+            # 已达最大重试次数（或非 Worker 环境直接调用）
+            logger.error(f"视频 {avid} 下载失败，不再重试: {final_error}")
+
         # 从 Redis 队列中移除任务
         remove_task_from_queue(avid)
 
@@ -644,79 +1072,95 @@ def download_video_task(self, avid: str):
                 "message": f"下载异常: {str(e)}",
             },
         )
-        notify_task_update("queue_status", get_full_task_queue())
+        notify_queue_event(
+            "removed",
+            task={"task_id": self.request.id, "avid": avid, "state": "FAILURE"},
+        )
 
-        # 重试
         try:
-            raise self.retry(exc=e)
-        except self.MaxRetriesExceededError:
-            try:
-                from django.db import transaction
-                from nassav.models import AVResource
+            from django.db import transaction
+            from nassav.models import AVResource
 
-                with transaction.atomic():
-                    AVResource.objects.filter(avid=avid).update(file_exists=False)
-            except Exception as e:
-                logger.warning(f"重试出现异常：{str(e)}")
-            return {
-                "status": "failed",
-                "avid": avid,
-                "message": f"下载失败，已达最大重试次数: {str(e)}",
-            }
+            with transaction.atomic():
+                AVResource.objects.filter(avid=avid).update(file_exists=False)
+        except Exception as db_error:
+            logger.warning(f"下载失败后更新 AVResource 失败: {str(db_error)}")
+        return {
+            "status": "failed",
+            "avid": avid,
+            "message": f"下载失败，已达最大重试次数: {str(e)}",
+        }
     finally:
-        # 任务完成后清理队列锁和全局下载锁（无论成功或失败）
+        # 任务完成后清理队列锁和下载槽位（无论成功或失败）
         try:
-            release_global_download_lock()
-            logger.info(f"已释放全局下载锁: {avid}")
+            heartbeat.stop()
+            slots.release(avid)
+            logger.info(f"已释放下载槽位: {avid}")
         except Exception as e:
-            logger.error(f"释放全局下载锁失败 {avid}: {str(e)}")
+            logger.error(f"释放下载槽位失败 {avid}: {str(e)}")
 
-        try:
-            remove_task_lock(avid)
-            logger.info(f"已清理任务锁: {avid}")
-        except Exception as e:
-            logger.error(f"清理任务锁失败 {avid}: {str(e)}")
+        # 清理任务锁、进度信息和在途记录（等待重试时保留登记）
+        if not retrying:
+            try:
+                clear_task_state(avid)
+                logger.info(f"已清理任务锁和进度: {avid}")
+            except Exception as e:
+                logger.error(f"清理任务锁和进度失败 {avid}: {str(e)}")
 
-        # 清理进度信息
+        # 派发下一个等待中的任务
         try:
-            remove_task_progress(avid)
-            logger.info(f"已清理任务进度: {avid}")
+            dispatch_download_queue()
         except Exception as e:
-            logger.error(f"清理任务进度失败 {avid}: {str(e)}")
-
-        # 发送最终队列状态
-        notify_task_update("queue_status", get_full_task_queue())
+            logger.error(f"派发后续下载任务失败 {avid}: {str(e)}")
 
 
-def submit_download_task(avid: str) -> tuple[bool | None, bool]:
+def submit_download_task(avid: str, priority: int = 0) -> tuple[bool | None, bool]:
     """
     提交下载任务（带去重检查）
 
+    任务先进入下载调度器的优先级队列，在有空闲下载槽位时按优先级派发到 Celery。
+
     Args:
         avid: 视频ID
+        priority: 显式优先级（越大越优先，默认 0）
 
     Returns:
         tuple: (task_result, is_duplicate)
-            task_result: 任务结果或None
+            task_result: 任务结果或None（派发前即可通过 task_result.id 获取任务ID）
             is_duplicate: 是否为重复任务
     """
+    import uuid
+
+    from nassav.models import AVResource
+
     avid = avid.upper()
 
-    # 检查任务是否已存在
-    if is_task_existed(avid):
+    # 预先生成任务ID，派发时沿用
+    task_id = str(uuid.uuid4())
+
+    # 原子登记任务（SET NX），已登记说明任务已在队列中
+    entry = register_task(avid, task_id, task_type="download")
+    if entry is None:
         logger.warning(f"任务 {avid} 已存在于队列中，跳过提交")
         return None, True
 
-    # 提交任务
-    task_result = download_video_task.delay(avid)
+    # 进入调度器等待队列
+    is_favorite = AVResource.objects.filter(avid=avid, is_favorite=True).exists()
+    scheduler = get_download_scheduler()
+    scheduler.enqueue(avid, task_id, priority=priority, is_favorite=is_favorite)
 
-    # 添加到 Redis 队列记录
-    add_task_to_queue(avid, task_result.id, task_type="download")
+    # 发送队列增量事件（附带排队位置）
+    entry.update(
+        position=scheduler.position(avid) or 0,
+        priority=priority,
+        is_favorite=is_favorite,
+    )
+    notify_queue_event("added", task=entry)
 
-    # 发送队列状态更新（使用完整队列）
-    notify_task_update("queue_status", get_full_task_queue())
+    # 有空闲槽位时立即派发
+    dispatch_download_queue()
 
-    return task_result, False
+    return download_video_task.AsyncResult(task_id), False
 
 
 @shared_task(
@@ -953,6 +1397,105 @@ def batch_translate_titles_task(
         return {"success": False, "error": str(e)}
 
 
+@shared_task(name="nassav.tasks.bulk_refresh_task", ignore_result=True)
+def bulk_refresh_task(job_id: str):
+    """
+    批量刷新任务：处理一块，还有剩余块时提交下一块的任务（见 nassav.bulk_refresh）
+
+    Args:
+        job_id: 批量刷新任务 ID
+    """
+    from nassav.bulk_refresh import bulk_refresh_jobs
+
+    try:
+        job = bulk_refresh_jobs.run_next_chunk(job_id)
+    except Exception as e:
+        logger.error(f"[批量刷新] 任务 {job_id} 失败: {e}")
+        bulk_refresh_jobs.fail(job_id, str(e))
+        return
+    if job is not None and bulk_refresh_jobs.has_pending(job_id):
+        bulk_refresh_task.delay(job_id)
+
+
+def start_bulk_refresh(job_id: str, async_mode: bool = True):
+    """
+    开始（或继续）执行批量刷新任务
+
+    Args:
+        job_id: 批量刷新任务 ID
+        async_mode: True 时提交 Celery 任务；False 时在当前进程中逐块处理完所有块
+    """
+    if async_mode:
+        bulk_refresh_task.delay(job_id)
+        return
+    from nassav.bulk_refresh import bulk_refresh_jobs
+
+    try:
+        while bulk_refresh_jobs.run_next_chunk(job_id) is not None:
+            pass
+    except Exception as e:
+        bulk_refresh_jobs.fail(job_id, str(e))
+        raise
+
+
+@shared_task(name="nassav.tasks.add_resource_task", ignore_result=True)
+def add_resource_task(job_id: str):
+    """
+    异步添加资源任务（见 nassav.add_jobs）
+
+    Args:
+        job_id: 添加资源任务 ID
+    """
+    from nassav.add_jobs import add_resource_jobs
+
+    add_resource_jobs.run(job_id)
+
+
+def start_add_resource(job_id: str, async_mode: bool = True):
+    """
+    执行添加资源任务
+
+    Args:
+        job_id: 添加资源任务 ID
+        async_mode: True 时提交 Celery 任务；False 时在当前进程中执行
+    """
+    if async_mode:
+        add_resource_task.delay(job_id)
+        return
+    from nassav.add_jobs import add_resource_jobs
+
+    add_resource_jobs.run(job_id)
+
+
+@shared_task(name="nassav.tasks.resources_batch_task", ignore_result=True)
+def resources_batch_task(job_id: str):
+    """
+    批量资源操作任务（见 nassav.batch_jobs）
+
+    Args:
+        job_id: 批量操作任务 ID
+    """
+    from nassav.batch_jobs import batch_jobs
+
+    batch_jobs.run(job_id)
+
+
+def start_resources_batch(job_id: str, async_mode: bool = True):
+    """
+    执行批量资源操作任务
+
+    Args:
+        job_id: 批量操作任务 ID
+        async_mode: True 时提交 Celery 任务；False 时在当前进程中执行
+    """
+    if async_mode:
+        resources_batch_task.delay(job_id)
+        return
+    from nassav.batch_jobs import batch_jobs
+
+    batch_jobs.run(job_id)
+
+
 def submit_translate_task(avid: str, async_mode: bool = True):
     """
     提交翻译任务的辅助函数
@@ -1000,19 +1543,16 @@ def mock_download_video_task(self, avid: str, duration_seconds: int = 30):
         f"[测试] 开始模拟下载任务: {avid}, 任务ID: {self.request.id}, 持续时间: {duration_seconds}秒"
     )
 
-    # 创建任务锁
-    create_task_lock(avid, self.request.id)
-
-    # 更新 Redis 队列中的任务状态为 STARTED
-    update_task_state_in_queue(avid, "STARTED")
+    # 续期任务锁并更新 Redis 队列中的任务状态为 STARTED（单次往返）
+    task_entry = mark_task_started(
+        avid, self.request.id, task_type="mock", ttl=MOCK_TASK_REGISTRY_TTL
+    )
 
-    # 发送任务开始通知
+    # 发送任务开始通知和队列增量事件
     notify_task_update(
         "task_started", {"task_id": self.request.id, "avid": avid, "status": "started"}
     )
-
-    # 发送更新后的队列状态
-    notify_task_update("queue_status", get_full_task_queue())
+    notify_queue_event("started", task=task_entry)
 
     try:
         # 模拟下载过程，每秒更新进度
@@ -1031,27 +1571,21 @@ def mock_download_video_task(self, avid: str, duration_seconds: int = 30):
             # 更新进度
             set_task_progress(avid, percent, speed, eta=eta)
 
-            # 发送进度通知
-            notify_task_update(
-                "progress_update",
-                {
+            # 发送进度事件
+            notify_queue_event(
+                "progress",
+                task={
                     "task_id": self.request.id,
                     "avid": avid,
-                    "percent": percent,
-                    "speed": speed,
-                    "eta": eta,
+                    "progress": {"percent": percent, "speed": speed, "eta": eta},
                 },
             )
 
         # 模拟下载完成
         logger.info(f"[测试] 模拟下载完成: {avid}")
 
-        # 清理进度和锁
-        remove_task_progress(avid)
-        remove_task_lock(avid)
-
-        # 从 Redis 队列中移除任务
-        remove_task_from_queue(avid)
+        # 清理进度和锁，并从 Redis 队列中移除任务
+        clear_task_state(avid, remove_from_queue=True)
 
         # 发送任务完成通知
         notify_task_update(
@@ -1063,9 +1597,10 @@ def mock_download_video_task(self, avid: str, duration_seconds: int = 30):
                 "message": "模拟下载完成",
             },
         )
-
-        # 发送更新后的队列状态
-        notify_task_update("queue_status", get_full_task_queue())
+        notify_queue_event(
+            "removed",
+            task={"task_id": self.request.id, "avid": avid, "state": "SUCCESS"},
+        )
 
         return {
             "status": "completed",
@@ -1077,12 +1612,8 @@ def mock_download_video_task(self, avid: str, duration_seconds: int = 30):
     except Exception as e:
         logger.error(f"[测试] 模拟下载失败: {avid}, 错误: {e}")
 
-        # 清理
-        remove_task_progress(avid)
-        remove_task_lock(avid)
-
-        # 从 Redis 队列中移除任务
-        remove_task_from_queue(avid)
+        # 清理进度和锁，并从 Redis 队列中移除任务
+        clear_task_state(avid, remove_from_queue=True)
 
         # 发送任务失败通知
         notify_task_update(
@@ -1094,9 +1625,10 @@ def mock_download_video_task(self, avid: str, duration_seconds: int = 30):
                 "message": f"模拟下载失败: {str(e)}",
             },
         )
-
-        # 发送更新后的队列状态
-        notify_task_update("queue_status", get_full_task_queue())
+        notify_queue_event(
+            "removed",
+            task={"task_id": self.request.id, "avid": avid, "state": "FAILURE"},
+        )
 
         return {
             "status": "failed",
@@ -1117,27 +1649,31 @@ def submit_mock_download_task(avid: str, duration_seconds: int = 30):
     Returns:
         tuple: (task_result, is_duplicate)
     """
+    import uuid
+
     avid = avid.upper()
+    task_id = str(uuid.uuid4())
 
-    # 检查任务是否已存在
-    if is_task_existed(avid):
+    # 原子登记任务（SET NX），已登记说明任务已存在
+    entry = register_task(avid, task_id, task_type="mock", ttl=MOCK_TASK_REGISTRY_TTL)
+    if entry is None:
         logger.warning(f"[测试] 模拟下载任务已存在: {avid}")
         return None, True
 
     # 提交任务
     try:
-        task_result = mock_download_video_task.delay(avid, duration_seconds)
+        task_result = mock_download_video_task.apply_async(
+            args=[avid, duration_seconds], task_id=task_id
+        )
         logger.info(f"[测试] 已提交模拟下载任务: {avid}, task_id={task_result.id}")
 
-        # 添加到 Redis 队列记录
-        add_task_to_queue(avid, task_result.id, task_type="mock")
-
-        # 发送队列状态更新（使用完整队列）
-        notify_task_update("queue_status", get_full_task_queue())
+        # 发送队列增量事件
+        notify_queue_event("added", task=entry)
 
         return task_result, False
     except Exception as e:
         logger.error(f"[测试] 提交模拟下载任务失败: {avid}, 错误: {e}")
+        clear_task_state(avid, remove_from_queue=True)
         raise
 
 
@@ -0,0 +1,13 @@
+"""
+本地替身服务（测试与基准脚本使用，不依赖外网）
+"""
+from .cassette_server import CassetteServer
+from .hls_server import LocalHlsServer
+from .source_server import LocalSourceServer, Route
+
+__all__ = [
+    "CassetteServer",
+    "LocalHlsServer",
+    "LocalSourceServer",
+    "Route",
+]
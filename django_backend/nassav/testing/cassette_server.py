@@ -0,0 +1,162 @@
+"""
+录像回放服务器
+按录像（nassav.http_replay.Cassette）返回源页面、刮削页面、图片、播放列表、分片和翻译接口的响应，
+可配置延迟和带宽，用于离线复现完整的添加/下载流程
+"""
+import socket
+import ssl
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List, Optional, Tuple
+
+from nassav.http_replay import Cassette, original_url
+
+
+class CassetteServer:
+    """
+    在 127.0.0.1 随机端口启动的录像回放服务器
+
+    请求路径为 /{scheme}/{host}{path}（见 nassav.http_replay.replay_path），按
+    方法 + 原始地址 + Range + 请求体 查找录像；未录制的请求返回 404 并记入 misses。
+    clients 按请求记录客户端地址（不同地址数即新建连接数）；传入 ssl_context 时以 HTTPS 提供服务。
+
+    用法：
+        with CassetteServer(Cassette(path), latency=0.05) as server, replaying(server.base_url):
+            resource_service.add_resource("ABC-123")
+    """
+
+    def __init__(
+        self,
+        cassette: Cassette,
+        latency: float = 0.0,
+        bandwidth: Optional[int] = None,
+        ssl_context: Optional[ssl.SSLContext] = None,
+    ):
+        """
+        Args:
+            cassette: 录像
+            latency: 每个请求的首字节延迟（秒）
+            bandwidth: 每个连接的带宽上限（字节/秒），None 表示不限速
+            ssl_context: 服务端 SSL 上下文，None 时使用 HTTP
+        """
+        self.cassette = cassette
+        self.latency = latency
+        self.bandwidth = bandwidth
+        self.ssl_context = ssl_context
+        self.hits = 0
+        self.bytes_sent = 0
+        self.misses: List[str] = []
+        self.clients: List[Tuple[str, int]] = []
+        self._lock = threading.Lock()
+        self._server = None
+        self._thread = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        scheme = "https" if self.ssl_context else "http"
+        return f"{scheme}://{host}:{port}"
+
+    def _handle(self, handler: BaseHTTPRequestHandler, method: str):
+        with self._lock:
+            self.clients.append(handler.client_address)
+        length = int(handler.headers.get("Content-Length") or 0)
+        body = handler.rfile.read(length) if length else None
+
+        if self.latency:
+            time.sleep(self.latency)
+
+        url = original_url(handler.path)
+        key = (
+            Cassette.key(method, url, body, handler.headers.get("Range"))
+            if url
+            else None
+        )
+        recorded = self.cassette.lookup(key) if key else None
+        if recorded is None:
+            with self._lock:
+                self.misses.append(key or handler.path)
+            # 不使用 send_error：它会关闭连接，影响长连接复用的统计
+            handler.send_response(404)
+            handler.send_header("Content-Length", "0")
+            handler.end_headers()
+            return
+
+        status, headers, content = recorded
+        with self._lock:
+            self.hits += 1
+            self.bytes_sent += len(content)
+        handler.send_response(status)
+        for name, value in headers:
+            handler.send_header(name, value)
+        handler.send_header("Content-Length", str(len(content)))
+        handler.end_headers()
+        if method != "HEAD":
+            self._write_body(handler, content)
+
+    def _write_body(self, handler: BaseHTTPRequestHandler, body: bytes):
+        if not self.bandwidth:
+            handler.wfile.write(body)
+            return
+        # 按 50ms 粒度限速写出
+        chunk_size = max(int(self.bandwidth * 0.05), 1)
+        for offset in range(0, len(body), chunk_size):
+            handler.wfile.write(body[offset : offset + chunk_size])
+            time.sleep(0.05)
+
+    def start(self) -> "CassetteServer":
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def setup(self):
+                super().setup()
+                # 响应头和正文分两次写出，长连接上需关闭 Nagle 避免与延迟 ACK 叠加出 40ms 停顿
+                self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+            def _serve(self, method):
+                try:
+                    server._handle(self, method)
+                except (BrokenPipeError, ConnectionResetError):
+                    pass
+
+            def do_GET(self):
+                self._serve("GET")
+
+            def do_POST(self):
+                self._serve("POST")
+
+            def do_HEAD(self):
+                self._serve("HEAD")
+
+            def log_message(self, format, *args):
+                pass
+
+        class Server(ThreadingHTTPServer):
+            def handle_error(self, request, client_address):
+                # 客户端取消请求（并发探测命中后取消其余请求）时断开连接，不输出异常
+                pass
+
+        self._server = Server(("127.0.0.1", 0), Handler)
+        if self.ssl_context:
+            self._server.socket = self.ssl_context.wrap_socket(
+                self._server.socket, server_side=True
+            )
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self) -> "CassetteServer":
+        return self.start()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
@@ -0,0 +1,186 @@
+"""
+本地 HLS 替身服务器
+提供主播放列表、媒体播放列表和确定性内容的分片，可配置延迟、带宽和故障注入
+"""
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Iterable, Optional
+
+
+class LocalHlsServer:
+    """
+    在 127.0.0.1 随机端口启动的 HLS 替身服务器
+
+    路由：
+        /master.m3u8      主播放列表（含一个低码率和一个高码率变体）
+        /high/index.m3u8  高码率媒体播放列表
+        /low/index.m3u8   低码率媒体播放列表
+        /high/seg{i}.ts   分片内容（确定性字节，可用 segment_bytes() 校验）
+
+    用法：
+        with LocalHlsServer(segment_count=20) as server:
+            downloader.download(server.master_url, ...)
+    """
+
+    def __init__(
+        self,
+        segment_count: int = 10,
+        segment_size: int = 64 * 1024,
+        segment_duration: float = 4.0,
+        latency: float = 0.0,
+        bandwidth: Optional[int] = None,
+        fail_segments: Iterable[int] = (),
+    ):
+        """
+        Args:
+            segment_count: 分片数量
+            segment_size: 每个分片的字节数
+            segment_duration: 每个分片的时长（秒，写入 EXTINF）
+            latency: 每个请求的首字节延迟（秒）
+            bandwidth: 每个连接的带宽上限（字节/秒），None 表示不限速
+            fail_segments: 首次请求时返回 500 的分片序号（用于测试重试）
+        """
+        self.segment_count = segment_count
+        self.segment_size = segment_size
+        self.segment_duration = segment_duration
+        self.latency = latency
+        self.bandwidth = bandwidth
+        self._pending_failures = set(fail_segments)
+        self._lock = threading.Lock()
+        self.request_count = 0
+        self.request_headers: Dict[str, Dict[str, str]] = {}
+        self._server = None
+        self._thread = None
+
+    def segment_bytes(self, index: int) -> bytes:
+        """返回第 index 个分片的内容"""
+        pattern = f"SEG{index:06d}|".encode()
+        repeat = self.segment_size // len(pattern) + 1
+        return (pattern * repeat)[: self.segment_size]
+
+    def expected_content(self) -> bytes:
+        """返回按序合并后的完整内容"""
+        return b"".join(self.segment_bytes(i) for i in range(self.segment_count))
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def master_url(self) -> str:
+        return f"{self.base_url}/master.m3u8"
+
+    @property
+    def media_url(self) -> str:
+        return f"{self.base_url}/high/index.m3u8"
+
+    def _master_playlist(self) -> str:
+        return (
+            "#EXTM3U\n"
+            "#EXT-X-STREAM-INF:BANDWIDTH=800000,RESOLUTION=640x360\n"
+            "low/index.m3u8\n"
+            "#EXT-X-STREAM-INF:BANDWIDTH=4000000,RESOLUTION=1920x1080\n"
+            "high/index.m3u8\n"
+        )
+
+    def _media_playlist(self) -> str:
+        lines = [
+            "#EXTM3U",
+            "#EXT-X-VERSION:3",
+            f"#EXT-X-TARGETDURATION:{int(self.segment_duration) + 1}",
+            "#EXT-X-MEDIA-SEQUENCE:0",
+        ]
+        for i in range(self.segment_count):
+            lines.append(f"#EXTINF:{self.segment_duration:.3f},")
+            lines.append(f"seg{i}.ts")
+        lines.append("#EXT-X-ENDLIST")
+        return "\n".join(lines) + "\n"
+
+    def _handle(self, handler: BaseHTTPRequestHandler):
+        with self._lock:
+            self.request_count += 1
+            self.request_headers[handler.path] = dict(handler.headers.items())
+
+        if self.latency:
+            time.sleep(self.latency)
+
+        path = handler.path.split("?", 1)[0]
+        if path == "/master.m3u8":
+            body, content_type = (
+                self._master_playlist().encode(),
+                "application/vnd.apple.mpegurl",
+            )
+        elif path in ("/high/index.m3u8", "/low/index.m3u8"):
+            body, content_type = (
+                self._media_playlist().encode(),
+                "application/vnd.apple.mpegurl",
+            )
+        elif path.startswith("/high/seg") and path.endswith(".ts"):
+            try:
+                index = int(path[len("/high/seg") : -len(".ts")])
+            except ValueError:
+                index = -1
+            if not 0 <= index < self.segment_count:
+                handler.send_error(404)
+                return
+            with self._lock:
+                should_fail = index in self._pending_failures
+                self._pending_failures.discard(index)
+            if should_fail:
+                handler.send_error(500)
+                return
+            body, content_type = self.segment_bytes(index), "video/mp2t"
+        else:
+            handler.send_error(404)
+            return
+
+        handler.send_response(200)
+        handler.send_header("Content-Type", content_type)
+        handler.send_header("Content-Length", str(len(body)))
+        handler.end_headers()
+        self._write_body(handler, body)
+
+    def _write_body(self, handler: BaseHTTPRequestHandler, body: bytes):
+        if not self.bandwidth:
+            handler.wfile.write(body)
+            return
+        # 按 50ms 粒度限速写出
+        chunk_size = max(int(self.bandwidth * 0.05), 1)
+        for offset in range(0, len(body), chunk_size):
+            handler.wfile.write(body[offset : offset + chunk_size])
+            time.sleep(0.05)
+
+    def start(self) -> "LocalHlsServer":
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                try:
+                    server._handle(self)
+                except (BrokenPipeError, ConnectionResetError):
+                    pass
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self) -> "LocalHlsServer":
+        return self.start()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
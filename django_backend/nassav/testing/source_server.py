@@ -0,0 +1,149 @@
+"""
+本地资源页替身服务器
+按路径返回预设的状态码、页面内容和延迟，用于测试多源并发探测（命中、404/403、慢请求取消）
+"""
+import socket
+import ssl
+import threading
+import time
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+
+
+@dataclass
+class Route:
+    """单个路径的响应"""
+
+    status: int = 200
+    body: str = ""
+    delay: float = 0.0
+    # 额外响应头（如 Retry-After）
+    headers: Dict[str, str] = field(default_factory=dict)
+
+
+class LocalSourceServer:
+    """
+    在 127.0.0.1 随机端口启动的资源页替身服务器
+
+    未配置的路径返回 404。记录每个请求的路径、开始时间、请求头、客户端地址（用于判断连接复用），
+    以及客户端在响应前断开的路径（请求被取消）。传入 ssl_context 时以 HTTPS 提供服务。
+
+    用法：
+        with LocalSourceServer({"/a/abc-123": Route(body=html, delay=0.5)}) as server:
+            url = server.url("/a/abc-123")
+    """
+
+    def __init__(
+        self,
+        routes: Optional[Dict[str, Route]] = None,
+        ssl_context: Optional[ssl.SSLContext] = None,
+    ):
+        self.routes: Dict[str, Route] = dict(routes or {})
+        self.ssl_context = ssl_context
+        self.requests: List[str] = []
+        self.request_times: Dict[str, float] = {}
+        self.request_headers: Dict[str, Dict[str, str]] = {}
+        self.clients: List[Tuple[str, int]] = []
+        self.aborted: List[str] = []
+        self._lock = threading.Lock()
+        self._server = None
+        self._thread = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        scheme = "https" if self.ssl_context else "http"
+        return f"{scheme}://{host}:{port}"
+
+    def url(self, path: str) -> str:
+        return f"{self.base_url}{path}"
+
+    def _handle(self, handler: BaseHTTPRequestHandler):
+        path = handler.path.split("?", 1)[0]
+        with self._lock:
+            self.requests.append(path)
+            self.request_times[path] = time.monotonic()
+            self.request_headers[path] = dict(handler.headers.items())
+            self.clients.append(handler.client_address)
+
+        route = self.routes.get(path)
+        if route is None:
+            handler.send_error(404)
+            return
+
+        # 分段等待，期间检测客户端是否已断开（请求被取消）
+        deadline = time.monotonic() + route.delay
+        while time.monotonic() < deadline:
+            time.sleep(0.02)
+            if self._client_closed(handler):
+                with self._lock:
+                    self.aborted.append(path)
+                return
+
+        body = route.body.encode()
+        handler.send_response(route.status)
+        handler.send_header("Content-Type", "text/html; charset=utf-8")
+        handler.send_header("Content-Length", str(len(body)))
+        for name, value in route.headers.items():
+            handler.send_header(name, value)
+        handler.end_headers()
+        handler.wfile.write(body)
+
+    @staticmethod
+    def _client_closed(handler: BaseHTTPRequestHandler) -> bool:
+        import select
+
+        sock = handler.connection
+        if isinstance(sock, ssl.SSLSocket):
+            # TLS 套接字不支持 MSG_PEEK，不检测断开
+            return False
+        readable, _, _ = select.select([sock], [], [], 0)
+        if not readable:
+            return False
+        try:
+            return sock.recv(1, socket.MSG_PEEK) == b""
+        except OSError:
+            return True
+
+    def start(self) -> "LocalSourceServer":
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def setup(self):
+                super().setup()
+                # 响应头和正文分两次写出，长连接上需关闭 Nagle 避免与延迟 ACK 叠加出 40ms 停顿
+                self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+            def do_GET(self):
+                try:
+                    server._handle(self)
+                except (BrokenPipeError, ConnectionResetError):
+                    pass
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        if self.ssl_context:
+            self._server.socket = self.ssl_context.wrap_socket(
+                self._server.socket, server_side=True
+            )
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self) -> "LocalSourceServer":
+        return self.start()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
@@ -7,6 +7,8 @@ from typing import Optional
 import requests
 from django.conf import settings
 from loguru import logger
+from nassav.http_replay import get_http_replay
+from nassav.rate_limit import get_rate_limiter
 
 from .TranslatorBase import TranslatorBase
 
@@ -140,7 +142,10 @@ class OllamaTranslator(TranslatorBase):
         """
         try:
             # 尝试访问 Ollama API 的 /api/tags 端点
-            response = requests.get(f"{self.url}/api/tags", timeout=5)
+            replay = get_http_replay()
+            tags_url = f"{self.url}/api/tags"
+            response = requests.get(replay.rewrite(tags_url), timeout=5)
+            replay.record("GET", tags_url, response)
             if response.status_code == 200:
                 # 检查模型是否存在
                 data = response.json()
@@ -182,24 +187,29 @@ class OllamaTranslator(TranslatorBase):
             # 构建 prompt
             prompt = self.prompt_template.format(text=text)
 
-            # 调用 Ollama API
+            # 调用 Ollama API（请求速率由限流器按服务地址控制）
+            limiter = get_rate_limiter()
+            limiter.wait(self.url)
+            replay = get_http_replay()
+            generate_url = f"{self.url}/api/generate"
+            payload = {
+                "model": self.model,
+                "prompt": prompt,
+                "stream": False,
+                "options": {
+                    "temperature": 0.1,  # 极低随机性，提高翻译一致性
+                    "top_p": 0.9,
+                    "top_k": 20,  # 限制采样范围
+                    "repeat_penalty": 0.8,  # 降低重复
+                },
+            }
             start_time = time.time()
             response = requests.post(
-                f"{self.url}/api/generate",
-                json={
-                    "model": self.model,
-                    "prompt": prompt,
-                    "stream": False,
-                    "options": {
-                        "temperature": 0.1,  # 极低随机性，提高翻译一致性
-                        "top_p": 0.9,
-                        "top_k": 20,  # 限制采样范围
-                        "repeat_penalty": 0.8,  # 降低重复
-                    },
-                },
-                timeout=self.timeout,
+                replay.rewrite(generate_url), json=payload, timeout=self.timeout
             )
             elapsed = time.time() - start_time
+            limiter.feedback_response(self.url, response)
+            replay.record("POST", generate_url, response, body=payload)
 
             response.raise_for_status()
             result = response.json()
@@ -252,10 +262,6 @@ class OllamaTranslator(TranslatorBase):
             )
             results.append(result)
 
-            # 避免请求过快
-            if i < len(texts):
-                time.sleep(0.5)
-
         success_count = sum(1 for r in results if r is not None)
         logger.info(f"批量翻译完成: 成功 {success_count}/{len(texts)}")
 
@@ -9,6 +9,12 @@ urlpatterns = [
     path("api/source/list", views.SourceListView.as_view(), name="source-list"),
     # GET/POST/DELETE /api/source/cookie - 源Cookie管理
     path("api/source/cookie", views.SourceCookieView.as_view(), name="source-cookie"),
+    # GET/DELETE /api/negative-cache - 查看/清除源与刮削器的未命中缓存
+    path(
+        "api/negative-cache",
+        views.NegativeCacheView.as_view(),
+        name="negative-cache",
+    ),
     # GET/PUT /api/setting - 用户设置管理
     path("api/setting", views.UserSettingView.as_view(), name="user-setting"),
     # GET /api/resources/ - 统一资源列表（过滤/分页）
@@ -39,6 +45,18 @@ urlpatterns = [
         views.ResourcesBatchView.as_view(),
         name="resources-batch",
     ),
+    # GET/DELETE /api/resources/batch/{job_id} - 批量操作任务状态与结果/取消任务
+    path(
+        "api/resources/batch/<str:job_id>",
+        views.ResourcesBatchJobView.as_view(),
+        name="resources-batch-job",
+    ),
+    # GET /api/resources/batch/{job_id}/stream - 以 NDJSON 流返回批量操作结果
+    path(
+        "api/resources/batch/<str:job_id>/stream",
+        views.ResourcesBatchStreamView.as_view(),
+        name="resources-batch-stream",
+    ),
     # POST /api/downloads/batch_submit - 批量提交下载任务
     path(
         "api/downloads/batch_submit",
@@ -53,12 +71,36 @@ urlpatterns = [
     ),
     # POST /api/resource/new - 通过avid获取资源信息（可指定source）
     path("api/resource", views.ResourceView.as_view(), name="resource-new"),
+    # GET /api/resource/jobs/{job_id} - 异步添加资源任务的状态与结果
+    path(
+        "api/resource/jobs/<str:job_id>",
+        views.ResourceJobView.as_view(),
+        name="resource-job",
+    ),
     # POST /api/resource/refresh/{avid} - 刷新已有资源的元数据和m3u8链接
     path(
         "api/resource/refresh/<str:avid>",
         views.RefreshResourceView.as_view(),
         name="resource-refresh",
     ),
+    # GET/POST /api/resources/refresh/bulk - 批量刷新元数据任务列表/创建任务
+    path(
+        "api/resources/refresh/bulk",
+        views.BulkRefreshView.as_view(),
+        name="resources-refresh-bulk",
+    ),
+    # GET/DELETE /api/resources/refresh/bulk/{job_id} - 批量刷新任务进度/取消任务
+    path(
+        "api/resources/refresh/bulk/<str:job_id>",
+        views.BulkRefreshJobView.as_view(),
+        name="resources-refresh-bulk-job",
+    ),
+    # POST /api/resources/refresh/bulk/{job_id}/resume - 从检查点继续批量刷新任务
+    path(
+        "api/resources/refresh/bulk/<str:job_id>/resume",
+        views.BulkRefreshResumeView.as_view(),
+        name="resources-refresh-bulk-resume",
+    ),
     # DELETE /api/resource/{avid} - 删除整个资源目录
     path(
         "api/resource/<str:avid>",
@@ -99,5 +141,17 @@ urlpatterns = [
         views.TaskQueueStatusView.as_view(),
         name="task-queue-status",
     ),
+    # POST /api/tasks/queue/reorder - 调整等待中下载任务的顺序
+    path(
+        "api/tasks/queue/reorder",
+        views.TaskQueueReorderView.as_view(),
+        name="task-queue-reorder",
+    ),
+    # PATCH /api/tasks/queue/{avid} - 调整等待中下载任务的优先级
+    path(
+        "api/tasks/queue/<str:avid>",
+        views.TaskQueueItemView.as_view(),
+        name="task-queue-item",
+    ),
     # Schema endpoints for OpenAPI (drf-spectacular)
 ]
@@ -184,13 +184,7 @@ def download_avatar(url: str, dest_path, max_retries: int = 3) -> bool:
 
     from django.conf import settings
     from loguru import logger
-    from nassav.constants import IMPERSONATE
-
-    try:
-        from curl_cffi import requests
-    except ImportError:
-        logger.error("curl_cffi未安装，无法下载头像")
-        return False
+    from nassav.http_pool import get_http_pool
 
     dest = Path(dest_path)
     dest.parent.mkdir(parents=True, exist_ok=True)
@@ -202,19 +196,15 @@ def download_avatar(url: str, dest_path, max_retries: int = 3) -> bool:
     }
 
     # 设置代理（如果启用）
-    proxies = None
+    proxy = None
     if hasattr(settings, "PROXY_ENABLED") and settings.PROXY_ENABLED:
         if hasattr(settings, "PROXY_URL") and settings.PROXY_URL:
-            proxies = {"http": settings.PROXY_URL, "https": settings.PROXY_URL}
+            proxy = settings.PROXY_URL
 
     for attempt in range(max_retries):
         try:
-            response = requests.get(
-                url,
-                headers=headers,
-                proxies=proxies,
-                timeout=15,
-                impersonate=IMPERSONATE,
+            response = get_http_pool().get(
+                url, proxy=proxy, headers=headers, timeout=15
             )
             if response.status_code == 200:
                 dest.write_bytes(response.content)
@@ -224,9 +214,5 @@ def download_avatar(url: str, dest_path, max_retries: int = 3) -> bool:
                 logger.warning(f"头像下载失败 (HTTP {response.status_code}): {url}")
         except Exception as e:
             logger.warning(f"头像下载失败 (尝试 {attempt + 1}/{max_retries}): {e}")
-            if attempt < max_retries - 1:
-                import time
-
-                time.sleep(1)  # 重试前等待1秒
 
     return False
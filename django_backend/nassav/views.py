@@ -14,7 +14,7 @@ from rest_framework import status
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
-from .api_utils import build_response
+from .api_utils import build_response, serialize_resource_obj
 from .serializers import (
     NewResourceSerializer,
     SourceCookieListSerializer,
@@ -30,44 +30,22 @@ from .utils import (
 )
 
 
-def _serialize_resource_obj(resource):
-    """Convert AVResource instance to plain dict suitable for API responses."""
-    try:
-        actors = [a.name for a in resource.actors.all()]
-    except Exception:
-        actors = []
-    try:
-        genres = [g.name for g in resource.genres.all()]
-    except Exception:
-        genres = []
-
-    return {
-        "avid": resource.avid,
-        "original_title": resource.original_title or "",
-        "source_title": resource.source_title or "",
-        "translated_title": resource.translated_title or "",
-        "m3u8": resource.m3u8 or "",
-        "source": resource.source or "",
-        "release_date": resource.release_date or "",
-        "duration": resource.duration,
-        "actors": actors,
-        "genres": genres,
-        "file_size": resource.file_size,
-        "file_exists": bool(resource.file_exists),
-        "watched": bool(resource.watched),
-        "is_favorite": bool(resource.is_favorite),
-    }
-
-
 class SourceListView(APIView):
     """
     GET /api/source/list
     获取所有可用的下载源名称列表
+
+    Query:
+      - detail: 为 1/true 时按动态排序返回各源的分数、成功率、延迟和熔断状态
     """
 
     def get(self, request):
-        sources = list(source_manager.sources.keys())
-        return Response({"code": 200, "message": "success", "data": sources})
+        detail = request.query_params.get("detail", "")
+        if str(detail).lower() in ("1", "true", "yes"):
+            data = source_manager.get_source_ranking()
+        else:
+            data = list(source_manager.sources.keys())
+        return Response({"code": 200, "message": "success", "data": data})
 
 
 class SourceCookieView(APIView):
@@ -134,6 +112,20 @@ class SourceCookieView(APIView):
                     logger.error(f"自动获取 Cookie 失败: {e}")
 
                 if success:
+                    from .negative_cache import (
+                        KIND_SOURCE,
+                        OUTCOME_FORBIDDEN,
+                        negative_cache,
+                    )
+
+                    try:
+                        negative_cache.purge(
+                            KIND_SOURCE,
+                            source_instance.get_source_name(),
+                            outcome=OUTCOME_FORBIDDEN,
+                        )
+                    except Exception as e:
+                        logger.warning(f"清除 403 未命中记录失败: {e}")
                     return Response(
                         {
                             "code": 200,
@@ -204,6 +196,66 @@ class SourceCookieView(APIView):
             )
 
 
+class NegativeCacheView(APIView):
+    """
+    GET /api/negative-cache
+    查看未命中缓存：近期在各源/刮削器上失败（404/403/其他错误）而被跳过的 AVID
+
+    DELETE /api/negative-cache
+    清除匹配的未命中记录（不带参数时清除全部）
+
+    Query 参数（均可选）:
+      - kind: source | scraper
+      - name: 源/刮削器名称（不区分大小写）
+      - avid: AVID
+      - outcome: miss | forbidden | error
+    """
+
+    def _filters(self, request):
+        from .negative_cache import KINDS, OUTCOMES
+
+        params = request.query_params
+        filters = {
+            "kind": params.get("kind") or None,
+            "name": params.get("name") or None,
+            "avid": params.get("avid") or None,
+            "outcome": params.get("outcome") or None,
+        }
+        if filters["kind"] and filters["kind"] not in KINDS:
+            return None, f"kind 必须是 {', '.join(KINDS)} 之一"
+        if filters["outcome"] and filters["outcome"] not in OUTCOMES:
+            return None, f"outcome 必须是 {', '.join(OUTCOMES)} 之一"
+        return filters, None
+
+    def get(self, request):
+        from .negative_cache import negative_cache
+
+        filters, error = self._filters(request)
+        if error:
+            return build_response(400, error, None)
+        try:
+            entries = negative_cache.entries(**filters)
+        except Exception as e:
+            logger.error(f"读取未命中缓存失败: {e}")
+            return build_response(500, f"读取未命中缓存失败: {str(e)}", None)
+        return build_response(
+            200, "success", {"total": len(entries), "entries": entries}
+        )
+
+    def delete(self, request):
+        from .negative_cache import negative_cache
+
+        filters, error = self._filters(request)
+        if error:
+            return build_response(400, error, None)
+        try:
+            purged = negative_cache.purge(**filters)
+        except Exception as e:
+            logger.error(f"清除未命中缓存失败: {e}")
+            return build_response(500, f"清除未命中缓存失败: {str(e)}", None)
+        return build_response(200, "success", {"purged": purged})
+
+
 class UserSettingView(APIView):
     """
     GET /api/setting
@@ -827,14 +879,19 @@ class ResourceView(APIView):
     请求参数:
         avid: 视频编号
         downloader: 指定源名称，默认 "any" 表示尝试所有源
+        mode: sync 在请求中完成添加（201）；async 提交后台任务立即返回 202 和 job_id，
+            阶段进度通过 WebSocket resource_add 消息推送，结果通过 GET /api/resource/jobs/{job_id} 查询。
+            默认见配置 ResourcePipeline.add_mode
     """
 
     def post(self, request):
+        from nassav.add_jobs import brief_resource, summarize
         from nassav.resource_service import (
             ResourceAccessDeniedError,
             ResourceAlreadyExistsError,
             ResourceFetchError,
             ResourceNotFoundError,
+            _pipeline_config,
             resource_service,
         )
 
@@ -844,6 +901,7 @@ class ResourceView(APIView):
 
         avid = serializer.validated_data["avid"].upper()
         source = serializer.validated_data.get("source", "any").lower()
+        mode = serializer.validated_data.get("mode") or _pipeline_config()["add_mode"]
 
         # 检查指定源是否存在
         if source != "any":
@@ -855,6 +913,9 @@ class ResourceView(APIView):
                     {"available_sources": list(source_manager.sources.keys())},
                 )
 
+        if mode == "async":
+            return self._submit(avid, source)
+
         # 调用ResourceService添加资源
         try:
             result = resource_service.add_resource(avid, source)
@@ -864,37 +925,12 @@ class ResourceView(APIView):
                 logger.warning(f"封面下载失败: {avid}")
 
             # 只返回指定的字段
-            resource_data = result["resource"]
-            filtered_resource = {
-                "avid": resource_data.get("avid"),
-                "original_title": resource_data.get("original_title"),
-                "source_title": resource_data.get("source_title"),
-                "translated_title": resource_data.get("translated_title"),
-                "source": resource_data.get("source"),
-            }
-
-            return build_response(
-                201,
-                "success",
-                {
-                    "resource": filtered_resource,
-                    "cover_downloaded": result["cover_saved"],
-                    "metadata_saved": result["metadata_saved"],
-                    "scraped": result["scraped"],
-                },
-            )
+            return build_response(201, "success", summarize(result))
 
         except ResourceAlreadyExistsError as e:
             # 409 Conflict - 资源已存在
             # 只返回指定的字段
-            filtered_resource = {
-                "avid": e.resource_data.get("avid"),
-                "original_title": e.resource_data.get("original_title"),
-                "source_title": e.resource_data.get("source_title"),
-                "translated_title": e.resource_data.get("translated_title"),
-                "source": e.resource_data.get("source"),
-            }
-            return build_response(409, str(e), filtered_resource)
+            return build_response(409, str(e), brief_resource(e.resource_data))
 
         except ResourceNotFoundError as e:
             # 404 Not Found - 所有源都返回404
@@ -913,7 +949,57 @@ class ResourceView(APIView):
             logger.error(f"添加资源失败: {avid}, 错误: {e}", exc_info=True)
             return build_response(500, f"服务器内部错误: {str(e)}", None)
 
-        # (clean) end of ResourceView.post
+    def _submit(self, avid: str, source: str):
+        """异步模式：检查资源是否已存在后创建任务，返回 202"""
+        from nassav.add_jobs import add_resource_jobs, brief_resource
+        from nassav.models import AVResource
+        from nassav.resource_service import resource_service
+
+        from .tasks import start_add_resource
+
+        existing = AVResource.objects.filter(avid=avid).first()
+        if existing:
+            return build_response(
+                409,
+                f"资源 {avid} 已存在",
+                brief_resource(
+                    resource_service._serialize_resource(
+                        existing, include_relations=True
+                    )
+                ),
+            )
+
+        try:
+            job, created = add_resource_jobs.create(avid, source)
+        except Exception as e:
+            logger.error(f"创建添加资源任务失败: {avid}, 错误: {e}")
+            return build_response(500, f"创建添加资源任务失败: {str(e)}", None)
+        if not created:
+            return build_response(202, f"资源 {avid} 正在添加中", job)
+
+        try:
+            start_add_resource(job["job_id"])
+        except Exception as e:
+            logger.error(f"提交添加资源任务失败: {avid}, 错误: {e}")
+            add_resource_jobs.finish(job["job_id"], 500, f"提交添加资源任务失败: {str(e)}")
+            return build_response(500, f"提交添加资源任务失败: {str(e)}", None)
+        return build_response(202, "添加资源任务已提交", job)
+
+
+class ResourceJobView(APIView):
+    """
+    GET /api/resource/jobs/{job_id}
+    异步添加资源任务的状态：status 为 queued/running/completed/failed，stages 为各阶段状态与耗时；
+    结束后 code/message/data 与同步模式的响应相同
+    """
+
+    def get(self, request, job_id):
+        from nassav.add_jobs import add_resource_jobs
+
+        job = add_resource_jobs.get(job_id)
+        if job is None:
+            return build_response(404, f"添加资源任务 {job_id} 不存在", None)
+        return build_response(200, "success", job)
 
 
 class DownloadView(APIView):
@@ -921,6 +1007,9 @@ class DownloadView(APIView):
         """
         POST /api/resource/downloads
         通过avid下载视频，此avid的元数据必须已存在于 resource 目录中
+
+        请求参数:
+            priority: 排队优先级 (int, optional, 默认 0，越大越优先)
         """
         avid = avid.upper()
 
@@ -952,10 +1041,15 @@ class DownloadView(APIView):
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR,
             )
 
+        try:
+            priority = int((request.data or {}).get("priority", 0))
+        except (TypeError, ValueError):
+            return build_response(400, "priority 必须为整数", None)
+
         # 使用Celery异步下载（带去重检查）
         from .tasks import submit_download_task
 
-        task_result, is_duplicate = submit_download_task(avid)
+        task_result, is_duplicate = submit_download_task(avid, priority=priority)
 
         if is_duplicate:
             return build_response(409, "下载任务已存在", None)
@@ -1088,7 +1182,7 @@ class RefreshResourceView(APIView):
             resource = AVResource.objects.filter(avid=avid).first()
             if resource:
                 resource.refresh_from_db()
-                resource_data = _serialize_resource_obj(resource)
+                resource_data = serialize_resource_obj(resource)
             else:
                 resource_data = None
         except Exception as e:
@@ -1099,6 +1193,98 @@ class RefreshResourceView(APIView):
         return build_response(200, "success", result_info)
 
 
+class BulkRefreshView(APIView):
+    """
+    POST /api/resources/refresh/bulk
+    创建批量刷新元数据任务（分块异步执行，进度通过 WebSocket bulk_refresh 消息推送）
+
+    Body（均可选）:
+      - filters: {"missing": ["title", "release_date", "duration", "actors", "genres"],
+                  "older_than_days": int, "sources": [str], "avids": [str], "limit": int}
+      - options: {"metadata": true, "m3u8": false, "cover": false, "force": false}
+
+    GET /api/resources/refresh/bulk
+    最近的批量刷新任务列表
+    """
+
+    def get(self, request):
+        from .bulk_refresh import bulk_refresh_jobs
+
+        try:
+            limit = int(request.query_params.get("limit", 20))
+        except ValueError:
+            return build_response(400, "limit 必须是整数", None)
+        try:
+            jobs = bulk_refresh_jobs.list(limit)
+        except Exception as e:
+            logger.error(f"读取批量刷新任务失败: {e}")
+            return build_response(500, f"读取批量刷新任务失败: {str(e)}", None)
+        return build_response(200, "success", jobs)
+
+    def post(self, request):
+        from .bulk_refresh import BulkRefreshError, bulk_refresh_jobs
+        from .tasks import start_bulk_refresh
+
+        filters = request.data.get("filters") or {}
+        options = request.data.get("options") or {}
+        if not isinstance(filters, dict) or not isinstance(options, dict):
+            return build_response(400, "filters 和 options 必须是对象", None)
+        try:
+            job = bulk_refresh_jobs.create(filters, options)
+        except BulkRefreshError as e:
+            return build_response(400, str(e), None)
+        except Exception as e:
+            logger.error(f"创建批量刷新任务失败: {e}")
+            return build_response(500, f"创建批量刷新任务失败: {str(e)}", None)
+        if job["chunks"]:
+            start_bulk_refresh(job["job_id"])
+        return build_response(202, "批量刷新任务已创建", job)
+
+
+class BulkRefreshJobView(APIView):
+    """
+    GET /api/resources/refresh/bulk/{job_id}
+    批量刷新任务进度（含失败的 AVID 及原因）
+
+    DELETE /api/resources/refresh/bulk/{job_id}
+    取消任务：正在处理的块完成后停止，之后可通过 resume 继续
+    """
+
+    def get(self, request, job_id):
+        from .bulk_refresh import bulk_refresh_jobs
+
+        job = bulk_refresh_jobs.get(job_id)
+        if job is None:
+            return build_response(404, f"批量刷新任务 {job_id} 不存在", None)
+        return build_response(200, "success", job)
+
+    def delete(self, request, job_id):
+        from .bulk_refresh import bulk_refresh_jobs
+
+        job = bulk_refresh_jobs.cancel(job_id)
+        if job is None:
+            return build_response(404, f"批量刷新任务 {job_id} 不存在", None)
+        return build_response(200, "success", job)
+
+
+class BulkRefreshResumeView(APIView):
+    """
+    POST /api/resources/refresh/bulk/{job_id}/resume
+    从检查点继续已取消/失败/中断的批量刷新任务（已完成的块不再处理）
+    """
+
+    def post(self, request, job_id):
+        from .bulk_refresh import STATUS_RUNNING, bulk_refresh_jobs
+        from .tasks import start_bulk_refresh
+
+        job = bulk_refresh_jobs.resume(job_id)
+        if job is None:
+            return build_response(404, f"批量刷新任务 {job_id} 不存在", None)
+        if job["status"] == STATUS_RUNNING:
+            start_bulk_refresh(job_id)
+        return build_response(202, "批量刷新任务已继续", job)
+
+
 class DeleteResourceView(APIView):
     """
     DELETE /api/resource/{avid}
@@ -1188,7 +1374,7 @@ class DeleteResourceView(APIView):
 
                 resource_obj = AVResource.objects.filter(avid=avid).first()
                 if resource_obj:
-                    resource_data = _serialize_resource_obj(resource_obj)
+                    resource_data = serialize_resource_obj(resource_obj)
                 AVResource.objects.filter(avid=avid).delete()
             except Exception as e:
                 logger.warning(f"删除数据库记录失败: {e}")
@@ -1228,6 +1414,65 @@ class TaskQueueStatusView(APIView):
             return build_response(500, f"获取队列状态失败: {str(e)}", None)
 
 
+class TaskQueueItemView(APIView):
+    """
+    PATCH /api/tasks/queue/{avid}
+    调整等待中下载任务的优先级
+
+    请求参数:
+        priority: 新的优先级 (int, optional)
+        bump: 是否直接提到队首 (boolean, optional)
+    """
+
+    def patch(self, request, avid):
+        from .tasks import get_full_task_queue, reprioritize_download
+
+        avid = avid.upper()
+        data = request.data or {}
+        bump = bool(data.get("bump", False))
+        priority = data.get("priority")
+        if not bump and priority is None:
+            return build_response(400, "需要提供 priority 或 bump", None)
+        if priority is not None:
+            try:
+                priority = int(priority)
+            except (TypeError, ValueError):
+                return build_response(400, "priority 必须为整数", None)
+
+        try:
+            if not reprioritize_download(avid, priority=priority, bump=bump):
+                return build_response(404, f"{avid} 不在等待队列中", None)
+            return build_response(200, "success", get_full_task_queue())
+        except Exception as e:
+            logger.error(f"调整下载优先级失败: {e}")
+            return build_response(500, f"调整优先级失败: {str(e)}", None)
+
+
+class TaskQueueReorderView(APIView):
+    """
+    POST /api/tasks/queue/reorder
+    按给定顺序把等待中的下载任务排到队首
+
+    Body example: { "avids": ["ABC-123", "DEF-222"] }
+    """
+
+    def post(self, request):
+        from .tasks import get_full_task_queue, reorder_download_queue
+
+        avids = (request.data or {}).get("avids") or []
+        if not isinstance(avids, list) or not avids:
+            return build_response(400, "avids 必须为非空列表", None)
+
+        try:
+            moved = reorder_download_queue([str(a) for a in avids])
+            data = get_full_task_queue()
+            data["reordered"] = moved
+            return build_response(200, "success", data)
+        except Exception as e:
+            logger.error(f"调整下载队列顺序失败: {e}")
+            return build_response(500, f"调整队列顺序失败: {str(e)}", None)
+
+
 class ResourcesBatchView(APIView):
     """POST /api/resources/batch
 
@@ -1235,430 +1480,148 @@ class ResourcesBatchView(APIView):
       { "actions": [ {"action":"add","avid":"ABC-123","source":"any"},
                       {"action":"delete-video","avid":"XYZ-001"},
                       {"action":"delete-all","avid":"OLD-999"},
-                      {"action":"refresh","avid":"DEF-222"} ] }
+                      {"action":"refresh","avid":"DEF-222"} ],
+        "mode": "sync" }
 
     支持的 action 类型：
     - add: 添加资源
     - refresh: 刷新资源元数据和 m3u8
     - delete-video: 只删除视频文件，保留元数据
     - delete-all 或 delete: 删除全部数据（视频+元数据+封面+备份）
+
+    mode（可选）：
+    - sync: 在请求中执行，返回 {"results": [...]}（按请求顺序）
+    - async: 创建后台任务，返回 202 和任务信息（见 ResourcesBatchJobView）
+    - stream: 创建后台任务，以 NDJSON 流按完成顺序返回每项结果
+    默认不超过 ResourcesBatch.sync_limit 项时为 sync，否则为 async。
+    每种操作的并发数见 ResourcesBatch.concurrency（nassav/batch_jobs.py）
     """
 
     def post(self, request):
-        import time
+        from .batch_jobs import (
+            BatchError,
+            batch_jobs,
+            default_mode,
+            run_actions,
+            validate_actions,
+        )
 
         data = request.data or {}
-        actions = data.get("actions") or []
-        results = []
-
-        for act in actions:
-            action = (act.get("action") or "").lower()
-            avid = (act.get("avid") or "").upper()
-            if not avid:
-                results.append(
-                    {
-                        "action": action,
-                        "avid": None,
-                        "code": 400,
-                        "message": "avid 缺失",
-                        "resource": None,
-                    }
-                )
-                continue
-
-            try:
-                if action == "add":
-                    # 先检查资源是否已存在
-                    from nassav.models import AVResource
-
-                    existing_resource = AVResource.objects.filter(avid=avid).first()
-
-                    if existing_resource:
-                        # 资源已存在，返回现有数据
-                        resource_data = _serialize_resource_obj(existing_resource)
-                        results.append(
-                            {
-                                "action": "add",
-                                "avid": avid,
-                                "code": 200,
-                                "message": "already exists",
-                                "resource": resource_data,
-                            }
-                        )
-                        continue
-
-                    # 资源不存在，执行添加操作
-                    source = (act.get("source") or "any").lower()
-                    time.sleep(2)
+        try:
+            actions = validate_actions(data.get("actions") or [])
+        except BatchError as e:
+            return build_response(400, str(e), None)
+        mode = data.get("mode") or default_mode(len(actions))
+        if mode not in ("sync", "async", "stream"):
+            return build_response(400, "mode 只能是 sync、async 或 stream", None)
+
+        if mode == "sync":
+            results = run_actions(actions)
+            return build_response(
+                200, "success", {"results": [results[i] for i in sorted(results)]}
+            )
 
-                    # 使用ResourceService添加资源
-                    try:
-                        from nassav.resource_service import (
-                            ResourceAccessDeniedError,
-                            ResourceAlreadyExistsError,
-                            ResourceFetchError,
-                            ResourceNotFoundError,
-                            resource_service,
-                        )
+        from .tasks import start_resources_batch
 
-                        result = resource_service.add_resource(avid, source)
-                        results.append(
-                            {
-                                "action": "add",
-                                "avid": avid,
-                                "code": 201,
-                                "message": "created",
-                                "resource": result["resource"],
-                            }
-                        )
+        try:
+            job = batch_jobs.create(actions)
+            if job["total"]:
+                start_resources_batch(job["job_id"])
+        except Exception as e:
+            logger.error(f"创建批量操作任务失败: {e}")
+            return build_response(500, f"创建批量操作任务失败: {str(e)}", None)
+        if mode == "stream":
+            return _batch_stream(request, job["job_id"])
+        return build_response(202, "批量操作任务已创建", job)
 
-                    except ResourceAlreadyExistsError as e:
-                        # 资源已存在(理论上不应该到这里,因为前面已经检查过)
-                        results.append(
-                            {
-                                "action": "add",
-                                "avid": avid,
-                                "code": 200,
-                                "message": "already exists",
-                                "resource": e.resource_data,
-                            }
-                        )
 
-                    except ResourceNotFoundError as e:
-                        results.append(
-                            {
-                                "action": "add",
-                                "avid": avid,
-                                "code": 404,
-                                "message": str(e),
-                                "resource": None,
-                            }
-                        )
+def _batch_stream(request, job_id: str, offset: int = 0):
+    from django.core.handlers.asgi import ASGIRequest
+    from django.http import StreamingHttpResponse
 
-                    except ResourceAccessDeniedError as e:
-                        results.append(
-                            {
-                                "action": "add",
-                                "avid": avid,
-                                "code": 403,
-                                "message": str(e),
-                                "resource": None,
-                            }
-                        )
+    from .batch_jobs import batch_jobs
 
-                    except ResourceFetchError as e:
-                        results.append(
-                            {
-                                "action": "add",
-                                "avid": avid,
-                                "code": 502,
-                                "message": str(e),
-                                "resource": None,
-                            }
-                        )
+    # ASGI 下必须使用异步生成器，同步迭代器会被整体读完后才发送
+    if isinstance(getattr(request, "_request", request), ASGIRequest):
+        content = batch_jobs.astream(job_id, offset)
+    else:
+        content = batch_jobs.stream(job_id, offset)
+    response = StreamingHttpResponse(content, content_type="application/x-ndjson")
+    response["Cache-Control"] = "no-cache"
+    # 关闭 nginx 缓冲，结果逐行到达客户端
+    response["X-Accel-Buffering"] = "no"
+    response["X-Job-Id"] = job_id
+    return response
 
-                    except Exception as e:
-                        logger.error(f"批量添加资源失败: {avid}, 错误: {e}", exc_info=True)
-                        results.append(
-                            {
-                                "action": "add",
-                                "avid": avid,
-                                "code": 500,
-                                "message": f"服务器内部错误: {str(e)}",
-                                "resource": None,
-                            }
-                        )
 
-                elif action == "delete-video":
-                    # 只删除视频文件，保留元数据
-                    from pathlib import Path
-
-                    mp4_path = Path(settings.VIDEO_DIR) / f"{avid}.mp4"
-
-                    if not mp4_path.exists():
-                        results.append(
-                            {
-                                "action": "delete-video",
-                                "avid": avid,
-                                "code": 404,
-                                "message": "视频不存在",
-                                "resource": None,
-                            }
-                        )
-                        continue
-
-                    try:
-                        file_size = mp4_path.stat().st_size
-                        mp4_path.unlink()
-                        logger.info(f"已删除视频: {avid}")
-                        # 更新数据库记录，标记视频不存在
-                        from nassav.models import AVResource
-
-                        AVResource.objects.filter(avid=avid).update(
-                            file_exists=False, file_size=None, video_saved_at=None
-                        )
-                        logger.info(f"已删除视频: {avid}")
-                        results.append(
-                            {
-                                "action": "delete-video",
-                                "avid": avid,
-                                "code": 200,
-                                "message": "视频已删除",
-                                "deleted_file": f"{avid}.mp4",
-                                "file_size": file_size,
-                            }
-                        )
-                    except Exception as e:
-                        logger.error(f"删除视频失败: {e}")
-                        results.append(
-                            {
-                                "action": "delete-video",
-                                "avid": avid,
-                                "code": 500,
-                                "message": f"删除失败: {str(e)}",
-                                "resource": None,
-                            }
-                        )
-
-                elif action in ["delete", "delete-all"]:
-                    # 删除全部数据（视频+元数据+封面+备份）
-                    import shutil
-                    from pathlib import Path
-
-                    cover_root = Path(settings.COVER_DIR)
-                    video_root = Path(settings.VIDEO_DIR)
-                    backup_root = Path(
-                        getattr(
-                            settings,
-                            "RESOURCE_BACKUP_DIR",
-                            Path(settings.BASE_DIR) / "resource_backup",
-                        )
-                    )
+class ResourcesBatchJobView(APIView):
+    """
+    GET /api/resources/batch/{job_id}[?offset=N]
+    批量操作任务状态与结果：results 按请求顺序，每项带 index（请求中的序号），
+    offset 为跳过的结果数（按完成顺序，增量轮询时使用）
 
-                    cover_candidates = []
-                    for ext in [".jpg", ".jpeg", ".png", ".webp"]:
-                        p = cover_root / f"{avid}{ext}"
-                        if p.exists():
-                            cover_candidates.append(p)
-
-                    mp4_path = video_root / f"{avid}.mp4"
-                    backup_dir = backup_root / avid
-
-                    if (
-                        not cover_candidates
-                        and not mp4_path.exists()
-                        and not backup_dir.exists()
-                    ):
-                        results.append(
-                            {
-                                "action": action,
-                                "avid": avid,
-                                "code": 404,
-                                "message": "资源不存在",
-                                "resource": None,
-                            }
-                        )
-                        continue
-
-                    deleted_files = []
-                    for p in cover_candidates:
-                        deleted_files.append(p.name)
-                        try:
-                            p.unlink()
-                            logger.info(f"已删除封面: {p.name}")
-                        except Exception:
-                            pass
-
-                    if mp4_path.exists():
-                        deleted_files.append(mp4_path.name)
-                        logger.info(f"已删除视频: {mp4_path.name}")
-                        try:
-                            mp4_path.unlink()
-                        except Exception:
-                            pass
-
-                    if backup_dir.exists():
-                        try:
-                            for f in backup_dir.iterdir():
-                                deleted_files.append(f.name)
-                            shutil.rmtree(backup_dir)
-                        except Exception:
-                            pass
-
-                    # serialize and delete DB record
-                    from nassav.models import AVResource
-
-                    resource_data = None
-                    try:
-                        resource_obj = AVResource.objects.filter(avid=avid).first()
-                        if resource_obj:
-                            resource_data = _serialize_resource_obj(resource_obj)
-                        AVResource.objects.filter(avid=avid).delete()
-                    except Exception:
-                        pass
+    DELETE /api/resources/batch/{job_id}
+    取消任务：正在执行的操作完成后停止，未开始的操作不再执行
+    """
 
-                    results.append(
-                        {
-                            "action": action,
-                            "avid": avid,
-                            "code": 200,
-                            "message": "已删除全部数据",
-                            "resource": resource_data,
-                            "deleted_files": deleted_files,
-                        }
-                    )
+    def get(self, request, job_id):
+        from .batch_jobs import batch_jobs
 
-                elif action == "refresh":
-                    # 支持细粒度刷新参数
-                    from nassav.models import AVResource
-
-                    resource = AVResource.objects.filter(avid=avid).first()
-                    if not resource:
-                        results.append(
-                            {
-                                "action": "refresh",
-                                "avid": avid,
-                                "code": 404,
-                                "message": "资源不存在",
-                                "resource": None,
-                            }
-                        )
-                        continue
-                    source = resource.source or ""
-                    if not source:
-                        results.append(
-                            {
-                                "action": "refresh",
-                                "avid": avid,
-                                "code": 400,
-                                "message": "没有 source 信息",
-                                "resource": None,
-                            }
-                        )
-                        continue
-
-                    # 解析细粒度参数
-                    refresh_m3u8 = act.get("refresh_m3u8", True)
-                    refresh_metadata = act.get("refresh_metadata", True)
-                    retranslate = act.get("retranslate", False)
-
-                    refresh_info = {}
-
-                    # 刷新元数据和/或 m3u8
-                    if refresh_metadata or refresh_m3u8:
-                        try:
-                            from nassav.resource_service import (
-                                ResourceNotFoundError,
-                                resource_service,
-                            )
-
-                            refresh_result = resource_service.refresh_resource(
-                                avid,
-                                scrape=refresh_metadata,
-                                download_cover=refresh_metadata,
-                            )
-
-                            refresh_info["metadata_refreshed"] = refresh_metadata
-                            refresh_info["m3u8_refreshed"] = refresh_m3u8
-                            refresh_info["cover_saved"] = refresh_result["cover_saved"]
-                            refresh_info["metadata_saved"] = refresh_result[
-                                "metadata_saved"
-                            ]
-                            refresh_info["scraped"] = refresh_result.get(
-                                "scraped", False
-                            )
-
-                        except ResourceNotFoundError as e:
-                            results.append(
-                                {
-                                    "action": "refresh",
-                                    "avid": avid,
-                                    "code": 404,
-                                    "message": str(e),
-                                    "resource": None,
-                                }
-                            )
-                            continue
-
-                        except Exception as e:
-                            logger.error(f"批量刷新资源失败: {avid}, 错误: {e}", exc_info=True)
-                            results.append(
-                                {
-                                    "action": "refresh",
-                                    "avid": avid,
-                                    "code": 500,
-                                    "message": f"刷新失败: {str(e)}",
-                                    "resource": None,
-                                }
-                            )
-                            continue
-
-                    # 重新翻译（在元数据刷新之后）
-                    if retranslate:
-                        try:
-                            resource.refresh_from_db()
-                            from nassav.tasks import translate_title_task
-
-                            resource.translation_status = "pending"
-                            resource.translated_title = None
-                            resource.save(
-                                update_fields=["translation_status", "translated_title"]
-                            )
-                            translate_title_task.delay(avid)
-                            refresh_info["translation_queued"] = True
-                        except Exception as e:
-                            logger.error(f"提交翻译任务失败: {e}")
-                            refresh_info["translation_error"] = str(e)
-
-                    resource.refresh_from_db()
-                    resource_data = (
-                        _serialize_resource_obj(resource) if resource else None
-                    )
-                    result_item = {
-                        "action": "refresh",
-                        "avid": avid,
-                        "code": 200,
-                        "message": "refreshed",
-                        "resource": resource_data,
-                    }
-                    result_item.update(refresh_info)
-                    results.append(result_item)
+        try:
+            offset = int(request.query_params.get("offset", 0))
+        except ValueError:
+            return build_response(400, "offset 必须是整数", None)
+        job = batch_jobs.get(job_id)
+        if job is None:
+            return build_response(404, f"批量操作任务 {job_id} 不存在", None)
+        results = batch_jobs.results(job_id, offset)
+        if not offset:
+            results.sort(key=lambda item: item["index"])
+        return build_response(200, "success", {**job, "results": results})
+
+    def delete(self, request, job_id):
+        from .batch_jobs import batch_jobs
+
+        job = batch_jobs.cancel(job_id)
+        if job is None:
+            return build_response(404, f"批量操作任务 {job_id} 不存在", None)
+        return build_response(200, "success", job)
+
+
+class ResourcesBatchStreamView(APIView):
+    """
+    GET /api/resources/batch/{job_id}/stream[?offset=N]
+    以 NDJSON 流按完成顺序返回批量操作任务的结果（{"event": "item", ...}），
+    空闲时输出心跳（{"event": "heartbeat"}），结束时输出 {"event": "end", 任务信息}
+    """
 
-                else:
-                    results.append(
-                        {
-                            "action": action,
-                            "avid": avid,
-                            "code": 400,
-                            "message": "未知 action",
-                            "resource": None,
-                        }
-                    )
+    def get(self, request, job_id):
+        from .batch_jobs import batch_jobs
 
-            except Exception as e:
-                logger.exception(f"批量操作失败: {e}")
-                results.append(
-                    {
-                        "action": action,
-                        "avid": avid,
-                        "code": 500,
-                        "message": str(e),
-                        "resource": None,
-                    }
-                )
-
-        return build_response(200, "success", {"results": results})
+        try:
+            offset = int(request.query_params.get("offset", 0))
+        except ValueError:
+            return build_response(400, "offset 必须是整数", None)
+        if batch_jobs.get(job_id) is None:
+            return build_response(404, f"批量操作任务 {job_id} 不存在", None)
+        return _batch_stream(request, job_id, offset)
 
 
 class DownloadsBatchSubmitView(APIView):
     """POST /api/downloads/batch_submit
 
-    Body example: { "avids": ["ABC-123","DEF-222"] }
+    Body example: { "avids": ["ABC-123","DEF-222"], "priority": -1 }
+
+    批量提交默认以较低优先级（-1）排队，避免挡住单独提交的下载。
     """
 
     def post(self, request):
         data = request.data or {}
         avids = data.get("avids") or []
+        try:
+            priority = int(data.get("priority", -1))
+        except (TypeError, ValueError):
+            return build_response(400, "priority 必须为整数", None)
         results = []
 
         from .tasks import submit_download_task
@@ -1666,7 +1629,9 @@ class DownloadsBatchSubmitView(APIView):
         for a in avids:
             avid = str(a).upper()
             try:
-                task_result, is_duplicate = submit_download_task(avid)
+                task_result, is_duplicate = submit_download_task(
+                    avid, priority=priority
+                )
                 if is_duplicate:
                     results.append(
                         {
@@ -4,16 +4,16 @@
 
 功能：
 1. 查找所有没有头像的演员
-2. 从关联的作品中获取AVID
-3. 重新刮削Javbus获取头像URL
-4. 下载并保存头像图片
+2. 从关联的作品中选出需要刮削的AVID（一个作品的刮削结果包含其所有演员的头像，同一作品只刮削一次）
+3. 并发刮削Javbus获取头像URL，更新数据库
+4. 通过头像服务并发下载头像（已有的头像不请求，请求速率由配置 RateLimit 按域名控制）
 
 使用方法：
-    uv run python scripts/backfill_actor_avatars.py [--limit N] [--delay SECONDS] [--dry-run]
+    uv run python scripts/backfill_actor_avatars.py [--limit N] [--workers N] [--dry-run]
 
 选项：
     --limit N       限制处理的演员数量（用于测试）
-    --delay SECONDS 每次刮削之间的延迟（默认1秒，避免过于频繁请求）
+    --workers N     同时刮削/下载的数量（默认使用配置 Avatars.workers）
     --dry-run       仅模拟运行，不实际更新数据库或下载文件
     --verbose       显示详细日志
 """
@@ -23,7 +23,8 @@ import argparse
 # 配置Django环境
 import os
 import sys
-import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
 
 import django
@@ -35,12 +36,43 @@ django.setup()
 from django.conf import settings
 from django.db.models import Count
 from loguru import logger
-from nassav import utils as nassav_utils
-from nassav.models import Actor
+from nassav.avatar_service import OK_STATUSES, STATUS_PRESENT, avatar_service
+from nassav.models import Actor, AVResource
 from nassav.scraper.Javbus import Javbus
 
 
-def backfill_avatars(limit=None, delay=1.0, dry_run=False, verbose=False):
+def pick_avids(actors) -> list:
+    """
+    选出覆盖所有演员的作品（优先选择包含最多待处理演员的作品）
+
+    Args:
+        actors: 待处理的演员（按作品数倒序）
+
+    Returns:
+        AVID 列表
+    """
+    actor_ids = [actor.id for actor in actors]
+    rows = AVResource.actors.through.objects.filter(actor_id__in=actor_ids).values_list(
+        "actor_id", "avresource__avid"
+    )
+    resources_of = defaultdict(list)
+    actors_of = defaultdict(set)
+    for actor_id, avid in rows:
+        resources_of[actor_id].append(avid)
+        actors_of[avid].add(actor_id)
+
+    uncovered = set(actor_ids)
+    avids = []
+    for actor_id in actor_ids:
+        if actor_id not in uncovered or not resources_of[actor_id]:
+            continue
+        avid = max(resources_of[actor_id], key=lambda a: len(actors_of[a] & uncovered))
+        avids.append(avid)
+        uncovered -= actors_of[avid]
+    return avids
+
+
+def backfill_avatars(limit=None, workers=None, dry_run=False, verbose=False):
     """为现有演员批量获取头像"""
 
     # 配置日志级别
@@ -70,98 +102,84 @@ def backfill_avatars(limit=None, delay=1.0, dry_run=False, verbose=False):
     if dry_run:
         logger.warning("【DRY RUN 模式】不会实际修改数据库或下载文件")
 
-    # 2. 初始化刮削器
-    scraper = Javbus()
+    actors = list(actors_without_avatar)
+    pending = {actor.name for actor in actors}
+    workers = max(1, int(workers or avatar_service.config["workers"]))
 
     # 统计
     stats = {
-        "processed": 0,
+        "processed": len(actors),
+        "scraped": 0,
         "success": 0,
         "failed": 0,
         "downloaded": 0,
-        "skipped": 0,  # 未找到作品或刮削失败
+        "skipped": 0,  # 刮削结果中没有该演员的头像
     }
 
-    # 3. 处理每个演员
-    for actor in actors_without_avatar:
-        stats["processed"] += 1
-        logger.info(
-            f"\n[{stats['processed']}/{len(actors_without_avatar)}] 处理演员: {actor.name} (作品数: {actor.resource_count})"
-        )
-
-        # 获取该演员的第一个作品AVID
-        first_resource = actor.resources.first()
-        if not first_resource:
-            logger.warning(f"  跳过: 演员 {actor.name} 没有关联作品")
-            stats["skipped"] += 1
-            continue
-
-        avid = first_resource.avid
-        logger.info(f"  使用作品 {avid} 进行刮削")
+    # 2. 选出需要刮削的作品（同一作品的所有演员只刮削一次）
+    avids = pick_avids(actors)
+    logger.info(f"需要刮削 {len(avids)} 个作品（并发 {workers}）")
 
-        # 刮削作品元数据
-        try:
-            scrape_data = scraper.scrape(avid)
-        except Exception as e:
-            logger.error(f"  刮削失败: {e}")
-            stats["failed"] += 1
-            time.sleep(delay)
-            continue
-
-        if not scrape_data:
-            logger.warning(f"  刮削失败: 未获取到元数据")
-            stats["skipped"] += 1
-            time.sleep(delay)
-            continue
-
-        # 检查是否有头像URL
-        actor_avatars = scrape_data.get("actor_avatars", {})
-        if actor.name not in actor_avatars:
-            logger.warning(f"  跳过: 刮削结果中没有该演员的头像URL")
-            stats["skipped"] += 1
-            time.sleep(delay)
-            continue
+    # 3. 并发刮削，数据库在主线程中更新
+    scraper = Javbus()
+    found = {}
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="scrape") as ex:
+        futures = {ex.submit(scraper.scrape, avid): avid for avid in avids}
+        for idx, future in enumerate(as_completed(futures), 1):
+            avid = futures[future]
+            try:
+                scrape_data = future.result()
+            except Exception as e:
+                logger.error(f"[{idx}/{len(avids)}] {avid} 刮削失败: {e}")
+                stats["failed"] += 1
+                continue
+            if not scrape_data:
+                logger.warning(f"[{idx}/{len(avids)}] {avid} 刮削失败: 未获取到元数据")
+                stats["failed"] += 1
+                continue
+            stats["scraped"] += 1
+
+            actor_avatars = {
+                name: url
+                for name, url in (scrape_data.get("actor_avatars") or {}).items()
+                if name in pending
+            }
+            pending -= set(actor_avatars)
+            found.update(actor_avatars)
+            logger.info(
+                f"[{idx}/{len(avids)}] {avid}: 找到 {len(actor_avatars)} 个演员的头像URL"
+            )
+            if not dry_run and actor_avatars:
+                avatar_service.update_actors(actor_avatars)
+
+    stats["success"] = len(found)
+    stats["skipped"] = len(pending)
+    for name in sorted(pending):
+        logger.debug(f"  跳过: 刮削结果中没有演员 {name} 的头像URL")
+
+    # 4. 并发下载头像（已有的不请求）
+    if dry_run:
+        for name, url in found.items():
+            logger.info(f"  [DRY RUN] 将更新 {name}: avatar_url={url}")
+    elif found:
+        results = avatar_service.backfill(found.values(), workers=workers)
+        stats["downloaded"] = sum(
+            1 for s in results.values() if s in OK_STATUSES and s != STATUS_PRESENT
+        )
+        for url, status in results.items():
+            if status not in OK_STATUSES:
+                logger.warning(f"  ✗ 下载失败: {url}")
 
-        avatar_url = actor_avatars[actor.name]
-        logger.info(f"  找到头像URL: {avatar_url}")
-
-        # 更新数据库
-        if not dry_run:
-            filename = avatar_url.rstrip("/").split("/")[-1]
-            actor.avatar_url = avatar_url
-            actor.avatar_filename = filename
-            actor.save()
-            logger.info(f"  ✓ 已更新数据库: {filename}")
-
-            # 下载头像
-            avatar_path = Path(settings.AVATAR_DIR) / filename
-            if avatar_path.exists():
-                logger.info(f"  头像已存在: {filename}")
-            else:
-                if nassav_utils.download_avatar(avatar_url, avatar_path):
-                    stats["downloaded"] += 1
-                    logger.info(f"  ✓ 下载成功: {filename}")
-                else:
-                    logger.warning(f"  ✗ 下载失败: {filename}")
-
-            stats["success"] += 1
-        else:
-            logger.info(f"  [DRY RUN] 将更新: avatar_url={avatar_url}")
-            stats["success"] += 1
-
-        # 延迟（避免频繁请求）
-        if delay > 0 and stats["processed"] < len(actors_without_avatar):
-            time.sleep(delay)
-
-    # 4. 输出统计信息
+    # 5. 输出统计信息
     logger.info("\n" + "=" * 60)
     logger.info("处理完成！")
     logger.info("=" * 60)
     logger.info(f"总演员数:   {stats['processed']}")
+    logger.info(f"刮削作品:   {stats['scraped']}")
     logger.info(f"成功获取:   {stats['success']}")
     logger.info(f"下载头像:   {stats['downloaded']}")
     logger.info(f"跳过:       {stats['skipped']}")
-    logger.info(f"失败:       {stats['failed']}")
+    logger.info(f"刮削失败:   {stats['failed']}")
 
     if not dry_run:
         # 显示AVATAR_DIR统计
@@ -169,6 +187,8 @@ def backfill_avatars(limit=None, delay=1.0, dry_run=False, verbose=False):
         avatar_files = list(avatar_dir.glob("*.jpg"))
         logger.info(f"\nAVATAR_DIR 文件总数: {len(avatar_files)}")
 
+    return stats
+
 
 def main():
     parser = argparse.ArgumentParser(
@@ -176,7 +196,7 @@ def main():
         formatter_class=argparse.RawDescriptionHelpFormatter,
         epilog="""
 示例：
-  # 为所有演员获取头像（延迟1秒）
+  # 为所有演员获取头像
   uv run python scripts/backfill_actor_avatars.py
 
   # 仅处理前10个演员（测试）
@@ -185,12 +205,14 @@ def main():
   # 干运行模式（不实际修改）
   uv run python scripts/backfill_actor_avatars.py --dry-run --limit 5
 
-  # 加快速度（0.5秒延迟）
-  uv run python scripts/backfill_actor_avatars.py --delay 0.5
+  # 8 个并发（每个域名的请求速率仍由 RateLimit 控制）
+  uv run python scripts/backfill_actor_avatars.py --workers 8
         """,
     )
     parser.add_argument("--limit", type=int, help="限制处理的演员数量（用于测试）")
-    parser.add_argument("--delay", type=float, default=1.0, help="每次刮削之间的延迟秒数（默认1秒）")
+    parser.add_argument(
+        "--workers", type=int, default=None, help="同时刮削/下载的数量（默认使用配置 Avatars.workers）"
+    )
     parser.add_argument("--dry-run", action="store_true", help="仅模拟运行，不实际修改数据库或下载文件")
     parser.add_argument("--verbose", action="store_true", help="显示详细日志")
 
@@ -199,7 +221,7 @@ def main():
     try:
         backfill_avatars(
             limit=args.limit,
-            delay=args.delay,
+            workers=args.workers,
             dry_run=args.dry_run,
             verbose=args.verbose,
         )
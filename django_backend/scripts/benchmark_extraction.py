@@ -0,0 +1,234 @@
+#!/usr/bin/env python
+"""
+页面解析基准测试
+
+功能：
+1. 读取 tests/fixtures/pages 下的页面样本，把番号替换成不同的 AVID，模拟批量重新解析上千个页面
+2. 对比旧的 JavBus 解析实现（十余个 re.search/findall 各扫描一次整页，部分正则插入番号、每个番号重新编译）
+   与当前的单次扫描实现（nassav.extractor），并校验两者结果一致
+3. 统计各源 parse_html 的 CPU 时间（MissAV 获取播放列表的网络请求已跳过）
+4. --from-store 时改为解析 HTML 快照存储中的页面（与 html_snapshots reparse 相同的负载）
+
+用法：
+    python scripts/benchmark_extraction.py [选项]
+
+选项：
+    --pages N          每个站点生成的页面数（默认 2000）
+    --from-store       解析 HTML 快照存储（settings.HTML_SNAPSHOT_DIR）中的页面
+    --limit N          --from-store 时最多解析的 AVID 数
+"""
+
+import argparse
+import os
+import re
+import sys
+import time
+from pathlib import Path
+
+# 添加项目根目录到 Python 路径
+script_dir = Path(__file__).resolve().parent
+project_root = script_dir.parent
+sys.path.insert(0, str(project_root))
+
+# 设置 Django 环境
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "django_project.settings")
+
+import django
+
+django.setup()
+
+from loguru import logger
+from nassav.scraper.Javbus import TECHNICAL_GENRES, Javbus
+from nassav.source import Jable, Memo, MissAV
+
+# 配置 loguru
+logger.remove()
+logger.add(
+    sys.stderr,
+    format="<green>{time:YYYY-MM-DD HH:mm:ss}</green> | <level>{level: <8}</level> | <cyan>{message}</cyan>",
+    level="INFO",
+    filter=lambda record: record["name"] == "__main__",
+)
+
+FIXTURES = project_root / "tests" / "fixtures" / "pages"
+
+
+def legacy_javbus_parse(html: str, avid: str, domain: str) -> dict:
+    """旧的 JavBus 解析实现：每个字段各自扫描整页，标题正则中插入番号"""
+    data = {
+        "avid": avid.upper(),
+        "title": "",
+        "release_date": "",
+        "duration": "",
+        "studio": "",
+        "label": "",
+        "series": "",
+        "genres": [],
+        "actors": [],
+    }
+    meta = re.search(r'<meta\s+name="description"\s+content="([^"]+)"', html)
+    if meta:
+        desc = meta.group(1)
+        m = re.search(r"【發行日期】(\d{4}-\d{2}-\d{2})", desc)
+        if m:
+            data["release_date"] = m.group(1)
+        m = re.search(r"【長度】(\d+)分鐘", desc)
+        if m:
+            data["duration"] = m.group(1) + "分钟"
+        m = re.search(rf"\({avid}\)(.+?)$", desc)
+        if m:
+            data["title"] = m.group(1).strip()
+    if not data["release_date"]:
+        m = re.search(r'<span class="header">發行日期:</span>\s*(\d{4}-\d{2}-\d{2})', html)
+        if m:
+            data["release_date"] = m.group(1)
+    if not data["duration"]:
+        m = re.search(r'<span class="header">長度:</span>\s*(\d+)分鐘', html)
+        if m:
+            data["duration"] = m.group(1) + "分钟"
+    if not data["title"]:
+        m = re.search(r"<title>([^<]+)</title>", html)
+        if m:
+            title = re.sub(r"\s*[-|]\s*JavBus.*$", "", m.group(1), flags=re.IGNORECASE)
+            title = re.sub(rf"^{avid}\s*", "", title, flags=re.IGNORECASE)
+            data["title"] = title.strip()
+    for key, header in (("studio", "製作商"), ("label", "發行商"), ("series", "系列")):
+        m = re.search(
+            rf'<span class="header">{header}:</span>\s*<a[^>]*>([^<]+)</a>', html
+        )
+        if m:
+            data[key] = m.group(1).strip()
+    genres = re.findall(
+        r'<span class="genre"><label><input[^>]*><a[^>]*>([^<]+)</a></label></span>',
+        html,
+    )
+    data["genres"] = [g for g in genres if g not in TECHNICAL_GENRES]
+    m = re.search(r'<span class="header">導演:</span>\s*<a[^>]*>([^<]+)</a>', html)
+    if m:
+        data["director"] = m.group(1).strip()
+    m = re.search(r'<a[^>]*class="bigImage"[^>]*href="([^"]+)"', html)
+    if m:
+        cover = m.group(1)
+        data["cover_url"] = (
+            f"https://{domain}{cover}" if cover.startswith("/") else cover
+        )
+    actors = re.compile(
+        r'<a class="avatar-box"[^>]*>\s*<div[^>]*>\s*'
+        r'<img[^>]*src="([^"]+)"[^>]*title="([^"]+)"[^>]*>',
+        re.DOTALL,
+    ).findall(html)
+    if actors:
+        data["actors"] = [name for _, name in actors]
+        data["actor_avatars"] = {
+            name: f"https://{domain}{src}" if src.startswith("/") else src
+            for src, name in actors
+        }
+    return data
+
+
+def corpus(site: str, pages: int):
+    """把样本页面中的番号替换为不同 AVID，生成 pages 个 (avid, html)"""
+    samples = [
+        (path.stem, path.read_text(encoding="utf-8"))
+        for path in sorted((FIXTURES / site).glob("*.html"))
+    ]
+    result = []
+    for i in range(pages):
+        original, html = samples[i % len(samples)]
+        avid = f"{chr(ord('A') + i % 26) * 3}-{i:05d}"
+        html = html.replace(original, avid).replace(original.lower(), avid.lower())
+        result.append((avid, html))
+    return result
+
+
+def timed(fn, items) -> float:
+    start = time.process_time()
+    for item in items:
+        fn(*item)
+    return time.process_time() - start
+
+
+def report(name: str, seconds: float, count: int, baseline: float = None):
+    line = f"{name:<16} {count:>6} 页 | CPU {seconds * 1000:8.1f}ms | 每页 {seconds / count * 1e6:7.1f}µs"
+    if baseline:
+        line += f" | 耗时减少 {1 - seconds / baseline:.0%}"
+    logger.info(line)
+
+
+def bench_fixtures(args):
+    javbus = Javbus()
+    pages = corpus("javbus", args.pages)
+
+    mismatched = [
+        avid
+        for avid, html in pages[:50]
+        if javbus.parse_html(html, avid)
+        != legacy_javbus_parse(html, avid, javbus.domain)
+    ]
+    if mismatched:
+        logger.error(f"新旧实现结果不一致: {mismatched[:5]}")
+
+    legacy = timed(
+        lambda avid, html: legacy_javbus_parse(html, avid, javbus.domain), pages
+    )
+    report("javbus legacy", legacy, len(pages))
+    # 复制字符串，避免命中同一页面对象的提取缓存
+    pages = [(avid, html + " ") for avid, html in pages]
+    report(
+        "javbus",
+        timed(lambda avid, html: javbus.parse_html(html, avid), pages),
+        len(pages),
+        legacy,
+    )
+
+    for site, source in (("missav", MissAV()), ("jable", Jable()), ("memo", Memo())):
+        pages = corpus(site, args.pages)
+        seconds = timed(
+            lambda avid, html: (source.parse_html(html), source.get_cover_url(html)),
+            pages,
+        )
+        report(site, seconds, len(pages))
+
+
+def bench_store(args):
+    from nassav.html_store import get_html_store
+    from nassav.source.SourceManager import source_manager
+
+    avids = list(get_html_store().avids())
+    if args.limit:
+        avids = avids[: args.limit]
+    if not avids:
+        logger.warning(f"快照存储为空: {get_html_store().root}")
+        return
+    failed = []
+
+    def reparse(avid):
+        if source_manager.reparse_snapshot(avid)[0] is None:
+            failed.append(avid)
+
+    # 读取快照、解压并解析，与 html_snapshots reparse 相同
+    report("snapshots", timed(reparse, [(avid,) for avid in avids]), len(avids))
+    if failed:
+        logger.warning(f"{len(failed)} 个快照解析失败: {failed[:5]}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="页面解析基准测试")
+    parser.add_argument("--pages", type=int, default=2000, help="每个站点生成的页面数")
+    parser.add_argument("--from-store", action="store_true", help="解析 HTML 快照存储中的页面")
+    parser.add_argument(
+        "--limit", type=int, default=None, help="--from-store 时最多解析的 AVID 数"
+    )
+    args = parser.parse_args()
+
+    # 只统计解析开销，跳过 MissAV 获取播放列表的网络请求
+    MissAV._get_highest_quality_m3u8 = lambda self, url: (url, "")
+
+    if args.from_store:
+        bench_store(args)
+    else:
+        bench_fixtures(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+#!/usr/bin/env python
+"""
+HLS 下载器吞吐量基准测试
+
+功能：
+1. 启动本地 HLS 替身服务器（可配置分片数量、大小、延迟、单连接带宽）
+2. 使用 AsyncHLS（以及可选的 N_m3u8DL-RE）下载同一播放列表
+3. 校验输出内容并统计耗时、吞吐量和服务器请求数
+
+用法：
+    python scripts/benchmark_hls_downloader.py [选项]
+
+选项：
+    --segments N          分片数量（默认 200）
+    --segment-size KB     每个分片大小，单位 KB（默认 512）
+    --latency SECONDS     每个请求的首字节延迟（默认 0.02 秒）
+    --bandwidth KB        单连接带宽上限，单位 KB/s（默认 0，不限速）
+    --threads LIST        并发数列表，逗号分隔（默认 8,16,32）
+    --rounds N            每种配置重复次数（默认 1）
+    --with-n-m3u8dl       同时测试 tools/ 下的 N_m3u8DL-RE（需已安装）
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# 添加项目根目录到 Python 路径
+script_dir = Path(__file__).resolve().parent
+project_root = script_dir.parent
+sys.path.insert(0, str(project_root))
+
+# 设置 Django 环境
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "django_project.settings")
+
+import django
+
+django.setup()
+
+from loguru import logger
+from nassav.m3u8downloader import AsyncHLS, M3u8DownloaderBase, N_m3u8DL_RE
+from nassav.testing import LocalHlsServer
+
+# 配置 loguru
+logger.remove()
+logger.add(
+    sys.stderr,
+    format="<green>{time:YYYY-MM-DD HH:mm:ss}</green> | <level>{level: <8}</level> | <cyan>{message}</cyan>",
+    level="INFO",
+    filter=lambda record: record["name"] == "__main__",
+)
+
+
+def run_once(
+    downloader: M3u8DownloaderBase, server: LocalHlsServer, threads: int
+) -> dict:
+    """执行一次下载，返回统计结果"""
+    callbacks = 0
+
+    def on_progress(progress):
+        nonlocal callbacks
+        callbacks += 1
+
+    with tempfile.TemporaryDirectory() as tmp:
+        output_dir = Path(tmp)
+        requests_before = server.request_count
+        start = time.perf_counter()
+        ok = downloader.download(
+            url=server.master_url,
+            output_dir=output_dir,
+            output_name="BENCH",
+            referer="http://127.0.0.1/",
+            user_agent="nassav-benchmark",
+            thread_count=threads,
+            retry_count=3,
+            progress_callback=on_progress,
+        )
+        elapsed = time.perf_counter() - start
+
+        output = downloader.get_output_file(output_dir, "BENCH")
+        valid = bool(ok and output and output.read_bytes() == server.expected_content())
+
+    total_bytes = server.segment_count * server.segment_size
+    return {
+        "ok": ok,
+        "valid": valid,
+        "elapsed": elapsed,
+        "throughput": total_bytes / elapsed / (1024 * 1024),
+        "requests": server.request_count - requests_before,
+        "callbacks": callbacks,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="HLS 下载器吞吐量基准测试",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+示例:
+  %(prog)s                                  # 默认配置
+  %(prog)s --segments 500 --segment-size 1024
+  %(prog)s --latency 0.1 --bandwidth 2048   # 模拟高延迟、单连接 2MB/s 的 CDN
+  %(prog)s --threads 4,16,64 --rounds 3
+  %(prog)s --with-n-m3u8dl                  # 与 N_m3u8DL-RE 对比
+        """,
+    )
+    parser.add_argument("--segments", type=int, default=200, help="分片数量")
+    parser.add_argument("--segment-size", type=int, default=512, help="每个分片大小（KB）")
+    parser.add_argument("--latency", type=float, default=0.02, help="每个请求的首字节延迟（秒）")
+    parser.add_argument(
+        "--bandwidth", type=int, default=0, help="单连接带宽上限（KB/s），0 表示不限速"
+    )
+    parser.add_argument("--threads", type=str, default="8,16,32", help="并发数列表，逗号分隔")
+    parser.add_argument("--rounds", type=int, default=1, help="每种配置重复次数")
+    parser.add_argument(
+        "--with-n-m3u8dl", action="store_true", help="同时测试 N_m3u8DL-RE（需已安装）"
+    )
+    args = parser.parse_args()
+
+    thread_list = [int(t) for t in args.threads.split(",") if t.strip()]
+    downloaders: list[M3u8DownloaderBase] = [AsyncHLS()]
+    if args.with_n_m3u8dl:
+        n_m3u8dl = N_m3u8DL_RE()
+        if Path(n_m3u8dl.tool_path).exists():
+            downloaders.append(n_m3u8dl)
+        else:
+            logger.warning(f"N_m3u8DL-RE 不存在，跳过: {n_m3u8dl.tool_path}")
+
+    total_mb = args.segments * args.segment_size / 1024
+    logger.info(
+        f"分片: {args.segments} x {args.segment_size}KB (共 {total_mb:.1f} MB)，"
+        f"延迟: {args.latency}s，单连接带宽: {args.bandwidth or '不限'} KB/s"
+    )
+    logger.info("-" * 70)
+
+    with LocalHlsServer(
+        segment_count=args.segments,
+        segment_size=args.segment_size * 1024,
+        latency=args.latency,
+        bandwidth=args.bandwidth * 1024 or None,
+    ) as server:
+        for downloader in downloaders:
+            for threads in thread_list:
+                for round_no in range(1, args.rounds + 1):
+                    result = run_once(downloader, server, threads)
+                    logger.info(
+                        f"{downloader.get_downloader_name():<12} 并发={threads:<3} "
+                        f"轮次={round_no} 耗时={result['elapsed']:.2f}s "
+                        f"吞吐={result['throughput']:.1f}MB/s "
+                        f"请求={result['requests']} 回调={result['callbacks']} "
+                        f"校验={'通过' if result['valid'] else '失败'}"
+                    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,260 @@
+#!/usr/bin/env python
+"""
+添加/下载全流程基准测试（HTTP 录制/回放）
+
+功能：
+1. --record：访问真实站点执行 添加资源 → 翻译 → 下载，同时把所有 HTTP 响应（源页面、刮削页面、封面、头像、
+   播放列表、分片、翻译接口）录制到录像目录
+2. 默认（回放）：启动本地录像回放服务器（可配置延迟、单连接带宽），所有请求改写到回放服务器，离线重放同样的流程，
+   统计 ResourceService.add_resource、translate_title_task、download_video_task 各阶段耗时
+3. 在临时数据库和临时资源目录中运行，不影响现有数据；未录制的请求会列出，便于发现流程变化
+
+用法：
+    python scripts/benchmark_pipeline.py --record --avid ABC-123 [--avid ...] [选项]
+    python scripts/benchmark_pipeline.py [选项]
+
+选项：
+    --cassette DIR        录像目录（默认 resource/cassettes/pipeline）
+    --record              录制模式（访问真实站点）
+    --avid AVID           AVID（可重复；回放时默认使用录制时的 AVID）
+    --runs N              回放时重复次数（默认 3）
+    --latency SECONDS     回放时每个请求的首字节延迟（默认 0.05 秒）
+    --bandwidth KB        回放时单连接带宽上限，单位 KB/s（默认 0，不限速）
+    --downloader NAME     下载器（默认 AsyncHLS；N_m3u8DL-RE 只能回放，不能录制）
+    --no-translate        跳过翻译阶段
+    --no-download         跳过下载阶段
+    --rate-limit          启用按域名限流（默认关闭，只测流程本身的耗时）
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+# 添加项目根目录到 Python 路径
+script_dir = Path(__file__).resolve().parent
+project_root = script_dir.parent
+sys.path.insert(0, str(project_root))
+
+# 设置 Django 环境
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "django_project.settings")
+
+import django
+
+django.setup()
+
+from django.conf import settings
+from django.db import connection
+from loguru import logger
+from nassav.http_replay import Cassette, recording, replaying
+from nassav.testing import CassetteServer
+
+# 配置 loguru
+logger.remove()
+logger.add(
+    sys.stderr,
+    format="<green>{time:YYYY-MM-DD HH:mm:ss}</green> | <level>{level: <8}</level> | <cyan>{message}</cyan>",
+    level="INFO",
+    filter=lambda record: record["name"] == "__main__",
+)
+
+STAGES = ("add", "translate", "download")
+
+
+def isolate(workdir: Path, args):
+    """资源目录指向临时目录，关闭跨进程共享状态，创建临时数据库；返回原数据库名"""
+    settings.RESOURCE_DIR = workdir
+    settings.COVER_DIR = workdir / "cover"
+    settings.VIDEO_DIR = workdir / "video"
+    settings.AVATAR_DIR = workdir / "avatar"
+    settings.HTML_SNAPSHOT_DIR = workdir / "html"
+    for path in (settings.COVER_DIR, settings.VIDEO_DIR, settings.AVATAR_DIR):
+        path.mkdir(parents=True, exist_ok=True)
+    # 未命中缓存、源健康统计、Cookie 同步保存在 Redis 中，会让多次运行互相影响
+    settings.NEGATIVE_CACHE_ENABLED = False
+    settings.SOURCE_HEALTH_ENABLED = False
+    settings.COOKIE_SYNC_ENABLED = False
+    settings.RATE_LIMIT_ENABLED = args.rate_limit
+    return connection.creation.create_test_db(
+        verbosity=0, autoclobber=True, serialize=False
+    )
+
+
+def redis_available() -> bool:
+    from nassav.tasks import get_redis_client
+
+    try:
+        get_redis_client().ping()
+        return True
+    except Exception:
+        return False
+
+
+def reset_database():
+    from nassav.models import Actor, AVResource, Genre
+
+    AVResource.objects.all().delete()
+    Actor.objects.all().delete()
+    Genre.objects.all().delete()
+
+
+def run_pipeline(avid: str, args, download: bool) -> dict:
+    """执行一次完整流程，返回 {阶段: 耗时（秒）或 None（失败）}"""
+    from nassav.resource_service import resource_service
+    from nassav.tasks import download_video_task, translate_title_task
+
+    timings = {}
+    start = time.perf_counter()
+    try:
+        resource_service.add_resource(avid, submit_translate=False)
+        timings["add"] = time.perf_counter() - start
+    except Exception as e:
+        logger.error(f"{avid} 添加失败: {e}")
+        timings["add"] = None
+        return timings
+
+    if not args.no_translate:
+        start = time.perf_counter()
+        result = translate_title_task.apply(args=(avid,)).result or {}
+        timings["translate"] = (
+            time.perf_counter() - start if result.get("success") else None
+        )
+
+    if download:
+        start = time.perf_counter()
+        result = download_video_task.apply(args=(avid,)).result or {}
+        timings["download"] = (
+            time.perf_counter() - start if result.get("status") == "success" else None
+        )
+    return timings
+
+
+def report(results: list):
+    for stage in STAGES:
+        values = [r[stage] for r in results if r.get(stage) is not None]
+        failed = sum(1 for r in results if stage in r and r[stage] is None)
+        if not values and not failed:
+            continue
+        line = f"{stage:<10} 成功 {len(values):>3}，失败 {failed:>3}"
+        if values:
+            line += (
+                f" | 平均 {statistics.mean(values) * 1000:8.1f}ms"
+                f" | 中位 {statistics.median(values) * 1000:8.1f}ms"
+                f" | 最大 {max(values) * 1000:8.1f}ms"
+            )
+        logger.info(line)
+    totals = [
+        sum(v for v in r.values() if v is not None)
+        for r in results
+        if all(v is not None for v in r.values())
+    ]
+    if totals:
+        logger.info(f"{'total':<10} 平均 {statistics.mean(totals) * 1000:.1f}ms / AVID")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="添加/下载全流程基准测试（HTTP 录制/回放）",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+示例:
+  %(prog)s --record --avid ABC-123 --avid XYZ-456   # 录制（访问真实站点）
+  %(prog)s                                          # 回放录制的流程
+  %(prog)s --latency 0.2 --bandwidth 2048 --runs 5  # 模拟高延迟、单连接 2MB/s
+  %(prog)s --no-download                            # 只测添加与翻译
+        """,
+    )
+    parser.add_argument(
+        "--cassette",
+        type=Path,
+        default=Path(settings.RESOURCE_DIR) / "cassettes" / "pipeline",
+        help="录像目录",
+    )
+    parser.add_argument("--record", action="store_true", help="录制模式（访问真实站点）")
+    parser.add_argument("--avid", action="append", default=None, help="AVID（可重复）")
+    parser.add_argument("--runs", type=int, default=3, help="回放时重复次数")
+    parser.add_argument("--latency", type=float, default=0.05, help="回放时每个请求的首字节延迟（秒）")
+    parser.add_argument(
+        "--bandwidth", type=int, default=0, help="回放时单连接带宽上限（KB/s），0 表示不限速"
+    )
+    parser.add_argument("--downloader", type=str, default="AsyncHLS", help="下载器")
+    parser.add_argument("--no-translate", action="store_true", help="跳过翻译阶段")
+    parser.add_argument("--no-download", action="store_true", help="跳过下载阶段")
+    parser.add_argument("--rate-limit", action="store_true", help="启用按域名限流")
+    args = parser.parse_args()
+
+    from nassav.m3u8downloader import create_m3u8_downloader
+    from nassav.services import video_download_service
+
+    cassette = Cassette(args.cassette)
+    avids = [a.upper() for a in args.avid or cassette.meta.get("avids", [])]
+    if not avids:
+        logger.error("没有指定 AVID（--avid），录像中也没有记录")
+        sys.exit(1)
+    if not args.record and not len(cassette):
+        logger.error(f"录像为空: {args.cassette}，请先使用 --record 录制")
+        sys.exit(1)
+
+    download = not args.no_download
+    if download and not redis_available():
+        logger.warning("Redis 不可用，跳过下载阶段（download_video_task 需要下载槽位）")
+        download = False
+    video_download_service.m3u8_downloader = create_m3u8_downloader(
+        args.downloader, proxy=settings.PROXY_URL if settings.PROXY_ENABLED else None
+    )
+
+    with tempfile.TemporaryDirectory(prefix="nassav-bench-") as tmp:
+        old_db = isolate(Path(tmp), args)
+        try:
+            if args.record:
+                with recording(cassette):
+                    results = [run_pipeline(avid, args, download) for avid in avids]
+                cassette.save_meta(
+                    {
+                        "avids": avids,
+                        "downloader": args.downloader,
+                        "recorded_at": datetime.now().isoformat(timespec="seconds"),
+                    }
+                )
+                logger.info(f"已录制 {len(cassette)} 个请求: {args.cassette}")
+                report(results)
+                return
+
+            results = []
+            with CassetteServer(
+                cassette, latency=args.latency, bandwidth=args.bandwidth * 1024 or None
+            ) as server, replaying(server.base_url):
+                logger.info(
+                    f"回放 {len(avids)} 个 AVID x {args.runs} 次，录像 {len(cassette)} 个请求，"
+                    f"延迟 {args.latency}s，单连接带宽 {args.bandwidth or '不限'} KB/s"
+                )
+                for run in range(args.runs):
+                    reset_database()
+                    for avid in avids:
+                        timings = run_pipeline(avid, args, download)
+                        logger.info(
+                            f"[{run + 1}/{args.runs}] {avid}: "
+                            + ", ".join(
+                                f"{k} {'失败' if v is None else f'{v * 1000:.0f}ms'}"
+                                for k, v in timings.items()
+                            )
+                        )
+                        results.append(timings)
+            logger.info("-" * 70)
+            report(results)
+            logger.info(
+                f"回放服务器: 命中 {server.hits}，发送 {server.bytes_sent / 1024 / 1024:.1f} MB，"
+                f"未录制 {len(server.misses)}"
+            )
+            for key in sorted(set(server.misses))[:10]:
+                logger.warning(f"未录制的请求: {key}")
+        finally:
+            connection.creation.destroy_test_db(old_db, verbosity=0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+#!/usr/bin/env python
+"""
+下载进度管线基准测试
+
+功能：
+1. 重放录制的 N_m3u8DL-RE 输出（tests/fixtures/n_m3u8dl_re_output.log）
+2. 对比旧实现（每行两次正则、每个匹配行写一次 Redis）与当前实现
+   （结构化解析、重复行去重、按 0.5 秒/1% 合并写入）
+3. 统计解析 CPU 时间和 Redis 写入次数
+
+用法：
+    python scripts/benchmark_progress_pipeline.py [选项]
+
+选项：
+    --repeat N            重放次数（默认 50，模拟 50 个下载任务）
+    --refresh SECONDS     模拟的控制台刷新间隔（默认 0.1 秒）
+    --redis-url URL       实际执行 SETEX 写入的 Redis 地址（默认只计数不写入）
+"""
+
+import argparse
+import json
+import os
+import re
+import sys
+import time
+from pathlib import Path
+
+# 添加项目根目录到 Python 路径
+script_dir = Path(__file__).resolve().parent
+project_root = script_dir.parent
+sys.path.insert(0, str(project_root))
+
+# 设置 Django 环境
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "django_project.settings")
+
+import django
+
+django.setup()
+
+from loguru import logger
+from nassav.m3u8downloader import ProgressCoalescer, parse_progress_line
+from nassav.tasks import PROGRESS_WRITE_INTERVAL, PROGRESS_WRITE_STEP
+
+# 配置 loguru
+logger.remove()
+logger.add(
+    sys.stderr,
+    format="<green>{time:YYYY-MM-DD HH:mm:ss}</green> | <level>{level: <8}</level> | <cyan>{message}</cyan>",
+    level="INFO",
+    filter=lambda record: record["name"] == "__main__",
+)
+
+FIXTURE = project_root / "tests" / "fixtures" / "n_m3u8dl_re_output.log"
+PROGRESS_KEY = "nassav:task_progress:BENCH-000"
+
+
+class Writer:
+    """统计写入次数，可选实际写入 Redis"""
+
+    def __init__(self, client=None):
+        self.client = client
+        self.writes = 0
+
+    def write(self, data: dict):
+        self.writes += 1
+        if self.client is not None:
+            self.client.setex(PROGRESS_KEY, 3600, json.dumps(data))
+
+
+def legacy_pipeline(lines, writer: Writer, refresh: float):
+    """旧实现：每行 strip + 两次正则，每个匹配行写一次"""
+    for line in lines:
+        line = line.strip()
+        percent_match = re.search(r"(\d+\.?\d*)%", line)
+        speed_match = re.search(r"([\d.]+\s*[KMG]?B/s)", line, re.IGNORECASE)
+        if percent_match:
+            percent = float(percent_match.group(1))
+            speed = speed_match.group(1) if speed_match else "N/A"
+            writer.write({"percent": percent, "speed": speed, "eta": ""})
+
+
+def current_pipeline(lines, writer: Writer, refresh: float):
+    """当前实现：结构化解析 + 重复行去重 + 合并写入（按模拟时钟）"""
+    now = [0.0]
+    coalescer = ProgressCoalescer(
+        lambda progress: writer.write(progress.to_dict()),
+        min_interval=PROGRESS_WRITE_INTERVAL,
+        min_step=PROGRESS_WRITE_STEP,
+        clock=lambda: now[0],
+    )
+    last = None
+    for line in lines:
+        now[0] += refresh
+        progress = parse_progress_line(line)
+        if progress is None or progress == last:
+            continue
+        last = progress
+        coalescer.update(progress)
+
+
+def run(name: str, fn, lines, args, client) -> dict:
+    writer = Writer(client)
+    start_cpu = time.process_time()
+    start = time.perf_counter()
+    for _ in range(args.repeat):
+        fn(lines, writer, args.refresh)
+    return {
+        "name": name,
+        "writes": writer.writes,
+        "cpu": time.process_time() - start_cpu,
+        "elapsed": time.perf_counter() - start,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="下载进度管线基准测试")
+    parser.add_argument("--repeat", type=int, default=50, help="重放次数")
+    parser.add_argument("--refresh", type=float, default=0.1, help="模拟的控制台刷新间隔（秒）")
+    parser.add_argument("--redis-url", default=None, help="实际执行 SETEX 写入的 Redis 地址")
+    args = parser.parse_args()
+
+    lines = FIXTURE.read_text(encoding="utf-8").splitlines(keepends=True)
+
+    client = None
+    if args.redis_url:
+        import redis
+
+        client = redis.from_url(args.redis_url)
+        try:
+            client.ping()
+        except redis.exceptions.ConnectionError as e:
+            logger.error(f"无法连接 Redis {args.redis_url}: {e}")
+            sys.exit(1)
+
+    logger.info(
+        f"输出行数: {len(lines)}，重放: {args.repeat} 次，"
+        f"模拟刷新间隔: {args.refresh}s，Redis: {args.redis_url or '只计数'}"
+    )
+
+    try:
+        results = [
+            run("legacy", legacy_pipeline, lines, args, client),
+            run("current", current_pipeline, lines, args, client),
+        ]
+    finally:
+        if client is not None:
+            client.delete(PROGRESS_KEY)
+
+    baseline = results[0]
+    for r in results:
+        logger.info(
+            f"{r['name']:<8} 写入 {r['writes']:>6} 次（{r['writes'] / args.repeat:.1f}/任务）"
+            f" | CPU {r['cpu'] * 1000:.1f}ms | 耗时 {r['elapsed'] * 1000:.1f}ms"
+            f" | 写入减少 {1 - r['writes'] / baseline['writes']:.0%}"
+        )
+
+
+if __name__ == "__main__":
+    main()
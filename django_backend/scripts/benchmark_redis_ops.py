@@ -0,0 +1,265 @@
+#!/usr/bin/env python
+"""
+下载任务 Redis 操作数基准测试
+
+功能：
+1. 模拟一次下载任务生命周期中的队列状态读写（提交、开始、进度更新、队列查询、结束清理）
+2. 对比旧实现（每次调用新建客户端、逐条命令往返）与当前实现（共享连接池、pipeline 合并）
+3. 统计 Redis 往返次数、新建连接数和耗时
+
+用法：
+    python scripts/benchmark_redis_ops.py [选项]
+
+选项：
+    --redis-url URL       Redis 地址（默认使用 CELERY_BROKER_URL 的 15 号库，运行前后会清空该库）
+    --downloads N         模拟下载任务数量（默认 20）
+    --ticks N             每个任务的进度更新次数（默认 100）
+    --queue-polls N       每个任务期间查询完整队列的次数（默认 10）
+    --queue-size N        队列中其他等待任务的数量（默认 10，影响完整队列查询的开销）
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from unittest.mock import patch
+
+# 添加项目根目录到 Python 路径
+script_dir = Path(__file__).resolve().parent
+project_root = script_dir.parent
+sys.path.insert(0, str(project_root))
+
+# 设置 Django 环境
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "django_project.settings")
+
+import django
+
+django.setup()
+
+import redis
+from django.conf import settings
+from loguru import logger
+from nassav import tasks
+from nassav.download_scheduler import DownloadScheduler
+
+# 配置 loguru
+logger.remove()
+logger.add(
+    sys.stderr,
+    format="<green>{time:YYYY-MM-DD HH:mm:ss}</green> | <level>{level: <8}</level> | <cyan>{message}</cyan>",
+    level="INFO",
+    filter=lambda record: record["name"] == "__main__",
+)
+
+
+class OpCounter:
+    """
+    统计 Redis 往返次数和新建连接数
+
+    往返按连接写出的数据包计数：单条命令、一次 pipeline 执行各计 1 次，
+    新建连接时的握手命令（如 CLIENT SETINFO）同样计入。
+    """
+
+    def __init__(self):
+        self.round_trips = 0
+        self.connections = 0
+
+    @contextmanager
+    def counting(self):
+        counter = self
+        send_packed_command = redis.connection.AbstractConnection.send_packed_command
+        make_connection = redis.ConnectionPool.make_connection
+
+        def counted_send_packed_command(conn, *args, **kwargs):
+            counter.round_trips += 1
+            return send_packed_command(conn, *args, **kwargs)
+
+        def counted_make_connection(pool):
+            counter.connections += 1
+            return make_connection(pool)
+
+        with patch.object(
+            redis.connection.AbstractConnection,
+            "send_packed_command",
+            counted_send_packed_command,
+        ), patch.object(
+            redis.ConnectionPool, "make_connection", counted_make_connection
+        ):
+            yield self
+
+
+def legacy_lifecycle(url: str, avid: str, task_id: str, ticks: int, polls: int):
+    """旧实现：每个辅助函数都通过 redis.from_url 新建客户端，多步操作逐条往返"""
+    queue_key = "nassav:task_queue"
+    lock_key = f"nassav:task_lock:{avid}"
+    progress_key = f"nassav:task_progress:{avid}"
+
+    def client():
+        return redis.from_url(url)
+
+    def full_queue():
+        data = client().hgetall(queue_key)
+        for raw in data.values():
+            task = json.loads(raw)
+            client().get(f"nassav:task_progress:{task['avid']}")
+
+    # 提交：写队列记录 + 续期
+    c = client()
+    c.hset(
+        queue_key,
+        avid,
+        json.dumps(
+            {
+                "task_id": task_id,
+                "avid": avid,
+                "state": "PENDING",
+                "task_type": "download",
+                "created_at": time.time(),
+            }
+        ),
+    )
+    c.expire(queue_key, 86400)
+    full_queue()
+
+    # 开始：任务锁 + 读取并更新队列状态
+    client().setex(lock_key, 3600, task_id)
+    c = client()
+    task = json.loads(c.hget(queue_key, avid))
+    task["state"] = "STARTED"
+    c.hset(queue_key, avid, json.dumps(task))
+    full_queue()
+
+    # 下载中：进度更新与队列查询
+    for i in range(ticks):
+        client().setex(progress_key, 3600, json.dumps({"percent": i}))
+    for _ in range(polls):
+        full_queue()
+
+    # 结束：移除队列记录、锁、进度
+    client().hdel(queue_key, avid)
+    full_queue()
+    client().delete(lock_key)
+    client().delete(progress_key)
+    full_queue()
+
+
+def current_lifecycle(avid: str, task_id: str, ticks: int, polls: int):
+    """当前实现：共享连接池，登记/开始/结束各为单次往返"""
+    scheduler = DownloadScheduler(tasks.get_redis_client())
+
+    # 提交：SET NX 登记任务（含去重和队列记录）+ 进入调度队列
+    tasks.register_task(avid, task_id)
+    scheduler.enqueue(avid, task_id)
+    tasks.get_full_task_queue()
+
+    # 开始：派发出队，任务锁 + 队列状态单次往返
+    scheduler.pop_next(1)
+    tasks.mark_task_started(avid, task_id)
+    tasks.get_full_task_queue()
+
+    # 下载中：进度更新与队列查询
+    for i in range(ticks):
+        tasks.set_task_progress(avid, float(i))
+    for _ in range(polls):
+        tasks.get_full_task_queue()
+
+    # 结束：移除队列记录，再批量清理锁/进度/在途记录
+    tasks.remove_task_from_queue(avid)
+    tasks.get_full_task_queue()
+    tasks.clear_task_state(avid)
+    tasks.get_full_task_queue()
+
+
+def fill_queue(size: int):
+    """写入若干其他等待任务，模拟真实队列长度"""
+    pipe = tasks.get_redis_client().pipeline(transaction=False)
+    for i in range(size):
+        tasks.add_task_to_queue(f"WAIT-{i:03d}", f"wait-{i}", pipe=pipe)
+    pipe.execute()
+
+
+def run(name: str, fn, args) -> dict:
+    fill_queue(args.queue_size)
+    counter = OpCounter()
+    start = time.perf_counter()
+    with counter.counting():
+        for i in range(args.downloads):
+            fn(f"BENCH-{i:03d}", f"task-{i}")
+    elapsed = time.perf_counter() - start
+    return {
+        "name": name,
+        "round_trips": counter.round_trips,
+        "connections": counter.connections,
+        "elapsed": elapsed,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="下载任务 Redis 操作数基准测试")
+    parser.add_argument("--redis-url", default=None, help="Redis 地址")
+    parser.add_argument("--downloads", type=int, default=20, help="模拟下载任务数量")
+    parser.add_argument("--ticks", type=int, default=100, help="每个任务的进度更新次数")
+    parser.add_argument("--queue-polls", type=int, default=10, help="每个任务期间查询完整队列的次数")
+    parser.add_argument("--queue-size", type=int, default=10, help="队列中其他等待任务的数量")
+    args = parser.parse_args()
+
+    url = args.redis_url
+    if url is None:
+        pool = redis.ConnectionPool.from_url(settings.CELERY_BROKER_URL)
+        kwargs = pool.connection_kwargs
+        url = f"redis://{kwargs.get('host', 'localhost')}:{kwargs.get('port', 6379)}/15"
+    settings.CELERY_BROKER_URL = url
+
+    admin = redis.from_url(url)
+    try:
+        admin.ping()
+    except redis.exceptions.ConnectionError as e:
+        logger.error(f"无法连接 Redis {url}: {e}")
+        sys.exit(1)
+
+    logger.info(
+        f"Redis: {url}，任务数: {args.downloads}，"
+        f"进度更新: {args.ticks} 次/任务，队列查询: {args.queue_polls} 次/任务，"
+        f"其他等待任务: {args.queue_size}"
+    )
+
+    results = []
+    try:
+        admin.flushdb()
+        results.append(
+            run(
+                "legacy",
+                lambda avid, task_id: legacy_lifecycle(
+                    url, avid, task_id, args.ticks, args.queue_polls
+                ),
+                args,
+            )
+        )
+        admin.flushdb()
+        results.append(
+            run(
+                "pooled",
+                lambda avid, task_id: current_lifecycle(
+                    avid, task_id, args.ticks, args.queue_polls
+                ),
+                args,
+            )
+        )
+    finally:
+        admin.flushdb()
+
+    baseline = results[0]
+    for r in results:
+        per_download = r["round_trips"] / args.downloads
+        logger.info(
+            f"{r['name']:<8} 往返 {r['round_trips']:>6} 次（{per_download:.1f}/任务）"
+            f" | 新建连接 {r['connections']:>6} | 耗时 {r['elapsed']:.3f}s"
+            f" | 往返减少 {1 - r['round_trips'] / baseline['round_trips']:.0%}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,232 @@
+#!/usr/bin/env python
+"""
+HTTP 会话池基准测试
+
+功能：
+1. 回放 benchmark_pipeline.py --record 录制的请求（本地录像回放服务器，默认 HTTPS 自签名证书），
+   离线执行真实的 ResourceService.add_resource：并发探测源、刮削、封面、演员头像
+2. 对比旧实现（每个请求新建 Session / 每次探测新建 AsyncSession，重新建连握手）与会话池实现，
+   统计每次添加的耗时和新建连接数
+3. 在临时数据库和临时资源目录中运行，不影响现有数据
+
+用法：
+    python scripts/benchmark_pipeline.py --record --avid ABC-123 --no-download   # 先录制
+    python scripts/benchmark_session_pool.py [选项]
+
+选项：
+    --cassette DIR        录像目录（默认 resource/cassettes/pipeline）
+    --runs N              每种实现重复次数（默认 5）
+    --latency SECONDS     回放时每个请求的首字节延迟（默认 0）
+    --no-tls              使用 HTTP（不生成证书，只比较 TCP 建连开销）
+"""
+
+import argparse
+import functools
+import os
+import shutil
+import ssl
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# 添加项目根目录到 Python 路径
+script_dir = Path(__file__).resolve().parent
+project_root = script_dir.parent
+sys.path.insert(0, str(project_root))
+
+# 设置 Django 环境
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "django_project.settings")
+
+import django
+
+django.setup()
+
+from django.conf import settings
+from django.db import connection
+from loguru import logger
+from nassav import http_pool
+from nassav.http_pool import HttpSessionPool
+from nassav.http_replay import Cassette, replaying
+from nassav.testing import CassetteServer
+
+# 配置 loguru
+logger.remove()
+logger.add(
+    sys.stderr,
+    format="<green>{time:YYYY-MM-DD HH:mm:ss}</green> | <level>{level: <8}</level> | <cyan>{message}</cyan>",
+    level="INFO",
+    filter=lambda record: record["name"] == "__main__",
+)
+
+
+class BenchPool(HttpSessionPool):
+    """会话池实现（回放服务器使用自签名证书，不校验证书）"""
+
+    def _new_session(self, factory):
+        return super()._new_session(functools.partial(factory, verify=False))
+
+
+class LegacyPool(BenchPool):
+    """旧实现：每个请求新建 Session，每次探测新建 AsyncSession，用完即关闭"""
+
+    def _acquire(self, sessions, url, proxy, factory):
+        return self._new_session(factory)
+
+    def _release(self, session):
+        self._close(session)
+
+
+def make_ssl_context(tmp: Path):
+    """用 openssl 生成自签名证书，不可用时返回 None"""
+    if not shutil.which("openssl"):
+        return None
+    cert, key = tmp / "cert.pem", tmp / "key.pem"
+    subprocess.run(
+        [
+            "openssl",
+            "req",
+            "-x509",
+            "-newkey",
+            "rsa:2048",
+            "-nodes",
+            "-days",
+            "1",
+            "-subj",
+            "/CN=127.0.0.1",
+            "-keyout",
+            str(key),
+            "-out",
+            str(cert),
+        ],
+        check=True,
+        capture_output=True,
+    )
+    context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+    context.load_cert_chain(cert, key)
+    return context
+
+
+def isolate(workdir: Path):
+    """资源目录指向临时目录，关闭跨进程共享状态，创建临时数据库；返回原数据库名"""
+    settings.RESOURCE_DIR = workdir
+    settings.COVER_DIR = workdir / "cover"
+    settings.VIDEO_DIR = workdir / "video"
+    settings.AVATAR_DIR = workdir / "avatar"
+    settings.HTML_SNAPSHOT_DIR = workdir / "html"
+    # 未命中缓存、源健康统计、Cookie 同步、头像索引保存在 Redis 中，会让多次运行互相影响
+    settings.NEGATIVE_CACHE_ENABLED = False
+    settings.SOURCE_HEALTH_ENABLED = False
+    settings.COOKIE_SYNC_ENABLED = False
+    settings.AVATAR_INDEX_ENABLED = False
+    # 只比较连接复用，关闭按域名限流
+    settings.RATE_LIMIT_ENABLED = False
+    return connection.creation.create_test_db(
+        verbosity=0, autoclobber=True, serialize=False
+    )
+
+
+def reset():
+    """清空数据库与资源目录，每次添加都重新下载封面和头像"""
+    from nassav.models import Actor, AVResource, Genre
+
+    AVResource.objects.all().delete()
+    Actor.objects.all().delete()
+    Genre.objects.all().delete()
+    for path in (settings.COVER_DIR, settings.AVATAR_DIR, settings.HTML_SNAPSHOT_DIR):
+        shutil.rmtree(path, ignore_errors=True)
+        path.mkdir(parents=True, exist_ok=True)
+
+
+def run(name: str, pool: HttpSessionPool, server, avids, args) -> dict:
+    from nassav.resource_service import resource_service
+
+    http_pool._pool = pool
+    server.clients.clear()
+    timings = []
+    failed = 0
+    for _ in range(args.runs):
+        reset()
+        for avid in avids:
+            start = time.perf_counter()
+            try:
+                resource_service.add_resource(avid, submit_translate=False)
+            except Exception as e:
+                logger.error(f"[{name}] {avid} 添加失败: {e}")
+                failed += 1
+                continue
+            timings.append(time.perf_counter() - start)
+    return {
+        "name": name,
+        "mean": statistics.mean(timings) if timings else 0.0,
+        "p95": sorted(timings)[max(int(len(timings) * 0.95) - 1, 0)]
+        if timings
+        else 0.0,
+        "requests": len(server.clients),
+        "connections": len(set(server.clients)),
+        "failed": failed,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="HTTP 会话池基准测试")
+    parser.add_argument(
+        "--cassette",
+        type=Path,
+        default=Path(settings.RESOURCE_DIR) / "cassettes" / "pipeline",
+        help="录像目录",
+    )
+    parser.add_argument("--runs", type=int, default=5, help="每种实现重复次数")
+    parser.add_argument("--latency", type=float, default=0.0, help="回放时每个请求的首字节延迟（秒）")
+    parser.add_argument("--no-tls", action="store_true", help="使用 HTTP")
+    args = parser.parse_args()
+
+    cassette = Cassette(args.cassette)
+    avids = [a.upper() for a in cassette.meta.get("avids", [])]
+    if not len(cassette) or not avids:
+        logger.error(
+            f"录像为空: {args.cassette}，请先使用 "
+            "scripts/benchmark_pipeline.py --record --avid ... --no-download 录制"
+        )
+        sys.exit(1)
+
+    with tempfile.TemporaryDirectory(prefix="nassav-bench-") as tmp:
+        workdir = Path(tmp)
+        context = None if args.no_tls else make_ssl_context(workdir)
+        if context is None and not args.no_tls:
+            logger.warning("未找到 openssl，改用 HTTP")
+
+        old_db = isolate(workdir / "resource")
+        try:
+            with CassetteServer(
+                cassette, latency=args.latency, ssl_context=context
+            ) as server, replaying(server.base_url):
+                logger.info(
+                    f"协议: {'HTTPS' if context else 'HTTP'}，AVID: {', '.join(avids)}，"
+                    f"重复 {args.runs} 次，服务器延迟: {args.latency}s"
+                )
+                results = [
+                    run("legacy", LegacyPool(), server, avids, args),
+                    run("pooled", BenchPool(), server, avids, args),
+                ]
+                misses = sorted(set(server.misses))
+        finally:
+            http_pool._pool = None
+            connection.creation.destroy_test_db(old_db, verbosity=0)
+
+    baseline = results[0]
+    for r in results:
+        reduction = 1 - r["mean"] / baseline["mean"] if baseline["mean"] else 0
+        logger.info(
+            f"{r['name']:<8} 每次添加平均 {r['mean'] * 1000:7.1f}ms | p95 {r['p95'] * 1000:7.1f}ms"
+            f" | 请求 {r['requests']:>5} | 新建连接 {r['connections']:>5}"
+            f" | 失败 {r['failed']} | 耗时减少 {reduction:.0%}"
+        )
+    for key in misses[:10]:
+        logger.warning(f"未录制的请求: {key}")
+
+
+if __name__ == "__main__":
+    main()
@@ -61,6 +61,7 @@ from django.conf import settings
 from django.db import transaction
 from loguru import logger
 from nassav.models import Actor, AVResource
+from nassav.relations import set_resource_relations
 from nassav.scraper.ScraperManager import ScraperManager
 
 # 配置 loguru
@@ -214,13 +215,8 @@ def rescrape_and_update(
 
         # 实际更新数据库（只更新演员信息，不修改其他字段）
         with transaction.atomic():
-            # 清空现有演员关联
-            resource.actors.clear()
-
-            # 添加新的演员
-            for actor_name in new_actors:
-                actor, created = Actor.objects.get_or_create(name=actor_name)
-                resource.actors.add(actor)
+            # 替换演员关联
+            set_resource_relations(resource, actors=new_actors, replace=True)
 
             # 注意：不更新其他元数据字段（title, duration, genres等）
             # 本脚本只专注于修复演员名称
@@ -288,7 +284,9 @@ def main():
     parser.add_argument("--avid", type=str, help="只处理指定的 AVID")
     parser.add_argument("--avids", nargs="+", help="批量处理多个 AVID")
     parser.add_argument("--stats", action="store_true", help="只显示统计信息")
-    parser.add_argument("--delay", type=float, default=2.0, help="每次刮削之间的延迟（秒），默认 2")
+    parser.add_argument(
+        "--delay", type=float, default=0.0, help="每次刮削之间的额外延迟（秒），请求速率由 RateLimit 控制"
+    )
     parser.add_argument("--force", action="store_true", help="强制重新刮削所有资源（即使演员名看起来正常）")
     parser.add_argument("--verbose", action="store_true", help="详细输出模式")
     parser.add_argument("--limit", type=int, help="限制处理的资源数量")
@@ -376,8 +374,8 @@ def main():
             failed += 1
             logger.error(f"  ✗ {message}")
 
-        # 延迟
-        if checked < total_resources:
+        # 额外延迟（请求速率已由限流器控制）
+        if args.delay > 0 and checked < total_resources:
             time.sleep(args.delay)
 
     # 打印最终统计
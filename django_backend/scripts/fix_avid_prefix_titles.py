@@ -30,7 +30,7 @@
     --execute       实际执行修改（默认为预览模式）
     --list-only     仅列出问题资源，不进行处理
     --no-translate  不进行翻译
-    --delay SECONDS 每次请求之间的延迟（默认 2 秒）
+    --delay SECONDS 每次请求之间的额外延迟（默认 0；请求速率由配置 RateLimit 控制）
 
 依赖：
     - Javbus scraper
@@ -86,7 +86,7 @@ def find_avid_prefix_resources():
     return avid_prefix_resources
 
 
-def fix_titles(dry_run: bool = False, delay: float = 2.0, translate: bool = True):
+def fix_titles(dry_run: bool = False, delay: float = 0.0, translate: bool = True):
     """修复以 AVID 开头的标题"""
 
     logger.info("=" * 60)
@@ -238,8 +238,8 @@ def main():
     parser.add_argument(
         "--delay",
         type=float,
-        default=2.0,
-        help="请求延迟（秒，默认: 2.0）",
+        default=0.0,
+        help="每次请求之间的额外延迟（秒，默认: 0，请求速率由 RateLimit 控制）",
     )
     parser.add_argument(
         "--no-translate",
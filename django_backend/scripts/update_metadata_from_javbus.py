@@ -16,7 +16,9 @@
     --avid AVID           只更新指定的 AVID
     --dry-run             预览模式，不实际写入文件
     --force               强制更新所有字段（不保留原有值）
-    --delay SECONDS       每次请求之间的延迟（默认 2 秒）
+    --delay SECONDS       每次请求之间的额外延迟（默认 0；请求速率由配置 RateLimit 控制）
+    --ignore-negative-cache
+                          不跳过近期在 Javbus 未命中的 AVID
 """
 
 import argparse
@@ -40,6 +42,7 @@ django.setup()
 
 from django.conf import settings
 from loguru import logger
+from nassav.negative_cache import KIND_SCRAPER, negative_cache
 from nassav.scraper.Javbus import Javbus
 
 # 配置 loguru
@@ -105,7 +108,8 @@ def save_metadata_to_db(avid: str, merged_metadata: dict, force: bool = False) -
     - translated_title: 翻译后的标题（保留不修改）
     """
     from django.db import transaction
-    from nassav.models import Actor, AVResource, Genre
+    from nassav.models import AVResource
+    from nassav.relations import set_resource_relations
 
     try:
         with transaction.atomic():
@@ -155,21 +159,13 @@ def save_metadata_to_db(avid: str, merged_metadata: dict, force: bool = False) -
                         resource_obj.translated_title = None
                         logger.info(f"  标题已更新，重置翻译状态为 pending")
 
-            # actors
-            resource_obj.actors.clear()
-            for a in merged_metadata.get("actors", []) or []:
-                if not a:
-                    continue
-                actor_obj, _ = Actor.objects.get_or_create(name=a)
-                resource_obj.actors.add(actor_obj)
-
-            # genres
-            resource_obj.genres.clear()
-            for g in merged_metadata.get("genres", []) or []:
-                if not g:
-                    continue
-                genre_obj, _ = Genre.objects.get_or_create(name=g)
-                resource_obj.genres.add(genre_obj)
+            # actors / genres（批量替换）
+            set_resource_relations(
+                resource_obj,
+                actors=merged_metadata.get("actors") or [],
+                genres=merged_metadata.get("genres") or [],
+                replace=True,
+            )
 
             resource_obj.save()
         return True
@@ -255,7 +251,7 @@ def update_single_resource(
 
     # 从 Javbus 刮削元数据
     logger.info(f"正在刮削 {avid} 的元数据...")
-    scraped_metadata = scraper.scrape(avid)
+    scraped_metadata = scraper.scrape(avid, use_negative_cache=False)
 
     if scraped_metadata is None:
         logger.error(f"无法从 Javbus 获取 {avid} 的元数据")
@@ -300,14 +296,19 @@ def main():
   %(prog)s --avid SSIS-075          # 只更新指定资源
   %(prog)s --dry-run                # 预览模式
   %(prog)s --force                  # 强制更新所有字段
-  %(prog)s --delay 3                # 设置请求间隔为 3 秒
+  %(prog)s --delay 3                # 每次请求后额外等待 3 秒
         """,
     )
     parser.add_argument("--avid", type=str, help="只更新指定的 AVID")
     parser.add_argument("--dry-run", action="store_true", help="预览模式，不实际写入文件")
     parser.add_argument("--force", action="store_true", help="强制更新所有字段")
-    parser.add_argument("--delay", type=float, default=2.0, help="每次请求之间的延迟（秒）")
+    parser.add_argument(
+        "--delay", type=float, default=0.0, help="每次请求之间的额外延迟（秒），请求速率由 RateLimit 控制"
+    )
     parser.add_argument("--limit", type=int, default=0, help="只处理前 N 个资源（0 表示不限制）")
+    parser.add_argument(
+        "--ignore-negative-cache", action="store_true", help="不跳过近期在 Javbus 未命中的 AVID"
+    )
 
     args = parser.parse_args()
 
@@ -348,6 +349,14 @@ def main():
     for i, avid in enumerate(avids, 1):
         logger.info(f"\n[{i}/{len(avids)}] 处理 {avid}")
 
+        # 近期未命中的 AVID 不再请求（也无需等待请求间隔）
+        if not args.ignore_negative_cache:
+            entry = negative_cache.get(KIND_SCRAPER, scraper.get_scraper_name(), avid)
+            if entry:
+                logger.info(f"Javbus 近期未命中 {avid}（{entry['outcome']}），跳过")
+                skip_count += 1
+                continue
+
         # 在 DB-first 模式下直接处理 AVResource 记录
 
         try:
@@ -365,8 +374,8 @@ def main():
             logger.error(f"处理 {avid} 时发生错误: {e}")
             fail_count += 1
 
-        # 请求延迟（避免频繁请求）
-        if i < len(avids) and not args.dry_run:
+        # 额外延迟（请求速率已由限流器控制）
+        if args.delay > 0 and i < len(avids) and not args.dry_run:
             time.sleep(args.delay)
 
     # 输出统计
@@ -113,3 +113,53 @@ def bulk_resources(resource_factory):
         return resources
 
     return _create
+
+
+@pytest.fixture
+def redis_client(settings):
+    """返回测试专用的 Redis 客户端（使用 15 号库，用例前后清空）；Redis 不可用时跳过"""
+    import redis
+
+    # URL 中的库号（/0）优先于 from_url 的 db 参数，需解析 URL 后显式改为 15 号库，
+    # 否则 flushdb 会清空 Broker、任务队列与 Channel Layer 所在的库
+    kwargs = redis.connection.parse_url(settings.CELERY_BROKER_URL)
+    kwargs["db"] = 15
+    client = redis.Redis(connection_pool=redis.ConnectionPool(**kwargs))
+    try:
+        client.ping()
+    except redis.exceptions.ConnectionError:
+        pytest.skip("Redis 服务不可用")
+    assert client.connection_pool.connection_kwargs["db"] == 15
+    client.flushdb()
+    yield client
+    client.flushdb()
+
+
+@pytest.fixture(autouse=True)
+def disable_negative_cache(settings):
+    """默认关闭未命中缓存，避免用例之间通过 Redis 互相影响（需要的用例自行开启）"""
+    settings.NEGATIVE_CACHE_ENABLED = False
+
+
+@pytest.fixture(autouse=True)
+def disable_rate_limit(settings):
+    """默认关闭请求限流，避免本地替身服务器的请求被限速（需要的用例自行开启）"""
+    settings.RATE_LIMIT_ENABLED = False
+
+
+@pytest.fixture(autouse=True)
+def disable_cookie_sync(settings):
+    """默认关闭 Cookie 的 Redis 同步与订阅线程，Cookie 只读写数据库（需要的用例自行开启）"""
+    settings.COOKIE_SYNC_ENABLED = False
+
+
+@pytest.fixture(autouse=True)
+def disable_avatar_index(settings):
+    """默认关闭头像的 Redis 索引与跨进程锁，只按文件是否存在判断（需要的用例自行开启）"""
+    settings.AVATAR_INDEX_ENABLED = False
+
+
+@pytest.fixture(autouse=True)
+def disable_source_health(settings):
+    """默认关闭源健康统计，避免用例之间通过 Redis 中的统计互相影响排序和熔断（需要的用例自行开启）"""
+    settings.SOURCE_HEALTH_ENABLED = False
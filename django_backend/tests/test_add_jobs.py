@@ -0,0 +1,240 @@
+#!/usr/bin/env python
+"""
+异步添加资源任务测试
+
+功能：
+1. 测试 ResourceService.add_resource 的阶段回调：查找源（source）与保存流程各阶段的开始/结束，
+   查找源失败时回调 failed；结果 timings 包含查找源耗时
+2. 测试任务生命周期：同一 AVID 重复提交返回同一任务、阶段状态记录与 WebSocket resource_add 消息、
+   成功/失败结果（code 与同步模式的 HTTP 状态码一致）、结束后释放 AVID
+3. 测试 POST /api/resource 的 mode=async（202 + job_id）与 GET /api/resource/jobs/{job_id}
+4. 测试 Celery 路由：下载任务进入 download 队列，异步添加等其它任务进入默认队列
+
+运行方式：
+    uv run pytest tests/test_add_jobs.py -v
+"""
+
+import pytest
+from nassav.add_jobs import (
+    STATUS_COMPLETED,
+    STATUS_FAILED,
+    STATUS_QUEUED,
+    add_resource_jobs,
+)
+from nassav.resource_service import ResourceNotFoundError, ResourceService
+from nassav.scraper import AVDownloadInfo
+
+
+class FakeSource:
+    def get_source_name(self):
+        return "Fake"
+
+    def get_cover_url(self, html):
+        return None
+
+
+class FakeScraperManager:
+    def scrape(self, avid):
+        return {"title": "タイトル", "actors": [], "genres": ["剧情"]}
+
+    def download_cover(self, url, path, scraper_name=None):
+        return False
+
+
+@pytest.fixture
+def service(settings, tmp_path, monkeypatch):
+    from nassav import resource_service
+
+    settings.COVER_DIR = tmp_path / "cover"
+    monkeypatch.setattr(
+        resource_service,
+        "get_html_store",
+        lambda: type("Store", (), {"put": lambda *args, **kwargs: None})(),
+    )
+    service = ResourceService(None, FakeScraperManager(), None)
+    info = AVDownloadInfo(avid="JOB-001", m3u8="https://x/a.m3u8", source="Fake")
+    monkeypatch.setattr(
+        service,
+        "_get_source_info",
+        lambda avid, source: (info, FakeSource(), "<html></html>", {}),
+    )
+    return service
+
+
+@pytest.mark.django_db
+def test_add_resource_reports_stages(service):
+    events = []
+    result = service.add_resource(
+        "JOB-001",
+        submit_translate=False,
+        on_stage=lambda name, status, elapsed: events.append((name, status)),
+    )
+    assert events[:2] == [("source", "running"), ("source", "done")]
+    for stage in ("scrape", "database", "cover"):
+        assert (stage, "done") in events
+    assert events.index(("scrape", "done")) < events.index(("database", "running"))
+    timings = result["timings"]
+    assert "source" in timings and "scrape" in timings
+    assert timings["total"] >= timings["source"]
+
+
+@pytest.mark.django_db
+def test_add_resource_reports_source_failure(service, monkeypatch):
+    def not_found(avid, source):
+        raise ResourceNotFoundError(avid, {"Fake": 404})
+
+    monkeypatch.setattr(service, "_get_source_info", not_found)
+    events = []
+    with pytest.raises(ResourceNotFoundError) as exc:
+        service.add_resource(
+            "JOB-001", on_stage=lambda name, status, _: events.append((name, status))
+        )
+    assert exc.value.status_code == 404
+    assert events == [("source", "running"), ("source", "failed")]
+
+
+@pytest.fixture
+def messages(monkeypatch):
+    """收集 WebSocket 消息"""
+    sent = []
+    monkeypatch.setattr(
+        "nassav.tasks.notify_task_update",
+        lambda update_type, data: sent.append((update_type, data)),
+    )
+    return sent
+
+
+@pytest.fixture
+def jobs(redis_client, monkeypatch, messages):
+    monkeypatch.setattr(add_resource_jobs, "_client", redis_client)
+    return add_resource_jobs
+
+
+def _fake_add(monkeypatch, error=None):
+    from nassav.resource_service import resource_service
+
+    calls = []
+
+    def add_resource(avid, source="any", on_stage=None, **kwargs):
+        calls.append((avid, source))
+        on_stage("source", "running", None)
+        on_stage("source", "done", 0.5)
+        if error:
+            raise error
+        on_stage("scrape", "done", 1.0)
+        return {
+            "resource": {"avid": avid, "original_title": "タイトル", "source": "Fake"},
+            "cover_saved": True,
+            "metadata_saved": True,
+            "scraped": True,
+            "timings": {"source": 0.5, "scrape": 1.0, "total": 1.5},
+        }
+
+    monkeypatch.setattr(resource_service, "add_resource", add_resource)
+    return calls
+
+
+def test_job_lifecycle(jobs, messages, monkeypatch):
+    calls = _fake_add(monkeypatch)
+
+    job, created = jobs.create("job-001", "fake")
+    assert created and (job["avid"], job["status"]) == ("JOB-001", STATUS_QUEUED)
+    again, created = jobs.create("JOB-001")
+    assert not created and again["job_id"] == job["job_id"]
+
+    job = jobs.run(job["job_id"])
+    assert calls == [("JOB-001", "fake")]
+    assert (job["status"], job["code"], job["message"]) == (
+        STATUS_COMPLETED,
+        201,
+        "success",
+    )
+    assert job["data"]["resource"]["avid"] == "JOB-001"
+    assert job["data"]["cover_downloaded"] is True
+    assert job["stages"]["source"] == {"status": "done", "elapsed": 0.5}
+    assert job["stages"]["scrape"]["status"] == "done"
+
+    stage_events = [
+        (data["stage"], data["stage_status"])
+        for kind, data in messages
+        if kind == "resource_add" and "stage" in data
+    ]
+    assert stage_events == [
+        ("source", "running"),
+        ("source", "done"),
+        ("scrape", "done"),
+    ]
+    assert messages[-1] == ("resource_add", job)
+
+    # 已执行的任务不重复执行；结束后同一 AVID 可以再次提交
+    assert jobs.run(job["job_id"])["status"] == STATUS_COMPLETED
+    assert len(calls) == 1
+    new_job, created = jobs.create("JOB-001")
+    assert created and new_job["job_id"] != job["job_id"]
+
+
+def test_job_failure_records_status_code(jobs, monkeypatch):
+    _fake_add(monkeypatch, error=ResourceNotFoundError("JOB-002", {"Fake": 404}))
+    job, _ = jobs.create("JOB-002")
+    job = jobs.run(job["job_id"])
+    assert (job["status"], job["code"], job["data"]) == (STATUS_FAILED, 404, None)
+    assert job["stages"]["source"]["status"] == "done"
+    assert jobs.create("JOB-002")[1]
+
+
+@pytest.mark.django_db
+def test_async_add_api(
+    jobs, resource_factory, api_client, assert_api_response, monkeypatch
+):
+    started = []
+    monkeypatch.setattr("nassav.tasks.start_add_resource", started.append)
+
+    response = api_client.post(
+        "/nassav/api/resource", {"avid": "job-003", "mode": "async"}, format="json"
+    )
+    job = assert_api_response(response, expected_code=202)["data"]
+    assert (job["avid"], job["status"]) == ("JOB-003", STATUS_QUEUED)
+    assert started == [job["job_id"]]
+
+    # 重复提交返回同一任务，不再提交
+    response = api_client.post(
+        "/nassav/api/resource", {"avid": "JOB-003", "mode": "async"}, format="json"
+    )
+    assert assert_api_response(response, expected_code=202)["data"]["job_id"] == (
+        job["job_id"]
+    )
+    assert len(started) == 1
+
+    url = f"/nassav/api/resource/jobs/{job['job_id']}"
+    assert assert_api_response(api_client.get(url))["data"]["status"] == STATUS_QUEUED
+    assert api_client.get("/nassav/api/resource/jobs/unknown").status_code == 404
+
+    # 已存在的资源在请求中直接返回 409，不创建任务
+    resource_factory(avid="JOB-004")
+    response = api_client.post(
+        "/nassav/api/resource", {"avid": "JOB-004", "mode": "async"}, format="json"
+    )
+    assert_api_response(response, expected_code=409)
+    assert len(started) == 1
+
+    response = api_client.post(
+        "/nassav/api/resource", {"avid": "JOB-005", "mode": "later"}, format="json"
+    )
+    assert response.status_code == 400
+
+
+@pytest.mark.parametrize(
+    "task_name, queue",
+    [
+        ("nassav.tasks.download_video_task", "download"),
+        ("nassav.tasks.mock_download_video_task", "download"),
+        ("nassav.tasks.add_resource_task", "celery"),
+        ("nassav.tasks.resources_batch_task", "celery"),
+        ("nassav.tasks.bulk_refresh_task", "celery"),
+        ("nassav.tasks.dispatch_download_queue_task", "celery"),
+    ],
+)
+def test_task_routes(task_name, queue):
+    from django_project.celery import app
+
+    assert app.amqp.router.route({}, task_name)["queue"].name == queue
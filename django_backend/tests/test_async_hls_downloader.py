@@ -0,0 +1,300 @@
+#!/usr/bin/env python
+"""
+AsyncHLS 原生下载器测试
+
+功能：
+1. 测试主播放列表/媒体播放列表解析（变体选择、BYTERANGE、EXT-X-MAP、加密标记）
+2. 基于本地 HLS 替身服务器测试并发下载、按序写入和进度回调（回调在事件循环线程之外执行）
+3. 测试分片失败重试与重试耗尽时的清理
+4. 测试断点续传（失败保留断点、续传只下载剩余分片、播放列表变化时重新下载）；
+   进度回调抛出 DownloadAborted 时中止下载并保留断点
+5. 测试按配置名称创建下载器
+
+运行方式：
+    uv run pytest tests/test_async_hls_downloader.py -v
+"""
+
+import threading
+
+import pytest
+from asgiref.sync import async_to_sync
+from nassav.m3u8downloader import (
+    AsyncHLS,
+    DownloadAborted,
+    N_m3u8DL_RE,
+    create_m3u8_downloader,
+)
+from nassav.m3u8downloader.AsyncHLS import (
+    parse_master_playlist,
+    parse_media_playlist,
+)
+from nassav.m3u8downloader.DownloadCheckpoint import DownloadCheckpoint
+from nassav.testing import LocalHlsServer
+
+
+def test_parse_master_playlist_resolves_relative_urls():
+    text = (
+        "#EXTM3U\n"
+        "#EXT-X-STREAM-INF:BANDWIDTH=800000,RESOLUTION=640x360\n"
+        "360p/video.m3u8\n"
+        '#EXT-X-STREAM-INF:BANDWIDTH=2500000,CODECS="avc1.64001f,mp4a.40.2"\n'
+        "https://cdn.example.com/720p/video.m3u8\n"
+    )
+    variants = parse_master_playlist(text, "https://example.com/abc/playlist.m3u8")
+    assert variants == [
+        (800000, "https://example.com/abc/360p/video.m3u8"),
+        (2500000, "https://cdn.example.com/720p/video.m3u8"),
+    ]
+
+
+def test_parse_media_playlist_segments():
+    text = (
+        "#EXTM3U\n"
+        "#EXT-X-TARGETDURATION:6\n"
+        '#EXT-X-MAP:URI="init.mp4"\n'
+        "#EXTINF:5.5,\n"
+        "seg0.m4s\n"
+        "#EXTINF:4.0,title\n"
+        "#EXT-X-BYTERANGE:1000@0\n"
+        "all.ts\n"
+        "#EXTINF:4.0,\n"
+        "#EXT-X-BYTERANGE:500\n"
+        "all.ts\n"
+        "#EXT-X-ENDLIST\n"
+    )
+    playlist = parse_media_playlist(text, "https://example.com/v/index.m3u8")
+
+    assert playlist.encryption is None
+    assert [seg.url for seg in playlist.segments] == [
+        "https://example.com/v/init.mp4",
+        "https://example.com/v/seg0.m4s",
+        "https://example.com/v/all.ts",
+        "https://example.com/v/all.ts",
+    ]
+    assert [seg.index for seg in playlist.segments] == [0, 1, 2, 3]
+    assert playlist.segments[2].byte_range == (1000, 0)
+    # 未指定 offset 时紧接上一个同 URI 分片
+    assert playlist.segments[3].byte_range == (500, 1000)
+    assert playlist.total_duration == pytest.approx(13.5)
+
+
+def test_parse_media_playlist_marks_encryption():
+    text = (
+        "#EXTM3U\n"
+        '#EXT-X-KEY:METHOD=AES-128,URI="key.bin"\n'
+        "#EXTINF:4.0,\n"
+        "seg0.ts\n"
+    )
+    playlist = parse_media_playlist(text, "https://example.com/index.m3u8")
+    assert playlist.encryption == "AES-128"
+
+
+def test_download_writes_segments_in_order(tmp_path):
+    progress = []
+    with LocalHlsServer(segment_count=40, segment_size=4096) as server:
+        downloader = AsyncHLS()
+        ok = downloader.download(
+            url=server.master_url,
+            output_dir=tmp_path,
+            output_name="TEST-001",
+            referer="https://missav.ai/",
+            user_agent="pytest-agent",
+            thread_count=8,
+            retry_count=1,
+            progress_callback=progress.append,
+        )
+
+        assert ok is True
+        output = tmp_path / "TEST-001.ts"
+        assert output.read_bytes() == server.expected_content()
+        assert not (tmp_path / "TEST-001.ts.part").exists()
+
+        # 请求头透传
+        headers = server.request_headers["/high/seg0.ts"]
+        assert headers["Referer"] == "https://missav.ai/"
+        assert headers["User-Agent"] == "pytest-agent"
+
+    # 每个分片回调一次，percent 精确单调递增至 100
+    assert len(progress) == 40
+    percents = [p.percent for p in progress]
+    assert percents == sorted(percents)
+    assert percents[0] == pytest.approx(2.5)
+    assert percents[-1] == 100
+    assert progress[-1].speed.endswith("/s")
+    assert (progress[-1].done_segments, progress[-1].total_segments) == (40, 40)
+    assert progress[-1].downloaded_bytes == (tmp_path / "TEST-001.ts").stat().st_size
+
+    assert downloader.ensure_mp4(tmp_path, "TEST-001") == tmp_path / "TEST-001.mp4"
+
+
+def test_progress_callback_runs_off_event_loop(tmp_path):
+    """进度回调不在事件循环线程中执行，可以使用 async_to_sync（WebSocket 推送）"""
+    progress = []
+    threads = set()
+
+    async def push(p):
+        progress.append(p)
+
+    def callback(p):
+        threads.add(threading.current_thread().name)
+        async_to_sync(push)(p)
+
+    with LocalHlsServer(segment_count=20, segment_size=1024) as server:
+        ok = AsyncHLS().download(
+            url=server.master_url,
+            output_dir=tmp_path,
+            output_name="TEST-001",
+            referer="https://missav.ai/",
+            user_agent="pytest-agent",
+            thread_count=4,
+            retry_count=1,
+            progress_callback=callback,
+        )
+
+    assert ok is True
+    # download() 返回前所有回调都已按顺序执行完毕
+    assert [p.done_segments for p in progress] == list(range(1, 21))
+    assert all(name.startswith("hls-progress") for name in threads)
+
+
+def test_download_retries_failed_segments(tmp_path):
+    with LocalHlsServer(
+        segment_count=10, segment_size=1024, fail_segments=[0, 7]
+    ) as server:
+        ok = AsyncHLS().download(
+            url=server.media_url,
+            output_dir=tmp_path,
+            output_name="TEST-002",
+            referer="",
+            user_agent="pytest-agent",
+            thread_count=4,
+            retry_count=2,
+        )
+        assert ok is True
+        assert (tmp_path / "TEST-002.ts").read_bytes() == server.expected_content()
+
+
+def _download(server, tmp_path, name, thread_count=1, retry_count=0):
+    return AsyncHLS().download(
+        url=server.media_url,
+        output_dir=tmp_path,
+        output_name=name,
+        referer="",
+        user_agent="pytest-agent",
+        thread_count=thread_count,
+        retry_count=retry_count,
+    )
+
+
+def test_failed_download_without_progress_is_cleaned(tmp_path):
+    with LocalHlsServer(
+        segment_count=5, segment_size=1024, fail_segments=[0]
+    ) as server:
+        assert _download(server, tmp_path, "TEST-003") is False
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_failed_download_keeps_checkpoint_and_resumes(tmp_path):
+    with LocalHlsServer(
+        segment_count=10, segment_size=1024, fail_segments=[6]
+    ) as server:
+        assert _download(server, tmp_path, "TEST-004") is False
+
+        checkpoint = DownloadCheckpoint(tmp_path, "TEST-004")
+        data = checkpoint.load()
+        assert data["segment_count"] == 10
+        assert data["offsets"] == [1024 * (i + 1) for i in range(6)]
+        assert checkpoint.part_path.stat().st_size == 6 * 1024
+
+        # 第二次下载只请求播放列表和剩余 4 个分片
+        requests_before = server.request_count
+        assert _download(server, tmp_path, "TEST-004") is True
+        assert server.request_count - requests_before == 1 + 4
+
+        assert (tmp_path / "TEST-004.ts").read_bytes() == server.expected_content()
+        assert not checkpoint.path.exists()
+        assert not checkpoint.part_path.exists()
+
+
+def test_progress_callback_can_abort_download(tmp_path):
+    def callback(progress):
+        if progress.done_segments >= 3:
+            raise DownloadAborted("lease lost")
+
+    with LocalHlsServer(segment_count=20, segment_size=1024) as server:
+        with pytest.raises(DownloadAborted):
+            AsyncHLS().download(
+                url=server.media_url,
+                output_dir=tmp_path,
+                output_name="TEST-009",
+                referer="",
+                user_agent="pytest-agent",
+                thread_count=1,
+                retry_count=0,
+                progress_callback=callback,
+            )
+
+        # 中止时保留断点，未下载完所有分片
+        checkpoint = DownloadCheckpoint(tmp_path, "TEST-009")
+        assert 3 <= len(checkpoint.load()["offsets"]) < 20
+        assert not (tmp_path / "TEST-009.ts").exists()
+
+        assert _download(server, tmp_path, "TEST-009") is True
+        assert (tmp_path / "TEST-009.ts").read_bytes() == server.expected_content()
+
+
+def test_resume_truncates_unrecorded_tail(tmp_path):
+    with LocalHlsServer(segment_count=8, segment_size=512, fail_segments=[5]) as server:
+        assert _download(server, tmp_path, "TEST-005") is False
+
+        # 模拟进程崩溃：清单保存后又写入了不完整的数据
+        checkpoint = DownloadCheckpoint(tmp_path, "TEST-005")
+        with open(checkpoint.part_path, "ab") as f:
+            f.write(b"garbage")
+
+        assert _download(server, tmp_path, "TEST-005") is True
+        assert (tmp_path / "TEST-005.ts").read_bytes() == server.expected_content()
+
+
+def test_changed_playlist_restarts_download(tmp_path):
+    with LocalHlsServer(segment_count=6, segment_size=512, fail_segments=[3]) as server:
+        assert _download(server, tmp_path, "TEST-006") is False
+    assert DownloadCheckpoint(tmp_path, "TEST-006").load() is not None
+
+    # 分片数量变化 => 指纹不同，丢弃旧断点从头下载
+    with LocalHlsServer(segment_count=9, segment_size=700) as server:
+        assert _download(server, tmp_path, "TEST-006") is True
+        assert server.request_count == 1 + 9
+        assert (tmp_path / "TEST-006.ts").read_bytes() == server.expected_content()
+
+
+def test_checkpoint_fingerprint_ignores_host_and_query():
+    a = parse_media_playlist(
+        "#EXTM3U\n#EXTINF:4.0,\nseg0.ts?token=abc\n",
+        "https://edge1.example.com/v/index.m3u8",
+    )
+    b = parse_media_playlist(
+        "#EXTM3U\n#EXTINF:4.0,\nseg0.ts?token=xyz\n",
+        "https://edge2.example.com/v/index.m3u8",
+    )
+    c = parse_media_playlist(
+        "#EXTM3U\n#EXTINF:5.0,\nseg0.ts\n", "https://edge1.example.com/v/index.m3u8"
+    )
+    fp = DownloadCheckpoint.compute_fingerprint
+    assert fp(a.segments) == fp(b.segments)
+    assert fp(a.segments) != fp(c.segments)
+
+
+def test_create_m3u8_downloader_by_name():
+    assert isinstance(create_m3u8_downloader("AsyncHLS"), AsyncHLS)
+    assert isinstance(create_m3u8_downloader("N_m3u8DL-RE"), N_m3u8DL_RE)
+    assert isinstance(create_m3u8_downloader(None), N_m3u8DL_RE)
+
+    downloader = create_m3u8_downloader("asynchls", proxy="http://127.0.0.1:7890")
+    assert downloader.proxies == {
+        "http": "http://127.0.0.1:7890",
+        "https": "http://127.0.0.1:7890",
+    }
+
+    with pytest.raises(ValueError):
+        create_m3u8_downloader("unknown")
@@ -0,0 +1,178 @@
+#!/usr/bin/env python
+"""
+演员头像服务测试
+
+功能：
+1. 测试头像文件已存在时不发出请求，添加资源时不为已有头像添加下载阶段
+2. 测试同一 URL 的并发下载只请求一次；跨进程锁被占用时等待其他进程下载完成
+3. 测试 Redis 索引：下载后记录 ETag，超过 revalidate_after 后带 If-None-Match 重新验证，304 不重新下载
+4. 测试批量补全的并发上限、占位符 URL 跳过，以及演员 avatar_url/avatar_filename 批量更新
+
+运行方式：
+    uv run pytest tests/test_avatar_service.py -v
+"""
+
+import threading
+import time
+
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from nassav.avatar_service import (
+    KEY,
+    LOCK_PREFIX,
+    STATUS_DOWNLOADED,
+    STATUS_NOT_MODIFIED,
+    STATUS_PRESENT,
+    STATUS_SKIPPED,
+    AvatarService,
+    avatar_filename,
+)
+from nassav.constants import ACTOR_AVATAR_PLACEHOLDER_URLS
+from nassav.models import Actor
+from nassav.stage_graph import StageGraph
+from nassav.testing import LocalSourceServer, Route
+
+
+@pytest.fixture
+def avatar_dir(settings, tmp_path):
+    settings.AVATAR_DIR = tmp_path / "avatar"
+    settings.AVATAR_DIR.mkdir()
+    return settings.AVATAR_DIR
+
+
+def test_avatar_filename():
+    assert avatar_filename("https://a.com/pics/actress/abc_a.jpg?x=1") == "abc_a.jpg"
+    assert avatar_filename("https://a.com/avatar/123").endswith(".jpg")
+
+
+def test_present_file_is_not_requested(avatar_dir):
+    from nassav.resource_service import ResourceService
+
+    with LocalSourceServer({"/a.jpg": Route(body="new")}) as server:
+        url = server.url("/a.jpg")
+        (avatar_dir / "a.jpg").write_bytes(b"old")
+        service = AvatarService()
+        assert service.ensure(url) == STATUS_PRESENT
+        assert service.missing([url, url, None]) == []
+        assert service.ensure(ACTOR_AVATAR_PLACEHOLDER_URLS[0]) == STATUS_SKIPPED
+
+        graph = StageGraph()
+        graph.add("avatars", lambda: None)
+        ResourceService(None, None, None)._add_avatar_stages(
+            graph, {"actors": ["甲"], "actor_avatars": {"甲": url}}
+        )
+        assert graph.run() == {"avatars": None}
+        assert server.requests == []
+    assert (avatar_dir / "a.jpg").read_bytes() == b"old"
+
+
+def test_concurrent_requests_are_deduplicated(avatar_dir):
+    with LocalSourceServer({"/a.jpg": Route(body="img", delay=0.2)}) as server:
+        url = server.url("/a.jpg")
+        service = AvatarService()
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(service.ensure(url)))
+            for _ in range(5)
+        ]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        assert server.requests == ["/a.jpg"]
+    assert sorted(results) == [STATUS_DOWNLOADED] + [STATUS_PRESENT] * 4
+    assert (avatar_dir / "a.jpg").read_bytes() == b"img"
+
+
+def test_backfill_is_bounded(avatar_dir):
+    routes = {f"/{i}.jpg": Route(body=str(i), delay=0.2) for i in range(6)}
+    with LocalSourceServer(routes) as server:
+        urls = [server.url(f"/{i}.jpg") for i in range(6)]
+        (avatar_dir / "0.jpg").write_bytes(b"0")
+        placeholder = ACTOR_AVATAR_PLACEHOLDER_URLS[0]
+
+        start = time.monotonic()
+        results = AvatarService().backfill(urls + [placeholder], workers=2)
+        elapsed = time.monotonic() - start
+
+        assert results[urls[0]] == STATUS_PRESENT
+        assert results[placeholder] == STATUS_SKIPPED
+        assert all(results[u] == STATUS_DOWNLOADED for u in urls[1:])
+        assert sorted(server.requests) == [f"/{i}.jpg" for i in range(1, 6)]
+    # 5 个 0.2 秒的请求、2 个并发：3 轮
+    assert 0.55 < elapsed < 1.0
+
+
+@pytest.mark.django_db
+def test_update_actors(actor_factory):
+    actor_factory(name="甲")
+    actor_factory(name="乙", avatar_url="https://a.com/b.jpg", avatar_filename="b.jpg")
+    actor_factory(name="丙")
+    service = AvatarService()
+    with CaptureQueriesContext(connection) as queries:
+        changed = service.update_actors(
+            {
+                "甲": "https://a.com/a.jpg",
+                "乙": "https://a.com/b.jpg",
+                "丙": ACTOR_AVATAR_PLACEHOLDER_URLS[0],
+                "不存在": "https://a.com/x.jpg",
+            }
+        )
+    assert changed == 2
+    assert len(queries) <= 4
+    assert Actor.objects.get(name="甲").avatar_filename == "a.jpg"
+    placeholder = Actor.objects.get(name="丙")
+    assert (placeholder.avatar_url, placeholder.avatar_filename) == (
+        ACTOR_AVATAR_PLACEHOLDER_URLS[0],
+        None,
+    )
+
+
+@pytest.fixture
+def indexed(settings, redis_client):
+    settings.AVATAR_INDEX_ENABLED = True
+    return AvatarService(client=redis_client)
+
+
+def test_index_and_etag_revalidation(settings, avatar_dir, indexed, redis_client):
+    import json
+
+    route = Route(body="v1", headers={"ETag": '"v1"'})
+    with LocalSourceServer({"/a.jpg": route}) as server:
+        url = server.url("/a.jpg")
+        assert indexed.ensure(url) == STATUS_DOWNLOADED
+        entry = json.loads(redis_client.hget(KEY, url))
+        assert (entry["filename"], entry["etag"]) == ("a.jpg", '"v1"')
+
+        assert indexed.ensure(url) == STATUS_PRESENT
+        assert server.requests == ["/a.jpg"]
+
+        # 超过 revalidate_after：带 If-None-Match 重新验证
+        settings.AVATAR_CONFIG = {"revalidate_after": 60}
+        redis_client.hset(KEY, url, json.dumps({**entry, "fetched_at": 0}))
+        assert indexed.missing([url]) == [url]
+        route.status = 304
+        assert indexed.ensure(url) == STATUS_NOT_MODIFIED
+        assert server.request_headers["/a.jpg"]["If-None-Match"] == '"v1"'
+        assert indexed.missing([url]) == []
+    assert (avatar_dir / "a.jpg").read_bytes() == b"v1"
+
+
+def test_waits_for_other_process(avatar_dir, indexed, redis_client):
+    import hashlib
+
+    with LocalSourceServer({"/a.jpg": Route(body="mine")}) as server:
+        url = server.url("/a.jpg")
+        lock_key = f"{LOCK_PREFIX}:{hashlib.sha1(url.encode()).hexdigest()}"
+        redis_client.set(lock_key, "other", ex=10)
+
+        def other_process():
+            time.sleep(0.3)
+            (avatar_dir / "a.jpg").write_bytes(b"theirs")
+            redis_client.delete(lock_key)
+
+        threading.Thread(target=other_process).start()
+        assert indexed.ensure(url) == STATUS_PRESENT
+        assert server.requests == []
+    assert (avatar_dir / "a.jpg").read_bytes() == b"theirs"
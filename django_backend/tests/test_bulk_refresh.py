@@ -0,0 +1,258 @@
+#!/usr/bin/env python
+"""
+批量刷新元数据任务测试
+
+功能：
+1. 测试按缺失字段、元数据更新时间、来源筛选资源
+2. 测试单块刷新：只补全空字段/force 覆盖、标题变化时重置翻译、演员/类别批量写入，
+   数据库查询数不随块大小增长
+3. 测试任务生命周期：分块、检查点、取消、从检查点继续、WebSocket 进度消息
+4. 测试 /api/resources/refresh/bulk 接口
+
+运行方式：
+    uv run pytest tests/test_bulk_refresh.py -v
+"""
+
+from datetime import timedelta
+
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from nassav.bulk_refresh import (
+    STATUS_CANCELLED,
+    STATUS_COMPLETED,
+    STATUS_RUNNING,
+    BulkRefreshError,
+    bulk_refresh_jobs,
+    refresh_chunk,
+    select_avids,
+)
+from nassav.models import AVResource
+
+
+def _scraped(avid, **overrides):
+    data = {
+        "avid": avid,
+        "title": f"{avid} 原标题",
+        "release_date": "2025-01-01",
+        "duration": "120分钟",
+        "studio": "片商",
+        "genres": ["剧情", "单体"],
+        "actors": ["演员A", "演员B"],
+        "cover_url": f"https://www.javbus.com/pics/{avid}.jpg",
+    }
+    data.update(overrides)
+    return data
+
+
+@pytest.fixture
+def fake_scrape(monkeypatch):
+    """替换刮削器：返回 results 中的元数据（没有的 AVID 返回 None）"""
+    from nassav.scraper.ScraperManager import scraper_manager
+
+    results = {}
+    calls = []
+
+    def scrape(avid):
+        calls.append(avid)
+        return results.get(avid)
+
+    monkeypatch.setattr(scraper_manager, "scrape", scrape)
+    return results, calls
+
+
+@pytest.mark.django_db
+def test_select_avids(resource_factory, actor_factory):
+    resource_factory(avid="AAA-001", source="Jable")
+    resource_factory(avid="AAA-002", original_title="", source="MissAV")
+    c = resource_factory(avid="AAA-003", source="missav", duration=7200)
+    c.actors.add(actor_factory(name="演员"))
+    AVResource.objects.filter(avid="AAA-001").update(
+        metadata_updated_at=timezone.now() - timedelta(days=40)
+    )
+
+    assert select_avids() == ["AAA-001", "AAA-002", "AAA-003"]
+    assert select_avids(missing=["title"]) == ["AAA-002"]
+    assert select_avids(missing=["actors"]) == ["AAA-001", "AAA-002"]
+    assert select_avids(missing=["title", "duration"]) == ["AAA-001", "AAA-002"]
+    assert select_avids(older_than_days=30) == ["AAA-001"]
+    assert select_avids(sources=["MISSAV"]) == ["AAA-002", "AAA-003"]
+    assert select_avids(sources=["missav"], missing=["actors"]) == ["AAA-002"]
+    assert select_avids(avids=["aaa-003", "AAA-001"], limit=1) == ["AAA-001"]
+
+    with pytest.raises(BulkRefreshError):
+        select_avids(missing=["cover"])
+    with pytest.raises(BulkRefreshError):
+        select_avids(older_than_days="abc")
+
+
+@pytest.mark.django_db
+def test_refresh_chunk_fills_missing_fields(
+    resource_factory, actor_factory, fake_scrape
+):
+    results, _ = fake_scrape
+    empty = resource_factory(avid="BBB-001", original_title="", metadata={"m3u8": "x"})
+    kept = resource_factory(
+        avid="BBB-002",
+        original_title="旧标题",
+        translated_title="旧翻译",
+        translation_status="completed",
+        duration=600,
+    )
+    kept.actors.add(actor_factory(name="旧演员"))
+    results["BBB-001"] = _scraped("BBB-001")
+    results["BBB-002"] = _scraped("BBB-002")
+
+    result = refresh_chunk(["BBB-001", "BBB-002", "BBB-404"])
+    assert (result["updated"], result["unchanged"], result["failed"]) == (2, 0, 1)
+    assert result["errors"] == {"BBB-404": "资源不存在"}
+
+    empty.refresh_from_db()
+    assert empty.original_title == "BBB-001 原标题"
+    assert empty.duration == 7200 and empty.release_date == "2025-01-01"
+    assert empty.metadata["m3u8"] == "x" and empty.metadata["studio"] == "片商"
+    assert sorted(a.name for a in empty.actors.all()) == ["演员A", "演员B"]
+    assert {g.name for g in empty.genres.all()} == {"剧情", "单体"}
+
+    # 不覆盖已有字段，只补全空字段
+    kept.refresh_from_db()
+    assert kept.original_title == "旧标题" and kept.duration == 600
+    assert [a.name for a in kept.actors.all()] == ["旧演员"]
+    assert kept.genres.count() == 2
+
+    # 再次刷新没有变化
+    result = refresh_chunk(["BBB-001", "BBB-002"])
+    assert (result["updated"], result["unchanged"]) == (0, 2)
+
+    # force：覆盖已有字段，标题变化时重置翻译
+    result = refresh_chunk(["BBB-002"], {"force": True})
+    kept.refresh_from_db()
+    assert kept.original_title == "BBB-002 原标题"
+    assert (kept.translation_status, kept.translated_title) == ("pending", None)
+    assert sorted(a.name for a in kept.actors.all()) == ["演员A", "演员B"]
+
+    results.pop("BBB-001")
+    result = refresh_chunk(["BBB-001"])
+    assert result["errors"] == {"BBB-001": "未获取到元数据"}
+
+
+@pytest.mark.django_db
+def test_refresh_chunk_query_count_is_constant(resource_factory, fake_scrape):
+    results, _ = fake_scrape
+
+    def run(prefix, count):
+        avids = [f"{prefix}-{i:03d}" for i in range(count)]
+        for avid in avids:
+            resource_factory(avid=avid, original_title="")
+            results[avid] = _scraped(avid, actors=[f"{avid} 演员"])
+        with CaptureQueriesContext(connection) as queries:
+            assert refresh_chunk(avids)["updated"] == count
+        return len(queries)
+
+    run("BBB", 1)  # 先创建共同的类别，之后两次都只需创建演员
+    assert run("CCC", 2) == run("DDD", 20)
+
+
+@pytest.fixture
+def messages(monkeypatch):
+    """收集 WebSocket 消息"""
+    sent = []
+    monkeypatch.setattr(
+        "nassav.tasks.notify_task_update",
+        lambda update_type, data: sent.append((update_type, data)),
+    )
+    return sent
+
+
+@pytest.fixture
+def jobs(redis_client, settings, monkeypatch, messages):
+    settings.BULK_REFRESH_CONFIG = {"chunk_size": 2, "concurrency": 2}
+    monkeypatch.setattr(bulk_refresh_jobs, "_client", redis_client)
+    return bulk_refresh_jobs
+
+
+@pytest.mark.django_db
+def test_job_checkpoint_cancel_and_resume(jobs, messages, bulk_resources, fake_scrape):
+    from nassav.tasks import start_bulk_refresh
+
+    results, calls = fake_scrape
+    for resource in bulk_resources(5, original_title=""):
+        results[resource.avid] = _scraped(resource.avid)
+
+    job = jobs.create({"missing": ["title"]}, {"cover": False})
+    assert (job["status"], job["total"], job["chunks"]) == (STATUS_RUNNING, 5, 3)
+
+    job = jobs.run_next_chunk(job["job_id"])
+    assert (job["chunks_done"], job["processed"], job["updated"]) == (1, 2, 2)
+    assert messages[-1][0] == "bulk_refresh"
+    assert messages[-1][1]["chunks_done"] == 1
+
+    # 取消后不再领取新的块
+    assert jobs.cancel(job["job_id"])["status"] == STATUS_CANCELLED
+    assert jobs.run_next_chunk(job["job_id"]) is None
+
+    # 模拟处理中断：一块已领取但未完成，resume 后重新排队
+    jobs.resume(job["job_id"])
+    assert jobs.claim(job["job_id"]) == 1
+    jobs.cancel(job["job_id"])
+    assert jobs.resume(job["job_id"])["status"] == STATUS_RUNNING
+
+    start_bulk_refresh(job["job_id"], async_mode=False)
+    job = jobs.get(job["job_id"])
+    assert job["status"] == STATUS_COMPLETED
+    assert (job["chunks_done"], job["updated"], job["failed"]) == (3, 5, 0)
+    # 已完成的块不重复请求
+    assert sorted(calls) == [f"TEST-{i:03d}" for i in range(1, 6)]
+    assert not AVResource.objects.filter(original_title="").exists()
+    assert jobs.resume(job["job_id"])["status"] == STATUS_COMPLETED
+
+
+@pytest.mark.django_db
+def test_job_validation(jobs):
+    with pytest.raises(BulkRefreshError):
+        jobs.create({"unknown": 1})
+    with pytest.raises(BulkRefreshError):
+        jobs.create({}, {"metadata": False})
+    job = jobs.create({"avids": ["NONE-001"]})
+    assert (job["status"], job["chunks"]) == (STATUS_COMPLETED, 0)
+
+
+@pytest.mark.django_db
+def test_bulk_refresh_api(
+    jobs, bulk_resources, api_client, assert_api_response, monkeypatch
+):
+    started = []
+    monkeypatch.setattr("nassav.tasks.start_bulk_refresh", started.append)
+    bulk_resources(3)
+
+    response = api_client.post(
+        "/nassav/api/resources/refresh/bulk",
+        {"filters": {"limit": 2}, "options": {"force": True}},
+        format="json",
+    )
+    job = assert_api_response(response, expected_code=202)["data"]
+    assert (job["total"], job["options"]["force"]) == (2, True)
+    assert started == [job["job_id"]]
+
+    url = f"/nassav/api/resources/refresh/bulk/{job['job_id']}"
+    assert assert_api_response(api_client.get(url))["data"]["status"] == STATUS_RUNNING
+    data = assert_api_response(api_client.get("/nassav/api/resources/refresh/bulk"))
+    assert [j["job_id"] for j in data["data"]] == [job["job_id"]]
+
+    assert assert_api_response(api_client.delete(url))["data"]["status"] == "cancelled"
+    response = api_client.post(f"{url}/resume")
+    assert (
+        assert_api_response(response, expected_code=202)["data"]["status"] == "running"
+    )
+    assert started == [job["job_id"]] * 2
+
+    response = api_client.post(
+        "/nassav/api/resources/refresh/bulk",
+        {"filters": {"missing": ["cover"]}},
+        format="json",
+    )
+    assert response.status_code == 400
+    assert (
+        api_client.get("/nassav/api/resources/refresh/bulk/unknown").status_code == 404
+    )
@@ -0,0 +1,145 @@
+#!/usr/bin/env python
+"""
+源 Cookie 生命周期测试
+
+功能：
+1. 测试自动获取 Cookie 时记录每个 Cookie 的过期时间（会话 Cookie 按 session_ttl 计），手动设置的 Cookie 不记录
+2. 测试按过期时间后台刷新：只刷新即将过期的自动获取的 Cookie，刷新后过期时间延后
+3. 测试 Cookie 保存在 Redis 中，加载时不读数据库；更新通过发布/订阅推送到其他进程的源
+
+运行方式：
+    uv run pytest tests/test_cookie_manager.py -v
+"""
+
+import time
+
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from nassav.cookie_manager import cookie_manager
+from nassav.models import SourceCookie
+from nassav.source.SourceBase import SourceBase
+from nassav.source.SourceManager import SourceManager
+from nassav.testing import LocalSourceServer, Route
+
+
+class FakeSource(SourceBase):
+    def __init__(self, name, server):
+        super().__init__(timeout=5)
+        self.name = name
+        self.server = server
+
+    def get_source_name(self):
+        return self.name
+
+    def _get_home_url(self):
+        return self.server.url("/home")
+
+
+def _manager(settings, server, *names):
+    settings.SOURCE_CONFIG = {}
+    manager = SourceManager()
+    manager.sources = {name: FakeSource(name, server) for name in names}
+    return manager
+
+
+@pytest.mark.django_db
+def test_entry_expiry(settings):
+    settings.COOKIE_CONFIG = {"session_ttl": 100}
+    entry = cookie_manager.build_entry(
+        "MissAV", "a=1; b=2", {"a": 1000.0, "b": None}, now=0
+    )
+    assert (entry["source"], entry["expires_at"], entry["auto"]) == (
+        "missav",
+        100,
+        True,
+    )
+    entry = cookie_manager.build_entry("MissAV", "a=1", {"a": 50.0}, now=0)
+    assert entry["expires_at"] == 50
+
+    manual = cookie_manager.build_entry("MissAV", "a=1")
+    assert (manual["expires_at"], manual["auto"]) == (None, False)
+    cookie_manager.store("Jable", "c=3")
+    assert cookie_manager.due(within=10**9) == []
+
+
+@pytest.mark.django_db
+def test_set_cookie_auto_records_expiry():
+    home = Route(body="home", headers={"Set-Cookie": "sid=abc; Max-Age=600; Path=/"})
+    with LocalSourceServer({"/home": home}) as server:
+        source = FakeSource("Local", server)
+        before = time.time()
+        assert source.set_cookie_auto(force_refresh=True)
+
+    assert source.cookie == "sid=abc"
+    obj = SourceCookie.objects.get(source_name="local")
+    assert obj.cookie == "sid=abc"
+    assert before + 590 < obj.expires_at.timestamp() < time.time() + 610
+
+    assert cookie_manager.get("LOCAL")["auto"]
+    assert cookie_manager.due(within=0) == []
+    assert cookie_manager.due(within=1200) == ["local"]
+
+
+@pytest.mark.django_db
+def test_refresh_expiring_cookies(settings):
+    settings.COOKIE_CONFIG = {"refresh_before": 1800}
+    home = Route(body="home", headers={"Set-Cookie": "sid=new; Max-Age=86400"})
+    with LocalSourceServer({"/home": home}) as server:
+        manager = _manager(settings, server, "Soon", "Later", "Manual")
+        now = time.time()
+        cookie_manager.store("Soon", "sid=old", {"sid": now + 60})
+        cookie_manager.store("Later", "sid=old", {"sid": now + 7200})
+        cookie_manager.store("Manual", "sid=old")
+
+        assert manager.refresh_expiring_cookies() == {"Soon": True}
+        assert server.requests == ["/home"]
+
+    assert manager.sources["Soon"].cookie == "sid=new"
+    assert cookie_manager.get("soon")["expires_at"] > now + 86000
+    assert cookie_manager.due() == []
+    assert SourceCookie.objects.get(source_name="later").cookie == "sid=old"
+
+
+@pytest.fixture
+def synced(settings, redis_client, monkeypatch):
+    settings.COOKIE_SYNC_ENABLED = True
+    monkeypatch.setattr(cookie_manager, "_client", redis_client)
+    yield cookie_manager
+    cookie_manager.stop()
+
+
+def _wait_for(predicate, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.02)
+    return False
+
+
+@pytest.mark.django_db
+def test_cookie_updates_are_pushed_to_all_processes(settings, synced):
+    with LocalSourceServer() as server:
+        synced.store("Top", "sid=1", {"sid": None})
+        assert set(synced.get("top")["expires"]) == {"sid"}
+        manager = _manager(settings, server, "Top", "Mid")
+
+        # 从 Redis 加载，不读数据库
+        with CaptureQueriesContext(connection) as queries:
+            manager._ensure_cookies_loaded()
+        assert len(queries) == 0
+        assert manager.sources["Top"].cookie == "sid=1"
+        assert manager.sources["Mid"].cookie is None
+
+        # 模拟另一个进程设置 Cookie：本进程的源通过订阅更新
+        other = _manager(settings, server, "Top", "Mid")
+        other._cookies_loaded = True
+        assert other.set_source_cookie("mid", "token=2")
+        assert _wait_for(lambda: manager.sources["Mid"].cookie == "token=2")
+
+        # 清除 Cookie 同样推送
+        other.set_source_cookie("top", "")
+        assert _wait_for(lambda: manager.sources["Top"].cookie is None)
+
+    assert SourceCookie.objects.get(source_name="mid").cookie == "token=2"
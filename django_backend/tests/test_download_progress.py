@@ -0,0 +1,218 @@
+#!/usr/bin/env python
+"""
+下载进度解析与写入合并测试
+
+功能：
+1. 测试 N_m3u8DL-RE 进度行解析（分片数、字节数、速度、剩余时间、未知值占位）
+2. 重放录制的 N_m3u8DL-RE 输出（tests/fixtures/n_m3u8dl_re_output.log），验证进度单调、字节数正确
+3. 测试进度写入合并（按时间间隔/百分比步长写入，100% 必写）
+4. 测试 N_m3u8DL-RE 下载器对重复进度行去重并回调结构化进度
+5. 测试下载任务按合并后的频率写入 Redis 进度（含字节数）
+
+运行方式：
+    uv run pytest tests/test_download_progress.py -v
+"""
+
+import os
+import platform
+import stat
+from pathlib import Path
+from unittest.mock import MagicMock, patch
+
+import pytest
+from nassav.m3u8downloader import (
+    DownloadProgress,
+    N_m3u8DL_RE,
+    ProgressCoalescer,
+    parse_progress_line,
+)
+from nassav.m3u8downloader.DownloadProgress import parse_size
+
+FIXTURE = Path(__file__).parent / "fixtures" / "n_m3u8dl_re_output.log"
+
+
+def _replay():
+    with open(FIXTURE, encoding="utf-8") as f:
+        return [p for p in map(parse_progress_line, f) if p is not None]
+
+
+def test_parse_progress_line_fields():
+    line = (
+        "Vid 1920x1080 | 4000 Kbps ━━━━━━━━━━ 245/1042 23.51% "
+        "486.21MB/~2.03GB 8.12MBps 00:03:12\n"
+    )
+    progress = parse_progress_line(line)
+    assert progress == DownloadProgress(
+        percent=23.51,
+        speed="8.12MB/s",
+        eta="00:03:12",
+        done_segments=245,
+        total_segments=1042,
+        downloaded_bytes=parse_size("486.21MB"),
+        total_bytes=parse_size("2.03GB"),
+        speed_bps=8.12 * 1024**2,
+    )
+    assert "downloaded_bytes" in progress.to_dict()
+
+
+def test_parse_progress_line_placeholders_and_noise():
+    progress = parse_progress_line(
+        "Vid 1920x1080 | 4000 Kbps ━━━━ 0/240 0.00% -/- - --:--:--"
+    )
+    assert (progress.percent, progress.done_segments, progress.total_segments) == (
+        0.0,
+        0,
+        240,
+    )
+    assert progress.downloaded_bytes is None and progress.speed == ""
+    assert progress.to_dict() == {
+        "percent": 0.0,
+        "speed": "",
+        "eta": "",
+        "done_segments": 0,
+        "total_segments": 240,
+    }
+
+    assert parse_progress_line("22:40:23.113 INFO : Vid 1920x1080 | 4000 Kbps") is None
+    assert parse_progress_line("22:40:23.113 WARN : retry 50% of segments") is None
+    # ANSI 颜色码与其他格式的进度行
+    colored = parse_progress_line("\x1b[32m12/40 30.00%\x1b[0m 1.00MB/4.00MB 1.5MBps")
+    assert colored.percent == 30.0 and colored.total_bytes == 4 * 1024**2
+    assert parse_progress_line("已下载: 45.2% | 速度: 5.2MB/s").speed == "5.2MB/s"
+
+
+def test_replay_captured_output():
+    progress = _replay()
+
+    # 只有进度行被解析（日志行里的 "%" 不会误报）
+    assert len(progress) == 459
+    percents = [p.percent for p in progress]
+    assert percents == sorted(percents)
+    segments = [p.done_segments for p in progress]
+    assert segments == sorted(segments)
+
+    last = progress[-1]
+    assert (last.percent, last.done_segments, last.total_segments) == (100.0, 240, 240)
+    assert last.downloaded_bytes == last.total_bytes == parse_size("864.00MB")
+    assert all(
+        p.downloaded_bytes <= p.total_bytes * 1.05
+        for p in progress
+        if p.downloaded_bytes is not None
+    )
+
+
+def test_coalescer_limits_writes_on_replay():
+    now = [0.0]
+    written = []
+    coalescer = ProgressCoalescer(
+        written.append, min_interval=0.5, min_step=1.0, clock=lambda: now[0]
+    )
+
+    # 控制台约每 0.1 秒刷新一行
+    updates = _replay()
+    for progress in updates:
+        now[0] += 0.1
+        coalescer.update(progress)
+
+    assert coalescer.writes == len(written)
+    # 100% 最多 100 次按步长写入 + 0.5 秒一次的定时写入（总时长约 46 秒）
+    assert len(written) <= 100 + 46 / 0.5
+    assert len(written) < len(updates) / 2
+    assert written[-1].percent == 100
+    assert written[0].percent == 0
+
+
+def test_coalescer_interval_and_step():
+    now = [0.0]
+    written = []
+    coalescer = ProgressCoalescer(written.append, clock=lambda: now[0])
+
+    assert coalescer.update(DownloadProgress(percent=10.0, speed="1MB/s"))
+    now[0] += 0.1
+    assert not coalescer.update(DownloadProgress(percent=10.5, speed="2MB/s"))
+    assert coalescer.update(DownloadProgress(percent=11.0, speed="2MB/s"))
+    now[0] += 0.6
+    assert coalescer.update(DownloadProgress(percent=11.1, speed="3MB/s"))
+    # 相同进度不重复写入，100% 无视间隔
+    assert not coalescer.update(DownloadProgress(percent=11.1, speed="3MB/s"))
+    assert coalescer.update(DownloadProgress(percent=100.0))
+    assert [p.percent for p in written] == [10.0, 11.0, 11.1, 100.0]
+
+
+@pytest.mark.skipif(platform.system() == "Windows", reason="需要 sh")
+def test_n_m3u8dl_re_reports_deduplicated_progress(tmp_path, settings):
+    # 用 shell 脚本替代 N_m3u8DL-RE：输出录制的日志并生成输出文件
+    tool = tmp_path / "N_m3u8DL-RE"
+    tool.write_text(f'#!/bin/sh\ncat "{FIXTURE}"\ntouch "$5/$7.mp4"\n')
+    tool.chmod(tool.stat().st_mode | stat.S_IEXEC)
+
+    downloader = N_m3u8DL_RE()
+    downloader.tool_path = str(tool)
+    received = []
+    ok = downloader.download(
+        url="https://example.com/playlist.m3u8",
+        output_dir=tmp_path / "out",
+        output_name="ABC-123",
+        referer="",
+        user_agent="pytest-agent",
+        progress_callback=received.append,
+    )
+
+    assert ok is True
+    assert os.path.exists(tmp_path / "out" / "ABC-123.mp4")
+    replay = _replay()
+    assert all(a != b for a, b in zip(received, received[1:]))
+    assert len(received) < len(replay)
+    assert received[-1] == replay[-1]
+
+
+@pytest.mark.django_db
+def test_download_task_coalesces_redis_writes():
+    from nassav.tasks import download_video_task
+
+    updates = _replay()
+
+    def fake_download(avid, progress_callback):
+        for progress in updates:
+            progress_callback(progress)
+        return True
+
+    slots = MagicMock()
+    slots.try_acquire.return_value = True
+    slots.start_heartbeat.return_value.lost = False
+    names = [
+        "mark_task_started",
+        "clear_task_state",
+        "remove_task_from_queue",
+        "notify_task_update",
+        "notify_queue_event",
+        "dispatch_download_queue",
+        "set_task_progress",
+    ]
+    patchers = [patch(f"nassav.tasks.{name}") for name in names]
+    mocks = {name: p.start() for name, p in zip(names, patchers)}
+    try:
+        with patch("nassav.tasks.get_download_slots", return_value=slots), patch(
+            "nassav.services.video_download_service.download_video",
+            side_effect=fake_download,
+        ):
+            assert download_video_task("abc-123")["status"] == "success"
+    finally:
+        for p in patchers:
+            p.stop()
+
+    # 重放瞬间完成，只按 1% 步长写入
+    writes = mocks["set_task_progress"].call_args_list
+    assert len(writes) <= 101
+    assert len(writes) < len(updates) / 4
+    last = writes[-1]
+    assert last.args == ("ABC-123",)
+    assert last.kwargs["percent"] == 100.0
+    assert last.kwargs["downloaded_bytes"] == last.kwargs["total_bytes"]
+
+    progress_events = [
+        c.kwargs["task"]["progress"]
+        for c in mocks["notify_queue_event"].call_args_list
+        if c.args[0] == "progress"
+    ]
+    assert progress_events[-1]["total_segments"] == 240
@@ -0,0 +1,175 @@
+#!/usr/bin/env python
+"""
+下载优先级调度测试
+
+功能：
+1. 测试排序规则：显式优先级 > 收藏加成 > 提交时间，以及等待老化（需要 Redis）
+2. 测试修改优先级、提到队首、批量排序和原子弹出（需要 Redis）
+3. 测试派发数量不超过空闲下载槽位数
+4. 测试提交下载任务时写入调度队列，以及调整优先级接口
+
+运行方式：
+    uv run pytest tests/test_download_scheduler.py -v
+"""
+
+import time
+from unittest.mock import MagicMock, patch
+
+import pytest
+from nassav.download_scheduler import DownloadScheduler
+
+
+def _avids(scheduler):
+    return [item["avid"] for item in scheduler.ordered()]
+
+
+def test_priority_then_favorite_then_submit_time(redis_client):
+    scheduler = DownloadScheduler(redis_client, favorite_boost=5, aging_per_hour=0)
+    now = time.time()
+
+    scheduler.enqueue("OLD-001", "t1", submitted_at=now - 60)
+    scheduler.enqueue("NEW-001", "t2", submitted_at=now)
+    scheduler.enqueue("FAV-001", "t3", is_favorite=True, submitted_at=now)
+    scheduler.enqueue("LOW-001", "t4", priority=-1, submitted_at=now - 3600)
+    scheduler.enqueue("HIGH-001", "t5", priority=10, submitted_at=now)
+
+    assert _avids(scheduler) == ["HIGH-001", "FAV-001", "OLD-001", "NEW-001", "LOW-001"]
+    assert [item["position"] for item in scheduler.ordered()] == [1, 2, 3, 4, 5]
+
+
+def test_aging_lets_waiting_tasks_overtake(redis_client):
+    scheduler = DownloadScheduler(redis_client, favorite_boost=5, aging_per_hour=1)
+    now = time.time()
+
+    # 等待了 6 小时的普通任务超过刚提交的收藏任务
+    scheduler.enqueue("WAIT-001", "t1", submitted_at=now - 6 * 3600)
+    scheduler.enqueue("FAV-001", "t2", is_favorite=True, submitted_at=now)
+
+    ordered = scheduler.ordered()
+    assert [item["avid"] for item in ordered] == ["WAIT-001", "FAV-001"]
+    assert ordered[0]["effective_priority"] == pytest.approx(6, abs=0.01)
+    assert ordered[1]["effective_priority"] == pytest.approx(5, abs=0.01)
+
+
+def test_set_priority_bump_and_reorder(redis_client):
+    scheduler = DownloadScheduler(redis_client, aging_per_hour=1)
+    now = time.time()
+    for i, avid in enumerate(["A-001", "B-001", "C-001", "D-001"]):
+        scheduler.enqueue(avid, f"t{i}", submitted_at=now - (4 - i) * 60)
+    assert _avids(scheduler) == ["A-001", "B-001", "C-001", "D-001"]
+
+    assert scheduler.set_priority("c-001", 3) is True
+    assert _avids(scheduler) == ["C-001", "A-001", "B-001", "D-001"]
+
+    assert scheduler.bump("D-001") is True
+    assert _avids(scheduler)[0] == "D-001"
+
+    assert scheduler.reorder(["B-001", "A-001", "MISSING-001"]) == ["B-001", "A-001"]
+    assert _avids(scheduler) == ["B-001", "A-001", "D-001", "C-001"]
+
+    assert scheduler.set_priority("MISSING-001", 1) is False
+    assert scheduler.bump("MISSING-001") is False
+
+
+def test_pop_next_removes_entries(redis_client):
+    scheduler = DownloadScheduler(redis_client)
+    scheduler.enqueue("A-001", "task-a", priority=1)
+    scheduler.enqueue("B-001", "task-b")
+
+    popped = scheduler.pop_next(5)
+    assert [(item["avid"], item["task_id"]) for item in popped] == [
+        ("A-001", "task-a"),
+        ("B-001", "task-b"),
+    ]
+    assert len(scheduler) == 0
+    assert scheduler.is_queued("A-001") is False
+    assert scheduler.get_meta("A-001") is None
+    assert scheduler.pop_next(1) == []
+
+
+def test_dispatch_respects_free_slots(redis_client):
+    from nassav.tasks import INFLIGHT_KEY, dispatch_download_queue
+
+    scheduler = DownloadScheduler(redis_client)
+    for i, avid in enumerate(["A-001", "B-001", "C-001"]):
+        scheduler.enqueue(avid, f"task-{i}", priority=3 - i)
+
+    slots = MagicMock(limit=2)
+    slots.holders.return_value = []
+    with patch("nassav.tasks.get_redis_client", return_value=redis_client), patch(
+        "nassav.tasks.get_download_slots", return_value=slots
+    ), patch("nassav.tasks.download_video_task.apply_async") as mock_apply:
+        assert dispatch_download_queue() == ["A-001", "B-001"]
+        # 在途任务已占满槽位，不再派发
+        assert dispatch_download_queue() == []
+
+        redis_client.zrem(INFLIGHT_KEY, "A-001")
+        assert dispatch_download_queue() == ["C-001"]
+
+    assert [c.kwargs for c in mock_apply.call_args_list] == [
+        {"args": ["A-001"], "task_id": "task-0"},
+        {"args": ["B-001"], "task_id": "task-1"},
+        {"args": ["C-001"], "task_id": "task-2"},
+    ]
+
+
+@pytest.mark.django_db
+def test_submit_download_task_enqueues_with_favorite(resource_factory):
+    from nassav.tasks import submit_download_task
+
+    resource_factory(avid="FAV-123", is_favorite=True)
+    scheduler = MagicMock()
+    scheduler.position.return_value = 3
+    with patch(
+        "nassav.tasks.register_task", return_value={"avid": "FAV-123"}
+    ) as mock_register, patch(
+        "nassav.tasks.get_download_scheduler", return_value=scheduler
+    ), patch(
+        "nassav.tasks.dispatch_download_queue"
+    ) as mock_dispatch, patch(
+        "nassav.tasks.notify_queue_event"
+    ) as mock_event:
+        result, is_duplicate = submit_download_task("fav-123", priority=2)
+
+        assert is_duplicate is False
+        mock_register.assert_called_once_with(
+            "FAV-123", result.id, task_type="download"
+        )
+        scheduler.enqueue.assert_called_once_with(
+            "FAV-123", result.id, priority=2, is_favorite=True
+        )
+        mock_dispatch.assert_called_once()
+        mock_event.assert_called_once_with(
+            "added",
+            task={"avid": "FAV-123", "position": 3, "priority": 2, "is_favorite": True},
+        )
+
+        # 已登记的 AVID 视为重复任务，不再进入调度队列
+        mock_register.return_value = None
+        assert submit_download_task("FAV-123") == (None, True)
+        scheduler.enqueue.assert_called_once()
+
+
+@pytest.mark.django_db
+def test_queue_item_view(api_client, assert_api_response):
+    with patch(
+        "nassav.tasks.reprioritize_download", return_value=True
+    ) as mock_re, patch(
+        "nassav.tasks.get_full_task_queue", return_value={"pending": [], "active": []}
+    ):
+        response = api_client.patch(
+            "/nassav/api/tasks/queue/abc-123", {"bump": True}, format="json"
+        )
+        assert_api_response(response, 200)
+        mock_re.assert_called_once_with("ABC-123", priority=None, bump=True)
+
+        response = api_client.patch(
+            "/nassav/api/tasks/queue/ABC-123", {"priority": "x"}, format="json"
+        )
+        assert_api_response(response, 400)
+
+        mock_re.return_value = False
+        response = api_client.patch(
+            "/nassav/api/tasks/queue/ABC-123", {"priority": 3}, format="json"
+        )
+        assert_api_response(response, 404)
@@ -0,0 +1,247 @@
+#!/usr/bin/env python
+"""
+下载槽位（Redis 计数信号量）测试
+
+功能：
+1. 测试槽位数量限制、重入续期、释放和过期租约回收（需要 Redis）
+2. 测试槽位已满时下载任务被暂存（延迟重新入队，不计入失败重试次数）
+3. 测试下载任务完成后释放槽位并停止心跳，且只推送增量队列事件（不广播完整快照）
+4. 测试下载异常等待重试时保留任务登记，达到最大重试次数后才清理
+5. 测试槽位租约丢失时中止下载并暂存任务（重新占用槽位后续传）
+
+运行方式：
+    uv run pytest tests/test_download_slots.py -v
+"""
+
+import time
+from unittest.mock import MagicMock, patch
+
+import pytest
+from celery.exceptions import Retry
+from nassav.download_slots import SLOTS_KEY, DownloadSlots
+
+
+def test_slots_limit_and_release(redis_client):
+    slots = DownloadSlots(redis_client, limit=2, lease_ttl=30)
+
+    assert slots.try_acquire("AAA-001") is True
+    assert slots.try_acquire("AAA-002") is True
+    assert slots.try_acquire("AAA-003") is False
+    # 同一持有者重复占用视为续期
+    assert slots.try_acquire("AAA-001") is True
+    assert sorted(slots.holders()) == ["AAA-001", "AAA-002"]
+
+    slots.release("AAA-001")
+    assert slots.try_acquire("AAA-003") is True
+
+
+def test_expired_lease_is_reclaimed(redis_client):
+    slots = DownloadSlots(redis_client, limit=1, lease_ttl=30)
+    assert slots.try_acquire("CRASHED-001") is True
+
+    # 模拟崩溃的 Worker：租约到期且不再续期
+    redis_client.zadd(SLOTS_KEY, {"CRASHED-001": time.time() - 1})
+
+    assert slots.renew("CRASHED-001") is False
+    assert slots.try_acquire("NEXT-001") is True
+    assert slots.holders() == ["NEXT-001"]
+
+
+def test_heartbeat_keeps_lease_alive(redis_client):
+    slots = DownloadSlots(redis_client, limit=1, lease_ttl=3)
+    assert slots.try_acquire("LONG-001") is True
+    first_expiry = redis_client.zscore(SLOTS_KEY, "LONG-001")
+
+    heartbeat = slots.start_heartbeat("LONG-001")
+    time.sleep(1.5)
+    heartbeat.stop()
+
+    assert redis_client.zscore(SLOTS_KEY, "LONG-001") > first_expiry
+    assert heartbeat.lost is False
+
+
+def test_park_download_task_does_not_consume_retries(settings):
+    from nassav.tasks import park_download_task
+
+    settings.DOWNLOAD_SLOT_PARK_DELAY = 7
+    task = MagicMock()
+    task.request.retries = 1
+    redis_client = MagicMock()
+
+    with patch("nassav.tasks.get_redis_client", return_value=redis_client):
+        with pytest.raises(Retry):
+            park_download_task(task, "ABC-123", parked=2)
+
+    # 暂存期间刷新在途记录
+    redis_client.zadd.assert_called_once()
+
+    _, kwargs = task.signature_from_request.call_args
+    assert kwargs["args"] == ["ABC-123"]
+    assert kwargs["kwargs"] == {"parked": 3}
+    assert kwargs["countdown"] == 7
+    assert kwargs["retries"] == 1
+    task.signature_from_request.return_value.apply_async.assert_called_once()
+
+
+@pytest.fixture
+def task_side_effects():
+    """屏蔽下载任务中与槽位无关的 Redis / WebSocket 副作用"""
+    names = [
+        "create_task_lock",
+        "mark_task_started",
+        "mark_task_retrying",
+        "clear_task_state",
+        "remove_task_from_queue",
+        "notify_task_update",
+        "notify_queue_event",
+        "get_full_task_queue",
+        "dispatch_download_queue",
+    ]
+    patchers = [patch(f"nassav.tasks.{name}") for name in names]
+    mocks = {name: p.start() for name, p in zip(names, patchers)}
+    yield mocks
+    for p in patchers:
+        p.stop()
+
+
+def test_download_task_parks_when_slots_full(task_side_effects):
+    from nassav.tasks import download_video_task
+
+    slots = MagicMock()
+    slots.try_acquire.return_value = False
+
+    with patch("nassav.tasks.get_download_slots", return_value=slots), patch(
+        "nassav.tasks.park_download_task", side_effect=Retry()
+    ) as mock_park, patch(
+        "nassav.services.video_download_service.download_video"
+    ) as mock_download:
+        with pytest.raises(Retry):
+            download_video_task("abc-123")
+
+    mock_park.assert_called_once()
+    assert mock_park.call_args[0][1:] == ("ABC-123", 0)
+    mock_download.assert_not_called()
+    slots.start_heartbeat.assert_not_called()
+    # 暂存期间保留任务锁和队列记录
+    task_side_effects["create_task_lock"].assert_called_once()
+    task_side_effects["clear_task_state"].assert_not_called()
+    task_side_effects["remove_task_from_queue"].assert_not_called()
+
+
+@pytest.mark.django_db
+def test_download_task_releases_slot(task_side_effects):
+    from nassav.tasks import download_video_task
+
+    slots = MagicMock()
+    slots.try_acquire.return_value = True
+
+    with patch("nassav.tasks.get_download_slots", return_value=slots), patch(
+        "nassav.services.video_download_service.download_video", return_value=True
+    ):
+        result = download_video_task("abc-123")
+
+    assert result["status"] == "success"
+    slots.start_heartbeat.assert_called_once_with("ABC-123")
+    slots.start_heartbeat.return_value.stop.assert_called_once()
+    slots.release.assert_called_once_with("ABC-123")
+
+    events = [c.args[0] for c in task_side_effects["notify_queue_event"].call_args_list]
+    assert events == ["started", "removed"]
+    removed = task_side_effects["notify_queue_event"].call_args.kwargs["task"]
+    assert removed["state"] == "SUCCESS"
+    task_side_effects["get_full_task_queue"].assert_not_called()
+
+
+@pytest.mark.django_db
+def test_download_task_keeps_registration_while_retrying(task_side_effects):
+    from nassav.tasks import download_video_task
+
+    slots = MagicMock()
+    slots.try_acquire.return_value = True
+    task_side_effects["mark_task_retrying"].return_value = {
+        "avid": "ABC-123",
+        "state": "PENDING",
+    }
+
+    with patch("nassav.tasks.get_download_slots", return_value=slots), patch(
+        "nassav.services.video_download_service.download_video",
+        side_effect=RuntimeError("boom"),
+    ), patch.object(download_video_task, "retry", return_value=Retry(when=60)):
+        with pytest.raises(Retry):
+            download_video_task("abc-123")
+
+    # 释放槽位，但保留任务锁、在途记录和队列记录（置回 PENDING）
+    slots.release.assert_called_once_with("ABC-123")
+    task_side_effects["mark_task_retrying"].assert_called_once()
+    assert task_side_effects["mark_task_retrying"].call_args.args[2] == 60
+    task_side_effects["clear_task_state"].assert_not_called()
+    task_side_effects["remove_task_from_queue"].assert_not_called()
+
+    events = [c.args[0] for c in task_side_effects["notify_queue_event"].call_args_list]
+    assert events == ["started", "added"]
+    assert task_side_effects["notify_queue_event"].call_args.kwargs["task"] == {
+        "avid": "ABC-123",
+        "state": "PENDING",
+        "position": 0,
+    }
+
+
+@pytest.mark.django_db
+def test_download_task_clears_registration_after_last_retry(task_side_effects):
+    from nassav.tasks import download_video_task
+
+    slots = MagicMock()
+    slots.try_acquire.return_value = True
+
+    # 重试次数耗尽时 Celery 重新抛出原始异常
+    with patch("nassav.tasks.get_download_slots", return_value=slots), patch(
+        "nassav.services.video_download_service.download_video",
+        side_effect=RuntimeError("boom"),
+    ), patch.object(download_video_task, "retry", side_effect=RuntimeError("boom")):
+        result = download_video_task("abc-123")
+
+    assert result["status"] == "failed"
+    task_side_effects["mark_task_retrying"].assert_not_called()
+    task_side_effects["clear_task_state"].assert_called_once_with("ABC-123")
+    task_side_effects["remove_task_from_queue"].assert_called_once_with("ABC-123")
+    events = [c.args[0] for c in task_side_effects["notify_queue_event"].call_args_list]
+    assert events == ["started", "removed"]
+
+
+@pytest.mark.django_db
+def test_download_task_aborts_when_lease_lost(task_side_effects):
+    from nassav.m3u8downloader import DownloadAborted, DownloadProgress
+    from nassav.tasks import download_video_task
+
+    slots = MagicMock()
+    slots.try_acquire.return_value = True
+    slots.start_heartbeat.return_value.lost = True
+    task_side_effects["mark_task_retrying"].return_value = {"avid": "ABC-123"}
+    aborted = []
+
+    def download_video(avid, progress_callback):
+        try:
+            progress_callback(DownloadProgress(percent=10.0, speed="1MB/s"))
+        except DownloadAborted as e:
+            aborted.append(e)
+            raise
+
+    with patch("nassav.tasks.get_download_slots", return_value=slots), patch(
+        "nassav.tasks.park_download_task", side_effect=Retry()
+    ) as mock_park, patch(
+        "nassav.services.video_download_service.download_video",
+        side_effect=download_video,
+    ), patch(
+        "nassav.tasks.set_task_progress"
+    ) as mock_progress:
+        with pytest.raises(Retry):
+            download_video_task("abc-123")
+
+    assert len(aborted) == 1
+    mock_progress.assert_not_called()
+    # 暂存任务等待重新占用槽位，保留任务登记
+    assert mock_park.call_args[0][1:] == ("ABC-123", 0)
+    task_side_effects["mark_task_retrying"].assert_called_once()
+    task_side_effects["clear_task_state"].assert_not_called()
+    task_side_effects["remove_task_from_queue"].assert_not_called()
+    slots.release.assert_called_once_with("ABC-123")
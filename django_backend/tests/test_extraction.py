@@ -0,0 +1,107 @@
+#!/usr/bin/env python
+"""
+单次扫描页面解析测试
+
+功能：
+1. 测试 Extractor 合并规则后的取值（首个匹配/所有匹配、多分组、共享前缀、无字面前缀的规则）
+2. 测试 JavBus 详情页的所有规则合并为一个正则，只扫描一次页面
+3. 用 tests/fixtures/pages 下的页面样本校验 Javbus 与各源的解析结果
+   （期望结果 *.json 由改写前的逐字段正则实现生成）
+
+运行方式：
+    uv run pytest tests/test_extraction.py -v
+"""
+
+import json
+from dataclasses import asdict
+from pathlib import Path
+
+import pytest
+from nassav.extractor import Extractor, _literal_head
+from nassav.scraper.Javbus import JAVBUS_PAGE, Javbus
+from nassav.source import Jable, Memo, MissAV
+
+PAGES = Path(__file__).parent / "fixtures" / "pages"
+
+
+def test_literal_head():
+    assert _literal_head(r'<span class="x">(\d+)') == ('<span class="x">', r"(\d+)")
+    assert _literal_head(r"var a\.b = (\w+)") == ("var a.b = ", r"(\w+)")
+    # 量词作用于最后一个字符，不属于前缀
+    assert _literal_head(r"<ab*c") == ("<a", "b*c")
+    assert _literal_head(r"\s*<a") == ("", r"\s*<a")
+
+
+def test_extractor_fields():
+    extractor = Extractor(
+        {
+            "date": r'<span class="header">日期:</span>\s*([\d-]+)',
+            "links": r'<span class="header">(导演|系列):</span>\s*<a>([^<]+)</a>',
+            "tags": r'<span class="tag">([^<]+)</span>',
+            "script": r"var id = (\d+);",
+            "marker": r"<hr>",
+        },
+        multi=("links", "tags"),
+    )
+    html = (
+        '<span class="tag">a</span><span class="header">日期:</span> 2025-01-01<'
+        '<span class="header">导演:</span><a>某人</a>var id = 42;'
+        '<span class="tag">b</span><span class="header">日期:</span> 2024-01-01<<hr>'
+    )
+    fields = extractor.extract(html)
+    assert fields == {
+        "date": "2025-01-01",
+        "links": [("导演", "某人")],
+        "tags": ["a", "b"],
+        "script": "42",
+        "marker": "<hr>",
+    }
+    # "<" 开头的规则合并为一个正则，"var" 开头的规则单独扫描
+    assert len(extractor.patterns) == 2
+
+    # 同一页面对象再次提取时使用缓存，返回的列表可以安全修改
+    fields["tags"].append("c")
+    assert extractor.extract(html)["tags"] == ["a", "b"]
+    assert extractor.extract("") == dict.fromkeys(fields) | {"links": [], "tags": []}
+
+    with pytest.raises(ValueError):
+        Extractor({"x": r"(?P<v>\d+)"})
+    with pytest.raises(ValueError):
+        Extractor({"x": r"(\d+)"}, multi=("y",))
+
+
+def test_javbus_page_is_scanned_once():
+    assert len(JAVBUS_PAGE.patterns) == 1
+
+
+def _fixture_pages(site):
+    return sorted((PAGES / site).glob("*.html"))
+
+
+def _expected(path: Path):
+    return json.loads(path.with_suffix(".json").read_text(encoding="utf-8"))
+
+
+@pytest.mark.parametrize("path", _fixture_pages("javbus"), ids=lambda p: p.stem)
+def test_javbus_fixture_pages(path):
+    html = path.read_text(encoding="utf-8")
+    assert Javbus().parse_html(html, path.stem) == _expected(path)
+
+
+@pytest.mark.parametrize(
+    "path",
+    _fixture_pages("missav") + _fixture_pages("jable") + _fixture_pages("memo"),
+    ids=lambda p: f"{p.parent.name}-{p.stem}",
+)
+def test_source_fixture_pages(path, monkeypatch):
+    # 不请求播放列表，直接使用解析出的地址
+    monkeypatch.setattr(
+        MissAV, "_get_highest_quality_m3u8", lambda self, url: (url, "1920x1080")
+    )
+    source = {"missav": MissAV, "jable": Jable, "memo": Memo}[path.parent.name]()
+    html = path.read_text(encoding="utf-8")
+    info = source.parse_html(html)
+    assert {
+        "info": asdict(info) if info else None,
+        "cover_url": source.get_cover_url(html),
+    } == _expected(path)
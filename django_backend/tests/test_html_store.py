@@ -0,0 +1,177 @@
+#!/usr/bin/env python
+"""
+HTML 快照存储测试
+
+功能：
+1. 测试快照压缩保存、按内容哈希去重、按 AVID 保留最近 N 个快照
+2. 测试训练 zstd 字典后新快照使用字典压缩，旧快照仍可读取
+3. 测试删除 AVID 后 gc 清理未引用的内容；多个进程同时写入同一 AVID 时不丢失快照
+4. 测试 load_cached_html 读取快照、reparse_snapshot 离线重新解析
+5. 测试 html_snapshots 管理命令导入旧 HTML 并重新解析写回数据库
+
+运行方式：
+    uv run pytest tests/test_html_store.py -v
+"""
+
+import multiprocessing
+import random
+
+import pytest
+import zstandard
+from django.core.management import call_command
+from nassav.html_store import HtmlSnapshotStore
+from nassav.scraper.AVDownloadInfo import AVDownloadInfo
+from nassav.source.SourceBase import SourceBase
+from nassav.source.SourceManager import SourceManager
+
+
+def _page(i: int) -> str:
+    rng = random.Random(i)
+    items = "".join(
+        f'<li class="item"><a href="/v/{rng.randint(1, 99999)}">作品 {rng.random()}</a></li>'
+        for _ in range(50)
+    )
+    return (
+        "<!DOCTYPE html><html><head><meta charset='utf-8'>"
+        f'<meta property="og:title" content="ABC-{i:03d} 标题 {i}">'
+        "<script src='/static/app.js'></script></head>"
+        f"<body><div class='video' data-m3u8='https://cdn.example/{i}.m3u8'></div>"
+        f"<ul>{items}</ul></body></html>"
+    )
+
+
+@pytest.fixture
+def store(tmp_path, settings):
+    settings.HTML_SNAPSHOT_DIR = tmp_path / "html"
+    settings.HTML_SNAPSHOT_CONFIG = {"keep": 3}
+    from nassav.html_store import get_html_store
+
+    return get_html_store()
+
+
+def test_put_get_dedup_and_retention(store):
+    html = _page(1)
+    first = store.put("abc-001", html, source="Jable", fetched_at=100)
+    store.put("ABC-001", html, source="Jable", fetched_at=200)
+
+    assert store.get("abc-001") == html
+    assert [s["fetched_at"] for s in store.snapshots("ABC-001")] == [100, 200]
+    assert store.stats()["objects"] == 1
+    stored = store._object_path(first["sha256"]).stat().st_size
+    assert stored < len(html.encode("utf-8")) / 3
+
+    for t, i in ((300, 2), (400, 3)):
+        store.put("ABC-001", _page(i), source="MissAV", fetched_at=t)
+    assert [s["fetched_at"] for s in store.snapshots("ABC-001")] == [200, 300, 400]
+    assert store.get("ABC-001", source="jable") == html
+    assert store.get("ABC-001") == _page(3)
+    assert store.get("ABC-999") is None
+
+
+def test_dictionary_training(store, tmp_path):
+    for i in range(200):
+        store.put(f"ABC-{i:03d}", _page(i))
+    old = store.latest("ABC-000")["sha256"]
+    size_before = store._object_path(store.put("NEW-001", _page(1000))["sha256"])
+
+    dict_id = store.train_dictionary(dict_size=16 * 1024)
+    assert store.current_dict_id() == dict_id
+
+    sha = store.put("NEW-002", _page(1001))["sha256"]
+    data = store._object_path(sha).read_bytes()
+    assert zstandard.get_frame_parameters(data).dict_id == dict_id
+    assert len(data) < size_before.stat().st_size
+
+    # 新实例从磁盘加载字典；未使用字典的旧快照照常读取
+    reopened = HtmlSnapshotStore(tmp_path / "html")
+    assert reopened.read(sha) == _page(1001)
+    assert reopened.read(old) == _page(0)
+
+
+def test_delete_and_gc(store):
+    shared = store.put("ABC-001", _page(1))["sha256"]
+    store.put("ABC-002", _page(1))
+    store.put("ABC-002", _page(2))
+
+    assert store.delete("ABC-002")
+    assert store.gc() == 1
+    assert store.read(shared) == _page(1)
+    assert store.stats()["objects"] == 1
+
+
+def _put_many(root, worker: int, count: int):
+    store = HtmlSnapshotStore(root, keep=0)
+    for i in range(count):
+        store.put("ABC-001", f"<html>{worker}-{i}</html>", fetched_at=i)
+
+
+@pytest.mark.skipif(
+    "fork" not in multiprocessing.get_all_start_methods(), reason="需要 fork"
+)
+def test_concurrent_processes_keep_all_snapshots(tmp_path):
+    root = tmp_path / "html"
+    ctx = multiprocessing.get_context("fork")
+    workers = [ctx.Process(target=_put_many, args=(root, w, 30)) for w in range(4)]
+    for p in workers:
+        p.start()
+    for p in workers:
+        p.join(timeout=30)
+        assert p.exitcode == 0
+
+    assert len(HtmlSnapshotStore(root).snapshots("ABC-001")) == 120
+
+
+class FakeSource(SourceBase):
+    def get_source_name(self):
+        return "Fake"
+
+    def parse_html(self, html):
+        import re
+
+        info = AVDownloadInfo()
+        info.m3u8 = re.search(r"data-m3u8='([^']+)'", html).group(1)
+        info.source_title = re.search(r'og:title" content="([^"]+)"', html).group(1)
+        return info
+
+
+@pytest.fixture
+def manager(monkeypatch):
+    import nassav.source.SourceManager as module
+
+    manager = SourceManager()
+    manager.sources = {"Fake": FakeSource()}
+    monkeypatch.setattr(module, "source_manager", manager)
+    return manager
+
+
+def test_load_cached_html_and_reparse(store, manager):
+    assert manager.load_cached_html("ABC-001") is None
+    store.put("ABC-001", _page(1), source="Fake")
+
+    assert manager.load_cached_html("abc-001") == _page(1)
+    info, source = manager.reparse_snapshot("abc-001")
+    assert source.get_source_name() == "Fake"
+    assert (info.avid, info.m3u8) == ("ABC-001", "https://cdn.example/1.m3u8")
+    assert manager.reparse_snapshot("ABC-001", "Jable") == (None, None)
+
+
+def test_command_import_and_reparse(
+    store, manager, settings, tmp_path, resource_factory
+):
+    settings.COVER_DIR = tmp_path / "cover"
+    settings.COVER_DIR.mkdir()
+    (settings.COVER_DIR / "ABC-001.html").write_text(_page(1), encoding="utf-8")
+    resource = resource_factory(avid="ABC-001", source="Fake", m3u8="old")
+
+    call_command("html_snapshots", "import", "--delete-legacy")
+    assert not (settings.COVER_DIR / "ABC-001.html").exists()
+    assert store.latest("ABC-001")["source"] == "Fake"
+
+    call_command("html_snapshots", "reparse")
+    resource.refresh_from_db()
+    assert resource.m3u8 == "old"
+
+    call_command("html_snapshots", "reparse", "--apply")
+    resource.refresh_from_db()
+    assert resource.m3u8 == "https://cdn.example/1.m3u8"
+    assert resource.source_title.startswith("ABC-001")
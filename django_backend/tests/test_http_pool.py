@@ -0,0 +1,183 @@
+#!/usr/bin/env python
+"""
+HTTP 会话池测试
+
+功能：
+1. 测试按 (域名, 代理) 复用会话，超出上限时淘汰并关闭最久未使用的会话（使用中的会话释放后关闭）
+2. 测试同一域名的多个请求复用同一连接
+3. 测试按域名注入 Cookie（显式 Cookie 头优先）
+4. 测试文件下载先写临时文件，失败时不留下残缺文件
+5. 测试源的页面请求、文件下载走会话池并注入源 Cookie，错误码照常记录
+6. 测试 AsyncSession 在多次 run_async 调用之间复用连接
+
+运行方式：
+    uv run pytest tests/test_http_pool.py -v
+"""
+
+import asyncio
+import os
+import sys
+
+import pytest
+from curl_cffi.requests import Session
+from curl_cffi.requests.exceptions import HTTPError
+from nassav.http_pool import HttpSessionPool
+from nassav.source.SourceBase import SourceBase
+from nassav.testing import LocalSourceServer, Route
+
+
+@pytest.fixture
+def server():
+    routes = {
+        "/page": Route(body="<html>page</html>"),
+        "/file": Route(body="x" * 50_000),
+    }
+    with LocalSourceServer(routes) as s:
+        yield s
+
+
+def _domain(server):
+    return server.base_url.split("://", 1)[1]
+
+
+def test_sessions_keyed_by_domain_and_proxy():
+    pool = HttpSessionPool(max_sessions=2)
+    a = pool.session("https://a.example/x")
+    assert pool.session("https://A.example/y?q=1") is a
+    assert pool.session("https://a.example/x", proxy="http://127.0.0.1:7890") is not a
+
+    # 访问 a 后再创建第三个会话，淘汰最久未使用的（带代理的 a）
+    assert pool.session("https://a.example/z") is a
+    b = pool.session("https://b.example/")
+    assert pool.sessions_created == 3
+    assert pool.session("https://a.example/") is a
+    assert pool.session("https://b.example/") is b
+    pool.session("https://a.example/x", proxy="http://127.0.0.1:7890")
+    assert pool.sessions_created == 4
+
+
+def test_evicted_sessions_are_closed():
+    pool = HttpSessionPool(max_sessions=1)
+    a = pool.session("https://a.example/")
+    b = pool.session("https://b.example/")
+    assert a._closed and not b._closed
+
+    # 仍在使用的会话被淘汰时推迟到释放后关闭
+    with pool._lease(pool._sessions, "https://b.example/", None, Session) as leased:
+        assert leased is b
+        pool.session("https://c.example/")
+        assert not b._closed
+    assert b._closed
+
+    pool.clear()
+    assert pool.session("https://c.example/") is not b
+    assert pool.sessions_created == 4
+
+
+def test_evicted_async_sessions_are_closed():
+    pool = HttpSessionPool(max_sessions=1)
+
+    async def evict():
+        with pool.async_lease("https://a.example/") as a:
+            pool.async_session("https://b.example/")
+            assert not a._closed
+        # 关闭在事件循环中异步执行
+        for _ in range(10):
+            if a._closed:
+                break
+            await asyncio.sleep(0.01)
+        return a
+
+    assert pool.run_async(evict())._closed
+
+
+def test_session_discarded_after_fork():
+    pool = HttpSessionPool()
+    session = pool.session("https://a.example/")
+    pool._pid = -1  # 模拟 fork 后的子进程
+    assert pool.session("https://a.example/") is not session
+
+
+def test_requests_reuse_connection(server):
+    pool = HttpSessionPool()
+    for _ in range(5):
+        assert pool.get(server.url("/page"), timeout=5).text == "<html>page</html>"
+
+    assert len(server.clients) == 5
+    assert len(set(server.clients)) == 1
+    assert pool.sessions_created == 1
+
+
+def test_cookie_injection(server):
+    pool = HttpSessionPool()
+    pool.set_cookie(_domain(server), "cf_clearance=abc")
+
+    pool.get(server.url("/page"), timeout=5)
+    assert server.request_headers["/page"]["Cookie"] == "cf_clearance=abc"
+
+    pool.get(server.url("/page"), headers={"Cookie": "explicit=1"}, timeout=5)
+    assert server.request_headers["/page"]["Cookie"] == "explicit=1"
+
+    pool.set_cookie(_domain(server), None)
+    pool.get(server.url("/page"), timeout=5)
+    assert "Cookie" not in server.request_headers["/page"]
+
+
+def test_download_is_atomic(server, tmp_path):
+    pool = HttpSessionPool()
+    target = tmp_path / "covers" / "a.jpg"
+    pool.download(server.url("/file"), str(target), timeout=5)
+    assert target.read_text() == "x" * 50_000
+
+    missing = tmp_path / "covers" / "b.jpg"
+    with pytest.raises(HTTPError):
+        pool.download(server.url("/missing"), str(missing), timeout=5)
+    assert sorted(os.listdir(tmp_path / "covers")) == ["a.jpg"]
+
+
+class LocalSource(SourceBase):
+    def get_source_name(self):
+        return "Local"
+
+
+def test_source_requests_go_through_pool(server, tmp_path, monkeypatch):
+    pool = HttpSessionPool()
+    # nassav.source 导出了同名类，需通过 sys.modules 取模块
+    monkeypatch.setattr(
+        sys.modules[SourceBase.__module__], "get_http_pool", lambda: pool
+    )
+
+    source = LocalSource(timeout=5)
+    source.set_domain(_domain(server))
+    source.set_cookie("session=1")
+
+    html, error = source.fetch_html(server.url("/page"), referer="https://ref/")
+    assert html is not None and error is None
+    assert source.download_file(server.url("/file"), str(tmp_path / "cover.jpg"))
+    assert source.fetch_html(server.url("/missing")) == (None, 404)
+
+    assert server.request_headers["/page"]["Cookie"] == "session=1"
+    assert server.request_headers["/page"]["Referer"] == "https://ref/"
+    assert server.request_headers["/file"]["Cookie"] == "session=1"
+    assert len(set(server.clients)) == 1
+
+
+def test_async_sessions_reused_across_calls(server):
+    pool = HttpSessionPool()
+
+    async def fetch():
+        session = pool.async_session(server.url("/page"))
+        response = await session.get(server.url("/page"), timeout=5)
+        return session, response.text
+
+    first, text = pool.run_async(fetch())
+    second, _ = pool.run_async(fetch())
+    assert text == "<html>page</html>"
+    assert first is second and pool.sessions_created == 1
+    assert len(set(server.clients)) == 1
+
+    async def nested():
+        return pool.run_async(fetch())
+
+    with pytest.raises(RuntimeError):
+        pool.run_async(nested())
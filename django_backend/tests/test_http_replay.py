@@ -0,0 +1,109 @@
+#!/usr/bin/env python
+"""
+HTTP 录制/回放测试
+
+功能：
+1. 测试录像的请求键（Range、JSON 请求体与序列化方式无关）、追加写入与重新加载、相同内容只保存一份
+2. 测试通过会话池录制页面和文件下载，关闭原服务器后经回放服务器得到相同响应，未录制的请求返回 404
+3. 测试 AsyncHLS 下载录制后在限速的回放服务器上离线重放，合并结果一致
+4. 测试回放服务器的延迟配置
+
+运行方式：
+    uv run pytest tests/test_http_replay.py -v
+"""
+
+import time
+
+from nassav.http_pool import HttpSessionPool
+from nassav.http_replay import (
+    Cassette,
+    get_http_replay,
+    original_url,
+    recording,
+    replay_path,
+    replaying,
+)
+from nassav.m3u8downloader import AsyncHLS
+from nassav.testing import CassetteServer, LocalHlsServer, LocalSourceServer, Route
+
+
+def test_cassette_keys_and_persistence(tmp_path):
+    assert replay_path("https://a.com/x/y.m3u8?t=1") == "/https/a.com/x/y.m3u8?t=1"
+    assert original_url("/https/a.com/x/y.m3u8?t=1") == "https://a.com/x/y.m3u8?t=1"
+    assert original_url("/favicon.ico") is None
+
+    assert Cassette.key("post", "http://o/api", {"b": 1, "a": 2}) == Cassette.key(
+        "POST", "http://o/api", b'{"a": 2, "b": 1}'
+    )
+    assert Cassette.key("GET", "http://o/s", byte_range="bytes=0-9").endswith(
+        "range=bytes=0-9"
+    )
+
+    cassette = Cassette(tmp_path)
+    cassette.record("GET http://o/a", 200, [("Content-Type", "text/html")], b"same")
+    cassette.record("GET http://o/b", 404, [], b"same")
+    cassette.record("GET http://o/a", 200, [], b"new")
+
+    reloaded = Cassette(tmp_path)
+    assert len(reloaded) == 2
+    assert reloaded.lookup("GET http://o/a") == (200, [], b"new")
+    assert reloaded.lookup("GET http://o/b") == (404, [], b"same")
+    assert reloaded.lookup("GET http://o/c") is None
+    assert len(list((tmp_path / "bodies").rglob("*"))) == 4  # 2 个子目录 + 2 份内容
+
+
+def test_pool_record_then_replay(tmp_path):
+    pool = HttpSessionPool()
+    routes = {
+        "/page": Route(body="<html>页面</html>", headers={"ETag": '"v1"'}),
+        "/cover.jpg": Route(body="JPEGDATA"),
+    }
+    with LocalSourceServer(routes) as origin:
+        page_url, cover_url = origin.url("/page"), origin.url("/cover.jpg")
+        with recording(tmp_path) as cassette:
+            assert pool.get(page_url).text == "<html>页面</html>"
+            pool.download(cover_url, str(tmp_path / "live.jpg"))
+        assert len(cassette) == 2
+
+    assert not get_http_replay().recording
+    with CassetteServer(Cassette(tmp_path)) as server, replaying(server.base_url):
+        response = pool.get(page_url)
+        assert response.text == "<html>页面</html>"
+        assert response.headers["ETag"] == '"v1"'
+        pool.download(cover_url, str(tmp_path / "replayed.jpg"))
+        assert (tmp_path / "replayed.jpg").read_bytes() == b"JPEGDATA"
+
+        assert pool.get(f"{page_url}?other=1").status_code == 404
+        assert server.hits == 2 and len(server.misses) == 1
+    assert get_http_replay().rewrite(page_url) == page_url
+
+
+def test_async_hls_record_then_replay(tmp_path):
+    downloader = AsyncHLS()
+    with LocalHlsServer(segment_count=6, segment_size=16 * 1024) as origin:
+        url = f"{origin.base_url}/master.m3u8"
+        expected = origin.expected_content()
+        with recording(tmp_path / "cassette"):
+            assert downloader.download(url, tmp_path / "live", "A", "", "ua", 3, 0)
+
+    bandwidth = 256 * 1024
+    with CassetteServer(
+        Cassette(tmp_path / "cassette"), bandwidth=bandwidth
+    ) as server, replaying(server.base_url):
+        start = time.monotonic()
+        assert downloader.download(url, tmp_path / "replay", "A", "", "ua", 3, 0)
+        elapsed = time.monotonic() - start
+
+    assert (tmp_path / "replay" / "A.ts").read_bytes() == expected
+    assert server.misses == []
+    # 6 个 16KB 分片、3 个连接，每个连接 256KB/s
+    assert elapsed >= 0.1
+
+
+def test_cassette_server_latency(tmp_path):
+    cassette = Cassette(tmp_path)
+    cassette.record(Cassette.key("GET", "https://example.com/"), 200, [], b"ok")
+    with CassetteServer(cassette, latency=0.2) as server, replaying(server.base_url):
+        start = time.monotonic()
+        assert HttpSessionPool().get("https://example.com/").text == "ok"
+        assert time.monotonic() - start >= 0.2
@@ -0,0 +1,235 @@
+#!/usr/bin/env python
+"""
+未命中缓存测试
+
+功能：
+1. 测试失败结果归类（404 -> miss、403 -> forbidden、其他 -> error）及按类型的有效期
+2. 测试 SourceManager 跳过近期未命中的源（错误码照常返回），指定源刷新不读缓存
+3. 测试重新设置源 Cookie 时清除该源的 403 记录
+4. 测试刮削器/ScraperManager 跳过近期未命中的 AVID，成功后清除记录；
+   同一刮削器并发刮削时按各自的请求结果写入缓存
+5. 测试查看/清除未命中缓存的 API
+
+运行方式：
+    uv run pytest tests/test_negative_cache.py -v
+"""
+
+import pytest
+from nassav.negative_cache import (
+    KIND_SCRAPER,
+    KIND_SOURCE,
+    NegativeCache,
+    classify,
+    negative_cache,
+)
+from nassav.scraper.ScraperBase import ScraperBase
+from nassav.scraper.ScraperManager import ScraperManager
+from nassav.source.SourceBase import SourceBase
+from nassav.source.SourceManager import SourceManager
+from nassav.testing import LocalSourceServer, Route
+
+
+@pytest.fixture
+def cache(settings, redis_client, monkeypatch):
+    settings.NEGATIVE_CACHE_ENABLED = True
+    settings.NEGATIVE_CACHE_TTL = {"miss": 86400, "forbidden": 1800, "error": 0}
+    monkeypatch.setattr(negative_cache, "_client", redis_client)
+    return negative_cache
+
+
+class FakeSource(SourceBase):
+    def __init__(self, name, server, path):
+        super().__init__(timeout=5)
+        self.name = name
+        self.server = server
+        self.path = path
+
+    def get_source_name(self):
+        return self.name
+
+    def get_candidate_urls(self, avid):
+        return [(self.server.url(self.path), "")]
+
+    def parse_html(self, html):
+        from nassav.scraper.AVDownloadInfo import AVDownloadInfo
+
+        info = AVDownloadInfo()
+        info.m3u8 = html
+        return info
+
+
+class FakeScraper(ScraperBase):
+    def __init__(self, name, html=None, code=404):
+        super().__init__()
+        self.name = name
+        self.html = html
+        self.code = code
+        self.calls = 0
+
+    def get_scraper_name(self):
+        return self.name
+
+    def get_html(self, avid):
+        self.calls += 1
+        return self.html, None if self.html else self.code
+
+    def parse_html(self, html, avid):
+        return {"avid": avid, "title": html}
+
+
+def test_classify():
+    assert classify(404) == classify("404") == "miss"
+    assert classify(403) == "forbidden"
+    assert classify(502) == classify("timeout") == classify(None) == "error"
+
+
+def test_record_lookup_and_ttl(cache, redis_client):
+    assert cache.record(KIND_SOURCE, "MissAV", "abc-123", 404)["outcome"] == "miss"
+    assert cache.record(KIND_SOURCE, "Jable", "ABC-123", 403)["outcome"] == "forbidden"
+    # error 有效期配置为 0：不缓存
+    assert cache.record(KIND_SOURCE, "Memo", "ABC-123", 502) is None
+
+    found = cache.lookup(KIND_SOURCE, ["MissAV", "Jable", "Memo"], "abc-123")
+    assert {n: e["code"] for n, e in found.items()} == {"MissAV": 404, "Jable": 403}
+    assert (
+        1800 - 5
+        < redis_client.ttl(NegativeCache.key(KIND_SOURCE, "jable", "ABC-123"))
+        <= 1800
+    )
+
+    cache.forget(KIND_SOURCE, "MissAV", "ABC-123")
+    assert cache.get(KIND_SOURCE, "MissAV", "ABC-123") is None
+
+
+def test_disabled_cache_is_noop(cache, settings):
+    settings.NEGATIVE_CACHE_ENABLED = False
+    assert cache.record(KIND_SOURCE, "MissAV", "ABC-123", 404) is None
+    assert cache.lookup(KIND_SOURCE, ["MissAV"], "ABC-123") == {}
+
+
+def _manager(settings, server):
+    settings.SOURCE_PROBE_CONCURRENT = True
+    settings.SOURCE_CONFIG = {"top": {"weight": 1000}, "mid": {"weight": 800}}
+    manager = SourceManager()
+    manager._cookies_loaded = True
+    manager.sources = {
+        "Top": FakeSource("Top", server, "/top"),
+        "Mid": FakeSource("Mid", server, "/mid"),
+    }
+    return manager
+
+
+def test_source_manager_skips_known_misses(cache, settings):
+    with LocalSourceServer({"/mid": Route(body="m3u8")}) as server:
+        manager = _manager(settings, server)
+
+        _, source, _, errors = manager.get_info_from_any_source("abc-123")
+        assert source.get_source_name() == "Mid" and errors == {"Top": 404}
+        assert cache.get(KIND_SOURCE, "Top", "ABC-123")["outcome"] == "miss"
+
+        # 第二次不再请求 Top，错误码仍然返回（用于 404/403 映射）
+        _, source, _, errors = manager.get_info_from_any_source("abc-123")
+        assert source.get_source_name() == "Mid" and errors == {"Top": 404}
+        assert server.requests == ["/top", "/mid", "/mid"]
+
+        # 指定源刷新总是实际请求
+        manager.get_info_from_source("abc-123", "top")
+        assert server.requests[-1] == "/top"
+
+
+def test_all_sources_cached_sends_no_request(cache, settings):
+    cache.record(KIND_SOURCE, "Top", "ABC-123", 404)
+    cache.record(KIND_SOURCE, "Mid", "ABC-123", 404)
+    with LocalSourceServer({"/mid": Route(body="m3u8")}) as server:
+        manager = _manager(settings, server)
+        info, _, _, errors = manager.get_info_from_any_source("abc-123")
+        assert info is None
+        assert errors == {"Top": 404, "Mid": 404}
+        assert server.requests == []
+
+
+def test_set_cookie_purges_forbidden(cache, settings, db):
+    cache.record(KIND_SOURCE, "Top", "ABC-1", 403)
+    cache.record(KIND_SOURCE, "Top", "ABC-2", 404)
+    cache.record(KIND_SOURCE, "Mid", "ABC-1", 403)
+    with LocalSourceServer() as server:
+        manager = _manager(settings, server)
+        assert manager.set_source_cookie("top", "new=1")
+
+    remaining = {(e["name"], e["avid"]) for e in cache.entries()}
+    assert remaining == {("Top", "ABC-2"), ("Mid", "ABC-1")}
+
+
+def test_scraper_manager_skips_known_misses(cache):
+    manager = ScraperManager()
+    missing = FakeScraper("Javbus")
+    found = FakeScraper("Busdmm", html="title")
+    manager.scrapers = {"Javbus": missing, "Busdmm": found}
+
+    assert manager.scrape("abc-123")["title"] == "title"
+    assert manager.scrape("abc-123")["title"] == "title"
+    assert (missing.calls, found.calls) == (1, 2)
+    assert cache.get(KIND_SCRAPER, "Javbus", "ABC-123")["code"] == 404
+
+    # 直接调用刮削器同样跳过；指定刮削器时总是请求，成功后清除记录
+    assert missing.scrape("ABC-123") is None and missing.calls == 1
+    missing.html = "later"
+    assert manager.scrape_from_specific("ABC-123", "Javbus")["title"] == "later"
+    assert cache.get(KIND_SCRAPER, "Javbus", "ABC-123") is None
+
+
+class ServerScraper(ScraperBase):
+    def __init__(self, server):
+        super().__init__(timeout=5)
+        self.server = server
+
+    def get_scraper_name(self):
+        return "Javbus"
+
+    def get_html(self, avid):
+        return self.fetch_html(self.server.url(f"/{avid}"))
+
+    def parse_html(self, html, avid):
+        return {"avid": avid, "title": html}
+
+
+def test_concurrent_scrapes_record_their_own_outcome(cache):
+    from concurrent.futures import ThreadPoolExecutor
+
+    # 未配置的路径返回 404（miss）；ERR-* 返回 502（error，有效期为 0 不缓存）
+    errors = {f"/ERR-{i:03d}": Route(status=502, delay=0.05) for i in range(8)}
+    with LocalSourceServer(errors) as server:
+        scraper = ServerScraper(server)
+        avids = [f"{kind}-{i:03d}" for i in range(8) for kind in ("MISS", "ERR")]
+        with ThreadPoolExecutor(max_workers=len(avids)) as pool:
+            assert list(pool.map(scraper.scrape, avids)) == [None] * len(avids)
+
+    recorded = {e["avid"]: e["code"] for e in cache.entries()}
+    assert recorded == {avid: 404 for avid in avids if avid.startswith("MISS")}
+
+
+@pytest.mark.django_db
+def test_negative_cache_api(cache, api_client, assert_api_response):
+    cache.record(KIND_SOURCE, "MissAV", "ABC-1", 404)
+    cache.record(KIND_SOURCE, "Jable", "ABC-1", 403)
+    cache.record(KIND_SCRAPER, "Javbus", "ABC-2", 404)
+
+    data = assert_api_response(api_client.get("/nassav/api/negative-cache"))["data"]
+    assert data["total"] == 3
+    entry = data["entries"][0]
+    assert {"kind", "name", "avid", "outcome", "code", "at", "ttl"} <= set(entry)
+
+    data = assert_api_response(
+        api_client.get("/nassav/api/negative-cache?kind=source&outcome=miss")
+    )["data"]
+    assert [(e["name"], e["avid"]) for e in data["entries"]] == [("MissAV", "ABC-1")]
+
+    response = api_client.get("/nassav/api/negative-cache?kind=other")
+    assert response.status_code == 400
+
+    data = assert_api_response(
+        api_client.delete("/nassav/api/negative-cache?avid=abc-1")
+    )["data"]
+    assert data["purged"] == 2
+    data = assert_api_response(api_client.get("/nassav/api/negative-cache"))["data"]
+    assert [e["name"] for e in data["entries"]] == ["Javbus"]
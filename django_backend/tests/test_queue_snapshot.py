@@ -0,0 +1,136 @@
+#!/usr/bin/env python
+"""
+异步任务队列快照测试
+
+功能：
+1. 测试并发请求合并为一次快照计算（重连风暴）
+2. 测试 TTL 过期后重新计算、计算失败不缓存
+3. 测试异步快照与同步 get_full_task_queue 结构一致（需要 Redis）
+4. 测试 TaskConsumer 连接时使用异步快照而不调用同步接口
+
+运行方式：
+    uv run pytest tests/test_queue_snapshot.py -v
+"""
+
+import asyncio
+from unittest.mock import patch
+
+import pytest
+from nassav.queue_snapshot import QueueSnapshotProvider
+
+
+def _counting_provider(ttl=60.0, fail=False):
+    provider = QueueSnapshotProvider(ttl=ttl)
+
+    async def compute():
+        provider.computations += 1
+        await asyncio.sleep(0.01)
+        if fail:
+            raise ConnectionError("redis down")
+        return {"seq": provider.computations}
+
+    provider._compute = compute
+    return provider
+
+
+def test_concurrent_requests_share_one_computation():
+    provider = _counting_provider()
+
+    async def storm():
+        return await asyncio.gather(*(provider.get() for _ in range(100)))
+
+    snapshots = asyncio.run(storm())
+
+    assert provider.computations == 1
+    assert all(s is snapshots[0] for s in snapshots)
+
+    # 缓存有效期内的后续请求直接命中
+    asyncio.run(provider.get())
+    assert provider.computations == 1
+
+
+def test_expired_snapshot_is_recomputed():
+    provider = _counting_provider(ttl=0)
+
+    async def twice():
+        return [await provider.get(), await provider.get()]
+
+    first, second = asyncio.run(twice())
+    assert (first["seq"], second["seq"]) == (1, 2)
+
+
+def test_failed_computation_is_not_cached():
+    provider = _counting_provider(fail=True)
+
+    async def twice():
+        return [await provider.get(), await provider.get()]
+
+    first, second = asyncio.run(twice())
+    assert first["seq"] is None and first["active_tasks"] == []
+    assert provider.computations == 2
+
+
+def test_snapshot_matches_sync_queue(redis_client, settings):
+    from nassav import tasks
+    from nassav.download_scheduler import DownloadScheduler
+
+    # 异步客户端与 redis_client 连接同一个库
+    kwargs = redis_client.connection_pool.connection_kwargs
+    auth = f":{kwargs['password']}@" if kwargs.get("password") else ""
+    settings.CELERY_BROKER_URL = (
+        f"redis://{auth}{kwargs['host']}:{kwargs['port']}/{kwargs['db']}"
+    )
+
+    with patch("nassav.tasks.get_redis_client", return_value=redis_client), patch(
+        "nassav.tasks.notify_task_update"
+    ):
+        tasks.register_task("RUN-001", "task-run")
+        tasks.mark_task_started("RUN-001", "task-run")
+        tasks.set_task_progress("RUN-001", 42.0, "1 MB/s")
+        for avid in ("WAIT-001", "WAIT-002"):
+            tasks.register_task(avid, f"task-{avid}")
+        scheduler = DownloadScheduler(redis_client)
+        scheduler.enqueue("WAIT-001", "task-WAIT-001", priority=0)
+        scheduler.enqueue("WAIT-002", "task-WAIT-002", priority=5)
+        tasks.notify_queue_event("added", task={"avid": "WAIT-002"})
+
+        expected = tasks.get_full_task_queue()
+
+    snapshot = asyncio.run(QueueSnapshotProvider().get())
+
+    for queue in (expected, snapshot):
+        for task in queue["pending_tasks"]:
+            task.pop("effective_priority")
+    assert snapshot == expected
+    assert snapshot["seq"] == 1
+    assert [t["avid"] for t in snapshot["pending_tasks"]] == ["WAIT-002", "WAIT-001"]
+    assert snapshot["active_tasks"][0]["progress"]["percent"] == 42.0
+
+
+def test_consumer_connect_uses_async_snapshot(settings):
+    from channels.testing import WebsocketCommunicator
+    from nassav.consumers import TaskConsumer
+
+    settings.CHANNEL_LAYERS = {
+        "default": {"BACKEND": "channels.layers.InMemoryChannelLayer"}
+    }
+    snapshot = {"active_tasks": [], "pending_tasks": [], "seq": 7}
+
+    async def run():
+        communicator = WebsocketCommunicator(TaskConsumer.as_asgi(), "/ws/tasks/")
+        connected, _ = await communicator.connect()
+        assert connected
+        first = await communicator.receive_json_from()
+        await communicator.send_json_to({"action": "get_queue_status"})
+        second = await communicator.receive_json_from()
+        await communicator.disconnect()
+        return first, second
+
+    with patch(
+        "nassav.queue_snapshot.get_queue_snapshot", return_value=snapshot
+    ) as mock_snapshot, patch("nassav.tasks.get_full_task_queue") as mock_sync:
+        first, second = asyncio.run(run())
+
+    assert first == second == {"type": "queue_status", "data": snapshot}
+    assert mock_snapshot.await_count == 2
+    mock_sync.assert_not_called()
@@ -0,0 +1,128 @@
+#!/usr/bin/env python
+"""
+按域名令牌桶限流测试
+
+功能：
+1. 测试空闲域名可突发 burst 个请求，之后按 rate 匀速放行，不同域名互不影响
+2. 测试按域名覆盖速率（匹配子域名）、rate 为 0 时不限流
+3. 测试 429/403/5xx 退避、成功后逐步恢复、Retry-After 推迟放行
+4. 测试 Redis 后端在多个限流器实例（多进程）之间共享额度，Redis 不可用时退回进程内限流
+5. 测试会话池请求经过限流并按响应状态码退避
+
+运行方式：
+    uv run pytest tests/test_rate_limit.py -v
+"""
+
+import time
+
+import pytest
+from nassav.http_pool import HttpSessionPool
+from nassav.rate_limit import RateLimiter
+from nassav.testing import LocalSourceServer, Route
+
+
+@pytest.fixture(autouse=True)
+def enable_rate_limit(settings):
+    settings.RATE_LIMIT_ENABLED = True
+
+
+def _local(**kwargs):
+    return RateLimiter(use_redis=False, **kwargs)
+
+
+def test_burst_then_steady_rate():
+    limiter = _local(rate=10, burst=3)
+    delays = [limiter.reserve("https://a.example/x") for _ in range(5)]
+    assert delays[:3] == [0, 0, 0]
+    assert delays[3] == pytest.approx(0.1, abs=0.01)
+    assert delays[4] == pytest.approx(0.2, abs=0.01)
+    # 其他域名不受影响
+    assert limiter.reserve("https://b.example/") == 0
+
+
+def test_domain_overrides_and_unlimited(settings):
+    limiter = _local(rate=10, burst=1, domains={"javbus.com": {"rate": 1}})
+    assert limiter.limits("www.javbus.com") == (1.0, 1)
+    assert limiter.limits("cdn.other.com") == (10.0, 1)
+
+    limiter.configure("127.0.0.1:8000", rate=0)
+    assert [limiter.reserve("http://127.0.0.1:8000/a") for _ in range(3)] == [0, 0, 0]
+
+    settings.RATE_LIMIT_ENABLED = False
+    assert [limiter.reserve("https://www.javbus.com/") for _ in range(3)] == [0, 0, 0]
+
+
+def test_backoff_recovery_and_retry_after():
+    limiter = _local(rate=10, burst=1, max_backoff=4)
+    url = "https://a.example/"
+    limiter.reserve(url)
+
+    for _ in range(3):
+        limiter.feedback(url, 503)
+    assert limiter._backoff_seen["a.example"] == 4  # 受 max_backoff 限制
+    # 退避后间隔为 4 / rate
+    wait = limiter.reserve(url)
+    assert limiter.reserve(url) - wait == pytest.approx(0.4, abs=0.02)
+
+    # 非整数（请求异常信息）不影响退避，成功逐步恢复
+    limiter.feedback(url, "timeout")
+    limiter.feedback(url, 200)
+    assert limiter._backoff_seen["a.example"] == pytest.approx(3.2)
+
+    other = "https://b.example/"
+    limiter.feedback(other, 429, retry_after="2")
+    assert limiter.reserve(other) == pytest.approx(2, abs=0.05)
+
+
+def test_redis_backend_shared_between_instances(redis_client):
+    first = RateLimiter(rate=10, burst=2, client=redis_client)
+    second = RateLimiter(rate=10, burst=2, client=redis_client)
+    url = "https://shared.example/"
+
+    delays = [first.reserve(url), second.reserve(url), first.reserve(url)]
+    assert delays[:2] == [0, 0]
+    assert delays[2] == pytest.approx(0.1, abs=0.02)
+
+    second.feedback(url, 429, retry_after=1)
+    assert first.reserve(url) == pytest.approx(1, abs=0.05)
+    assert redis_client.ttl("nassav:ratelimit:shared.example") > 0
+
+
+def test_redis_unavailable_falls_back_to_local():
+    class BrokenClient:
+        def register_script(self, script):
+            def call(**kwargs):
+                raise ConnectionError("down")
+
+            return call
+
+    limiter = RateLimiter(rate=10, burst=1, client=BrokenClient())
+    delays = [limiter.reserve("https://a.example/") for _ in range(2)]
+    assert delays[0] == 0
+    assert delays[1] == pytest.approx(0.1, abs=0.01)
+
+
+def test_pool_requests_are_throttled(monkeypatch):
+    limiter = _local(rate=20, burst=1)
+    monkeypatch.setattr("nassav.rate_limit._limiter", limiter)
+    routes = {
+        "/ok": Route(body="ok"),
+        "/busy": Route(status=429, headers={"Retry-After": "0.3"}),
+    }
+    with LocalSourceServer(routes) as server:
+        pool = HttpSessionPool()
+        start = time.monotonic()
+        for _ in range(4):
+            pool.get(server.url("/ok"), timeout=5)
+        # 第一个请求立即发起，之后每 0.05 秒一个
+        assert time.monotonic() - start == pytest.approx(0.15, abs=0.08)
+
+        assert pool.get(server.url("/busy"), timeout=5).status_code == 429
+        start = time.monotonic()
+        pool.get(server.url("/ok"), timeout=5)
+        assert time.monotonic() - start >= 0.25
+
+        # 不限流的请求不等待
+        start = time.monotonic()
+        pool.get(server.url("/ok"), throttle=False, timeout=5)
+        assert time.monotonic() - start < 0.1
@@ -0,0 +1,96 @@
+#!/usr/bin/env python
+"""
+演员/类别关联批量写入测试
+
+功能：
+1. 测试名称规范化（字符串或 {"name": ...}，去空白、去重）、缺少的演员/类别自动创建、追加与替换
+2. 测试查询次数与演员/类别数量无关（5 个演员 + 15 个类别不超过 12 条查询）
+3. 测试 ResourceService 保存刮削结果时通过批量写入关联演员/类别
+
+运行方式：
+    uv run pytest tests/test_relations.py -v
+"""
+
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from nassav.models import Actor, AVResource, Genre
+from nassav.relations import associate, clean_names, set_resource_relations
+
+
+def test_clean_names():
+    assert clean_names([" 演员A ", {"name": "演员B"}, "演员A", "", None, {}]) == [
+        "演员A",
+        "演员B",
+    ]
+    assert clean_names(None) == []
+
+
+@pytest.mark.django_db
+def test_append_and_replace(resource_factory, actor_factory, genre_factory):
+    resource = resource_factory(avid="REL-001")
+    existing = actor_factory(name="演员A")
+    resource.actors.add(actor_factory(name="旧演员"))
+    genre_factory(name="剧情")
+
+    set_resource_relations(resource, actors=["演员A", "演员B"], genres=["剧情", "单体"])
+    assert sorted(a.name for a in resource.actors.all()) == ["旧演员", "演员A", "演员B"]
+    assert sorted(g.name for g in resource.genres.all()) == ["剧情", "单体"]
+    assert Actor.objects.get(name="演员A").pk == existing.pk
+    assert Genre.objects.count() == 2
+
+    # 重复写入不产生重复关联
+    set_resource_relations(resource, actors=["演员B"])
+    assert resource.actors.count() == 3
+
+    set_resource_relations(resource, actors=["演员C"], genres=[], replace=True)
+    assert [a.name for a in resource.actors.all()] == ["演员C"]
+    assert resource.genres.count() == 0
+
+
+@pytest.mark.django_db
+def test_associate_many_resources(resource_factory):
+    a = resource_factory(avid="REL-001")
+    b = resource_factory(avid="REL-002")
+    associate(Actor, AVResource.actors, {a.pk: ["共同", "甲"], b.pk: ["共同", "乙"]})
+    assert Actor.objects.count() == 3
+    assert sorted(x.name for x in a.actors.all()) == ["共同", "甲"]
+    assert sorted(x.name for x in b.actors.all()) == ["乙", "共同"]
+
+
+@pytest.mark.django_db
+def test_query_count_is_constant(resource_factory, actor_factory):
+    actor_factory(name="演员0")
+
+    def run(avid, actors, genres):
+        resource = resource_factory(avid=avid)
+        with CaptureQueriesContext(connection) as queries:
+            set_resource_relations(resource, actors=actors, genres=genres)
+        assert resource.actors.count() == len(actors)
+        assert resource.genres.count() == len(genres)
+        return len(queries)
+
+    few = run("REL-001", ["演员0", "演员1"], ["类别0"])
+    many = run(
+        "REL-002",
+        [f"演员{i}" for i in range(5)],
+        [f"类别{i}" for i in range(15)],
+    )
+    assert many == few
+    assert many <= 12
+
+
+@pytest.mark.django_db
+def test_resource_service_associates_in_bulk(resource_factory):
+    from nassav.resource_service import ResourceService
+
+    resource = resource_factory(avid="REL-001")
+    service = ResourceService(None, None, None)
+    with CaptureQueriesContext(connection) as queries:
+        service._associate_actors(
+            resource, [{"name": f"演员{i}", "avatar_url": None} for i in range(5)]
+        )
+        service._associate_genres(resource, [f"类别{i}" for i in range(15)])
+    assert resource.actors.count() == 5
+    assert resource.genres.count() == 15
+    assert len(queries) <= 12
@@ -0,0 +1,276 @@
+#!/usr/bin/env python
+"""
+批量资源操作任务测试
+
+功能：
+1. 测试按操作类型分组的有界并发：同类操作不超过 concurrency，不同类操作互不占用名额
+2. 测试少量操作在请求中执行，返回与之前相同的 {"results": [...]}（按请求顺序）
+3. 测试任务生命周期：结果按完成顺序记录、WebSocket resources_batch 消息、取消后未开始的操作不再执行
+4. 测试 /api/resources/batch 的 async（202）/stream（NDJSON）模式与任务查询、取消接口
+5. 测试 ASGI 下 NDJSON 流逐行发送：任务结束前即可收到第一行结果
+
+运行方式：
+    uv run pytest tests/test_resources_batch.py -v
+"""
+
+import asyncio
+import json
+import threading
+import time
+
+import pytest
+from asgiref.testing import ApplicationCommunicator
+from django.core.handlers.asgi import ASGIHandler
+from nassav import batch_jobs as batch_module
+from nassav.batch_jobs import (
+    STATUS_CANCELLED,
+    STATUS_COMPLETED,
+    STATUS_QUEUED,
+    STATUS_RUNNING,
+    batch_jobs,
+    run_actions,
+)
+
+
+class Tracker:
+    """记录每类操作的最大并发数"""
+
+    def __init__(self, delay=0.2):
+        self.delay = delay
+        self.active = {}
+        self.peak = {}
+        self.calls = []
+        self.lock = threading.Lock()
+
+    def __call__(self, avid, act):
+        action = act["action"]
+        with self.lock:
+            self.calls.append(avid)
+            self.active[action] = self.active.get(action, 0) + 1
+            self.peak[action] = max(self.peak.get(action, 0), self.active[action])
+        time.sleep(self.delay)
+        with self.lock:
+            self.active[action] -= 1
+        return {"action": action, "avid": avid, "code": 200, "message": "ok"}
+
+
+@pytest.fixture
+def tracker(monkeypatch, settings):
+    settings.RESOURCES_BATCH_CONFIG = {"concurrency": {"add": 2, "delete-video": 1}}
+    tracker = Tracker()
+    monkeypatch.setitem(batch_module.ACTIONS, "add", ("add", tracker))
+    monkeypatch.setitem(batch_module.ACTIONS, "delete-video", ("delete-video", tracker))
+    return tracker
+
+
+def test_run_actions_bounded_per_action(tracker):
+    actions = [{"action": "add", "avid": f"ADD-{i}"} for i in range(6)]
+    actions += [{"action": "delete-video", "avid": "DEL-1"}, {"avid": ""}]
+    order = []
+    start = time.monotonic()
+    results = run_actions(actions, on_result=lambda i, _: order.append(i))
+    elapsed = time.monotonic() - start
+
+    assert tracker.peak == {"add": 2, "delete-video": 1}
+    # 6 个 add、2 个并发：3 轮；delete-video 与 add 同时进行
+    assert 0.55 < elapsed < 0.9
+    assert sorted(results) == list(range(8))
+    assert results[7]["code"] == 400
+    assert sorted(order) == list(range(8))
+    assert order.index(6) < order.index(5)
+
+
+@pytest.mark.django_db(transaction=True)
+def test_small_batch_runs_in_request(
+    settings, tmp_path, resource_factory, api_client, assert_api_response
+):
+    settings.VIDEO_DIR = tmp_path
+    resource_factory(avid="OLD-001", original_title="既存")
+    (tmp_path / "OLD-001.mp4").write_bytes(b"x" * 10)
+
+    response = api_client.post(
+        "/nassav/api/resources/batch",
+        {
+            "actions": [
+                {"action": "delete-video", "avid": "old-001"},
+                {"action": "add", "avid": "OLD-001"},
+                {"action": "unknown", "avid": "OLD-001"},
+                {"action": "delete-video", "avid": "NONE-001"},
+            ]
+        },
+        format="json",
+    )
+    results = assert_api_response(response)["data"]["results"]
+    assert [(r["action"], r["code"]) for r in results] == [
+        ("delete-video", 200),
+        ("add", 200),
+        ("unknown", 400),
+        ("delete-video", 404),
+    ]
+    assert results[0]["file_size"] == 10 and "index" not in results[0]
+    assert results[1]["message"] == "already exists"
+    assert results[1]["resource"]["original_title"] == "既存"
+
+
+@pytest.fixture
+def messages(monkeypatch):
+    """收集 WebSocket 消息"""
+    sent = []
+    monkeypatch.setattr(
+        "nassav.tasks.notify_task_update",
+        lambda update_type, data: sent.append((update_type, data)),
+    )
+    return sent
+
+
+@pytest.fixture
+def jobs(redis_client, monkeypatch, messages):
+    monkeypatch.setattr(batch_jobs, "_client", redis_client)
+    return batch_jobs
+
+
+def test_job_lifecycle(jobs, messages, tracker):
+    tracker.delay = 0.05
+    actions = [{"action": "add", "avid": f"ADD-{i}"} for i in range(3)] + [{}]
+    job = jobs.create(actions)
+    assert (job["status"], job["total"], job["processed"]) == (STATUS_QUEUED, 4, 0)
+
+    job = jobs.run(job["job_id"])
+    assert (job["status"], job["succeeded"], job["failed"]) == (STATUS_COMPLETED, 3, 1)
+    results = jobs.results(job["job_id"])
+    assert sorted(r["index"] for r in results) == [0, 1, 2, 3]
+    items = [data for kind, data in messages if "result" in data]
+    assert len(items) == 4 and all(kind == "resources_batch" for kind, _ in messages)
+    assert messages[-1][1]["status"] == STATUS_COMPLETED
+
+    # 已执行的任务不重复执行
+    assert jobs.run(job["job_id"])["processed"] == 4
+    assert len(tracker.calls) == 3
+
+
+def test_cancel_skips_pending_actions(jobs, tracker, settings):
+    settings.RESOURCES_BATCH_CONFIG = {"concurrency": {"add": 1}}
+    tracker.delay = 0.3
+    job = jobs.create([{"action": "add", "avid": f"ADD-{i}"} for i in range(6)])
+    threading.Timer(0.1, jobs.cancel, args=(job["job_id"],)).start()
+    job = jobs.run(job["job_id"])
+    assert job["status"] == STATUS_CANCELLED
+    assert 1 <= job["processed"] <= 3
+    assert len(tracker.calls) == job["processed"]
+
+
+def test_batch_job_api(jobs, tracker, api_client, assert_api_response, monkeypatch):
+    started = []
+    monkeypatch.setattr("nassav.tasks.start_resources_batch", started.append)
+    tracker.delay = 0
+
+    actions = [{"action": "add", "avid": f"ADD-{i}"} for i in range(12)]
+    response = api_client.post(
+        "/nassav/api/resources/batch", {"actions": actions}, format="json"
+    )
+    job = assert_api_response(response, expected_code=202)["data"]
+    assert (job["total"], job["status"]) == (12, STATUS_QUEUED)
+    assert started == [job["job_id"]]
+
+    url = f"/nassav/api/resources/batch/{job['job_id']}"
+    assert assert_api_response(api_client.delete(url))["data"]["status"] == (
+        STATUS_CANCELLED
+    )
+    data = assert_api_response(api_client.get(url))["data"]
+    assert (data["status"], data["results"]) == (STATUS_CANCELLED, [])
+    assert api_client.get("/nassav/api/resources/batch/unknown").status_code == 404
+
+    for body in ({"actions": {"action": "add"}}, {"actions": [], "mode": "later"}):
+        response = api_client.post("/nassav/api/resources/batch", body, format="json")
+        assert response.status_code == 400
+
+
+def test_batch_stream(jobs, tracker, api_client, assert_api_response, monkeypatch):
+    monkeypatch.setattr("nassav.tasks.start_resources_batch", jobs.run)
+    tracker.delay = 0
+
+    response = api_client.post(
+        "/nassav/api/resources/batch",
+        {"actions": [{"action": "add", "avid": "ADD-1"}, {}], "mode": "stream"},
+        format="json",
+    )
+    assert response["Content-Type"] == "application/x-ndjson"
+    lines = [
+        json.loads(line) for line in b"".join(response.streaming_content).splitlines()
+    ]
+    assert [line["event"] for line in lines] == ["item", "item", "end"]
+    assert sorted(line["index"] for line in lines[:2]) == [0, 1]
+    assert (lines[-1]["status"], lines[-1]["processed"]) == (STATUS_COMPLETED, 2)
+
+    # 从 offset 继续读取
+    url = f"/nassav/api/resources/batch/{response['X-Job-Id']}"
+    response = api_client.get(f"{url}/stream?offset=1")
+    lines = [
+        json.loads(line) for line in b"".join(response.streaming_content).splitlines()
+    ]
+    assert [line["event"] for line in lines] == ["item", "end"]
+
+    data = assert_api_response(api_client.get(url))["data"]
+    assert [r["index"] for r in data["results"]] == [0, 1]
+
+
+def test_batch_stream_over_asgi(jobs, settings, monkeypatch):
+    settings.RESOURCES_BATCH_CONFIG = {
+        "concurrency": {"add": 1},
+        "poll_interval": 0.05,
+    }
+    release = threading.Event()
+
+    def action(avid, act):
+        if avid == "ADD-2":
+            release.wait(timeout=10)
+        return {"action": "add", "avid": avid, "code": 200, "message": "ok"}
+
+    monkeypatch.setitem(batch_module.ACTIONS, "add", ("add", action))
+    job = jobs.create(
+        [{"action": "add", "avid": "ADD-1"}, {"action": "add", "avid": "ADD-2"}]
+    )
+    worker = threading.Thread(target=jobs.run, args=(job["job_id"],))
+    worker.start()
+
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": f"/nassav/api/resources/batch/{job['job_id']}/stream",
+        "query_string": b"",
+        "headers": [],
+        "server": ("testserver", 80),
+        "client": ("127.0.0.1", 12345),
+    }
+
+    async def read_stream():
+        app = ApplicationCommunicator(ASGIHandler(), scope)
+        await app.send_input({"type": "http.request", "body": b""})
+        start = await app.receive_output(timeout=5)
+        assert start["status"] == 200
+        first = await app.receive_output(timeout=5)
+        # 第一行在任务结束前到达（第二项仍在执行）
+        assert jobs.status(job["job_id"]) == STATUS_RUNNING
+        release.set()
+        chunks = [first["body"]]
+        while True:
+            message = await app.receive_output(timeout=5)
+            chunks.append(message.get("body", b""))
+            if not message.get("more_body"):
+                break
+        await app.wait(timeout=5)
+        return first, b"".join(chunks)
+
+    try:
+        first, body = asyncio.run(read_stream())
+    finally:
+        release.set()
+        worker.join(timeout=10)
+
+    assert json.loads(first["body"])["avid"] == "ADD-1" and first["more_body"]
+    lines = [json.loads(line) for line in body.splitlines()]
+    assert [line["event"] for line in lines] == ["item", "item", "end"]
+    assert lines[-1]["status"] == STATUS_COMPLETED
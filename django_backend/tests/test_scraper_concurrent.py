@@ -0,0 +1,192 @@
+#!/usr/bin/env python
+"""
+并发多镜像刮削测试
+
+功能：
+1. 测试并发模式下任一镜像返回完整结果时立即返回，不等待慢镜像
+2. 测试没有完整结果时按镜像优先级逐字段合并，并记录每个字段的来源（field_sources）
+3. 测试延迟预算：预算用完后只合并已返回的结果；预算内没有任何结果时等待第一个成功的镜像
+4. 测试依次模式（Scraper.concurrent=false）
+5. 测试 download_cover 按字段来源/封面域名选择刮削器（不依赖管理器上的共享状态）
+
+运行方式：
+    uv run pytest tests/test_scraper_concurrent.py -v
+"""
+
+import threading
+import time
+
+import pytest
+from nassav.scraper.ScraperBase import ScraperBase
+from nassav.scraper.ScraperManager import (
+    FIELD_SOURCES_KEY,
+    ScraperManager,
+    is_complete,
+    merge_metadata,
+)
+
+COMPLETE = {
+    "avid": "ABC-123",
+    "title": "标题",
+    "release_date": "2025-01-01",
+    "duration": "120分钟",
+    "studio": "",
+    "genres": ["剧情"],
+    "actors": ["演员A"],
+    "actor_avatars": {"演员A": "https://mirror/a.jpg"},
+    "cover_url": "https://mirror/cover.jpg",
+}
+
+
+class FakeScraper(ScraperBase):
+    def __init__(self, name, metadata=None, delay=0.0):
+        super().__init__()
+        self.name = name
+        self.domain = f"{name.lower()}.example"
+        self.metadata = metadata
+        self.delay = delay
+        self.covers = []
+        self.started = False
+        self.finished = threading.Event()
+
+    def scrape(self, avid, use_negative_cache=True):
+        self.started = True
+        try:
+            return super().scrape(avid, use_negative_cache)
+        finally:
+            self.finished.set()
+
+    def get_scraper_name(self):
+        return self.name
+
+    def get_html(self, avid):
+        time.sleep(self.delay)
+        return ("html", None) if self.metadata else (None, 404)
+
+    def parse_html(self, html, avid):
+        return dict(self.metadata)
+
+    def download_cover(self, url, save_path):
+        self.covers.append(url)
+        return True
+
+
+@pytest.fixture
+def manager_factory(settings):
+    """创建使用假刮削器的管理器；用例结束时等待后台仍在执行的刮削完成"""
+    created = []
+
+    def factory(*scrapers, concurrent=True, budget=2.0):
+        settings.SCRAPER_CONCURRENT = concurrent
+        settings.SCRAPER_LATENCY_BUDGET = budget
+        manager = ScraperManager()
+        manager.scrapers = {scraper.name: scraper for scraper in scrapers}
+        created.extend(scrapers)
+        return manager
+
+    yield factory
+    for scraper in created:
+        if scraper.started:
+            scraper.finished.wait(5)
+
+
+def test_merge_metadata():
+    javbus = dict(COMPLETE, actors=[], actor_avatars={})
+    busdmm = dict(
+        COMPLETE,
+        title="另一个标题",
+        studio="片商",
+        actors=["演员B"],
+        actor_avatars={"演员B": "https://busdmm/b.jpg"},
+    )
+    assert not is_complete(javbus) and is_complete(busdmm)
+
+    merged = merge_metadata([("Javbus", javbus), ("Busdmm", busdmm)])
+    assert merged["title"] == "标题"
+    assert merged["studio"] == "片商"
+    # 头像地址与演员取自同一镜像
+    assert merged["actors"] == ["演员B"]
+    assert merged["actor_avatars"] == {"演员B": "https://busdmm/b.jpg"}
+    sources = merged[FIELD_SOURCES_KEY]
+    assert sources["title"] == sources["cover_url"] == "Javbus"
+    assert (
+        sources["studio"] == sources["actors"] == sources["actor_avatars"] == "Busdmm"
+    )
+    assert merge_metadata([]) is None
+
+
+def test_complete_result_returns_without_waiting(manager_factory):
+    slow = FakeScraper("Javbus", COMPLETE, delay=1.5)
+    fast = FakeScraper("Busdmm", COMPLETE)
+    manager = manager_factory(slow, fast)
+
+    start = time.monotonic()
+    metadata = manager.scrape("abc-123")
+    assert time.monotonic() - start < 1.0
+    assert set(metadata[FIELD_SOURCES_KEY].values()) == {"Busdmm"}
+
+
+def test_partial_results_are_merged(manager_factory):
+    partial = dict(COMPLETE, actors=[], actor_avatars={})
+    actors_only = {"avid": "ABC-123", "actors": ["演员B"], "genres": ["剧情"]}
+    manager = manager_factory(
+        FakeScraper("Javbus", partial),
+        FakeScraper("Busdmm", actors_only, delay=0.1),
+        FakeScraper("Dmmsee"),
+    )
+
+    metadata = manager.scrape("abc-123")
+    assert metadata["title"] == "标题" and metadata["actors"] == ["演员B"]
+    assert metadata[FIELD_SOURCES_KEY]["genres"] == "Javbus"
+    assert metadata[FIELD_SOURCES_KEY]["actors"] == "Busdmm"
+
+
+def test_latency_budget(manager_factory):
+    partial = dict(COMPLETE, actors=[])
+    manager = manager_factory(
+        FakeScraper("Javbus", COMPLETE, delay=1.0),
+        FakeScraper("Busdmm", partial),
+        budget=0.2,
+    )
+    start = time.monotonic()
+    metadata = manager.scrape("abc-123")
+    # 预算用完后不再等待更优先的慢镜像
+    assert time.monotonic() - start < 0.8
+    assert metadata["actors"] == []
+    assert set(metadata[FIELD_SOURCES_KEY].values()) == {"Busdmm"}
+
+    # 预算内没有任何结果：等待第一个成功的镜像
+    manager = manager_factory(
+        FakeScraper("Javbus", partial, delay=0.3),
+        FakeScraper("Busdmm"),
+        budget=0.05,
+    )
+    assert manager.scrape("abc-123")[FIELD_SOURCES_KEY]["title"] == "Javbus"
+
+    manager = manager_factory(FakeScraper("Javbus"), FakeScraper("Busdmm"))
+    assert manager.scrape("abc-123") is None
+
+
+def test_sequential_mode(manager_factory):
+    first = FakeScraper("Javbus", dict(COMPLETE, actors=[]))
+    second = FakeScraper("Busdmm", COMPLETE)
+    manager = manager_factory(first, second, concurrent=False)
+
+    metadata = manager.scrape("abc-123")
+    assert metadata["actors"] == []
+    assert metadata[FIELD_SOURCES_KEY]["title"] == "Javbus"
+
+
+def test_download_cover_uses_field_source(manager_factory, tmp_path):
+    javbus = FakeScraper("Javbus")
+    busdmm = FakeScraper("Busdmm")
+    manager = manager_factory(javbus, busdmm)
+    path = str(tmp_path / "cover.jpg")
+
+    assert manager.download_cover("https://cdn/cover.jpg", path, scraper_name="Busdmm")
+    assert busdmm.covers == ["https://cdn/cover.jpg"]
+    # 未指定时按封面域名选择，其次使用第一个刮削器
+    manager.download_cover("https://busdmm.example/pics/c.jpg", path)
+    manager.download_cover("https://cdn/other.jpg", path)
+    assert busdmm.covers[-1] == "https://busdmm.example/pics/c.jpg"
+    assert javbus.covers == ["https://cdn/other.jpg"]
@@ -11,23 +11,20 @@ def test_scraper_download_cover_with_referer():
     scraper = Javbus()
     scraper.domain = "www.javbus.com"
 
-    # Mock requests.get
-    with patch("nassav.scraper.ScraperBase.requests.get") as mock_get:
-        mock_response = Mock()
-        mock_response.iter_content.return_value = [b"fake image data"]
-        mock_get.return_value = mock_response
+    # Mock 会话池
+    with patch("nassav.scraper.ScraperBase.get_http_pool") as mock_pool:
+        mock_download = mock_pool.return_value.download
 
         # 尝试下载封面
         url = "https://www.javbus.com/pics/cover/test.jpg"
         save_path = "/tmp/test.jpg"
 
-        with patch("builtins.open", create=True) as mock_open:
-            with patch("os.makedirs"):
-                scraper.download_cover(url, save_path)
+        assert scraper.download_cover(url, save_path) is True
 
-        # 验证requests.get被调用，且headers包含Referer
-        assert mock_get.called
-        call_kwargs = mock_get.call_args[1]
+        # 验证通过会话池下载，且headers包含Referer
+        assert mock_download.called
+        assert mock_download.call_args[0] == (url, save_path)
+        call_kwargs = mock_download.call_args[1]
         headers = call_kwargs.get("headers", {})
 
         # 验证Referer头存在且正确
@@ -47,11 +44,13 @@ def test_scraper_manager_download_cover():
     mock_scraper = Mock()
     mock_scraper.download_cover.return_value = True
 
-    # 设置last_successful_scraper
-    manager._last_successful_scraper = mock_scraper
+    # 注册为提供封面的刮削器
+    manager.scrapers = {"Mock": mock_scraper}
 
     # 调用download_cover
-    result = manager.download_cover("https://test.com/cover.jpg", "/tmp/test.jpg")
+    result = manager.download_cover(
+        "https://test.com/cover.jpg", "/tmp/test.jpg", scraper_name="Mock"
+    )
 
     # 验证委托给scraper
     assert result is True
@@ -68,9 +67,9 @@ def test_scraper_download_cover_error_handling():
     scraper = Javbus()
     scraper.domain = "www.javbus.com"
 
-    # Mock requests.get抛出异常
-    with patch("nassav.scraper.ScraperBase.requests.get") as mock_get:
-        mock_get.side_effect = Exception("Network error")
+    # Mock 会话池下载抛出异常
+    with patch("nassav.scraper.ScraperBase.get_http_pool") as mock_pool:
+        mock_pool.return_value.download.side_effect = Exception("Network error")
 
         # 尝试下载封面
         url = "https://www.javbus.com/pics/cover/test.jpg"
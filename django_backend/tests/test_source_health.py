@@ -0,0 +1,231 @@
+#!/usr/bin/env python
+"""
+源健康统计与熔断测试
+
+功能：
+1. 测试错误归类（404 不算健康失败）、成功率与 p50/p95 延迟统计
+2. 测试按 配置权重 × 成功率 × 延迟系数 动态排序，慢源/失败源降级
+3. 测试熔断：连续失败后打开，冷却期后只放行一次试探，失败则冷却期加倍，成功则关闭
+4. 测试 SourceManager 跳过熔断中的源（错误为 circuit_open）、后台试探熔断源
+5. 测试 /api/source/list?detail=1 返回排序明细，默认仍返回源名称列表
+
+运行方式：
+    uv run pytest tests/test_source_health.py -v
+"""
+
+import pytest
+from nassav.source.SourceBase import SourceBase
+from nassav.source.SourceManager import SourceManager
+from nassav.source_health import (
+    CIRCUIT_OPEN_ERROR,
+    ERROR_PARSE,
+    STATE_CLOSED,
+    STATE_HALF_OPEN,
+    STATE_OPEN,
+    classify_error,
+    source_health,
+)
+from nassav.testing import LocalSourceServer, Route
+
+
+class Clock:
+    def __init__(self, now=1_000_000.0):
+        self.now = now
+
+    def time(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr("nassav.source_health.time", clock)
+    return clock
+
+
+@pytest.fixture
+def health(settings, redis_client, monkeypatch):
+    settings.SOURCE_HEALTH_ENABLED = True
+    settings.SOURCE_HEALTH_CONFIG = {
+        "failure_threshold": 3,
+        "cooldown": 10,
+        "max_cooldown": 30,
+    }
+    monkeypatch.setattr(source_health, "_client", redis_client)
+    return source_health
+
+
+def test_classify_error():
+    assert classify_error(None) is None
+    assert classify_error(404) == classify_error("404") == "miss"
+    assert classify_error(403) == "forbidden"
+    assert classify_error(429) == "rate_limited"
+    assert classify_error(502) == "server"
+    assert classify_error(ERROR_PARSE) == "parse"
+    assert classify_error("Operation timed out after 10000 ms") == "timeout"
+    assert classify_error("Could not resolve host") == "network"
+
+
+def test_metrics_and_percentiles(health):
+    for ms in range(100, 1100, 100):
+        health.record("Jable", ms / 1000)
+    health.record("Jable", 0.05, 404)
+    health.record("Jable", 2.0, "timeout")
+
+    metrics = health.metrics(["Jable", "Memo"])
+    jable = metrics["Jable"]
+    assert jable["samples"] == 12
+    # 404 不算失败
+    assert jable["success_rate"] == pytest.approx(11 / 12, abs=1e-4)
+    assert jable["p50_ms"] == 500.0
+    assert jable["p95_ms"] == 2000.0
+    assert jable["last_error"] == "timeout"
+    assert jable["state"] == STATE_CLOSED
+    assert metrics["Memo"]["samples"] == 0 and metrics["Memo"]["success_rate"] is None
+
+
+def test_rank_demotes_slow_and_failing_sources(health):
+    for _ in range(20):
+        health.record("Top", 8.0)
+        health.record("Mid", 0.5)
+    ranking = health.rank({"Top": 1000, "Mid": 800, "New": 600})
+
+    assert [e["name"] for e in ranking] == ["Mid", "New", "Top"]
+    assert [e["demoted"] for e in ranking] == [False, False, True]
+    # 没有统计的源分数等于配置权重
+    assert ranking[1]["score"] == 600
+    assert ranking[0]["score"] == pytest.approx(800 * 2000 / 2500, abs=0.01)
+
+
+def test_circuit_open_half_open_and_close(health, clock):
+    for _ in range(2):
+        assert health.record("Top", 1.0, 503) == STATE_CLOSED
+    assert health.record("Top", 1.0, 503) == STATE_OPEN
+    metrics = health.metrics(["Top"])["Top"]
+    assert metrics["state"] == STATE_OPEN
+    assert metrics["retry_at"] == clock.now + 10
+    assert not health.allow("Top", metrics)
+    # 熔断中的源即使分数更高也排在最后
+    assert [e["name"] for e in health.rank({"Top": 1000, "Mid": 1})] == ["Mid", "Top"]
+
+    # 冷却期结束：只放行一个试探请求，失败后冷却期加倍
+    clock.now += 10
+    metrics = health.metrics(["Top"])["Top"]
+    assert metrics["state"] == STATE_HALF_OPEN
+    assert health.allow("Top", metrics)
+    assert not health.allow("Top", metrics)
+    assert health.record("Top", 1.0, "timeout") == STATE_OPEN
+    assert health.metrics(["Top"])["Top"]["retry_at"] == clock.now + 20
+
+    clock.now += 20
+    assert health.allow("Top", health.metrics(["Top"])["Top"])
+    assert health.record("Top", 0.2) == STATE_CLOSED
+    metrics = health.metrics(["Top"])["Top"]
+    assert (metrics["state"], metrics["failures"]) == (STATE_CLOSED, 0)
+    assert health.allow("Top", metrics)
+
+    # 恢复后冷却期重置
+    for _ in range(3):
+        health.record("Top", 1.0, 503)
+    assert health.metrics(["Top"])["Top"]["retry_at"] == clock.now + 10
+
+    assert health.reset("Top") > 0
+    assert health.metrics(["Top"])["Top"]["samples"] == 0
+
+
+def test_disabled_health_is_noop(health, settings):
+    settings.SOURCE_HEALTH_ENABLED = False
+    assert health.record("Top", 1.0, 503) is None
+    assert health.metrics(["Top"]) == {}
+    ranking = health.rank({"Top": 10, "Mid": 20})
+    assert [(e["name"], e["score"]) for e in ranking] == [("Mid", 20), ("Top", 10)]
+
+
+class FakeSource(SourceBase):
+    def __init__(self, name, server, path):
+        super().__init__(timeout=5)
+        self.name = name
+        self.server = server
+        self.path = path
+
+    def get_source_name(self):
+        return self.name
+
+    def get_candidate_urls(self, avid):
+        return [(self.server.url(self.path), "")]
+
+    def _get_home_url(self):
+        return self.server.url("/home")
+
+    def parse_html(self, html):
+        from nassav.scraper.AVDownloadInfo import AVDownloadInfo
+
+        info = AVDownloadInfo()
+        info.m3u8 = html
+        return info
+
+
+def _manager(settings, server):
+    settings.SOURCE_CONFIG = {"top": {"weight": 1000}, "mid": {"weight": 800}}
+    manager = SourceManager()
+    manager._cookies_loaded = True
+    manager.sources = {
+        "Top": FakeSource("Top", server, "/top"),
+        "Mid": FakeSource("Mid", server, "/mid"),
+    }
+    return manager
+
+
+@pytest.mark.parametrize("concurrent", [True, False])
+def test_manager_records_and_skips_open_circuit(health, clock, settings, concurrent):
+    settings.SOURCE_PROBE_CONCURRENT = concurrent
+    routes = {"/top": Route(status=503), "/mid": Route(body="m3u8")}
+    with LocalSourceServer(routes) as server:
+        manager = _manager(settings, server)
+        _, source, _, errors = manager.get_info_from_any_source("abc-123")
+        assert source.get_source_name() == "Mid" and errors == {"Top": 503}
+        metrics = health.metrics(["Top", "Mid"])
+        assert metrics["Top"]["last_error"] == "server"
+        assert metrics["Mid"]["success_rate"] == 1
+
+        for _ in range(2):
+            health.record("Top", 1.0, 503)
+        assert manager.get_sorted_sources()[0][0] == "Mid"
+        requests = len(server.requests)
+        _, source, _, errors = manager.get_info_from_any_source("abc-123")
+        assert source.get_source_name() == "Mid"
+        assert errors == {"Top": CIRCUIT_OPEN_ERROR}
+        assert server.requests[requests:] == ["/mid"]
+
+
+def test_probe_tripped_sources(health, clock, settings):
+    with LocalSourceServer({"/home": Route(body="ok")}) as server:
+        manager = _manager(settings, server)
+        for _ in range(3):
+            health.record("Top", 1.0, 503)
+        # 冷却期内不试探
+        assert manager.probe_tripped_sources() == {}
+
+        clock.now += 10
+        assert manager.probe_tripped_sources() == {"Top": STATE_CLOSED}
+        assert server.requests == ["/home"]
+        assert health.allow("Top", health.metrics(["Top"])["Top"])
+
+
+@pytest.mark.django_db
+def test_source_list_detail(health, api_client, assert_api_response, monkeypatch):
+    manager = SourceManager()
+    manager.sources = {"Jable": None, "MissAV": None}
+    monkeypatch.setattr("nassav.views.source_manager", manager)
+    health.record("MissAV", 0.5)
+
+    body = assert_api_response(api_client.get("/nassav/api/source/list"))
+    assert body["data"] == ["Jable", "MissAV"]
+
+    body = assert_api_response(
+        api_client.get("/nassav/api/source/list", {"detail": "1"})
+    )
+    entries = {e["name"]: e for e in body["data"]}
+    assert entries["MissAV"]["metrics"]["samples"] == 1
+    assert entries["Jable"]["metrics"]["state"] == STATE_CLOSED
+    assert {"weight", "score", "rank", "demoted"} <= set(entries["Jable"])
@@ -0,0 +1,178 @@
+#!/usr/bin/env python
+"""
+多源并发探测测试
+
+功能：
+1. 测试权重最高的成功结果胜出，其余仍在进行的请求被取消
+2. 测试高权重源失败时不等待顺序重试，低权重源结果立即可用
+3. 测试同一源的候选地址并发发起（受按域名限流错开）
+4. 测试失败源的错误码照常返回，用于 403/404/502 映射
+5. 测试关闭并发探测时按权重依次尝试
+6. 测试多次探测复用会话池中同一域名的 AsyncSession 连接
+
+运行方式：
+    uv run pytest tests/test_source_probe.py -v
+"""
+
+import time
+from unittest.mock import MagicMock
+
+import pytest
+from nassav.rate_limit import RateLimiter
+from nassav.resource_service import ResourceAccessDeniedError, ResourceService
+from nassav.scraper.AVDownloadInfo import AVDownloadInfo
+from nassav.source.SourceBase import SourceBase
+from nassav.source.SourceManager import SourceManager
+from nassav.testing import LocalSourceServer, Route
+
+
+class FakeSource(SourceBase):
+    """候选地址指向本地替身服务器的源"""
+
+    def __init__(self, name, server, paths):
+        super().__init__(timeout=5)
+        self.name = name
+        self.server = server
+        self.paths = paths
+
+    def get_source_name(self):
+        return self.name
+
+    def get_candidate_urls(self, avid):
+        return [(self.server.url(path), "") for path in self.paths]
+
+    def parse_html(self, html):
+        if "m3u8" not in html:
+            return None
+        info = AVDownloadInfo()
+        info.source = self.name
+        info.m3u8 = html
+        return info
+
+
+def _manager(settings, server, layout):
+    """
+    layout: [(name, weight, [path, ...]), ...]
+    """
+    settings.SOURCE_PROBE_CONCURRENT = True
+    settings.SOURCE_CONFIG = {name.lower(): {"weight": w} for name, w, _ in layout}
+    manager = SourceManager()
+    manager._cookies_loaded = True
+    manager.sources = {
+        name: FakeSource(name, server, paths) for name, _, paths in layout
+    }
+    return manager
+
+
+def test_highest_weight_wins_and_cancels_rest(settings):
+    routes = {
+        "/top/1": Route(body="top m3u8", delay=0.4),
+        "/mid/1": Route(body="mid m3u8"),
+        "/low/1": Route(body="low m3u8", delay=3),
+    }
+    with LocalSourceServer(routes) as server:
+        manager = _manager(
+            settings,
+            server,
+            [
+                ("Top", 1000, ["/top/1"]),
+                ("Mid", 800, ["/mid/1"]),
+                ("Low", 600, ["/low/1"]),
+            ],
+        )
+        start = time.monotonic()
+        info, source, html, errors = manager.get_info_from_any_source("abc-123")
+        elapsed = time.monotonic() - start
+        time.sleep(0.2)
+
+        assert source.get_source_name() == "Top"
+        assert info.avid == "ABC-123" and html == "top m3u8"
+        assert errors == {}
+        # 所有源同时发起，无需等待慢源
+        assert elapsed < 1.5
+        assert server.aborted == ["/low/1"]
+
+
+def test_failed_top_source_does_not_delay_fallback(settings):
+    routes = {"/mid/1": Route(body="mid m3u8")}
+    with LocalSourceServer(routes) as server:
+        manager = _manager(
+            settings,
+            server,
+            [
+                ("Top", 1000, ["/top/1", "/top/2", "/top/3"]),
+                ("Mid", 800, ["/mid/1"]),
+            ],
+        )
+        start = time.monotonic()
+        info, source, _, errors = manager.get_info_from_any_source("abc-123")
+
+        assert source.get_source_name() == "Mid"
+        assert errors == {"Top": 404}
+        # 顺序模式下至少需要 3 次请求 + 间隔；并发模式只受请求间隔限制
+        assert time.monotonic() - start < 1.0
+
+
+def test_source_candidates_start_concurrently(settings, monkeypatch):
+    # 同一域名每 0.05 秒放行一个请求
+    settings.RATE_LIMIT_ENABLED = True
+    monkeypatch.setattr(
+        "nassav.rate_limit._limiter", RateLimiter(rate=20, burst=1, use_redis=False)
+    )
+    routes = {
+        "/top/1": Route(body="first m3u8", delay=0.3),
+        "/top/2": Route(body="second m3u8", delay=2),
+    }
+    with LocalSourceServer(routes) as server:
+        manager = _manager(settings, server, [("Top", 1000, ["/top/1", "/top/2"])])
+        _, _, html, _ = manager.get_info_from_any_source("abc-123")
+        time.sleep(0.2)
+
+        # 第二个候选地址在第一个完成前就已发起（间隔约为限流间隔），命中后被取消
+        assert html == "first m3u8"
+        gap = server.request_times["/top/2"] - server.request_times["/top/1"]
+        assert 0.03 < gap < 0.3
+        assert server.aborted == ["/top/2"]
+
+
+def test_error_codes_are_returned_for_mapping(settings):
+    routes = {"/top/1": Route(status=403, body="forbidden")}
+    with LocalSourceServer(routes) as server:
+        manager = _manager(
+            settings,
+            server,
+            [("Top", 1000, ["/top/1"]), ("Mid", 800, ["/mid/1"])],
+        )
+        info, source, html, errors = manager.get_info_from_any_source("abc-123")
+        assert (info, source, html) == (None, None, None)
+        assert errors == {"Top": 403, "Mid": 404}
+
+        service = ResourceService(manager, MagicMock(), MagicMock())
+        with pytest.raises(ResourceAccessDeniedError):
+            service._get_source_info("ABC-123", "any")
+
+
+def test_sequential_mode(settings):
+    routes = {"/mid/1": Route(body="mid m3u8")}
+    with LocalSourceServer(routes) as server:
+        manager = _manager(
+            settings, server, [("Top", 1000, ["/top/1"]), ("Mid", 800, ["/mid/1"])]
+        )
+        settings.SOURCE_PROBE_CONCURRENT = False
+        _, source, _, errors = manager.get_info_from_any_source("abc-123")
+
+        assert source.get_source_name() == "Mid"
+        assert errors == {"Top": 404}
+        assert server.requests == ["/top/1", "/mid/1"]
+
+
+def test_probes_reuse_pooled_connection(settings):
+    routes = {"/top/1": Route(body="top m3u8")}
+    with LocalSourceServer(routes) as server:
+        manager = _manager(settings, server, [("Top", 1000, ["/top/1"])])
+        for _ in range(3):
+            _, source, _, _ = manager.get_info_from_any_source("abc-123")
+            assert source.get_source_name() == "Top"
+
+        assert len(server.clients) == 3
+        assert len(set(server.clients)) == 1
@@ -0,0 +1,206 @@
+#!/usr/bin/env python
+"""
+阶段依赖图与资源保存流程测试
+
+功能：
+1. 测试 StageGraph：互不依赖的阶段同时执行、依赖顺序、inline 阶段在调用线程执行、
+   执行中添加阶段、阶段失败时跳过依赖它的阶段并抛出异常、阶段事件
+2. 测试 ResourceService 保存资源时刮削与源网站封面同时进行、头像并发下载，结果包含各阶段耗时
+3. 测试 Javbus 封面下载失败时使用预取的源网站封面，成功时删除预取的文件
+
+运行方式：
+    uv run pytest tests/test_stage_graph.py -v
+"""
+
+import threading
+import time
+
+import pytest
+from nassav.models import Actor
+from nassav.scraper import AVDownloadInfo
+from nassav.stage_graph import StageGraph
+from nassav.testing import LocalSourceServer, Route
+
+
+def _sleep(seconds, value=None):
+    def run():
+        time.sleep(seconds)
+        return value
+
+    return run
+
+
+def test_independent_stages_run_concurrently():
+    graph = StageGraph(max_workers=4)
+    graph.add("a", _sleep(0.2, 1))
+    graph.add("b", _sleep(0.2, 2))
+    graph.add("c", lambda: graph.results["a"] + graph.results["b"], deps=("a", "b"))
+    start = time.monotonic()
+    assert graph.run()["c"] == 3
+    assert time.monotonic() - start < 0.35
+    assert set(graph.timings) == {"a", "b", "c"}
+    assert graph.timings["a"] >= 0.2
+
+
+def test_inline_and_dynamic_stages():
+    caller = threading.get_ident()
+    events = []
+    graph = StageGraph(on_event=lambda name, status, _: events.append((name, status)))
+    graph.add("fetch", _sleep(0.05, ["x", "y"]))
+    graph.add("db", threading.get_ident, deps=("fetch",), inline=True)
+
+    def fan_out():
+        for item in graph.results["fetch"]:
+            graph.add(f"item:{item}", _sleep(0.1, item), deps=("fan_out",))
+
+    graph.add("fan_out", fan_out, deps=("fetch",))
+    start = time.monotonic()
+    results = graph.run()
+    assert results["db"] == caller
+    assert results["item:x"] == "x" and results["item:y"] == "y"
+    assert time.monotonic() - start < 0.3
+    assert ("item:x", "done") in events
+    assert events.index(("fetch", "done")) < events.index(("db", "running"))
+
+    with pytest.raises(ValueError):
+        graph.add("late", lambda: None, deps=("missing",))
+
+
+def test_failure_skips_dependents_and_raises():
+    ran = []
+    graph = StageGraph()
+    graph.add("bad", lambda: 1 / 0)
+    graph.add("after", lambda: ran.append("after"), deps=("bad",))
+    graph.add("other", lambda: ran.append("other"))
+    with pytest.raises(ZeroDivisionError):
+        graph.run()
+    assert ran == ["other"]
+    assert graph.status == {"bad": "failed", "after": "skipped", "other": "done"}
+
+
+class FakeSource:
+    def __init__(self, delay=0.2):
+        self.delay = delay
+        self.downloads = []
+
+    def get_source_name(self):
+        return "Fake"
+
+    def get_cover_url(self, html):
+        return "https://source.test/cover.jpg"
+
+    def download_file(self, url, path):
+        time.sleep(self.delay)
+        self.downloads.append(url)
+        with open(path, "wb") as f:
+            f.write(b"SOURCE")
+        return True
+
+
+class FakeScraperManager:
+    def __init__(self, avatar_server, cover_ok=True):
+        self.avatar_server = avatar_server
+        self.cover_ok = cover_ok
+
+    def scrape(self, avid):
+        time.sleep(0.2)
+        return {
+            "title": "タイトル",
+            "cover_url": "https://javbus.test/cover.jpg",
+            "actors": [f"演员{i}" for i in range(3)],
+            "actor_avatars": {
+                f"演员{i}": self.avatar_server.url(f"/actress/{i}.jpg") for i in range(3)
+            },
+            "genres": ["剧情"],
+        }
+
+    def download_cover(self, url, path, scraper_name=None):
+        time.sleep(0.1)
+        if not self.cover_ok:
+            return False
+        with open(path, "wb") as f:
+            f.write(b"JAVBUS")
+        return True
+
+
+@pytest.fixture
+def service(settings, tmp_path, monkeypatch):
+    from nassav import resource_service
+
+    settings.COVER_DIR = tmp_path / "cover"
+    settings.AVATAR_DIR = tmp_path / "avatar"
+    monkeypatch.setattr(
+        resource_service,
+        "get_html_store",
+        lambda: type("Store", (), {"put": lambda *args, **kwargs: None})(),
+    )
+    routes = {
+        f"/actress/{i}.jpg": Route(body=f"avatar{i}", delay=0.2) for i in range(3)
+    }
+
+    with LocalSourceServer(routes) as avatar_server:
+
+        def _create(cover_ok=True):
+            return resource_service.ResourceService(
+                None, FakeScraperManager(avatar_server, cover_ok), None
+            )
+
+        yield _create
+
+
+def _save(service, source):
+    info = AVDownloadInfo(avid="PIPE-001", m3u8="https://x/a.m3u8", source="Fake")
+    return service._save_all_resources(
+        "PIPE-001", info, source, "<html></html>", submit_translate=False
+    )
+
+
+@pytest.mark.django_db
+def test_save_runs_network_stages_concurrently(service, settings):
+    source = FakeSource()
+    start = time.monotonic()
+    result = _save(service(), source)
+    elapsed = time.monotonic() - start
+
+    # 串行时：刮削 0.2 + 封面 0.1 + 源封面 0.2 + 3 个头像 0.6
+    assert elapsed < 0.7
+    assert result["scraped"] and result["cover_saved"]
+    assert (settings.COVER_DIR / "PIPE-001.jpg").read_bytes() == b"JAVBUS"
+    assert sorted(result["resource"]["actors"]) == [
+        "演员0",
+        "演员1",
+        "演员2",
+    ]
+    assert sorted(p.name for p in settings.AVATAR_DIR.iterdir()) == [
+        "0.jpg",
+        "1.jpg",
+        "2.jpg",
+    ]
+    assert Actor.objects.get(name="演员1").avatar_filename == "1.jpg"
+    # 预取的源网站封面未被使用，已删除
+    assert source.downloads and list(settings.COVER_DIR.iterdir()) == [
+        settings.COVER_DIR / "PIPE-001.jpg"
+    ]
+
+    timings = result["timings"]
+    for stage in ("html", "scrape", "source_cover", "cover", "database", "avatar:演员0"):
+        assert stage in timings
+    assert timings["scrape"] >= 0.2
+    assert timings["total"] >= timings["scrape"]
+
+
+@pytest.mark.django_db
+def test_save_uses_prefetched_source_cover(service, settings):
+    result = _save(service(cover_ok=False), FakeSource(delay=0))
+    assert result["cover_saved"]
+    assert (settings.COVER_DIR / "PIPE-001.jpg").read_bytes() == b"SOURCE"
+    assert list(settings.COVER_DIR.iterdir()) == [settings.COVER_DIR / "PIPE-001.jpg"]
+
+
+@pytest.mark.django_db
+def test_save_without_prefetch(service, settings):
+    settings.RESOURCE_PIPELINE_CONFIG = {"prefetch_source_cover": False}
+    source = FakeSource(delay=0)
+    result = _save(service(), source)
+    assert result["cover_saved"] and source.downloads == []
+    assert "source_cover" not in result["timings"]
@@ -0,0 +1,216 @@
+#!/usr/bin/env python
+"""
+任务队列状态（Redis）测试
+
+功能：
+1. 测试同一进程内复用 Redis 连接池
+2. 测试任务登记（SET NX 去重）与任务开始时锁、队列状态单次往返写入
+3. 测试任务结束时批量清理锁、进度、在途记录和队列记录；等待重试时保留任务登记
+4. 测试完整任务队列批量附加进度信息
+5. 测试任务登记对账（清理崩溃遗留登记、补建任务锁和队列记录）
+6. 测试队列增量事件序号递增且与完整队列快照的 seq 对齐
+
+运行方式：
+    uv run pytest tests/test_task_queue_state.py -v
+"""
+
+import json
+from unittest.mock import patch
+
+import pytest
+from nassav import tasks
+
+
+@pytest.fixture
+def queue_redis(redis_client):
+    """让 nassav.tasks 使用测试专用的 Redis 客户端"""
+    with patch("nassav.tasks.get_redis_client", return_value=redis_client):
+        yield redis_client
+
+
+def _queue_entry(redis_client, avid):
+    raw = redis_client.hget(tasks.QUEUE_KEY, avid)
+    return json.loads(raw) if raw else None
+
+
+def test_redis_client_is_shared(settings):
+    settings.CELERY_BROKER_URL = "redis://127.0.0.1:6399/3"
+    client = tasks.get_redis_client()
+    assert tasks.get_redis_client() is client
+    assert client.connection_pool.connection_kwargs["db"] == 3
+
+    settings.CELERY_BROKER_URL = "redis://127.0.0.1:6399/4"
+    assert tasks.get_redis_client() is not client
+
+
+def test_mark_task_started_keeps_created_at(queue_redis):
+    tasks.add_task_to_queue("abc-123", "task-1")
+    created_at = _queue_entry(queue_redis, "ABC-123")["created_at"]
+
+    tasks.mark_task_started("abc-123", "task-1")
+
+    entry = _queue_entry(queue_redis, "ABC-123")
+    assert entry["state"] == "STARTED"
+    assert entry["task_id"] == "task-1"
+    assert entry["task_type"] == "download"
+    assert entry["created_at"] == pytest.approx(created_at, abs=1e-3)
+    assert "updated_at" in entry
+    assert queue_redis.get("nassav:task_lock:ABC-123") == b"task-1"
+    assert 0 < queue_redis.ttl(tasks.QUEUE_KEY) <= tasks.QUEUE_TTL
+
+
+def test_mark_task_started_recreates_missing_entry(queue_redis):
+    tasks.mark_task_started("MOCK-001", "task-2", task_type="mock")
+
+    entry = _queue_entry(queue_redis, "MOCK-001")
+    assert entry["state"] == "STARTED"
+    assert entry["task_type"] == "mock"
+    assert entry["task_id"] == "task-2"
+
+
+def test_clear_task_state(queue_redis):
+    tasks.add_task_to_queue("ABC-123", "task-1")
+    tasks.mark_task_started("ABC-123", "task-1")
+    tasks.set_task_progress("ABC-123", 50.0, "1MB/s")
+    queue_redis.zadd(tasks.INFLIGHT_KEY, {"ABC-123": 1})
+
+    tasks.clear_task_state("ABC-123")
+    assert queue_redis.exists("nassav:task_lock:ABC-123") == 0
+    assert queue_redis.exists("nassav:task_progress:ABC-123") == 0
+    assert queue_redis.zscore(tasks.INFLIGHT_KEY, "ABC-123") is None
+    assert _queue_entry(queue_redis, "ABC-123") is not None
+
+    tasks.clear_task_state("ABC-123", remove_from_queue=True)
+    assert _queue_entry(queue_redis, "ABC-123") is None
+
+
+def test_mark_task_retrying_keeps_registration(queue_redis, liveness):
+    import time
+
+    tasks.register_task("ABC-123", "task-1")
+    tasks.mark_task_started("ABC-123", "task-1")
+
+    entry = tasks.mark_task_retrying("abc-123", "task-1", countdown=60)
+
+    assert entry["state"] == "PENDING"
+    assert _queue_entry(queue_redis, "ABC-123")["state"] == "PENDING"
+    assert queue_redis.get("nassav:task_lock:ABC-123") == b"task-1"
+    assert queue_redis.zscore(tasks.INFLIGHT_KEY, "ABC-123") > time.time() + 50
+    # 倒计时期间重复提交被拦截，对账也不会清理
+    assert tasks.register_task("ABC-123", "task-2") is None
+    assert tasks.reconcile_task_registry()["removed"] == []
+
+
+def test_full_task_queue_attaches_progress(queue_redis):
+    tasks.add_task_to_queue("A-001", "task-a")
+    tasks.add_task_to_queue("B-001", "task-b")
+    tasks.mark_task_started("A-001", "task-a")
+    tasks.set_task_progress("A-001", 42.5, "3MB/s", eta="00:01:00")
+
+    with patch("nassav.tasks.get_download_scheduler") as mock_scheduler:
+        mock_scheduler.return_value.ordered.return_value = []
+        queue = tasks.get_full_task_queue()
+
+    assert queue["active_count"] == 1
+    assert queue["pending_count"] == 1
+    active = queue["active_tasks"][0]
+    assert active["avid"] == "A-001"
+    assert active["progress"]["percent"] == 42.5
+    assert active["progress"]["eta"] == "00:01:00"
+    assert "progress" not in queue["pending_tasks"][0]
+
+
+def test_register_task_rejects_duplicates(queue_redis):
+    assert tasks.is_task_existed("abc-123") is False
+    registered = tasks.register_task("abc-123", "task-1")
+    assert registered["avid"] == "ABC-123"
+    assert registered["state"] == "PENDING"
+    assert tasks.is_task_existed("ABC-123") is True
+    assert tasks.register_task("ABC-123", "task-2") is None
+
+    entry = _queue_entry(queue_redis, "ABC-123")
+    assert entry["state"] == "PENDING"
+    assert entry["task_id"] == "task-1"
+    assert 0 < queue_redis.ttl("nassav:task_lock:ABC-123") <= tasks.TASK_REGISTRY_TTL
+
+
+def test_is_task_existed_does_not_inspect_workers(queue_redis):
+    with patch("celery.app.control.Control.inspect") as mock_inspect:
+        assert tasks.is_task_existed("ABC-123") is False
+    mock_inspect.assert_not_called()
+
+
+@pytest.fixture
+def liveness():
+    """控制对账使用的存活状态（调度队列、下载槽位）"""
+    from unittest.mock import MagicMock
+
+    scheduler = MagicMock()
+    scheduler.ordered.return_value = []
+    slots = MagicMock()
+    slots.holders.return_value = []
+    with patch("nassav.tasks.get_download_scheduler", return_value=scheduler), patch(
+        "nassav.tasks.get_download_slots", return_value=slots
+    ):
+        yield scheduler, slots
+
+
+def test_reconcile_removes_stale_registrations(queue_redis, liveness):
+    import time
+
+    scheduler, slots = liveness
+
+    # 崩溃遗留：已开始但不再持有槽位，且长时间未更新
+    tasks.register_task("DEAD-001", "task-dead")
+    tasks.mark_task_started("DEAD-001", "task-dead")
+    entry = _queue_entry(queue_redis, "DEAD-001")
+    entry["updated_at"] = time.time() - 3600
+    queue_redis.hset(tasks.QUEUE_KEY, "DEAD-001", json.dumps(entry))
+
+    # 仍在调度队列中等待（很久以前提交）
+    tasks.register_task("WAIT-001", "task-wait")
+    entry = _queue_entry(queue_redis, "WAIT-001")
+    entry["created_at"] = time.time() - 3600
+    queue_redis.hset(tasks.QUEUE_KEY, "WAIT-001", json.dumps(entry))
+    scheduler.ordered.return_value = [{"avid": "WAIT-001"}]
+
+    # 正在下载但任务锁丢失
+    tasks.add_task_to_queue("RUN-001", "task-run")
+    slots.holders.return_value = ["RUN-001"]
+
+    result = tasks.reconcile_task_registry()
+
+    assert result == {"removed": ["DEAD-001"], "relocked": ["RUN-001"], "restored": []}
+    assert tasks.is_task_existed("DEAD-001") is False
+    assert _queue_entry(queue_redis, "DEAD-001") is None
+    assert tasks.is_task_existed("WAIT-001") is True
+    assert queue_redis.get("nassav:task_lock:RUN-001") == b"task-run"
+
+
+def test_reconcile_restores_missing_queue_entry(queue_redis, liveness):
+    _, slots = liveness
+    queue_redis.set("nassav:task_lock:RUN-002", "task-run")
+    slots.holders.return_value = ["RUN-002"]
+
+    result = tasks.reconcile_task_registry()
+
+    assert result["restored"] == ["RUN-002"]
+    entry = _queue_entry(queue_redis, "RUN-002")
+    assert entry["state"] == "STARTED"
+    assert entry["task_id"] == "task-run"
+
+
+def test_queue_event_seq_matches_snapshot(queue_redis):
+    with patch("nassav.tasks.notify_task_update") as mock_notify:
+        assert tasks.get_full_task_queue()["seq"] == 0
+
+        tasks.notify_queue_event("added", task={"avid": "A-001"})
+        tasks.notify_queue_event("removed", task={"avid": "A-001", "state": "SUCCESS"})
+
+    payloads = [c.args[1] for c in mock_notify.call_args_list]
+    assert [c.args[0] for c in mock_notify.call_args_list] == ["queue_event"] * 2
+    assert [(p["seq"], p["event"]) for p in payloads] == [(1, "added"), (2, "removed")]
+    assert payloads[1]["task"]["state"] == "SUCCESS"
+
+    # 快照的 seq 为已包含的最后一个事件
+    assert tasks.get_full_task_queue()["seq"] == 2
@@ -199,7 +199,29 @@ export const resourceApi = {
         const timeout = baseTimeout + count * timeoutPerItem
         console.log(`[API] 批量${actionType} ${count} 个任务，超时: ${timeout}ms`)
 
-        return api.post('/resources/batch', payload, {timeout})
+        return api.post('/resources/batch', payload, {timeout}).then(res => {
+            // 超过 sync_limit 的批量操作由后台任务执行（202），轮询到结束后返回与同步模式相同的 {results}
+            if (res.code !== 202 || !res.data || !res.data.job_id) return res
+            return resourceApi.waitBatchJob(res.data.job_id)
+        })
+    },
+
+    // 批量操作任务：状态与结果 / 取消
+    getBatchJob: (jobId) => api.get(`/resources/batch/${encodeURIComponent(jobId)}`),
+    cancelBatchJob: (jobId) => api.delete(`/resources/batch/${encodeURIComponent(jobId)}`),
+
+    // 等待批量操作任务结束，返回 {code, message, data: {results}}（results 按请求顺序）
+    waitBatchJob: async (jobId, interval = 1000) => {
+        const finished = ['completed', 'cancelled', 'failed']
+        for (;;) {
+            const res = await resourceApi.getBatchJob(jobId)
+            const job = res.data || {}
+            if (finished.includes(job.status)) {
+                const results = (job.results || []).map(({index, ...item}) => item)
+                return {code: 200, message: job.error || 'success', data: {results, job_id: jobId, status: job.status}}
+            }
+            await new Promise(resolve => setTimeout(resolve, interval))
+        }
     }
 }
 
@@ -22,6 +22,12 @@ export const useWebSocketStore = defineStore('websocket', () => {
     const pendingCount = ref(0)
     const totalCount = ref(0)
 
+    // 队列增量事件序号：lastSeq 为已应用的最后一个事件序号
+    // 发现序号不连续时请求完整快照，等待快照期间收到的事件先缓存，快照到达后重放
+    let lastSeq = null
+    let awaitingSnapshot = false
+    let bufferedEvents = []
+
     // 缓存已获取的标题数据，避免重复请求和标题闪烁
     // Map<avid, { title: string, timestamp: number }>
     const titleCache = ref(new Map())
@@ -71,6 +77,10 @@ export const useWebSocketStore = defineStore('websocket', () => {
             ws.value.onopen = () => {
                 console.log('[WebSocket] 连接成功')
                 connected.value = true
+                // 服务端在连接建立后推送完整快照，之前的事件序号作废
+                lastSeq = null
+                awaitingSnapshot = true
+                bufferedEvents = []
                 // 清除连接超时定时器
                 if (connectionTimer.value) {
                     clearTimeout(connectionTimer.value)
@@ -171,23 +181,16 @@ export const useWebSocketStore = defineStore('websocket', () => {
 
         switch (message.type) {
             case 'queue_status':
-                // 队列状态更新
+                // 完整队列快照（连接时推送或按需请求）
                 if (message.data) {
-                    updateTaskData(message.data)
+                    applySnapshot(message.data)
                 }
                 break
 
-            case 'progress_update':
-                // 进度更新 - 更新对应任务的进度
+            case 'queue_event':
+                // 队列增量事件（added / started / progress / removed / reordered）
                 if (message.data) {
-                    const taskId = message.data.task_id
-                    const taskIndex = activeTasks.value.findIndex(t => t.task_id === taskId)
-                    if (taskIndex !== -1) {
-                        activeTasks.value[taskIndex].progress = {
-                            percent: message.data.percent,
-                            speed: message.data.speed
-                        }
-                    }
+                    handleQueueEvent(message.data)
                 }
                 break
 
@@ -198,7 +201,6 @@ export const useWebSocketStore = defineStore('websocket', () => {
                     if (avid) {
                         toastStore.info(`开始下载: ${avid}`)
                     }
-                    updateTaskData(message.data)
                 }
                 break
 
@@ -211,7 +213,6 @@ export const useWebSocketStore = defineStore('websocket', () => {
                         // 立即更新资源的下载状态
                         resourceStore.updateResourceDownloadStatus(avid, true)
                     }
-                    updateTaskData(message.data)
                 }
                 break
 
@@ -223,7 +224,6 @@ export const useWebSocketStore = defineStore('websocket', () => {
                     if (avid) {
                         toastStore.error(`下载失败: ${avid} - ${error}`)
                     }
-                    updateTaskData(message.data)
                 }
                 break
 
@@ -232,6 +232,132 @@ export const useWebSocketStore = defineStore('websocket', () => {
         }
     }
 
+    // 请求完整快照（检测到事件序号缺口时）
+    function requestSnapshot() {
+        if (awaitingSnapshot) {
+            return  // 已在等待快照（连接建立时服务端会主动推送）
+        }
+        awaitingSnapshot = true
+        if (ws.value && ws.value.readyState === WebSocket.OPEN) {
+            ws.value.send(JSON.stringify({action: 'get_queue_status'}))
+        }
+    }
+
+    // 应用完整快照，并重放快照之后缓存的事件
+    function applySnapshot(data) {
+        updateTaskData(data)
+        lastSeq = typeof data.seq === 'number' ? data.seq : null
+        awaitingSnapshot = false
+
+        const pending = bufferedEvents.sort((a, b) => a.seq - b.seq)
+        bufferedEvents = []
+        for (const event of pending) {
+            handleQueueEvent(event)
+        }
+    }
+
+    // 处理带序号的增量事件
+    function handleQueueEvent(event) {
+        if (awaitingSnapshot || lastSeq === null) {
+            bufferedEvents.push(event)
+            requestSnapshot()
+            return
+        }
+        if (event.seq <= lastSeq) {
+            // 已包含在快照中
+            return
+        }
+        if (event.seq !== lastSeq + 1) {
+            console.warn(`[WebSocket] 队列事件序号不连续 (期望 ${lastSeq + 1}, 收到 ${event.seq})，请求完整快照`)
+            bufferedEvents.push(event)
+            requestSnapshot()
+            return
+        }
+        applyQueueEvent(event)
+        lastSeq = event.seq
+    }
+
+    // 按排队位置排序等待任务（已派发的任务 position 为 0，排在最前）
+    function sortPendingTasks() {
+        pendingTasks.value.sort((a, b) =>
+            (a.position || 0) - (b.position || 0) || (a.created_at || 0) - (b.created_at || 0)
+        )
+    }
+
+    function withCachedTitle(task) {
+        const cachedTitle = titleCache.value.get(task.avid)?.title
+        return {...task, title: task.title || cachedTitle || null}
+    }
+
+    // 应用单个增量事件（幂等：重复应用结果相同）
+    function applyQueueEvent(event) {
+        const task = event.task || {}
+        const avid = task.avid
+
+        switch (event.event) {
+            case 'added':
+                activeTasks.value = activeTasks.value.filter(t => t.avid !== avid)
+                pendingTasks.value = pendingTasks.value.filter(t => t.avid !== avid)
+                pendingTasks.value.push(withCachedTitle(task))
+                sortPendingTasks()
+                break
+
+            case 'started': {
+                const existing = [...pendingTasks.value, ...activeTasks.value].find(t => t.avid === avid)
+                pendingTasks.value = pendingTasks.value.filter(t => t.avid !== avid)
+                activeTasks.value = activeTasks.value.filter(t => t.avid !== avid)
+                activeTasks.value.push(withCachedTitle({
+                    ...task,
+                    title: existing?.title,
+                    progress: existing?.progress
+                }))
+                activeTasks.value.sort((a, b) => (a.created_at || 0) - (b.created_at || 0))
+                break
+            }
+
+            case 'progress': {
+                const target = activeTasks.value.find(t => t.avid === avid)
+                if (target) {
+                    target.progress = {...(target.progress || {}), ...task.progress}
+                }
+                break
+            }
+
+            case 'removed':
+                activeTasks.value = activeTasks.value.filter(t => t.avid !== avid)
+                pendingTasks.value = pendingTasks.value.filter(t => t.avid !== avid)
+                break
+
+            case 'reordered': {
+                const order = new Map((event.order || []).map(item => [item.avid, item]))
+                for (const t of pendingTasks.value) {
+                    const item = order.get(t.avid)
+                    if (item) {
+                        t.position = item.position
+                        t.priority = item.priority
+                        t.effective_priority = item.effective_priority
+                    } else {
+                        t.position = 0
+                    }
+                }
+                sortPendingTasks()
+                break
+            }
+
+            default:
+                console.log('[WebSocket] 未知队列事件:', event.event)
+                return
+        }
+
+        activeCount.value = activeTasks.value.length
+        pendingCount.value = pendingTasks.value.length
+        totalCount.value = activeCount.value + pendingCount.value
+
+        if (event.event === 'added' || event.event === 'started') {
+            fetchMissingMetadata()
+        }
+    }
+
     // 更新任务数据
     function updateTaskData(data) {
         // 更新任务列表时，先从缓存应用标题